@@ -32,6 +32,10 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 from config import Config
+from llm_client import close_async_llm_clients
+from llm_pool import get_llm_pool
+from model_residency import get_model_residency
+from web_search import get_web_search_client, reset_web_search_client
 from security.jwt_manager import JWTManager
 from security.user_manager import UserManager
 from security.role_manager import RoleManager
@@ -105,6 +109,21 @@ async def lifespan(app: FastAPI):
     app.state.role_manager = role_manager
     app.state.config = config
     
+    # モデルのウォームアップ・キープアライブ開始（完了は待たない）
+    model_residency = None
+    if config.model.model_warmup_enabled:
+        model_residency = get_model_residency()
+        await model_residency.start()
+        app.state.model_residency = model_residency
+        logger.info(f"Model warm-up started: {model_residency.models}")
+    
+    # Ollamaホストのプール使用時は定期ヘルスチェック開始
+    llm_pool = get_llm_pool()
+    if llm_pool is not None:
+        await llm_pool.start()
+        app.state.llm_pool = llm_pool
+        logger.info(f"Ollama host pool started: {[host.url for host in llm_pool.hosts]}")
+    
     logger.info("LlmMultiChat3 API started successfully")
     
     yield
@@ -116,6 +135,15 @@ async def lifespan(app: FastAPI):
     if hasattr(user_manager, 'close'):
         user_manager.close()
     
+    # キープアライブ停止後、検索・LLMクライアントの接続プールをクローズ
+    if model_residency is not None:
+        await model_residency.stop()
+    if llm_pool is not None:
+        await llm_pool.stop()
+    await get_web_search_client().aclose()
+    reset_web_search_client()
+    await close_async_llm_clients()
+    
     logger.info("LlmMultiChat3 API shut down successfully")
 
 
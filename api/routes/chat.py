@@ -23,7 +23,9 @@ Phase 3 Week 9-1:
 """
 
 from typing import Dict, Any, List, Optional
+import asyncio
 import logging
+from contextlib import aclosing
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
@@ -41,12 +43,30 @@ from exceptions import (
     LLMError
 )
 from services import chat_service
+from llm_scheduler import priority_for_roles
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
 
 
+def _format_sse(data: str, event: Optional[str] = None) -> str:
+    """SSEイベント文字列に整形.
+    
+    トークン差分に改行が含まれる場合はSSE仕様に従い複数のdata行に分割します
+    （クライアント側で改行結合されます）。
+    
+    Args:
+        data: 送信データ
+        event: イベント名（省略時は既定のmessageイベント）
+    
+    Returns:
+        str: SSEイベント文字列
+    """
+    event_line = f"event: {event}\n" if event else ""
+    return event_line + "".join(f"data: {line}\n" for line in data.split("\n")) + "\n"
+
+
 # ===== リクエスト/レスポンスモデル =====
 
 class ChatRequest(BaseModel):
@@ -223,7 +243,8 @@ async def chat(
             user_id=current_user.user_id,
             session_id=chat_request.session_id,
             user_input=chat_request.user_input,
-            character=chat_request.character
+            character=chat_request.character,
+            priority=priority_for_roles(current_user.roles)
         )
         
         # レスポンス整形
@@ -242,7 +263,7 @@ async def chat(
         )
         
         return response
-        
+    
     except InputValidationError as e:
         logger.warning(f"Input validation error: {e.message}")
         raise HTTPException(
@@ -297,18 +318,34 @@ async def chat_stream(
     
     Returns:
         StreamingResponse: SSEストリーミング
+    
+    Note:
+        クライアントが切断するとStreamingResponseがこのストリームをキャンセルし、
+        キャンセルはChatService・LangGraph実行・Ollamaのストリーミング要求まで伝播する
+        （途中までの応答はcancelled付きで記録される）。
     """
     async def generate():
         """SSEストリームジェネレーター."""
         try:
             # Phase 1-3統合: ChatService ストリーミング呼び出し
-            async for chunk in chat_service.stream_chat(
+            # 下書きの改訂時はrevisionイベント（data: キャラクター）を送り、以降のトークンで置き換える
+            streamed = False
+            async with aclosing(chat_service.stream_chat_events(
                 user_id=current_user.user_id,
                 session_id=chat_request.session_id,
                 user_input=chat_request.user_input,
-                character=chat_request.character
-            ):
-                yield f"data: {chunk}\n\n"
+                character=chat_request.character,
+                priority=priority_for_roles(current_user.roles)
+            )) as events:
+                async for event in events:
+                    if event["type"] == "token":
+                        streamed = True
+                        yield _format_sse(event["delta"])
+                    elif event["type"] == "revision":
+                        yield _format_sse(event["character"], event="revision")
+                    elif event["type"] == "done" and not streamed:
+                        # トークンが流れなかった場合（入力検証エラー等）は応答全文を返す
+                        yield _format_sse(event["response"])
             
             yield "data: [DONE]\n\n"
             
@@ -316,7 +353,14 @@ async def chat_stream(
                 f"Stream chat completed: "
                 f"user={current_user.user_id}, session={chat_request.session_id}"
             )
-            
+        
+        except (asyncio.CancelledError, GeneratorExit):
+            logger.info(
+                f"Stream chat cancelled by client disconnect: "
+                f"user={current_user.user_id}, session={chat_request.session_id}"
+            )
+            raise
+        
         except Exception as e:
             logger.error(f"Streaming error: {e}", exc_info=True)
             yield "data: {\"error\": \"Streaming failed\"}\n\n"
@@ -395,7 +439,7 @@ async def get_history(
         )
         
         return history_response
-        
+    
     except SessionNotFoundError as e:
         logger.warning(f"Session not found: {e.message}")
         raise HTTPException(
@@ -468,7 +512,7 @@ async def list_sessions(
         )
         
         return session_list
-        
+    
     except Exception as e:
         logger.error(f"Session listing error: {e}", exc_info=True)
         raise HTTPException(
@@ -526,7 +570,7 @@ async def delete_session(
             "status": "success",
             "message": f"Session {session_id} cleared successfully"
         }
-        
+    
     except SessionNotFoundError as e:
         logger.warning(f"Session deletion failed: {e.message}")
         raise HTTPException(
@@ -24,11 +24,18 @@ Phase 3 Week 9-2:
     ...     session_id: 'session-123',
     ...     user_input: 'こんにちは'
     ... }));
+    >>> 
+    >>> // 応答: {type: 'chat_chunk', delta: '...'} が生成され次第届き、
+    >>> // 下書きを改訂する場合は {type: 'chat_revision'} の後に改訂版のchat_chunkが届く。
+    >>> // 最後に全文を含む {type: 'chat_response', response: '...'} が届く
+    >>> // 生成中に切断した場合はサーバー側の生成も中断される（途中までの応答はcancelled付きで記録）
 """
 
-from typing import Dict, Optional, Any
+from typing import Awaitable, Dict, List, Optional, Any
+import asyncio
 import logging
 import json
+from contextlib import aclosing
 from datetime import datetime
 
 from fastapi import WebSocket, WebSocketDisconnect
@@ -36,11 +43,13 @@ from fastapi.websockets import WebSocketState
 
 from security.jwt_manager import JWTManager
 from security.user_manager import UserManager
+from services import chat_service
+from llm_scheduler import priority_for_roles
 from exceptions import (
     TokenExpiredError,
     InvalidTokenError,
     InputValidationError,
-    LLMError
+    LLMNodeError
 )
 
 logger = logging.getLogger(__name__)
@@ -55,12 +64,14 @@ class ConnectionManager:
     Attributes:
         active_connections: アクティブな接続の辞書（user_id -> WebSocket）
         connection_metadata: 接続メタデータ（user_id -> metadata）
+        generations: 応答生成中のタスク（connection_id -> Task）。切断時にキャンセルする
     """
     
     def __init__(self):
         """ConnectionManagerを初期化."""
         self.active_connections: Dict[str, WebSocket] = {}
         self.connection_metadata: Dict[str, Dict[str, Any]] = {}
+        self.generations: Dict[str, asyncio.Task] = {}
         
         logger.info("ConnectionManager initialized")
     
@@ -106,6 +117,65 @@ class ConnectionManager:
             del self.connection_metadata[connection_id]
             
             logger.info(f"WebSocket disconnected: {connection_id}")
+        
+        # 応答生成中であれば中断（LLM生成も打ち切る）
+        generation = self.generations.pop(connection_id, None)
+        if generation is not None and not generation.done():
+            generation.cancel()
+            logger.info(f"WebSocket generation cancelled: {connection_id}")
+    
+    async def run_until_disconnect(
+        self,
+        connection_id: str,
+        generation: Awaitable[Dict[str, Any]],
+        backlog: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """応答生成を実行し、その間に切断されたら生成をキャンセル.
+        
+        生成中も受信を続け、切断を検知した時点（または送信失敗でdisconnectされた時点）で
+        生成タスクをキャンセルする。切断以外の受信メッセージはbacklogに積み、生成後に処理する。
+        
+        Args:
+            connection_id: 接続ID
+            generation: 応答生成のコルーチン
+            backlog: 生成中に受信したメッセージの格納先
+        
+        Returns:
+            dict: 生成結果（応答メッセージ）
+        
+        Raises:
+            WebSocketDisconnect: 生成中に切断された場合
+        """
+        websocket = self.active_connections[connection_id]
+        task = asyncio.ensure_future(generation)
+        self.generations[connection_id] = task
+        receiving: Optional[asyncio.Future] = None
+        
+        try:
+            while True:
+                receiving = asyncio.ensure_future(websocket.receive())
+                await asyncio.wait({task, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                
+                if receiving.done():
+                    message = receiving.result()
+                    receiving = None
+                    if message["type"] == "websocket.disconnect":
+                        self.disconnect(connection_id)
+                        raise WebSocketDisconnect(message.get("code", 1000))
+                    backlog.append(json.loads(message.get("text") or message.get("bytes")))
+                
+                if task.done():
+                    if task.cancelled():
+                        # 送信失敗等でdisconnect済み
+                        raise WebSocketDisconnect(1006)
+                    return task.result()
+        finally:
+            if receiving is not None:
+                receiving.cancel()
+            if not task.done():
+                task.cancel()
+            if self.generations.get(connection_id) is task:
+                del self.generations[connection_id]
     
     async def send_message(
         self,
@@ -262,6 +332,7 @@ class WebSocketHandler:
             # 接続メタデータ更新
             if connection_id in manager.connection_metadata:
                 manager.connection_metadata[connection_id]["user_id"] = user_id
+                manager.connection_metadata[connection_id]["roles"] = payload.get("roles", [])
                 manager.connection_metadata[connection_id]["authenticated"] = True
             
             logger.info(f"WebSocket authenticated: {connection_id} (user={user_id})")
@@ -271,7 +342,7 @@ class WebSocketHandler:
                 "status": "success",
                 "user_id": user_id
             }
-            
+        
         except (TokenExpiredError, InvalidTokenError) as e:
             logger.warning(f"WebSocket auth failed: {e.message}")
             
@@ -314,36 +385,54 @@ class WebSocketHandler:
             }
         
         try:
-            # TODO: Phase 1のLangGraphコアを使用
-            # chat_manager = ...
-            # response = await chat_manager.chat(
-            #     session_id=session_id,
-            #     user_id=metadata["user_id"],
-            #     user_input=user_input,
-            #     character=character
-            # )
-            
-            # モック応答（Phase 1統合後に削除）
             logger.info(
                 f"WebSocket chat: user={metadata['user_id']}, "
                 f"session={session_id}"
             )
             
+            # Phase 1-3統合: トークンを生成され次第chat_chunkとして送信
+            # （切断時はConnectionManagerがこのタスクをキャンセルし、ストリームを閉じて生成を中断）
+            response: Dict[str, Any] = {}
+            async with aclosing(chat_service.stream_chat_events(
+                user_id=metadata["user_id"],
+                session_id=session_id,
+                user_input=user_input,
+                character=character,
+                priority=priority_for_roles(metadata.get("roles"))
+            )) as events:
+                async for event in events:
+                    if event["type"] == "token":
+                        await manager.send_message(connection_id, {
+                            "type": "chat_chunk",
+                            "session_id": session_id,
+                            "character": event["character"],
+                            "delta": event["delta"]
+                        })
+                    elif event["type"] == "revision":
+                        # 送出済みの下書きを破棄し、以降のchat_chunkで置き換える
+                        await manager.send_message(connection_id, {
+                            "type": "chat_revision",
+                            "session_id": session_id,
+                            "character": event["character"]
+                        })
+                    elif event["type"] == "done":
+                        response = event
+            
             return {
                 "type": "chat_response",
                 "session_id": session_id,
-                "character": character or "lumina",
-                "response": f"WebSocketモック応答: {user_input}",
+                "character": response.get("character", character or "lumina"),
+                "response": response.get("response", ""),
                 "timestamp": datetime.utcnow().isoformat()
             }
-            
+        
         except InputValidationError as e:
             return {
                 "type": "error",
                 "message": e.message
             }
         
-        except LLMError as e:
+        except LLMNodeError as e:
             logger.error(f"LLM error in WebSocket: {e.message}")
             return {
                 "type": "error",
@@ -394,10 +483,13 @@ async def websocket_endpoint(
             user_manager=user_manager
         )
         
+        # 応答生成中に受信したメッセージ（生成後に順に処理）
+        backlog: List[Dict[str, Any]] = []
+        
         # メッセージループ
         while True:
             # メッセージ受信
-            data = await websocket.receive_json()
+            data = backlog.pop(0) if backlog else await websocket.receive_json()
             
             message_type = data.get("type")
             
@@ -412,7 +504,10 @@ async def websocket_endpoint(
             if message_type == "auth":
                 response = await handler.handle_auth(connection_id, data)
             elif message_type == "chat":
-                response = await handler.handle_chat(connection_id, data)
+                # 生成中の切断を検知して生成を中断
+                response = await manager.run_until_disconnect(
+                    connection_id, handler.handle_chat(connection_id, data), backlog
+                )
             elif message_type == "ping":
                 response = await handler.handle_ping(connection_id, data)
             else:
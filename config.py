@@ -31,7 +31,15 @@ class APIConfig:
         self.enabled = False     # Phase 3: ON
         self.rate_limit_free = int(os.getenv("RATE_LIMIT_FREE", "100"))
         self.rate_limit_pro = int(os.getenv("RATE_LIMIT_PRO", "1000"))
+        # proプラン扱いのロール（LLMスケジューラで優先実行）
+        self.pro_roles = os.getenv("PRO_ROLES", "admin,premium").split(",")
         self.cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+        # 同一セッションの連続入力の合流（開始前のターンに後続の入力をまとめて1回の生成にする）
+        self.input_coalesce_enabled = os.getenv("INPUT_COALESCE_ENABLED", "true").lower() == "true"
+        # ターン開始前に後続の入力を待つ時間（ミリ秒、0の場合は先行ターンの完了待ちの間のみ合流）
+        self.input_coalesce_window_ms = float(os.getenv("INPUT_COALESCE_WINDOW_MS", "0"))
+        # 生成中のターンに後続の入力が届いた場合は生成を打ち切り、後続の入力で置き換える
+        self.input_supersede_enabled = os.getenv("INPUT_SUPERSEDE_ENABLED", "false").lower() == "true"
 
 
 class DatabaseConfig:
@@ -69,6 +77,22 @@ class ModelConfig:
     
     def __init__(self):
         self.ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+        # 複数Ollamaホストのプール（"URL=モデル|モデル,URL"形式、モデル省略時は/api/tagsの一覧）
+        # 未設定時はollama_hostのみを使う
+        self.ollama_hosts = [
+            {"url": url.strip(), "models": [m.strip() for m in models.split("|") if m.strip()]}
+            for url, _, models in (
+                entry.partition("=") for entry in os.getenv("OLLAMA_HOSTS", "").split(",") if entry.strip()
+            )
+        ]
+        # ホストのサーキットブレーカー（連続失敗数と除外秒数）とヘルスチェック間隔（秒）
+        self.llm_pool_failure_threshold = int(os.getenv("LLM_POOL_FAILURE_THRESHOLD", "3"))
+        self.llm_pool_open_seconds = float(os.getenv("LLM_POOL_OPEN_SECONDS", "30"))
+        self.llm_pool_probe_interval = float(os.getenv("LLM_POOL_PROBE_INTERVAL", "10"))
+        # ヘッジング: 応答がモデル別p95（最短この値）を過ぎても届かない場合に別ホストへも送信
+        self.llm_hedge_enabled = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+        self.llm_hedge_min_delay_ms = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "1000"))
+        self.llm_hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
         
         self.models = {
             "fast": os.getenv("DEFAULT_MODEL_FAST", "llama3-jp-8b"),
@@ -76,6 +100,104 @@ class ModelConfig:
             "search": os.getenv("DEFAULT_MODEL_SEARCH", "dsasai/llama3-elyza-jp-8b:latest")
         }
         
+        # 非同期LLMクライアント（ホストごとの接続プール）
+        self.llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "10"))
+        self.llm_max_keepalive_connections = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+        self.llm_keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+        llm_timeout = os.getenv("LLM_TIMEOUT", "")
+        self.llm_timeout = float(llm_timeout) if llm_timeout else None
+        
+        # リトライ待機（ジッター付き指数バックオフ）
+        self.llm_retry_base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+        self.llm_retry_max_delay = float(os.getenv("LLM_RETRY_MAX_DELAY", "8.0"))
+        
+        # スケジューラ: モデル別の同時実行数（Ollama側のOLLAMA_NUM_PARALLELに合わせる）
+        self.llm_default_slots = int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+        self.llm_slots = {
+            "fast": int(os.getenv("LLM_SLOTS_FAST", str(self.llm_default_slots))),
+            "medium": int(os.getenv("LLM_SLOTS_MEDIUM", str(self.llm_default_slots))),
+            "search": int(os.getenv("LLM_SLOTS_SEARCH", str(self.llm_default_slots)))
+        }
+        # 実行枠の待機期限（秒）
+        self.llm_queue_timeout = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+        
+        # レイテンシSLOによるモデル降格（待機+実行時間のp95がSLOを超えたモデルキーを一時的に振り替え、
+        # キャラクターの応答モデルが変わるためオプトイン）
+        self.model_downgrade_enabled = os.getenv("MODEL_DOWNGRADE_ENABLED", "false").lower() == "true"
+        # モデルキー別のp95上限（ミリ秒、0で監視しない）
+        self.model_slo_ms = {
+            "fast": float(os.getenv("MODEL_SLO_MS_FAST", "0")),
+            "medium": float(os.getenv("MODEL_SLO_MS_MEDIUM", "20000")),
+            "search": float(os.getenv("MODEL_SLO_MS_SEARCH", "20000"))
+        }
+        # 降格先（"medium:fast,search:fast"形式）
+        self.model_downgrade = dict(
+            pair.strip().split(":", 1)
+            for pair in os.getenv("MODEL_DOWNGRADE", "medium:fast,search:fast").split(",") if ":" in pair
+        )
+        # p95の時間窓（秒）と判定に必要な最小計測数
+        self.model_slo_window_seconds = float(os.getenv("MODEL_SLO_WINDOW_SECONDS", "120"))
+        self.model_slo_min_samples = int(os.getenv("MODEL_SLO_MIN_SAMPLES", "10"))
+        # ヒステリシス: 最低この秒数は降格を維持し、p95がSLO×この比率以下になってから戻す
+        self.model_slo_hold_seconds = float(os.getenv("MODEL_SLO_HOLD_SECONDS", "60"))
+        self.model_slo_recover_ratio = float(os.getenv("MODEL_SLO_RECOVER_RATIO", "0.7"))
+        
+        # LLM応答キャッシュ（完全一致、プロセス内LRU+TTL → Redis）
+        self.response_cache_enabled = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+        self.response_cache_max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+        self.response_cache_ttl = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        # キャッシュを使わないキャラクター（lumina/claris/nox、カンマ区切り）
+        self.response_cache_exclude = [
+            c.strip() for c in os.getenv("RESPONSE_CACHE_EXCLUDE", "").split(",") if c.strip()
+        ]
+        
+        # プロンプトのトークン予算（キャラクター別、num_ctxはここから算出）
+        # 会話履歴は新しい順に予算内まで残す
+        self.prompt_history_tokens = {
+            "lumina": int(os.getenv("PROMPT_HISTORY_TOKENS_LUMINA", "1024")),
+            "claris": int(os.getenv("PROMPT_HISTORY_TOKENS_CLARIS", "1536")),
+            "nox": int(os.getenv("PROMPT_HISTORY_TOKENS_NOX", "1024"))
+        }
+        # ユーザー入力・検索結果の上限（超過分は切り詰め）
+        self.prompt_input_tokens = int(os.getenv("PROMPT_INPUT_TOKENS", "512"))
+        self.prompt_search_tokens = int(os.getenv("PROMPT_SEARCH_TOKENS", "768"))
+        # 応答の最大生成トークン数
+        self.num_predict = {
+            "lumina": int(os.getenv("NUM_PREDICT_LUMINA", "512")),
+            "claris": int(os.getenv("NUM_PREDICT_CLARIS", "1024")),
+            "nox": int(os.getenv("NUM_PREDICT_NOX", "512"))
+        }
+        
+        # 下書き→改訂のカスケード（キャラクター別ポリシー）
+        # off: 通常のモデルのみ / draft: 下書きモデルのみ / refine: 下書きを流した後に必ず通常のモデルで改訂
+        # auto: 深い説明が必要な入力・下書きが簡易判定を満たさない場合のみ改訂
+        self.cascade_policy = {
+            "lumina": os.getenv("CASCADE_POLICY_LUMINA", "off"),
+            "claris": os.getenv("CASCADE_POLICY_CLARIS", "off"),
+            "nox": os.getenv("CASCADE_POLICY_NOX", "off")
+        }
+        # 下書きに使うモデルキー
+        self.cascade_draft_model = os.getenv("CASCADE_DRAFT_MODEL", "fast")
+        # auto判定: 下書きを採用する最小文字数と、採用しない不確実な表現
+        self.cascade_accept_min_chars = int(os.getenv("CASCADE_ACCEPT_MIN_CHARS", "80"))
+        self.cascade_uncertain_markers = [
+            m.strip() for m in os.getenv(
+                "CASCADE_UNCERTAIN_MARKERS", "わかりません,分かりません,不明,かもしれません,確認が必要"
+            ).split(",") if m.strip()
+        ]
+        
+        # モデル常駐（ウォームアップ・キープアライブ）
+        # Ollamaにモデルを常駐させる時間（全リクエストで指定、例: "30m"、-1で無期限）
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self.model_warmup_enabled = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"
+        # キープアライブ送信間隔（秒、keep_aliveより短くする）
+        self.model_keepalive_interval = float(os.getenv("MODEL_KEEPALIVE_INTERVAL", "600"))
+        # この読み込み時間（ミリ秒）以上をコールドスタートとして記録
+        self.model_cold_start_threshold_ms = float(os.getenv("MODEL_COLD_START_THRESHOLD_MS", "500"))
+        
+        # 同一モデル・プロンプトの同時リクエストを1回の生成に集約
+        self.single_flight_enabled = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+        
         # API Keys
         self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY", "")
@@ -94,8 +216,80 @@ class SystemConfig:
         self.enable_associative_memory = os.getenv("ENABLE_ASSOCIATIVE_MEMORY", "true").lower() == "true"
         self.enable_self_reflection = os.getenv("ENABLE_SELF_REFLECTION", "true").lower() == "true"
         
+        # セッション別会話状態の保持上限（超過分はLRUで中期記憶へ退避）
+        self.max_active_sessions = int(os.getenv("MAX_ACTIVE_SESSIONS", "1000"))
+        
+        # LangGraph実行時に渡す直近履歴のターン数
+        self.graph_history_window = int(os.getenv("GRAPH_HISTORY_WINDOW", "12"))
+        
+        # ローリング要約（古いターンをfastモデルで要約し、プロンプトでは要約に置き換える）
+        self.summary_enabled = os.getenv("ROLLING_SUMMARY_ENABLED", "true").lower() == "true"
+        # 未要約のターン数・推定トークン数がいずれかを超えたら要約を実行
+        self.summary_trigger_turns = int(os.getenv("SUMMARY_TRIGGER_TURNS", "8"))
+        self.summary_trigger_tokens = int(os.getenv("SUMMARY_TRIGGER_TOKENS", "1024"))
+        # 要約せずに残す直近のターン数
+        self.summary_keep_recent_turns = int(os.getenv("SUMMARY_KEEP_RECENT_TURNS", "4"))
+        # 要約の最大トークン数、1回の要約で取り込むターンの上限トークン数
+        self.summary_max_tokens = int(os.getenv("SUMMARY_MAX_TOKENS", "384"))
+        self.summary_batch_tokens = int(os.getenv("SUMMARY_BATCH_TOKENS", "2048"))
+        
+        # ルーティング・意図判定のキーワードルール
+        # （NFKC・カタカナ→ひらがな正規化後に照合し、priorityの大きいルールを採用。
+        #   targetはキャラクターキー、または意図（search: ノクスの検索要否））
+        self.routing_rules = [
+            {"keyword": "ルミナ", "target": "lumina", "priority": 100},
+            {"keyword": "クラリス", "target": "claris", "priority": 100},
+            {"keyword": "ノクス", "target": "nox", "priority": 100},
+            {"keyword": "調べて", "target": "nox", "priority": 50},
+            {"keyword": "検索", "target": "nox", "priority": 50},
+            {"keyword": "最新", "target": "nox", "priority": 50},
+            {"keyword": "ニュース", "target": "nox", "priority": 50},
+            {"keyword": "説明", "target": "claris", "priority": 40},
+            {"keyword": "解説", "target": "claris", "priority": 40},
+            {"keyword": "詳しく", "target": "claris", "priority": 40},
+            {"keyword": "理由", "target": "claris", "priority": 40},
+            {"keyword": "調べて", "target": "search"},
+            {"keyword": "検索", "target": "search"},
+            {"keyword": "最新", "target": "search"},
+            {"keyword": "ニュース", "target": "search"},
+            {"keyword": "情報", "target": "search"},
+            # 深い説明が必要な入力（カスケードのauto判定で下書きを採用しない）
+            {"keyword": "詳しく", "target": "depth"},
+            {"keyword": "なぜ", "target": "depth"},
+            {"keyword": "理由", "target": "depth"},
+            {"keyword": "仕組み", "target": "depth"},
+            {"keyword": "違い", "target": "depth"},
+            {"keyword": "比較", "target": "depth"},
+        ]
+        
+        # このpriority以上のルール（キャラクターの指名）は分類器より優先
+        self.routing_mention_priority = int(os.getenv("ROUTING_MENTION_PRIORITY", "100"))
+        # 複数キャラクターの指名・指定時に並列で応答させる（最大キャラクター数、無効時は最初の1キャラのみ）
+        self.fanout_enabled = os.getenv("FANOUT_ENABLED", "false").lower() == "true"
+        self.fanout_max_characters = int(os.getenv("FANOUT_MAX_CHARACTERS", "3"))
+        # 統計的ルーティング（intent_classifier.pyで学習したモデル、空の場合は無効）
+        self.intent_model_path = os.getenv("INTENT_MODEL_PATH", "")
+        # 分類器の確信度がこれ未満の場合はキーワードルールで判定
+        self.intent_confidence_threshold = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.7"))
+        # 投機的ルーティング（非同期実行時のみ）: 判定が曖昧な入力は候補2キャラの生成を先行開始し、
+        # 高速モデルによる最終判定後に採用されなかった側をキャンセルする（Ollamaの負荷は増える）
+        self.speculative_routing_enabled = os.getenv("SPECULATIVE_ROUTING_ENABLED", "false").lower() == "true"
+        # 分類器の確信度がこれ未満の入力を曖昧とみなす（分類器なしの場合は複数キャラのキーワードに一致した入力）
+        self.speculative_confidence_threshold = float(os.getenv("SPECULATIVE_CONFIDENCE_THRESHOLD", "0.7"))
+        # 最終判定の待ち時間の上限（超過時は通常のルーティング結果を採用）
+        self.speculative_judge_timeout_ms = int(os.getenv("SPECULATIVE_JUDGE_TIMEOUT_MS", "1500"))
+        
         # Web検索API
         self.serper_api_key = os.getenv("SERPER_API_KEY", "")
+        # 検索結果キャッシュ（正規化したクエリ単位、プロセス内+Redis）
+        self.search_cache_enabled = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+        self.search_cache_ttl = int(os.getenv("SEARCH_CACHE_TTL", "900"))
+        self.search_cache_max_entries = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "512"))
+        # 検索APIのHTTPタイムアウト（秒）と同時接続数
+        self.search_timeout = float(os.getenv("SEARCH_TIMEOUT", "10"))
+        self.search_max_connections = int(os.getenv("SEARCH_MAX_CONNECTIONS", "10"))
+        # 検索の待ち時間の上限（ミリ秒、超過時は検索結果なしで応答）
+        self.search_deadline_ms = int(os.getenv("SEARCH_DEADLINE_MS", "2500"))
         
         # ログ設定
         self.log_level = os.getenv("LOG_LEVEL", "INFO")
@@ -134,9 +328,18 @@ class Config:
         # 必要に応じてYAML設定で上書き
         if "ollama" in yaml_config:
             self.model.ollama_host = yaml_config["ollama"].get("host", self.model.ollama_host)
+            if "hosts" in yaml_config["ollama"]:
+                self.model.ollama_hosts = [
+                    {"url": host, "models": []} if isinstance(host, str)
+                    else {"url": host["url"], "models": list(host.get("models", []))}
+                    for host in yaml_config["ollama"]["hosts"]
+                ]
         
         if "system" in yaml_config:
             self.system.max_turns = yaml_config["system"].get("max_turns", self.system.max_turns)
+        
+        if "routing" in yaml_config:
+            self.system.routing_rules = yaml_config["routing"].get("rules", self.system.routing_rules)
     
     def validate_config(self) -> bool:
         """設定整合性チェック"""
@@ -16,3 +16,50 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 print(f"[conftest.py] Added to sys.path: {project_root}")
+
+
+import time
+
+import pytest
+
+
+class FakeClock:
+    """手動で進める単調時計（time.monotonicの現在値から開始）"""
+    
+    def __init__(self):
+        self.now = time.monotonic()
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """時刻を注入できるコンポーネント用のFakeClock（clock.now += 秒数で進める）"""
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def _reset_global_singletons():
+    """テスト間でモジュールのシングルトンを共有しない
+    
+    LLM応答キャッシュ（Redis層も使用しない）・進行中フライト・検索クライアント・
+    モデル降格状態・メトリクスをテストごとに作り直す。
+    """
+    import metrics
+    import response_cache
+    metrics.reset_metrics_collector()
+    response_cache._response_cache = response_cache.ResponseCache()
+    yield
+    response_cache.reset_response_cache()
+    
+    import single_flight
+    single_flight.reset_single_flight()
+    
+    import web_search
+    web_search.reset_web_search_client()
+    
+    import model_slo
+    model_slo.reset_model_downgrade_policy()
+    
+    metrics.reset_metrics_collector()
@@ -3,9 +3,11 @@ conversation_state.py
 会話状態・履歴管理
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
+from collections import OrderedDict
+import threading
 
 
 @dataclass
@@ -51,6 +53,10 @@ class ConversationState:
     # 検索結果（ノクス用）
     search_results: Optional[str] = None
     
+    # ローリング要約（history[:summarized_turns]を圧縮したもの）
+    summary: str = ""
+    summarized_turns: int = 0
+    
     # 感情状態（各キャラクター）
     emotions: Dict[str, Dict[str, float]] = field(default_factory=dict)
     
@@ -129,6 +135,8 @@ class ConversationState:
         self.start_time = datetime.now()
         self.current_turn = 0
         self.history = []
+        self.summary = ""
+        self.summarized_turns = 0
     
     def should_flush(self) -> bool:
         """
@@ -148,15 +156,34 @@ class ConversationState:
         
         return False
     
+    def unsummarized_turns(self) -> List[Dict[str, Any]]:
+        """ローリング要約に含まれていないターンを取得"""
+        return self.history[self.summarized_turns:]
+    
+    def apply_summary(self, summary: str, summarized_turns: int):
+        """
+        ローリング要約を更新
+        
+        Args:
+            summary: history[:summarized_turns]の要約
+            summarized_turns: 要約済みのターン数（履歴の先頭からの件数）
+        """
+        self.summary = summary
+        self.summarized_turns = summarized_turns
+    
     def summarize(self) -> str:
         """
         会話履歴を要約
         
+        ローリング要約（ConversationSummarizerがLLMで生成）があればそれを返し、
+        無ければ参加者・ターン数等の簡易要約を返す。
+        
         Returns:
             要約テキスト
         """
-        # TODO: LLMを使った要約生成
-        # 現状は簡易的な処理
+        if self.summary:
+            return self.summary
+        
         if not self.history:
             return "No conversation yet."
         
@@ -182,6 +209,8 @@ class ConversationState:
         self.current_turn = 0
         self.start_time = datetime.now()
         self.search_results = None
+        self.summary = ""
+        self.summarized_turns = 0
     
     def to_dict(self) -> Dict[str, Any]:
         """辞書形式に変換（シリアライズ用）"""
@@ -194,6 +223,8 @@ class ConversationState:
             "thread_id": self.thread_id,
             "current_character": self.current_character,
             "search_results": self.search_results,
+            "summary": self.summary,
+            "summarized_turns": self.summarized_turns,
             "emotions": self.emotions,
             "metadata": self.metadata
         }
@@ -210,6 +241,194 @@ class ConversationState:
         state.thread_id = data.get("thread_id")
         state.current_character = data.get("current_character")
         state.search_results = data.get("search_results")
+        state.summary = data.get("summary", "")
+        state.summarized_turns = data.get("summarized_turns", 0)
         state.emotions = data.get("emotions", {})
         state.metadata = data.get("metadata", {})
-        return state
\ No newline at end of file
+        return state
+
+
+class SessionStateStore:
+    """セッション別会話状態ストア
+    
+    セッションIDごとにConversationStateとロックを保持する。
+    上限を超えた場合は最も古く使われたセッションを退避（LRU）し、
+    退避コールバック（中期記憶への保存等）を呼び出す。
+    acquireからreleaseまでの間（ターンの実行中）のセッションは退避しない。
+    """
+    
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        on_evict: Optional[Callable[[ConversationState], None]] = None,
+        loader: Optional[Callable[[str], Optional[ConversationState]]] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            max_sessions: 同時に保持する最大セッション数
+            on_evict: 退避時に呼ばれるコールバック
+            loader: 未保持セッションの復元関数（中期記憶からの読み込み等）
+        """
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self.loader = loader
+        
+        # {session_id: (ConversationState, ロック)}（末尾ほど最近使用）
+        self._sessions: OrderedDict[str, Tuple[ConversationState, threading.Lock]] = OrderedDict()
+        # {session_id: acquire済みでrelease前の数}（1以上のセッションは退避しない）
+        self._pins: Dict[str, int] = {}
+        # {session_id: ConversationState}（取り出し済みで退避コールバック完了前）
+        self._evicting: Dict[str, ConversationState] = {}
+        self._store_lock = threading.Lock()
+        self._evicted = threading.Condition(self._store_lock)
+    
+    def acquire(self, session_id: str) -> Tuple[ConversationState, threading.Lock]:
+        """
+        セッションの会話状態とロックを取得（存在しない場合は作成）
+        
+        同一セッションのターンは返却されたロックで直列化し、ターンの終了後にreleaseを呼ぶこと。
+        releaseまでの間、セッションは退避しない（ロック取得前に退避されると
+        ターンが保存されない会話状態に対して実行されるため）。
+        退避コールバック実行中のセッションは、保存の完了を待って同じ会話状態を再利用する
+        （保存前にloaderで復元すると古い状態が返るため）。
+        
+        Args:
+            session_id: セッションID
+            
+        Returns:
+            (会話状態, セッションロック)
+        """
+        with self._store_lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions.move_to_end(session_id)
+                self._pin(session_id)
+                return entry
+            
+            state = self._evicting.get(session_id)
+            if state is not None:
+                while session_id in self._evicting:
+                    self._evicted.wait()
+                entry, evicted = self._insert(session_id, state)
+        
+        if state is None:
+            # 復元はI/Oを伴うためストアロック外で実行
+            state = self.loader(session_id) if self.loader else None
+            if state is None:
+                state = ConversationState(thread_id=session_id)
+            
+            with self._store_lock:
+                entry, evicted = self._insert(session_id, state)
+        
+        for evicted_id, evicted_state in evicted:
+            self._evict(evicted_id, evicted_state)
+        
+        return entry
+    
+    def release(self, session_id: str):
+        """
+        acquireで確保したセッションを解放（上限を超えていれば退避）
+        
+        Args:
+            session_id: セッションID
+        """
+        with self._store_lock:
+            pins = self._pins.get(session_id, 0) - 1
+            if pins > 0:
+                self._pins[session_id] = pins
+                return
+            self._pins.pop(session_id, None)
+            evicted = self._collect_evictions()
+        
+        for evicted_id, evicted_state in evicted:
+            self._evict(evicted_id, evicted_state)
+    
+    def remove(self, session_id: str) -> bool:
+        """
+        セッションを退避せずに破棄
+        
+        Args:
+            session_id: セッションID
+            
+        Returns:
+            存在した場合True
+        """
+        with self._store_lock:
+            return self._sessions.pop(session_id, None) is not None
+    
+    def flush(self) -> int:
+        """
+        全セッションを退避
+        
+        Returns:
+            退避件数
+        """
+        with self._store_lock:
+            evicted = [(session_id, state) for session_id, (state, _) in self._sessions.items()]
+            self._sessions.clear()
+            self._evicting.update(evicted)
+        
+        for session_id, state in evicted:
+            self._evict(session_id, state)
+        return len(evicted)
+    
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def _insert(
+        self,
+        session_id: str,
+        state: ConversationState
+    ) -> Tuple[Tuple[ConversationState, threading.Lock], List[Tuple[str, ConversationState]]]:
+        """会話状態を登録して確保し、上限超過分を取り出す（ストアロック保持中に呼ぶ）"""
+        # 復元中・待機中に他スレッドが作成済みの場合はそちらを優先
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = (state, threading.Lock())
+            self._sessions[session_id] = entry
+        else:
+            self._sessions.move_to_end(session_id)
+        self._pin(session_id)
+        return entry, self._collect_evictions()
+    
+    def _collect_evictions(self) -> List[Tuple[str, ConversationState]]:
+        """上限超過分のLRUセッションを取り出す（ストアロック保持中に呼ぶ）"""
+        evicted = []
+        overflow = len(self._sessions) - self.max_sessions
+        if overflow <= 0:
+            return evicted
+        
+        # 実行中（確保中・ロック保持中）のセッションは退避しない
+        for session_id in list(self._sessions.keys()):
+            if overflow <= 0:
+                break
+            state, lock = self._sessions[session_id]
+            if session_id in self._pins or lock.locked():
+                continue
+            del self._sessions[session_id]
+            self._evicting[session_id] = state
+            evicted.append((session_id, state))
+            overflow -= 1
+        return evicted
+    
+    def _pin(self, session_id: str):
+        """確保数を加算（ストアロック保持中に呼ぶ）"""
+        self._pins[session_id] = self._pins.get(session_id, 0) + 1
+    
+    def _evict(self, session_id: str, state: ConversationState):
+        """退避コールバックを実行し、完了を待つacquireを再開させる"""
+        try:
+            if self.on_evict and state.history:
+                self.on_evict(state)
+        except Exception as e:
+            print(f"Session eviction error ({state.thread_id}): {e}")
+        finally:
+            with self._store_lock:
+                if self._evicting.get(session_id) is state:
+                    del self._evicting[session_id]
+                self._evicted.notify_all()
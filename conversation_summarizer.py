@@ -0,0 +1,222 @@
+"""
+conversation_summarizer.py
+会話のローリング要約
+
+未要約のターンが閾値（ターン数・推定トークン数）を超えたセッションについて、
+直近のターンを残して古いターンをfastモデルで要約し、既存の要約に統合する。
+要約はリクエスト処理の外（専用のワーカースレッド）で実行し、会話状態に反映した上で
+SessionManager経由で中期記憶に保存する。
+プロンプトでは要約済みのターンの代わりに要約を使うため、長いセッションでもプロンプト長が一定に保たれる。
+"""
+
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+import ollama
+
+from config import Config
+from conversation_state import ConversationState
+from llm_pool import get_llm_pool
+from llm_scheduler import get_llm_scheduler, PRIORITY_BACKGROUND
+from metrics import get_metrics_collector
+from prompt_builder import estimate_tokens, get_prompt_builder, truncate_to_tokens
+from utils import Logger
+
+
+SUMMARY_PROMPT = """あなたは会話の記録係です。
+これまでの要約と新しい会話を統合し、今後の会話に必要な情報を簡潔な日本語の箇条書きでまとめてください。
+- ユーザーについて分かった事実・好み・関心
+- 話題ごとの結論と、未解決の質問
+{max_chars}文字以内で、要約のみを出力してください。
+
+これまでの要約:
+{summary}
+
+新しい会話:
+{turns}"""
+
+
+class ConversationSummarizer:
+    """ローリング要約の生成"""
+    
+    def __init__(self, config: Config, memory=None, executor: Optional[Executor] = None):
+        """
+        初期化
+        
+        Args:
+            config: 設定
+            memory: 要約の保存先MemorySystemManager（Noneの場合は保存しない）
+            executor: 要約を実行するExecutor（省略時は専用のワーカースレッド1本）
+        """
+        self.config = config
+        self.memory = memory
+        self.logger = Logger()
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="summarizer"
+        )
+        # 要約待ち・実行中のセッションID
+        self._pending: Set[str] = set()
+        self._pending_lock = threading.Lock()
+    
+    def needs_summary(self, conv_state: ConversationState) -> bool:
+        """
+        要約が必要か判定
+        
+        Args:
+            conv_state: 会話状態
+        
+        Returns:
+            直近ターン以外に未要約のターンがあり、未要約分がターン数・トークン数の閾値を超えた場合True
+        """
+        system = self.config.system
+        if not self._candidates(conv_state):
+            return False
+        
+        pending = conv_state.unsummarized_turns()
+        if len(pending) >= system.summary_trigger_turns:
+            return True
+        return sum(estimate_tokens(turn.get('msg', '')) for turn in pending) >= system.summary_trigger_tokens
+    
+    def maybe_schedule(self, conv_state: ConversationState, lock: threading.Lock) -> bool:
+        """
+        必要であれば要約をバックグラウンドで実行
+        
+        Args:
+            conv_state: 会話状態
+            lock: セッションロック（要約の反映時に取得する）
+        
+        Returns:
+            要約を登録した場合True（同一セッションの要約が実行中の場合はFalse）
+        """
+        if not self.needs_summary(conv_state):
+            return False
+        
+        key = conv_state.session_id
+        with self._pending_lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._executor.submit(self._run, conv_state, lock, key)
+        return True
+    
+    def summarize(self, conv_state: ConversationState, lock: threading.Lock) -> bool:
+        """
+        未要約の古いターンを要約して会話状態に反映
+        
+        LLM呼び出し中はセッションロックを保持しない。呼び出し中に会話がリセットされた場合は
+        結果を破棄する。1回で取り込むターンはsummary_batch_tokensまでとし、残りは次回に回す。
+        
+        Args:
+            conv_state: 会話状態
+            lock: セッションロック
+        
+        Returns:
+            要約を反映した場合True
+        """
+        history = conv_state.history
+        start = conv_state.summarized_turns
+        model = self.config.model.models['fast']
+        num_ctx = get_prompt_builder().model_num_ctx(model)
+        
+        batch = self._select_batch(self._candidates(conv_state), self._batch_budget(num_ctx))
+        if not batch:
+            return False
+        
+        start_time = time.time()
+        summary = self._generate(self._build_prompt(conv_state.summary, batch), model, num_ctx)
+        if not summary:
+            return False
+        
+        summarized_turns = start + len(batch)
+        with lock:
+            if conv_state.history is not history or conv_state.summarized_turns != start:
+                return False
+            conv_state.apply_summary(summary, summarized_turns)
+        
+        get_metrics_collector().record_summary(
+            duration_ms=(time.time() - start_time) * 1000,
+            success=True,
+            turns=len(batch)
+        )
+        self.logger.log_system_event(
+            "rolling_summary",
+            {"session_id": conv_state.session_id, "summarized_turns": summarized_turns}
+        )
+        
+        if self.memory is not None:
+            try:
+                self.memory.save_rolling_summary(conv_state.session_id, summary, summarized_turns)
+            except Exception:
+                # 保存に失敗しても会話状態への反映は維持する（エラーは記憶システム側で記録済み）
+                pass
+        return True
+    
+    def _run(self, conv_state: ConversationState, lock: threading.Lock, key: str):
+        try:
+            self.summarize(conv_state, lock)
+        except Exception as e:
+            self.logger.log_error(e, context="rolling_summary")
+            get_metrics_collector().record_summary(duration_ms=0.0, success=False)
+        finally:
+            with self._pending_lock:
+                self._pending.discard(key)
+    
+    def _candidates(self, conv_state: ConversationState) -> List[Dict[str, Any]]:
+        """要約対象のターン（未要約分から直近ターンを除いたもの）"""
+        keep = self.config.system.summary_keep_recent_turns
+        pending = conv_state.unsummarized_turns()
+        return pending[:len(pending) - keep] if keep > 0 else pending
+    
+    def _batch_budget(self, num_ctx: int) -> int:
+        """1回で取り込むターンのトークン上限（要約・生成分を差し引いてnum_ctxに収める）"""
+        system = self.config.system
+        overhead = estimate_tokens(SUMMARY_PROMPT) + 2 * system.summary_max_tokens
+        return max(1, min(system.summary_batch_tokens, num_ctx - overhead))
+    
+    @staticmethod
+    def _select_batch(turns: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+        """古い順に上限トークン数までのターンを選択（最低1ターン）"""
+        batch = []
+        used = 0
+        for turn in turns:
+            used += estimate_tokens(turn.get('msg', '')) + 1
+            if batch and used > max_tokens:
+                break
+            batch.append(turn)
+        return batch
+    
+    def _build_prompt(self, summary: str, turns: List[Dict[str, Any]]) -> str:
+        """要約プロンプトを構築（ターン単体が上限を超える場合は切り詰める）"""
+        system = self.config.system
+        lines = [
+            truncate_to_tokens(f"{turn.get('speaker', 'User')}: {turn.get('msg', '')}",
+                               system.summary_batch_tokens)
+            for turn in turns
+        ]
+        return SUMMARY_PROMPT.format(
+            max_chars=system.summary_max_tokens,
+            summary=summary or "（なし）",
+            turns="\n".join(lines)
+        )
+    
+    def _generate(self, prompt: str, model: str, num_ctx: int) -> str:
+        """
+        fastモデルで要約を生成
+        
+        ユーザーのリクエストを優先するため、LLMスケジューラのバックグラウンド優先度で実行する。
+        num_ctxは通常リクエストと同じ値にする（異なるとOllamaがモデルを再ロードする）。
+        ホストのプール使用時はプール経由（振り分け・サーキットブレーカー）で送信する。
+        """
+        max_tokens = self.config.system.summary_max_tokens
+        pool = get_llm_pool()
+        chat = pool.chat if pool is not None else ollama.chat
+        with get_llm_scheduler().slot(model, PRIORITY_BACKGROUND):
+            response = chat(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                options={'num_ctx': num_ctx, 'num_predict': max_tokens},
+                keep_alive=self.config.model.keep_alive
+            )
+        return truncate_to_tokens(response['message']['content'].strip(), max_tokens)
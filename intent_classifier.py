@@ -0,0 +1,337 @@
+"""
+intent_classifier.py
+統計的な応答キャラクター分類器（ルーティング用）
+
+文字n-gramのハッシュ特徴（L2正規化したTF）と多クラスロジスティック回帰による軽量分類器。
+推論はNumPyでベクトル化しており、1入力あたり数十マイクロ秒、複数入力は一括で計算する（CPUのみ）。
+
+学習はエクスポートした会話ログ（/export のJSON: ユーザー発言→次に応答したキャラクター）や
+ラベル付きJSONL（{"text", "label"}）からオフラインで行い、.npzとして保存する。
+
+    python intent_classifier.py train exports/*.json --out data/intent_model.npz
+"""
+
+import argparse
+import json
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from routing_rules import normalize_text
+
+
+# 会話ログの発話者名 → キャラクターキー
+SPEAKER_KEYS = {"ルミナ": "lumina", "クラリス": "claris", "ノクス": "nox"}
+
+
+class HashingVectorizer:
+    """文字n-gramのハッシュ特徴量"""
+    
+    def __init__(self, n_features: int = 2 ** 14, ngram_range: Tuple[int, int] = (1, 3)):
+        """
+        初期化
+        
+        Args:
+            n_features: 特徴次元数（ハッシュのバケット数）
+            ngram_range: 文字n-gramの最小・最大長
+        """
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+    
+    def indices(self, text: str) -> np.ndarray:
+        """
+        テキストのn-gramをハッシュしたバケット番号（重複あり）
+        
+        Args:
+            text: 入力テキスト（内部で正規化する）
+        
+        Returns:
+            バケット番号の配列
+        """
+        padded = f" {normalize_text(text)} "
+        low, high = self.ngram_range
+        grams = [
+            padded[i:i + n]
+            for n in range(low, high + 1)
+            for i in range(len(padded) - n + 1)
+        ]
+        hashes = np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.int64, count=len(grams)
+        )
+        return hashes % self.n_features
+    
+    def transform(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        複数テキストを疎行列（COO形式）に変換
+        
+        Args:
+            texts: 入力テキスト
+        
+        Returns:
+            (行番号, 列番号, 値) の配列。値は行ごとにL2正規化したn-gram出現数
+        """
+        parts = [self.indices(text) for text in texts]
+        lengths = np.fromiter((len(part) for part in parts), dtype=np.int64, count=len(parts))
+        rows = np.repeat(np.arange(len(parts), dtype=np.int64), lengths)
+        cols = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        
+        # 行・列の組で重複を集計
+        keys, counts = np.unique(rows * self.n_features + cols, return_counts=True)
+        rows, cols = np.divmod(keys, self.n_features)
+        values = counts.astype(np.float64)
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(parts)))
+        values /= norms[rows]
+        return rows, cols, values
+
+
+class IntentClassifier:
+    """応答キャラクター分類器（多クラスロジスティック回帰）"""
+    
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray,
+                 vectorizer: Optional[HashingVectorizer] = None):
+        """
+        初期化
+        
+        Args:
+            labels: クラスラベル（キャラクターキー）
+            weights: 重み（n_features × クラス数）
+            bias: バイアス（クラス数）
+            vectorizer: 特徴量化（省略時は既定のHashingVectorizer）
+        """
+        self.labels = list(labels)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = np.asarray(bias, dtype=np.float64)
+        self.vectorizer = vectorizer or HashingVectorizer(n_features=self.weights.shape[0])
+    
+    def predict_proba_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        複数テキストのクラス確率を一括計算
+        
+        Args:
+            texts: 入力テキスト
+        
+        Returns:
+            確率（テキスト数 × クラス数）
+        """
+        rows, cols, values = self.vectorizer.transform(texts)
+        return _softmax(_scores(rows, cols, values, self.weights, self.bias, len(texts)))
+    
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """
+        複数テキストを一括分類
+        
+        Args:
+            texts: 入力テキスト
+        
+        Returns:
+            (ラベル, 確信度) のリスト
+        """
+        if not texts:
+            return []
+        proba = self.predict_proba_batch(texts)
+        best = proba.argmax(axis=1)
+        return [(self.labels[index], float(proba[row, index])) for row, index in enumerate(best)]
+    
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        1件を分類
+        
+        Args:
+            text: 入力テキスト
+        
+        Returns:
+            (ラベル, 確信度)
+        """
+        return self.predict_batch([text])[0]
+    
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = 2 ** 14,
+              ngram_range: Tuple[int, int] = (1, 3), epochs: int = 300,
+              learning_rate: float = 2.0, l2: float = 1e-4) -> "IntentClassifier":
+        """
+        ラベル付きテキストから学習（全件の勾配降下）
+        
+        Args:
+            texts: 入力テキスト
+            labels: 正解ラベル
+            n_features: 特徴次元数
+            ngram_range: 文字n-gramの最小・最大長
+            epochs: 反復回数
+            learning_rate: 学習率
+            l2: L2正則化係数
+        
+        Returns:
+            学習済みの分類器
+        
+        Raises:
+            ValueError: 学習データが空、またはクラスが1種類しかない場合
+        """
+        classes = sorted(set(labels))
+        if not texts or len(classes) < 2:
+            raise ValueError("学習には2種類以上のラベルを持つデータが必要です")
+        
+        vectorizer = HashingVectorizer(n_features=n_features, ngram_range=ngram_range)
+        rows, cols, values = vectorizer.transform(texts)
+        class_index = {label: index for index, label in enumerate(classes)}
+        targets = np.zeros((len(texts), len(classes)))
+        targets[np.arange(len(texts)), [class_index[label] for label in labels]] = 1.0
+        
+        weights = np.zeros((n_features, len(classes)))
+        bias = np.zeros(len(classes))
+        for _ in range(epochs):
+            proba = _softmax(_scores(rows, cols, values, weights, bias, len(texts)))
+            error = (proba - targets) / len(texts)
+            gradient = np.zeros_like(weights)
+            np.add.at(gradient, cols, values[:, None] * error[rows])
+            weights -= learning_rate * (gradient + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        return cls(classes, weights, bias, vectorizer)
+    
+    def save(self, path: str):
+        """
+        モデルを.npzとして保存
+        
+        Args:
+            path: 保存先パス
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            weights=self.weights.astype(np.float32),
+            bias=self.bias,
+            ngram_range=np.array(self.vectorizer.ngram_range)
+        )
+    
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """
+        保存したモデルを読み込み
+        
+        Args:
+            path: .npzファイルのパス
+        
+        Returns:
+            分類器
+        """
+        with np.load(path) as data:
+            weights = data["weights"].astype(np.float64)
+            low, high = (int(n) for n in data["ngram_range"])
+            return cls(
+                [str(label) for label in data["labels"]],
+                weights,
+                data["bias"],
+                HashingVectorizer(n_features=weights.shape[0], ngram_range=(low, high))
+            )
+
+
+def _scores(rows: np.ndarray, cols: np.ndarray, values: np.ndarray,
+            weights: np.ndarray, bias: np.ndarray, n_rows: int) -> np.ndarray:
+    """疎な特徴行列 × 重み + バイアス"""
+    scores = np.tile(bias, (n_rows, 1))
+    np.add.at(scores, rows, values[:, None] * weights[cols])
+    return scores
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    exp = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def load_examples(paths: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    学習データを読み込み
+    
+    - .jsonl: 1行1件の {"text", "label"}
+    - .json: 会話エクスポート（"conversation"内のユーザー発言と、その直後に応答したキャラクター）
+    
+    Args:
+        paths: ファイルパス
+    
+    Returns:
+        (テキスト, ラベル) のリスト
+    """
+    texts: List[str] = []
+    labels: List[str] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            if str(path).endswith(".jsonl"):
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        texts.append(record["text"])
+                        labels.append(record["label"])
+                continue
+            
+            history = json.load(f).get("conversation", [])
+        for turn, reply in zip(history, history[1:]):
+            label = SPEAKER_KEYS.get(reply.get("speaker"))
+            if turn.get("speaker") == "User" and label:
+                texts.append(turn.get("msg", ""))
+                labels.append(label)
+    return texts, labels
+
+
+# 読み込み済みモデル（パスごと、読み込み失敗時はNone）
+_classifiers: Dict[str, Optional[IntentClassifier]] = {}
+
+
+def get_intent_classifier(path: str) -> Optional[IntentClassifier]:
+    """
+    モデルファイルから分類器を取得（プロセス内で1回だけ読み込む）
+    
+    Args:
+        path: .npzファイルのパス（空の場合は無効）
+    
+    Returns:
+        分類器（未設定・読み込み失敗時はNone）
+    """
+    if not path:
+        return None
+    if path not in _classifiers:
+        try:
+            _classifiers[path] = IntentClassifier.load(path)
+        except Exception as e:
+            from utils import Logger
+            Logger().log_warning(f"意図分類モデルの読み込み失敗（キーワードルールを使用）: {e}",
+                                 context="intent_classifier")
+            _classifiers[path] = None
+    return _classifiers[path]
+
+
+def reset_intent_classifiers():
+    """読み込み済みモデルをクリア"""
+    _classifiers.clear()
+
+
+def main():
+    """学習コマンド"""
+    parser = argparse.ArgumentParser(description="応答キャラクター分類器の学習")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train", help="会話エクスポート・ラベル付きJSONLから学習")
+    train_parser.add_argument("paths", nargs="+", help="学習データ（.json / .jsonl）")
+    train_parser.add_argument("--out", default="data/intent_model.npz", help="モデルの保存先")
+    train_parser.add_argument("--epochs", type=int, default=300)
+    train_parser.add_argument("--holdout", type=float, default=0.2, help="評価用に除外する割合")
+    args = parser.parse_args()
+    
+    texts, labels = load_examples(args.paths)
+    order = np.random.default_rng(0).permutation(len(texts))
+    n_eval = int(len(texts) * args.holdout)
+    eval_idx, train_idx = order[:n_eval], order[n_eval:]
+    
+    classifier = IntentClassifier.train(
+        [texts[i] for i in train_idx], [labels[i] for i in train_idx], epochs=args.epochs
+    )
+    if n_eval:
+        predictions = classifier.predict_batch([texts[i] for i in eval_idx])
+        accuracy = np.mean([label == labels[i] for (label, _), i in zip(predictions, eval_idx)])
+        print(f"評価精度: {accuracy:.1%} ({n_eval}件)")
+    classifier.save(args.out)
+    print(f"保存しました: {args.out} ({len(train_idx)}件で学習、ラベル: {classifier.labels})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+llm_client.py
+非同期LLMクライアント層
+
+ollama.AsyncClient互換のインターフェースを持つ非同期クライアント。
+ホストごとにキープアライブ付きHTTP接続プールを共有し、
+リトライ待機の秒数はbackoff_delay（ジッター付き指数バックオフ）で求め、非同期経路ではasyncio.sleepで待つ（スレッドを占有しない）。
+"""
+
+import asyncio
+import random
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Union
+
+import httpx
+import ollama
+
+
+class AsyncLLMClient:
+    """Ollama非同期クライアント（接続プール付き）"""
+    
+    def __init__(
+        self,
+        host: str,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        timeout: Optional[float] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            host: OllamaホストURL
+            max_connections: ホストあたりの最大同時接続数
+            max_keepalive_connections: 保持するキープアライブ接続数
+            keepalive_expiry: アイドル接続の保持秒数
+            timeout: リクエストタイムアウト（秒、Noneで無制限）
+        """
+        self.host = host
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        # 接続プールは自前のトランスポートで保持し、acloseで閉じる
+        self._transport = httpx.AsyncHTTPTransport(limits=self.limits)
+        self._client = ollama.AsyncClient(host=host, timeout=timeout, transport=self._transport)
+    
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        stream: bool = False,
+        options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[Union[float, str]] = None
+    ) -> Union[Mapping[str, Any], AsyncIterator[Mapping[str, Any]]]:
+        """
+        チャット生成（ollama.AsyncClient.chat互換）
+        
+        Args:
+            model: モデル名
+            messages: メッセージリスト
+            stream: Trueの場合はチャンクの非同期イテレータを返す
+            options: モデルオプション（num_ctx等）
+            keep_alive: モデル常駐時間
+        
+        Returns:
+            応答辞書、またはstream=True時はチャンクの非同期イテレータ
+        """
+        return await self._client.chat(
+            model=model,
+            messages=messages,
+            stream=stream,
+            options=options,
+            keep_alive=keep_alive
+        )
+    
+    async def ps(self) -> Mapping[str, Any]:
+        """
+        Ollamaにロード済み（常駐中）のモデル一覧を取得
+        
+        Returns:
+            {'models': [{'name', 'model', 'expires_at', ...}]}
+        """
+        return await self._client.ps()
+    
+    async def tags(self) -> Mapping[str, Any]:
+        """
+        Ollamaで利用可能な（pull済みの）モデル一覧を取得
+        
+        Returns:
+            {'models': [{'name', 'model', 'size', ...}]}
+        """
+        return await self._client.list()
+    
+    async def aclose(self):
+        """接続プールをクローズ"""
+        await self._transport.aclose()
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 8.0) -> float:
+    """
+    ジッター付き指数バックオフの待機秒数
+    
+    上限付き指数値の半分を固定、残り半分をランダムにする（同時リトライの集中回避）。
+    
+    Args:
+        attempt: 失敗した試行番号（0始まり）
+        base: 基準秒数
+        cap: 最大秒数
+    
+    Returns:
+        待機秒数
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# イベントループ・ホスト別の共有クライアント
+# （httpxの接続プールは生成したイベントループに束縛されるため、ループ単位で保持）
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncLLMClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_llm_client(host: Optional[str] = None) -> AsyncLLMClient:
+    """
+    現在のイベントループで共有する非同期クライアントを取得
+    
+    Args:
+        host: OllamaホストURL（省略時は設定値）
+    
+    Returns:
+        AsyncLLMClient インスタンス
+    """
+    from config import config
+    
+    host = host or config.model.ollama_host
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    
+    client = clients.get(host)
+    if client is None:
+        client = AsyncLLMClient(
+            host=host,
+            max_connections=config.model.llm_max_connections,
+            max_keepalive_connections=config.model.llm_max_keepalive_connections,
+            keepalive_expiry=config.model.llm_keepalive_expiry,
+            timeout=config.model.llm_timeout
+        )
+        clients[host] = client
+    return client
+
+
+async def close_async_llm_clients():
+    """現在のイベントループの共有クライアントを全てクローズ"""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        await client.aclose()
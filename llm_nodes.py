@@ -7,12 +7,45 @@ llm_nodes.py
 """
 
 import ollama
-from typing import Dict, Any
+import asyncio
+import contextlib
+import re
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from datetime import datetime
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from config import Config
-import requests
 from utils import Logger
+from llm_client import get_async_llm_client, backoff_delay
+from llm_pool import get_llm_pool
+from llm_scheduler import get_llm_scheduler, PRIORITY_FREE
+from response_cache import get_response_cache, make_cache_key
+from model_residency import get_model_residency
+from model_slo import get_model_downgrade_policy
+from prompt_builder import estimate_tokens, get_prompt_builder
+from single_flight import FlightAbandoned, get_single_flight, make_flight_key
+from web_search import get_web_search_client, normalize_query
+from routing_rules import compile_rules, normalize_text
+from intent_classifier import get_intent_classifier
+
+
+# ルーティング対象のキャラクターキー（LangGraphのノード名）
+CHARACTER_KEYS = ('lumina', 'claris', 'nox')
+
+# 複数キャラクター指定の区切り
+_CHARACTER_SEPARATOR = re.compile(r"[,、，/\s]+")
+
+# トークン差分を受け取るコールバック型（ストリーミング用）
+TokenCallback = Callable[[str], None]
+
+
+def _async_chat(config: Config):
+    """非同期のchat呼び出し先（ホストのプール使用時はヘッジング付きのプール）"""
+    pool = get_llm_pool()
+    if pool is not None:
+        return pool.achat
+    return get_async_llm_client(config.model.ollama_host).chat
 
 
 class LLMNode:
@@ -21,32 +54,325 @@ class LLMNode:
     def __init__(self, config: Config):
         self.config = config
         self.character_name = "Base"
+        self.character_key = "base"  # 設定で参照するキャラクターキー
         self.model_key = "fast"
         self.logger = Logger()  # ログマネージャー追加
+        # 意図判定ルール（RouterNodeとコンパイル結果・走査結果を共有）
+        self.rules = compile_rules(config.system.routing_rules)
     
     def generate(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """応答生成（サブクラスでオーバーライド）"""
-        raise NotImplementedError
+        """
+        応答生成（同期）
+        
+        Returns:
+            状態の差分（新規ターンのみを含むhistoryとlast_speaker）。
+            入力のstateは変更しないこと。
+        """
+        prompt = self._build_prompt(state)
+        response, extra = self._respond(state, prompt, self._get_token_callback(state))
+        return self._build_update(response, **extra)
+    
+    async def agenerate(self, state: Dict[str, Any],
+                        on_token: Optional[TokenCallback] = None) -> Dict[str, Any]:
+        """
+        応答生成（非同期）
+        
+        generateと同じ差分を返す。LLM呼び出し・リトライ待機ともに
+        イベントループをブロックしない。
+        
+        Args:
+            state: グラフ状態
+            on_token: トークンコールバック（指定時はstate['stream']によらずストリーミングで生成）
+        """
+        prompt = self._build_prompt(state)
+        response, extra = await self._arespond(state, prompt, on_token or self._get_token_callback(state))
+        return self._build_update(response, **extra)
+    
+    def _respond(self, state: Dict[str, Any], prompt: str,
+                 on_token: Optional[TokenCallback]) -> Tuple[str, Dict[str, Any]]:
+        """
+        応答本文を生成（キャラクターのカスケードポリシーに従う）
+        
+        下書きモデルで生成・送出した後に改訂する場合は、トークンコールバックのrevise()で
+        改訂開始を通知してから通常のモデルの応答を送出する。
+        
+        Args:
+            state: グラフ状態
+            prompt: プロンプト
+            on_token: トークンコールバック
+        
+        Returns:
+            (応答, ターンに追加するフィールド)
+        """
+        priority = state.get('priority', PRIORITY_FREE)
+        mode = self._cascade_mode(state, on_token)
+        if mode in (None, "direct"):
+            response = self._call_ollama(prompt, on_token=on_token, priority=priority)
+            return response, self._cascade_result(mode)
+        
+        draft = self._call_ollama(
+            prompt, model_key=self.config.model.cascade_draft_model, on_token=on_token, priority=priority
+        )
+        if mode == "draft" or (mode == "auto" and self._accept_draft(draft)):
+            return draft, self._cascade_result("draft")
+        
+        self._revise(on_token)
+        response = self._call_ollama(
+            get_prompt_builder().refine(self.character_key, prompt, draft), on_token=on_token, priority=priority
+        )
+        return response, self._cascade_result("refined")
+    
+    async def _arespond(self, state: Dict[str, Any], prompt: str,
+                        on_token: Optional[TokenCallback]) -> Tuple[str, Dict[str, Any]]:
+        """応答本文を生成（非同期、_respondと同じ）"""
+        priority = state.get('priority', PRIORITY_FREE)
+        mode = self._cascade_mode(state, on_token)
+        if mode in (None, "direct"):
+            response = await self._acall_ollama(prompt, on_token=on_token, priority=priority)
+            return response, self._cascade_result(mode)
+        
+        draft = await self._acall_ollama(
+            prompt, model_key=self.config.model.cascade_draft_model, on_token=on_token, priority=priority
+        )
+        if mode == "draft" or (mode == "auto" and self._accept_draft(draft)):
+            return draft, self._cascade_result("draft")
+        
+        self._revise(on_token)
+        response = await self._acall_ollama(
+            get_prompt_builder().refine(self.character_key, prompt, draft), on_token=on_token, priority=priority
+        )
+        return response, self._cascade_result("refined")
+    
+    def _cascade_mode(self, state: Dict[str, Any], on_token: Optional[TokenCallback]) -> Optional[str]:
+        """
+        カスケードの実行方法を決定
+        
+        Returns:
+            None（カスケード無効）/ "direct"（通常のモデルのみ）/ "draft"（下書きで確定）/
+            "auto"（下書きを判定して必要なら改訂）/ "refine"（下書き後に必ず改訂）
+        """
+        policy = self.config.model.cascade_policy.get(self.character_key, "off")
+        if policy == "off":
+            return None
+        if policy == "draft":
+            return "draft"
+        if policy == "auto" and not self.rules.matches_target(state.get('user_input', ''), "depth"):
+            return "auto"
+        # 改訂が確定している場合、ストリーミングでなければ下書きを先に返す意味がない
+        return "refine" if on_token is not None else "direct"
+    
+    def _accept_draft(self, draft: str) -> bool:
+        """下書きを採用できるか（十分な長さがあり、不確実な表現・フォールバック応答でない）"""
+        model_config = self.config.model
+        if draft == self._get_fallback_response():
+            return False
+        if len(draft.strip()) < model_config.cascade_accept_min_chars:
+            return False
+        return not any(marker in draft for marker in model_config.cascade_uncertain_markers)
+    
+    def _cascade_result(self, outcome: Optional[str]) -> Dict[str, Any]:
+        """カスケードの結果を記録し、ターンに追加するフィールドを返す"""
+        if outcome is None:
+            return {}
+        from metrics import get_metrics_collector
+        get_metrics_collector().record_cascade(self.character_name, outcome)
+        return {'cascade': outcome}
+    
+    @staticmethod
+    def _revise(on_token: Optional[TokenCallback]):
+        """送出済みの下書きを改訂で置き換えることを通知"""
+        revise = getattr(on_token, 'revise', None)
+        if revise is not None:
+            revise()
+    
+    def _build_prompt(self, state: Dict[str, Any], extra: str = "") -> str:
+        """
+        プロンプト構築
+        
+        キャラクターのテンプレート（固定ペルソナ＋ローリング要約＋予算内の会話履歴）で組み立てる。
+        
+        Args:
+            state: グラフ状態
+            extra: 追加情報（検索結果等）
+        
+        Returns:
+            プロンプト
+        """
+        return get_prompt_builder().build(
+            self.character_key,
+            state.get('history', []),
+            state.get('user_input', ''),
+            extra,
+            state.get('summary', '')
+        )
+    
+    def _build_update(self, response: str, **extra: Any) -> Dict[str, Any]:
+        """
+        応答から状態差分を構築
+        
+        Args:
+            response: 生成された応答
+            **extra: ターンに追加するフィールド（search_used等）
+        
+        Returns:
+            状態の差分（historyはreducerで追記される）
+        """
+        turn = {
+            'speaker': self.character_name,
+            'msg': response,
+            'timestamp': datetime.now().isoformat()
+        }
+        turn.update(extra)
+        return {
+            'history': [turn],
+            'last_speaker': self.character_name
+        }
+    
+    def _get_token_callback(self, state: Dict[str, Any]) -> Optional[TokenCallback]:
+        """
+        ストリーミング実行時のトークンコールバックを取得
+        
+        state['stream']がTrueの場合、LangGraphのカスタムストリームに
+        {"type": "token", "speaker", "delta"} イベントを書き込むコールバックを返す。
+        
+        Args:
+            state: グラフ状態
+        
+        Returns:
+            コールバック、ストリーミング無効時はNone
+        """
+        if not state.get('stream'):
+            return None
+        
+        try:
+            from langgraph.config import get_stream_writer
+            writer = get_stream_writer()
+        except RuntimeError:
+            # グラフ外から直接呼ばれた場合
+            return None
+        
+        def on_token(delta: str):
+            writer({"type": "token", "speaker": self.character_name, "delta": delta})
+        
+        def revise():
+            writer({"type": "revision", "speaker": self.character_name})
+        
+        on_token.revise = revise
+        return on_token
+    
+    def _call_ollama(self, prompt: str, model_key: str = None, max_retries: int = 3,
+                     on_token: Optional[TokenCallback] = None,
+                     priority: int = PRIORITY_FREE) -> str:
+        """
+        Ollama APIを呼び出し（リトライロジック付き）
+        
+        同一モデル・キャラクター・プロンプトの応答がキャッシュにあればOllamaを呼ばずに返す。
+        同一モデル・プロンプトの生成が進行中であれば、それに合流して結果を共有する。
+        各試行はLLMスケジューラのモデル別実行枠内で行い、リトライ待機中は枠を返却する。
+        レイテンシSLO超過で降格中のモデルキーは、降格先のモデルで生成する。
+        
+        Args:
+            prompt: プロンプト
+            model_key: モデルキー（fast/medium/search）
+            max_retries: 最大試行回数
+            on_token: 指定時はstream=Trueで呼び出し、トークン差分ごとに通知
+            priority: スケジューラの優先度クラス
+        
+        Returns:
+            生成された応答全文
+        
+        Raises:
+            LLMTimeoutError: 実行枠の待機が期限切れになった場合
+        """
+        # SLO超過で降格中のモデルは安価なモデルへ振り替え
+        model_key = get_model_downgrade_policy().resolve(model_key or self.model_key)
+        model = self.config.model.models.get(model_key)
+        
+        # 応答キャッシュ
+        cache_key = self._response_cache_key(model, prompt)
+        if cache_key:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                return self._return_cached(cached, model, on_token)
+        
+        def invoke(on_token: Optional[TokenCallback]) -> str:
+            return self._invoke_ollama(prompt, model, max_retries, on_token, priority, cache_key)
+        
+        if not self.config.model.single_flight_enabled:
+            return invoke(on_token)
+        
+        # 同一リクエストの集約
+        flight, leader = get_single_flight().join(make_flight_key(model, prompt))
+        if not leader:
+            forwarded = self._follower_callback(model, on_token)
+            try:
+                return self._follower_result(flight.wait(forwarded), forwarded, on_token)
+            except FlightAbandoned:
+                if forwarded.tokens:
+                    return ''.join(forwarded.tokens)
+                return self._call_ollama(prompt, model_key, max_retries, on_token, priority)
+        
+        single_flight = get_single_flight()
+        try:
+            result = invoke(self._leader_callback(flight, on_token))
+        except (KeyboardInterrupt, GeneratorExit):
+            # 結果を出さずに中断した場合、合流者は各自で再実行する
+            single_flight.complete(flight, error=FlightAbandoned(flight.key))
+            raise
+        except BaseException as e:
+            single_flight.complete(flight, error=e)
+            raise
+        single_flight.complete(flight, result=result)
+        return result
     
-    def _call_ollama(self, prompt: str, model_key: str = None, max_retries: int = 3) -> str:
-        """Ollama APIを呼び出し（リトライロジック付き）"""
+    def _invoke_ollama(self, prompt: str, model: str, max_retries: int,
+                       on_token: Optional[TokenCallback], priority: int,
+                       cache_key: Optional[str]) -> str:
+        """Ollama呼び出し本体（リトライ・メトリクス・キャッシュ保存）"""
         from metrics import get_metrics_collector
         metrics = get_metrics_collector()
+        scheduler = get_llm_scheduler()
+        options = get_prompt_builder().options(self.character_key, model)
+        # ホストのプール使用時はプール経由（振り分け・サーキットブレーカー）
+        pool = get_llm_pool()
+        chat = pool.chat if pool is not None else ollama.chat
         
-        model = self.config.model.models.get(model_key or self.model_key)
         start_time = time.time()
         retry_count = 0
         
         for attempt in range(max_retries):
+            # ストリーミングで既に送出したトークン（途中失敗時の再送防止用）
+            chunks = []
+            ticket = scheduler.acquire(model, priority)
             try:
                 self.logger.log_system_event(
                     "llm_call_start",
-                    {"character": self.character_name, "model": model, "attempt": attempt + 1}
-                )
-                response = ollama.chat(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}]
+                    {"character": self.character_name, "model": model,
+                     "attempt": attempt + 1, "stream": on_token is not None}
                 )
+                if on_token is not None:
+                    for chunk in chat(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        stream=True,
+                        options=options,
+                        keep_alive=self.config.model.keep_alive
+                    ):
+                        delta = chunk['message']['content']
+                        if delta:
+                            chunks.append(delta)
+                            on_token(delta)
+                        if chunk.get('done'):
+                            self._observe_load(model, chunk)
+                    response = {'message': {'content': ''.join(chunks)}}
+                else:
+                    response = chat(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        options=options,
+                        keep_alive=self.config.model.keep_alive
+                    )
+                    self._observe_load(model, response)
                 
                 # 成功時のメトリクス記録
                 duration_ms = (time.time() - start_time) * 1000
@@ -61,11 +387,25 @@ class LLMNode:
                     "llm_call_success",
                     {"character": self.character_name, "model": model}
                 )
-                return response['message']['content']
+                content = response['message']['content']
+                if cache_key and content:
+                    get_response_cache().set(cache_key, content)
+                return content
             except Exception as e:
                 retry_count += 1
                 self.logger.log_error(e, context=f"_call_ollama_attempt_{attempt+1}")
                 
+                if chunks:
+                    # 送出済みトークンは取り消せないため、部分応答で確定
+                    duration_ms = (time.time() - start_time) * 1000
+                    metrics.record_llm_call(
+                        duration_ms=duration_ms,
+                        character=self.character_name,
+                        success=False,
+                        retry_count=retry_count
+                    )
+                    return ''.join(chunks)
+                
                 if attempt == max_retries - 1:
                     # 最終リトライ失敗時はフォールバック
                     duration_ms = (time.time() - start_time) * 1000
@@ -76,9 +416,230 @@ class LLMNode:
                         retry_count=retry_count
                     )
                     metrics.record_llm_fallback(self.character_name)
-                    return self._get_fallback_response()
-                # 指数バックオフ
-                time.sleep(2 ** attempt)
+                    fallback = self._get_fallback_response()
+                    if on_token is not None:
+                        on_token(fallback)
+                    return fallback
+            finally:
+                scheduler.release(ticket)
+            # 指数バックオフ（ジッター付き）
+            time.sleep(self._retry_delay(attempt))
+    
+    async def _acall_ollama(self, prompt: str, model_key: str = None, max_retries: int = 3,
+                            on_token: Optional[TokenCallback] = None,
+                            priority: int = PRIORITY_FREE) -> str:
+        """
+        Ollama APIを非同期で呼び出し（リトライロジック付き）
+        
+        共有の非同期クライアント（接続プール）を使用し、リトライ待機は
+        asyncio.sleepで行う。引数・戻り値は_call_ollamaと同じ。
+        """
+        # SLO超過で降格中のモデルは安価なモデルへ振り替え
+        model_key = get_model_downgrade_policy().resolve(model_key or self.model_key)
+        model = self.config.model.models.get(model_key)
+        
+        cache_key = self._response_cache_key(model, prompt)
+        if cache_key:
+            cached = await get_response_cache().aget(cache_key)
+            if cached is not None:
+                return self._return_cached(cached, model, on_token)
+        
+        async def invoke(on_token: Optional[TokenCallback]) -> str:
+            return await self._ainvoke_ollama(prompt, model, max_retries, on_token, priority, cache_key)
+        
+        if not self.config.model.single_flight_enabled:
+            return await invoke(on_token)
+        
+        flight, leader = get_single_flight().join(make_flight_key(model, prompt))
+        if not leader:
+            forwarded = self._follower_callback(model, on_token)
+            try:
+                return self._follower_result(await flight.await_result(forwarded), forwarded, on_token)
+            except FlightAbandoned:
+                if forwarded.tokens:
+                    return ''.join(forwarded.tokens)
+                return await self._acall_ollama(prompt, model_key, max_retries, on_token, priority)
+        
+        single_flight = get_single_flight()
+        try:
+            result = await invoke(self._leader_callback(flight, on_token))
+        except (asyncio.CancelledError, GeneratorExit):
+            single_flight.complete(flight, error=FlightAbandoned(flight.key))
+            raise
+        except BaseException as e:
+            single_flight.complete(flight, error=e)
+            raise
+        single_flight.complete(flight, result=result)
+        return result
+    
+    async def _ainvoke_ollama(self, prompt: str, model: str, max_retries: int,
+                              on_token: Optional[TokenCallback], priority: int,
+                              cache_key: Optional[str]) -> str:
+        """Ollama非同期呼び出し本体（リトライ・メトリクス・キャッシュ保存）"""
+        from metrics import get_metrics_collector
+        metrics = get_metrics_collector()
+        scheduler = get_llm_scheduler()
+        options = get_prompt_builder().options(self.character_key, model)
+        
+        chat = _async_chat(self.config)
+        start_time = time.time()
+        retry_count = 0
+        
+        for attempt in range(max_retries):
+            chunks = []
+            ticket = await scheduler.aacquire(model, priority)
+            try:
+                self.logger.log_system_event(
+                    "llm_call_start",
+                    {"character": self.character_name, "model": model,
+                     "attempt": attempt + 1, "stream": on_token is not None}
+                )
+                if on_token is not None:
+                    # キャンセル時（クライアント切断等）はストリームを閉じてOllamaへの要求を打ち切る
+                    async with contextlib.aclosing(await chat(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        stream=True,
+                        options=options,
+                        keep_alive=self.config.model.keep_alive
+                    )) as stream:
+                        async for chunk in stream:
+                            delta = chunk['message']['content']
+                            if delta:
+                                chunks.append(delta)
+                                on_token(delta)
+                            if chunk.get('done'):
+                                self._observe_load(model, chunk)
+                    response = {'message': {'content': ''.join(chunks)}}
+                else:
+                    response = await chat(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        options=options,
+                        keep_alive=self.config.model.keep_alive
+                    )
+                    self._observe_load(model, response)
+                
+                duration_ms = (time.time() - start_time) * 1000
+                metrics.record_llm_call(
+                    duration_ms=duration_ms,
+                    character=self.character_name,
+                    success=True,
+                    retry_count=retry_count
+                )
+                
+                self.logger.log_system_event(
+                    "llm_call_success",
+                    {"character": self.character_name, "model": model}
+                )
+                content = response['message']['content']
+                if cache_key and content:
+                    await get_response_cache().aset(cache_key, content)
+                return content
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retry_count += 1
+                self.logger.log_error(e, context=f"_acall_ollama_attempt_{attempt+1}")
+                
+                if chunks:
+                    # 送出済みトークンは取り消せないため、部分応答で確定
+                    duration_ms = (time.time() - start_time) * 1000
+                    metrics.record_llm_call(
+                        duration_ms=duration_ms,
+                        character=self.character_name,
+                        success=False,
+                        retry_count=retry_count
+                    )
+                    return ''.join(chunks)
+                
+                if attempt == max_retries - 1:
+                    duration_ms = (time.time() - start_time) * 1000
+                    metrics.record_llm_call(
+                        duration_ms=duration_ms,
+                        character=self.character_name,
+                        success=False,
+                        retry_count=retry_count
+                    )
+                    metrics.record_llm_fallback(self.character_name)
+                    fallback = self._get_fallback_response()
+                    if on_token is not None:
+                        on_token(fallback)
+                    return fallback
+            finally:
+                scheduler.release(ticket)
+            # 指数バックオフ（ジッター付き、ループは他リクエストを処理し続ける）
+            await asyncio.sleep(self._retry_delay(attempt))
+    
+    def _leader_callback(self, flight, on_token: Optional[TokenCallback]) -> Optional[TokenCallback]:
+        """
+        先行リクエストのトークンコールバック
+        
+        呼び出し元がストリーミングの場合のみ、トークンをフライトにも流す
+        （非ストリーミングの呼び出しモードは変えない）。
+        """
+        if on_token is None:
+            return None
+        
+        def emit(delta: str):
+            flight.emit(delta)
+            on_token(delta)
+        
+        return emit
+    
+    def _follower_callback(self, model: str, on_token: Optional[TokenCallback]):
+        """合流リクエストのトークンコールバック（転送済みトークンを記録）"""
+        from metrics import get_metrics_collector
+        get_metrics_collector().record_llm_coalesced()
+        self.logger.log_system_event(
+            "llm_call_coalesced",
+            {"character": self.character_name, "model": model}
+        )
+        
+        def forward(delta: str):
+            forward.tokens.append(delta)
+            if on_token is not None:
+                on_token(delta)
+        
+        forward.tokens = []
+        return forward
+    
+    def _follower_result(self, result: str, forwarded, on_token: Optional[TokenCallback]) -> str:
+        """合流結果を返す（先行が非ストリーミングだった場合は全文を1回で通知）"""
+        if on_token is not None and not forwarded.tokens:
+            on_token(result)
+        return result
+    
+    def _observe_load(self, model: str, response: Dict[str, Any]):
+        """応答のモデル読み込み時間を常駐管理へ通知（要求時のコールドスタート検出）"""
+        get_model_residency().observe(model, response.get('load_duration'), source="request")
+    
+    def _response_cache_key(self, model: str, prompt: str) -> Optional[str]:
+        """応答キャッシュのキー（キャッシュ無効・対象外キャラクターの場合None）"""
+        model_config = self.config.model
+        if not model_config.response_cache_enabled:
+            return None
+        if self.character_key in model_config.response_cache_exclude:
+            return None
+        return make_cache_key(model, self.character_name, prompt)
+    
+    def _return_cached(self, cached: str, model: str, on_token: Optional[TokenCallback]) -> str:
+        """キャッシュ済み応答を返す（ストリーミング時は全文を1回で通知）"""
+        self.logger.log_system_event(
+            "llm_cache_hit",
+            {"character": self.character_name, "model": model}
+        )
+        if on_token is not None:
+            on_token(cached)
+        return cached
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """リトライ待機秒数（ジッター付き指数バックオフ）"""
+        return backoff_delay(
+            attempt,
+            base=self.config.model.llm_retry_base_delay,
+            cap=self.config.model.llm_retry_max_delay
+        )
     
     def _get_fallback_response(self) -> str:
         """LLM呼び出し失敗時のフォールバック応答"""
@@ -89,16 +650,6 @@ class LLMNode:
             "Base": "申し訳ございません。一時的なエラーが発生しました。"
         }
         return fallback_messages.get(self.character_name, fallback_messages["Base"])
-    
-    def _format_history(self, history: list, max_turns: int = 6) -> str:
-        """会話履歴をフォーマット"""
-        recent = history[-max_turns:] if len(history) > max_turns else history
-        formatted = []
-        for turn in recent:
-            speaker = turn.get('speaker', 'User')
-            msg = turn.get('msg', '')
-            formatted.append(f"{speaker}: {msg}")
-        return "\n".join(formatted)
 
 
 class LuminaNode(LLMNode):
@@ -107,47 +658,8 @@ class LuminaNode(LLMNode):
     def __init__(self, config: Config):
         super().__init__(config)
         self.character_name = "ルミナ"
+        self.character_key = "lumina"
         self.model_key = "fast"
-    
-    def generate(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """ルミナの応答生成"""
-        history = state.get('history', [])
-        current_input = state.get('user_input', '')
-        
-        # 会話履歴のフォーマット
-        history_text = self._format_history(history)
-        
-        # プロンプト構築
-        prompt = f"""あなたは親しみやすく洞察力のあるAI「ルミナ」です。
-あなたの役割は司会進行と雑談です。
-
-性格・口調:
-- フレンドリーで明るい
-- ユーザーの感情に寄り添う
-- 話題を広げるのが得意
-- 自然な会話の流れを作る
-
-これまでの会話:
-{history_text}
-
-ユーザーの入力: {current_input}
-
-上記を踏まえて、自然で温かみのある返答をしてください。
-返答のみを出力してください。"""
-
-        # 応答生成
-        response = self._call_ollama(prompt)
-        
-        # 状態更新
-        new_state = state.copy()
-        new_state['history'].append({
-            'speaker': self.character_name,
-            'msg': response,
-            'timestamp': datetime.now().isoformat()
-        })
-        new_state['last_speaker'] = self.character_name
-        
-        return new_state
 
 
 class ClarisNode(LLMNode):
@@ -156,47 +668,8 @@ class ClarisNode(LLMNode):
     def __init__(self, config: Config):
         super().__init__(config)
         self.character_name = "クラリス"
+        self.character_key = "claris"
         self.model_key = "medium"
-    
-    def generate(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """クラリスの応答生成"""
-        history = state.get('history', [])
-        current_input = state.get('user_input', '')
-        
-        # 会話履歴のフォーマット
-        history_text = self._format_history(history)
-        
-        # プロンプト構築
-        prompt = f"""あなたは理論的で穏やかなAI「クラリス」です。
-あなたの役割は解説と理論的な整理です。
-
-性格・口調:
-- 穏やかで丁寧
-- 論理的・構造的に説明
-- 背景や理由を重視
-- 分かりやすく整理するのが得意
-
-これまでの会話:
-{history_text}
-
-ユーザーの入力: {current_input}
-
-上記の内容を丁寧に整理し、背景や構造を含めて解説してください。
-返答のみを出力してください。"""
-
-        # 応答生成
-        response = self._call_ollama(prompt)
-        
-        # 状態更新
-        new_state = state.copy()
-        new_state['history'].append({
-            'speaker': self.character_name,
-            'msg': response,
-            'timestamp': datetime.now().isoformat()
-        })
-        new_state['last_speaker'] = self.character_name
-        
-        return new_state
 
 
 class NoxNode(LLMNode):
@@ -205,149 +678,445 @@ class NoxNode(LLMNode):
     def __init__(self, config: Config):
         super().__init__(config)
         self.character_name = "ノクス"
+        self.character_key = "nox"
         self.model_key = "search"
+        # ルーター確定時に先行開始した検索 {(セッションID, 正規化クエリ): (Future/Task, 開始時刻)}
+        self._prefetched: Dict[tuple, tuple] = {}
+        self._prefetch_lock = threading.Lock()
+        # 同期実行パスの検索用（スレッドは初回の検索時に起動される）
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=config.system.search_max_connections,
+            thread_name_prefix="nox-search"
+        )
+        # 期限超過後も継続中の検索タスク（完了時に結果キャッシュへ保存される）
+        self._background_searches: set = set()
     
     def generate(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """ノクスの応答生成"""
-        history = state.get('history', [])
+        """ノクスの応答生成（必要に応じて検索を実行）"""
         current_input = state.get('user_input', '')
         
-        # 検索が必要かチェック
-        search_keywords = ["調べて", "検索", "最新", "ニュース", "情報"]
-        needs_search = any(keyword in current_input for keyword in search_keywords)
+        search_result = ""
+        if self._should_search(current_input):
+            search_result = self._wait_search(state)
+        
+        prompt = self._build_prompt(state, search_result)
+        response, extra = self._respond(state, prompt, self._get_token_callback(state))
+        return self._build_update(response, search_used=bool(search_result), **extra)
+    
+    async def agenerate(self, state: Dict[str, Any],
+                        on_token: Optional[TokenCallback] = None) -> Dict[str, Any]:
+        """ノクスの応答生成（非同期）"""
+        current_input = state.get('user_input', '')
         
         search_result = ""
-        if needs_search and self.config.enable_search:
-            search_result = self._perform_search(current_input)
+        if self._should_search(current_input):
+            search_result = await self._await_search(state)
         
-        # 検索結果テキスト生成
-        if search_result:
-            search_result_text = "検索結果:\n" + search_result + "\n"
-        else:
-            search_result_text = ""
+        prompt = self._build_prompt(state, search_result)
+        response, extra = await self._arespond(state, prompt, on_token or self._get_token_callback(state))
+        return self._build_update(response, search_used=bool(search_result), **extra)
+    
+    def prefetch_search(self, state: Dict[str, Any]) -> bool:
+        """
+        検索を先行開始（同期実行パス用、ワーカースレッドで実行）
         
-        # 会話履歴のフォーマット
-        history_text = self._format_history(history)
+        ルーターがノクスを選択した時点で呼び出し、ノードの切り替え・プロンプト準備と
+        検索APIの待ち時間を重ねる。
         
-        # プロンプト構築
-        prompt = f"""あなたはクールで情報整理に優れたAI「ノクス」です。
-あなたの役割は検証と要約です。
-
-性格・口調:
-- クールで簡潔
-- 疑問を持ちながら検証
-- 情報の正確性を重視
-- 要点を的確にまとめる
-
-これまでの会話:
-{history_text}
-
-ユーザーの入力: {current_input}
-
-{search_result_text}
-上記を踏まえて、正確で簡潔な返答をしてください。
-返答のみを出力してください。"""
-
-        # 応答生成
-        response = self._call_ollama(prompt)
+        Args:
+            state: グラフ状態
         
-        # 状態更新
-        new_state = state.copy()
-        new_state['history'].append({
-            'speaker': self.character_name,
-            'msg': response,
-            'timestamp': datetime.now().isoformat(),
-            'search_used': needs_search
-        })
-        new_state['last_speaker'] = self.character_name
+        Returns:
+            検索を開始した場合True
+        """
+        query = state.get('user_input', '')
+        if not self._should_search(query):
+            return False
+        return self._register_search(state, lambda: self._search_executor.submit(
+            self._perform_search, query
+        ))
+    
+    def aprefetch_search(self, state: Dict[str, Any]) -> bool:
+        """
+        検索を先行開始（非同期実行パス用、イベントループ上のタスクとして実行）
         
-        return new_state
+        Args:
+            state: グラフ状態
+        
+        Returns:
+            検索を開始した場合True
+        """
+        query = state.get('user_input', '')
+        if not self._should_search(query):
+            return False
+        return self._register_search(state, lambda: asyncio.ensure_future(
+            self._aperform_search(query)
+        ))
     
-    def _perform_search(self, query: str) -> str:
-        """Serper APIで検索実行"""
-        if not self.config.serper_api_key:
-            return "[検索APIキーが設定されていません]"
+    def _should_search(self, user_input: str) -> bool:
+        """検索を実行するかチェック"""
+        return self.config.system.enable_search and self._needs_search(user_input)
+    
+    def _needs_search(self, user_input: str) -> bool:
+        """検索が必要かチェック（target=searchのルールに一致するか）"""
+        return self.rules.matches_target(user_input, "search")
+    
+    def _register_search(self, state: Dict[str, Any], start: Callable[[], Any]) -> bool:
+        """先行検索を登録（同一セッション・クエリで開始済みの場合は何もしない）"""
+        key = self._prefetch_key(state)
+        now = time.monotonic()
+        stale_after = self.config.system.search_timeout + self._search_deadline()
+        with self._prefetch_lock:
+            # 消費されなかった古い先行検索を破棄
+            for stale in [k for k, (_, started) in self._prefetched.items() if now - started > stale_after]:
+                del self._prefetched[stale]
+            if key in self._prefetched:
+                return False
+            self._prefetched[key] = (start(), now)
+        return True
+    
+    def _take_prefetched(self, state: Dict[str, Any], kind: type) -> Optional[tuple]:
+        """先行検索を取り出す（実行パスの異なるものは使わない）"""
+        with self._prefetch_lock:
+            entry = self._prefetched.pop(self._prefetch_key(state), None)
+        if entry is None or not isinstance(entry[0], kind):
+            return None
+        return entry
+    
+    def _prefetch_key(self, state: Dict[str, Any]) -> tuple:
+        return (state.get('session_id', ''), normalize_query(state.get('user_input', '')))
+    
+    def _search_deadline(self) -> float:
+        """検索の待ち時間の上限（秒）"""
+        return self.config.system.search_deadline_ms / 1000
+    
+    def _wait_search(self, state: Dict[str, Any]) -> str:
+        """
+        検索結果を期限まで待つ（同期）
+        
+        Returns:
+            検索結果（期限超過時は空文字列、検索は継続し完了時にキャッシュされる）
+        """
+        entry = self._take_prefetched(state, Future)
+        if entry is None:
+            query = state.get('user_input', '')
+            entry = (self._search_executor.submit(self._perform_search, query), time.monotonic())
+        future, started = entry
         
+        remaining = self._search_deadline() - (time.monotonic() - started)
         try:
-            url = "https://google.serper.dev/search"
-            headers = {
-                "X-API-KEY": self.config.serper_api_key,
-                "Content-Type": "application/json"
-            }
-            payload = {"q": query, "num": 3}
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            results = data.get("organic", [])[:3]
-            
-            if not results:
-                return "[検索結果が見つかりませんでした]"
-            
-            formatted = []
-            for i, result in enumerate(results, 1):
-                title = result.get("title", "")
-                snippet = result.get("snippet", "")
-                formatted.append(f"{i}. {title}\n   {snippet}")
-            
-            return "\n\n".join(formatted)
-            
-        except Exception as e:
-            return f"[検索エラー: {str(e)}]"
+            return future.result(timeout=max(0.0, remaining))
+        except FutureTimeoutError:
+            self._record_search_timeout(state)
+            return ""
+    
+    async def _await_search(self, state: Dict[str, Any]) -> str:
+        """
+        検索結果を期限まで待つ（非同期）
+        
+        Returns:
+            検索結果（期限超過時は空文字列、検索タスクは継続し完了時にキャッシュされる）
+        """
+        entry = self._take_prefetched(state, asyncio.Future)
+        if entry is None:
+            query = state.get('user_input', '')
+            entry = (asyncio.ensure_future(self._aperform_search(query)), time.monotonic())
+        task, started = entry
+        
+        remaining = self._search_deadline() - (time.monotonic() - started)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=max(0.0, remaining))
+        except asyncio.TimeoutError:
+            self._background_searches.add(task)
+            task.add_done_callback(self._background_searches.discard)
+            self._record_search_timeout(state)
+            return ""
+    
+    def _record_search_timeout(self, state: Dict[str, Any]):
+        from metrics import get_metrics_collector
+        get_metrics_collector().record_search_timeout()
+        self.logger.log_system_event("search_deadline_exceeded", {
+            "session_id": state.get('session_id', ''),
+            "deadline_ms": self.config.system.search_deadline_ms
+        })
+    
+    def _perform_search(self, query: str) -> str:
+        """Serper APIで検索実行（結果キャッシュ付き）"""
+        return get_web_search_client().search(query)
+    
+    async def _aperform_search(self, query: str) -> str:
+        """Serper APIで検索実行（非同期）"""
+        return await get_web_search_client().asearch(query)
+
+
+class _SpeculativeStream:
+    """投機的生成のトークンバッファ（採用確定後は呼び出し元のコールバックへ中継）"""
+    
+    def __init__(self):
+        self.tokens: List[str] = []
+        # 改訂で破棄した下書きのトークン数（推定値、revise後も累積する）
+        self.revised_tokens = 0
+        self._target: Optional[TokenCallback] = None
+    
+    def __call__(self, delta: str):
+        self.tokens.append(delta)
+        if self._target is not None:
+            self._target(delta)
+    
+    @property
+    def generated_tokens(self) -> int:
+        """改訂で破棄した下書きを含む生成済みトークン数（プロンプトと同じ推定方法）"""
+        return self.revised_tokens + estimate_tokens("".join(self.tokens))
+    
+    def revise(self):
+        """下書きの改訂（送出済みのトークンは破棄される）"""
+        self.revised_tokens += estimate_tokens("".join(self.tokens))
+        self.tokens.clear()
+        revise = getattr(self._target, 'revise', None)
+        if revise is not None:
+            revise()
+    
+    def attach(self, target: Optional[TokenCallback]):
+        """バッファ済みのトークンを送出し、以降はそのまま中継"""
+        if target is None:
+            return
+        for delta in self.tokens:
+            target(delta)
+        self._target = target
 
 
 class RouterNode:
     """ルーターノード（どのキャラに応答させるか判定）"""
     
+    # キャラクター指定の別名（normalize_text後の表記）
+    CHARACTER_ALIASES = {
+        'るみな': 'lumina',
+        'くらりす': 'claris',
+        'のくす': 'nox',
+        'clarisse': 'claris',
+    }
+    
+    # 投機的ルーティングの最終判定に使う役割の説明
+    CHARACTER_ROLES = {
+        'lumina': 'ルミナ（司会・雑談・共感）',
+        'claris': 'クラリス（解説・理論・仕組みの説明）',
+        'nox': 'ノクス（検証・要約・最新情報の検索）',
+    }
+    
+    JUDGE_PROMPT = (
+        "次のユーザー発言に応答するのに最も適したキャラクターを1人選び、キーのみを答えてください。\n"
+        "{choices}\n\n"
+        "ユーザー発言: {user_input}\n"
+        "回答:"
+    )
+    
     def __init__(self, config: Config):
         self.config = config
+        self.logger = Logger()
+        self.rules = compile_rules(config.system.routing_rules)
+        # 統計的分類器（モデル未設定の場合None）
+        self.classifier = get_intent_classifier(config.system.intent_model_path)
     
     def route(self, state: Dict[str, Any]) -> str:
         """次に応答するキャラを決定"""
         # Phase 3からのキャラクター指定を優先（正規化）
         if state.get('next_character'):
-            char = state['next_character']
-            # キャラクター名の正規化マッピング
-            char_map = {
-                'ノクス': 'nox',
-                'のくす': 'nox',
-                'クラリス': 'claris',
-                'くらりす': 'claris',
-                'ルミナ': 'lumina',
-                'るみな': 'lumina',
-                'lumina': 'lumina',
-                'claris': 'claris',
-                'nox': 'nox',
-                'clarisse': 'claris',
-            }
-            normalized = char_map.get(char, char.lower())
+            normalized = self._normalize_character(state['next_character'])
             # LangGraphのエッジマッピングに存在するキーのみ返す
-            if normalized in ['lumina', 'claris', 'nox']:
+            if normalized in CHARACTER_KEYS:
                 return normalized
         
-        user_input = state.get('user_input', '').lower()
-        last_speaker = state.get('last_speaker', '')
-        
-        # 明示的な指名チェック
-        if 'ルミナ' in user_input or 'るみな' in user_input:
-            return 'lumina'
-        elif 'クラリス' in user_input or 'くらりす' in user_input:
-            return 'claris'
-        elif 'ノクス' in user_input or 'のくす' in user_input:
-            return 'nox'
-        
-        # キーワードベースのルーティング
-        if any(k in user_input for k in ['調べて', '検索', '最新', 'ニュース']):
-            return 'nox'
-        elif any(k in user_input for k in ['説明', '解説', '詳しく', '理由']):
-            return 'claris'
-        else:
-            return 'lumina'
+        user_input = state.get('user_input', '')
+        
+        # 指名・キーワードのルールを1回の走査で照合し、最も優先度の高いものを取得
+        rule = self.rules.best(user_input, targets=CHARACTER_KEYS)
+        if rule and rule.priority >= self.config.system.routing_mention_priority:
+            return self._record_route(rule.target, "mention")
+        
+        # 分類器の確信度が閾値以上ならその判定を採用、未満ならキーワードルールへフォールバック
+        if self.classifier is not None:
+            label, confidence = self.classifier.predict(user_input)
+            if label in CHARACTER_KEYS and confidence >= self.config.system.intent_confidence_threshold:
+                return self._record_route(label, "classifier")
+        
+        if rule:
+            return self._record_route(rule.target, "keyword")
+        return self._record_route('lumina', "default")
+    
+    def route_targets(self, state: Dict[str, Any]) -> List[str]:
+        """
+        応答するキャラを決定（複数可）
+        
+        キャラクター指定（"claris,nox"等の区切り指定）または入力中の指名が複数の場合は、
+        その順序で複数キャラを返す（グラフで並列に生成する）。それ以外はroute()の1キャラ。
+        
+        Returns:
+            キャラクターキーのリスト（重複なし、最大fanout_max_characters件）
+        """
+        system = self.config.system
+        targets: List[str] = []
+        if system.fanout_enabled:
+            if state.get('next_character'):
+                names = _CHARACTER_SEPARATOR.split(state['next_character'])
+                targets = [self._normalize_character(name) for name in names if name]
+            else:
+                targets = [
+                    match.rule.target for match in self.rules.find_all(state.get('user_input', ''))
+                    if match.rule.target in CHARACTER_KEYS
+                    and match.rule.priority >= system.routing_mention_priority
+                ]
+            targets = [key for key in dict.fromkeys(targets) if key in CHARACTER_KEYS]
+        
+        if len(targets) > 1:
+            targets = targets[:system.fanout_max_characters]
+            for target in targets:
+                self._record_route(target, "fanout")
+            return targets
+        return [self.route(state)]
+    
+    def _normalize_character(self, name: str) -> str:
+        normalized = normalize_text(name.strip())
+        return self.CHARACTER_ALIASES.get(normalized, normalized)
+    
+    def _record_route(self, target: str, source: str) -> str:
+        from metrics import get_metrics_collector
+        get_metrics_collector().record_route(target, source)
+        return target
+    
+    def speculation_candidates(self, state: Dict[str, Any], primary: str) -> List[str]:
+        """
+        投機的ルーティングの候補（判定が曖昧な場合の上位2キャラ）
+        
+        キャラクター指定・指名がなく、分類器の確信度がspeculative_confidence_threshold未満
+        （分類器なしの場合は複数キャラのキーワードに一致）の入力を曖昧とみなす。
+        
+        Args:
+            state: グラフ状態
+            primary: 通常のルーティング結果（第1候補）
+        
+        Returns:
+            [第1候補, 第2候補]、曖昧でない場合は空リスト
+        """
+        system = self.config.system
+        if not system.speculative_routing_enabled or state.get('next_character'):
+            return []
+        
+        user_input = state.get('user_input', '')
+        matches = sorted(
+            (match for match in self.rules.find_all(user_input) if match.rule.target in CHARACTER_KEYS),
+            key=lambda match: (-match.rule.priority, match.order)
+        )
+        if matches and matches[0].rule.priority >= system.routing_mention_priority:
+            return []
+        
+        ranked: List[str] = []
+        if self.classifier is not None:
+            proba = self.classifier.predict_proba_batch([user_input])[0]
+            if proba.max() >= system.speculative_confidence_threshold:
+                return []
+            ranked = [self.classifier.labels[index] for index in proba.argsort()[::-1]]
+        ranked += [match.rule.target for match in matches]
+        
+        runner_up = next((key for key in ranked if key in CHARACTER_KEYS and key != primary), None)
+        return [primary, runner_up] if runner_up else []
+    
+    async def ajudge(self, state: Dict[str, Any], candidates: List[str]) -> Optional[str]:
+        """
+        候補から応答キャラクターを高速モデルで最終判定
+        
+        判定は数トークンのみ生成する。キャラクターの生成と実行枠を奪い合わないよう、
+        LLMスケジューラを経由せず共有の非同期クライアントで直接呼び出す。
+        
+        Args:
+            state: グラフ状態
+            candidates: 候補のキャラクターキー
+        
+        Returns:
+            判定されたキャラクターキー（応答から判別できない場合None）
+        """
+        choices = "\n".join(f"- {key}: {self.CHARACTER_ROLES[key]}" for key in candidates)
+        prompt = self.JUDGE_PROMPT.format(choices=choices, user_input=state.get('user_input', ''))
+        response = await _async_chat(self.config)(
+            model=self.config.model.models.get('fast'),
+            messages=[{"role": "user", "content": prompt}],
+            options={'num_predict': 8, 'temperature': 0},
+            keep_alive=self.config.model.keep_alive
+        )
+        return self._parse_judgement(response['message']['content'], candidates)
+    
+    def _parse_judgement(self, answer: str, candidates: List[str]) -> Optional[str]:
+        """判定応答中で最初に現れた候補（キーまたは別名）"""
+        normalized = normalize_text(answer)
+        positions = {}
+        for name, key in [(key, key) for key in candidates] + list(self.CHARACTER_ALIASES.items()):
+            index = normalized.find(name)
+            if key in candidates and index >= 0:
+                positions[key] = min(index, positions.get(key, index))
+        return min(positions, key=positions.get) if positions else None
+    
+    async def aspeculate(self, state: Dict[str, Any], nodes: Dict[str, LLMNode]) -> Dict[str, Any]:
+        """
+        投機的ルーティング（state['candidates']の2キャラの生成を先行開始）
+        
+        最終判定（ajudge）と並行して両候補の生成を開始し、判定後に採用されなかった側の
+        ストリーミング要求をキャンセルする。採用側のトークンは判定までバッファし、
+        確定後に呼び出し元へ送出する。判定の失敗・期限超過時は第1候補を採用する。
+        
+        Args:
+            state: グラフ状態
+            nodes: キャラクターキー → ノード
+        
+        Returns:
+            採用したキャラクターの状態差分（next_character・targetsを含む）
+        
+        Raises:
+            LLMNodeError: 採用したキャラクターの生成に失敗した場合
+        """
+        candidates = state['candidates']
+        streams = {key: _SpeculativeStream() for key in candidates}
+        tasks = {
+            key: asyncio.ensure_future(nodes[key].agenerate(state, on_token=streams[key]))
+            for key in candidates
+        }
+        try:
+            winner = None
+            try:
+                winner = await asyncio.wait_for(
+                    self.ajudge(state, candidates),
+                    timeout=self.config.system.speculative_judge_timeout_ms / 1000
+                )
+            except Exception as e:
+                self.logger.log_warning(f"投機的ルーティングの判定失敗（第1候補を採用）: {e}",
+                                        context="router_speculation")
+            judge_failed = winner is None
+            winner = winner or candidates[0]
+            
+            # 採用されなかった候補をキャンセル（生成済みトークンを破棄分として記録）
+            loser = next(key for key in candidates if key != winner)
+            cancelled = not tasks[loser].done()
+            tasks[loser].cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await tasks[loser]
+            
+            from metrics import get_metrics_collector
+            get_metrics_collector().record_speculation(
+                hit=winner == candidates[0],
+                wasted_tokens=streams[loser].generated_tokens,
+                cancelled=cancelled,
+                judge_failed=judge_failed
+            )
+            self._record_route(winner, "speculative")
+            
+            streams[winner].attach(nodes[winner]._get_token_callback(state))
+            update = await tasks[winner]
+            return {**update, 'next_character': winner, 'targets': [winner]}
+        finally:
+            # 切断等で中断された場合も生成中の要求を残さない
+            for task in tasks.values():
+                task.cancel()
     
     def decide_next(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """次のノードを決定して状態に設定"""
-        next_character = self.route(state)
-        new_state = state.copy()
-        new_state['next_character'] = next_character
-        return new_state
\ No newline at end of file
+        """次のノードを決定して状態に設定（差分のみ返す）"""
+        targets = self.route_targets(state)
+        candidates = self.speculation_candidates(state, targets[0]) if len(targets) == 1 else []
+        return {'next_character': targets[0], 'targets': targets, 'candidates': candidates}
\ No newline at end of file
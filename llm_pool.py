@@ -0,0 +1,499 @@
+"""
+llm_pool.py
+Ollamaバックエンドプール（複数ホスト）
+
+ModelConfig.ollama_hostsに指定した複数のOllamaホストへLLMリクエストを振り分ける。
+- ホストごとのモデル一覧（設定値、省略時はヘルスチェックの/api/tagsで取得）に載っているホストのみ使用
+- 定期ヘルスチェック（/api/tags）に応答しないホストは復旧するまで除外
+- 処理中リクエスト数が最少のホストへ送信（least outstanding requests）
+- 連続失敗が閾値に達したホストはサーキットブレーカーで一定時間除外
+  （経過後は再び送信し、成功すれば復帰、失敗すれば再度除外）
+- ヘッジング（任意）: 応答（ストリーミングは最初のチャンク）がモデル別のp95を過ぎても届かない場合、
+  別ホストへ同じリクエストを送り、先に応答した方を採用して他方はキャンセルする
+  （最初のホストが即座に失敗した場合も、別ホストへ1回だけ送り直す）
+
+同期呼び出し（スレッド）はヘッジングせず、振り分けとサーキットブレーカーのみ適用する。
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import (Any, AsyncIterator, Callable, Deque, Dict, Iterable, Iterator,
+                    List, Mapping, Optional, Set, Tuple, Union)
+
+import ollama
+
+from exceptions import LLMInvocationError
+from llm_client import get_async_llm_client
+from utils import Logger
+
+
+# 結果
+_SUCCESS = "success"
+_FAILURE = "failure"
+_CANCELLED = "cancelled"
+
+
+class BackendHost:
+    """プール内のOllamaホストの状態"""
+    
+    def __init__(self, url: str, models: Optional[Iterable[str]] = None):
+        """
+        初期化
+        
+        Args:
+            url: OllamaホストURL
+            models: このホストで使うモデル名（省略時はヘルスチェックで取得した一覧）
+        """
+        self.url = url
+        self.models: Set[str] = set(models or ())
+        self.discovered_models: Optional[Set[str]] = None
+        self.healthy = True
+        self.outstanding = 0
+        self.dispatched = 0
+        # 連続失敗数とサーキットブレーカーの解除時刻（単調時刻）
+        self.failures = 0
+        self.open_until = 0.0
+    
+    def serves(self, model: str) -> bool:
+        """モデルを処理できるか（一覧が未取得の場合は全モデル）"""
+        models = self.models or self.discovered_models
+        if not models:
+            return True
+        return model in models or (":" not in model and f"{model}:latest" in models)
+    
+    def available(self, now: float) -> bool:
+        """振り分け対象か（ヘルスチェック正常かつサーキットブレーカーが閉じている）"""
+        return self.healthy and self.open_until <= now
+
+
+class _StreamAttempt:
+    """最初のチャンクまで受信したストリーミング応答"""
+    
+    __slots__ = ('host', 'first', 'chunks')
+    
+    def __init__(self, host: BackendHost, first: Mapping[str, Any], chunks: AsyncIterator):
+        self.host = host
+        self.first = first
+        self.chunks = chunks
+
+
+class LLMBackendPool:
+    """複数Ollamaホストへの振り分け・ヘルスチェック・ヘッジング"""
+    
+    # モデル別に保持する直近の応答時間の件数（ヘッジング待機時間の算出用）
+    LATENCY_WINDOW_SIZE = 256
+    
+    def __init__(self, hosts: List[Dict[str, Any]], failure_threshold: int = 3,
+                 open_seconds: float = 30.0, probe_interval: float = 10.0,
+                 hedge_enabled: bool = False, hedge_min_delay_ms: float = 1000.0,
+                 hedge_min_samples: int = 20, timeout: Optional[float] = None,
+                 metrics=None, clock: Callable[[], float] = time.monotonic):
+        """
+        初期化
+        
+        Args:
+            hosts: [{'url': ホストURL, 'models': [モデル名]}]
+            failure_threshold: サーキットブレーカーを開く連続失敗数
+            open_seconds: サーキットブレーカーを開いておく秒数
+            probe_interval: ヘルスチェック間隔（秒）
+            hedge_enabled: ヘッジングを行うか
+            hedge_min_delay_ms: ヘッジングまでの最短待機（計測数不足の間はこの値）
+            hedge_min_samples: p95を待機時間に使う最小計測数
+            timeout: 同期クライアントのリクエストタイムアウト（秒）
+            metrics: MetricsCollector（省略時はグローバルインスタンス）
+            clock: 単調増加時計（テスト用）
+        """
+        self.hosts = [BackendHost(host['url'], host.get('models')) for host in hosts]
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.probe_interval = probe_interval
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_min_samples = hedge_min_samples
+        self.timeout = timeout
+        self._metrics = metrics
+        self._clock = clock
+        # (モデル名, ストリーミングか) → 直近の応答時間（ストリーミングは最初のチャンクまで、ミリ秒）
+        self._latencies: Dict[Tuple[str, bool], Deque[float]] = {}
+        self._sync_clients: Dict[str, ollama.Client] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.logger = Logger()
+    
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            from metrics import get_metrics_collector
+            return get_metrics_collector()
+        return self._metrics
+    
+    # ---- 振り分け ----
+    
+    def select(self, model: str, exclude: Iterable[BackendHost] = (),
+               required: bool = True) -> Optional[BackendHost]:
+        """
+        処理中リクエスト数が最少のホストを選び、処理中として登録
+        
+        Args:
+            model: モデル名
+            exclude: 除外するホスト
+            required: Trueの場合、対象ホストが無ければ例外
+        
+        Returns:
+            選んだホスト（required=Falseで対象が無い場合None）
+        
+        Raises:
+            LLMInvocationError: 対象ホストが無い場合
+        """
+        excluded = set(map(id, exclude))
+        now = self._clock()
+        with self._lock:
+            candidates = [
+                host for host in self.hosts
+                if id(host) not in excluded and host.serves(model) and host.available(now)
+            ]
+            if not candidates:
+                if required:
+                    raise LLMInvocationError(f"モデル {model} を処理できるOllamaホストがありません")
+                return None
+            # 同数の場合は累計の少ないホスト（アイドル時も偏らない）
+            host = min(candidates, key=lambda h: (h.outstanding, h.dispatched))
+            host.outstanding += 1
+            host.dispatched += 1
+            return host
+    
+    def _release(self, host: BackendHost, outcome: str):
+        """処理中登録を解除し、結果をサーキットブレーカーに反映"""
+        opened = False
+        with self._lock:
+            host.outstanding -= 1
+            if outcome == _SUCCESS:
+                host.failures = 0
+                host.open_until = 0.0
+            elif outcome == _FAILURE:
+                host.failures += 1
+                now = self._clock()
+                if host.failures >= self.failure_threshold and host.open_until <= now:
+                    host.open_until = now + self.open_seconds
+                    opened = True
+        
+        if outcome != _CANCELLED:
+            self.metrics.record_backend_request(host.url, success=outcome == _SUCCESS)
+        if opened:
+            self.metrics.record_backend_circuit_open(host.url)
+            self.logger.log_warning(
+                f"Ollamaホストを除外: {host.url} (連続失敗 {host.failures}回、{self.open_seconds:.0f}秒)",
+                context="llm_pool"
+            )
+    
+    def _observe(self, model: str, stream: bool, latency_ms: float):
+        with self._lock:
+            samples = self._latencies.get((model, stream))
+            if samples is None:
+                samples = self._latencies[(model, stream)] = deque(maxlen=self.LATENCY_WINDOW_SIZE)
+            samples.append(latency_ms)
+    
+    def hedge_delay(self, model: str, stream: bool) -> Optional[float]:
+        """
+        ヘッジングまでの待機秒数
+        
+        Args:
+            model: モデル名
+            stream: ストリーミングか（最初のチャンクまでの時間で判定）
+        
+        Returns:
+            直近のp95（最短hedge_min_delay_ms）の秒数。ヘッジングしない場合None
+        """
+        if not self.hedge_enabled or len(self.hosts) < 2:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get((model, stream), ()))
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_min_delay_ms / 1000
+        p95 = samples[max(0, math.ceil(len(samples) * 0.95) - 1)]
+        return max(self.hedge_min_delay_ms, p95) / 1000
+    
+    # ---- 同期呼び出し ----
+    
+    def chat(self, model: str, messages: List[Dict[str, Any]], stream: bool = False,
+             options: Optional[Dict[str, Any]] = None,
+             keep_alive: Optional[Union[float, str]] = None
+             ) -> Union[Mapping[str, Any], Iterator[Mapping[str, Any]]]:
+        """
+        チャット生成（ollama.chat互換、ヘッジングなし）
+        
+        Raises:
+            LLMInvocationError: 対象ホストが無い場合
+        """
+        host = self.select(model)
+        started = self._clock()
+        try:
+            response = self._sync_client(host).chat(
+                model=model, messages=messages, stream=stream,
+                options=options, keep_alive=keep_alive
+            )
+        except Exception:
+            self._release(host, _FAILURE)
+            raise
+        except BaseException:
+            self._release(host, _CANCELLED)
+            raise
+        
+        if stream:
+            return self._relay_sync(host, model, started, response)
+        self._observe(model, False, (self._clock() - started) * 1000)
+        self._release(host, _SUCCESS)
+        return response
+    
+    def _relay_sync(self, host: BackendHost, model: str, started: float,
+                    chunks: Iterator[Mapping[str, Any]]) -> Iterator[Mapping[str, Any]]:
+        outcome = _CANCELLED
+        first = True
+        try:
+            for chunk in chunks:
+                if first:
+                    self._observe(model, True, (self._clock() - started) * 1000)
+                    first = False
+                yield chunk
+            outcome = _SUCCESS
+        except Exception:
+            outcome = _FAILURE
+            raise
+        finally:
+            self._release(host, outcome)
+    
+    def _sync_client(self, host: BackendHost) -> ollama.Client:
+        client = self._sync_clients.get(host.url)
+        if client is None:
+            client = self._sync_clients[host.url] = ollama.Client(host=host.url, timeout=self.timeout)
+        return client
+    
+    # ---- 非同期呼び出し ----
+    
+    async def achat(self, model: str, messages: List[Dict[str, Any]], stream: bool = False,
+                    options: Optional[Dict[str, Any]] = None,
+                    keep_alive: Optional[Union[float, str]] = None
+                    ) -> Union[Mapping[str, Any], AsyncIterator[Mapping[str, Any]]]:
+        """
+        チャット生成（AsyncLLMClient.chat互換、ヘッジングあり）
+        
+        Returns:
+            応答辞書、またはstream=True時はチャンクの非同期イテレータ
+        
+        Raises:
+            LLMInvocationError: 対象ホストが無い場合
+        """
+        request = dict(model=model, messages=messages, stream=stream,
+                       options=options, keep_alive=keep_alive)
+        primary = self.select(model)
+        attempts = {asyncio.ensure_future(self._aattempt(primary, request)): primary}
+        delay = self.hedge_delay(model, stream)
+        second_sent = hedged = False
+        error: Optional[BaseException] = None
+        
+        try:
+            while True:
+                timeout = None if second_sent else delay
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    host = attempts.pop(task)
+                    if task.exception() is None:
+                        if hedged:
+                            self.metrics.record_llm_hedge(won=host is not primary)
+                        result = task.result()
+                        return self._relay(result, model) if stream else result
+                    error = task.exception()
+                
+                if not attempts and second_sent:
+                    raise error
+                if done and attempts:
+                    # 一方が失敗し、他方は応答待ち
+                    continue
+                # ヘッジング（応答が遅い）または送り直し（即座に失敗）
+                second_sent = True
+                secondary = self.select(model, exclude=[primary], required=False)
+                if secondary is None:
+                    if error is not None:
+                        raise error
+                    continue
+                hedged = error is None
+                if hedged:
+                    self.logger.log_system_event(
+                        "llm_hedge", {"model": model, "primary": primary.url, "secondary": secondary.url}
+                    )
+                attempts[asyncio.ensure_future(self._aattempt(secondary, request))] = secondary
+        finally:
+            for task in attempts:
+                task.cancel()
+            if attempts:
+                await asyncio.gather(*attempts, return_exceptions=True)
+            # キャンセル前に最初のチャンクまで受信していた側を閉じる
+            for task in attempts:
+                if not task.cancelled() and task.exception() is None and stream:
+                    await self._discard(task.result())
+    
+    async def _aattempt(self, host: BackendHost,
+                        request: Dict[str, Any]) -> Union[Mapping[str, Any], _StreamAttempt]:
+        """1ホストへの送信（ストリーミングは最初のチャンクまで受信）"""
+        client = get_async_llm_client(host.url)
+        started = self._clock()
+        chunks = None
+        try:
+            response = await client.chat(**request)
+            if request['stream']:
+                chunks = response
+                first = await chunks.__anext__()
+        except asyncio.CancelledError:
+            if chunks is not None:
+                await chunks.aclose()
+            self._release(host, _CANCELLED)
+            raise
+        except StopAsyncIteration:
+            self._release(host, _FAILURE)
+            raise LLMInvocationError(f"Ollamaホスト {host.url} が空の応答を返しました")
+        except Exception:
+            self._release(host, _FAILURE)
+            raise
+        
+        self._observe(request['model'], request['stream'], (self._clock() - started) * 1000)
+        if request['stream']:
+            return _StreamAttempt(host, first, chunks)
+        self._release(host, _SUCCESS)
+        return response
+    
+    async def _relay(self, attempt: _StreamAttempt, model: str) -> AsyncIterator[Mapping[str, Any]]:
+        outcome = _CANCELLED
+        try:
+            yield attempt.first
+            async for chunk in attempt.chunks:
+                yield chunk
+            outcome = _SUCCESS
+        except Exception:
+            outcome = _FAILURE
+            raise
+        finally:
+            if outcome == _CANCELLED:
+                await attempt.chunks.aclose()
+            self._release(attempt.host, outcome)
+    
+    async def _discard(self, attempt: _StreamAttempt):
+        try:
+            await attempt.chunks.aclose()
+        finally:
+            self._release(attempt.host, _CANCELLED)
+    
+    # ---- ヘルスチェック ----
+    
+    async def start(self):
+        """バックグラウンドで定期ヘルスチェックを開始"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """ヘルスチェックを停止"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.probe_interval)
+    
+    async def probe_all(self):
+        """全ホストを並行してヘルスチェック"""
+        await asyncio.gather(*(self.probe(host) for host in self.hosts))
+    
+    async def probe(self, host: BackendHost) -> bool:
+        """
+        ホストのヘルスチェック（/api/tagsでモデル一覧も更新）
+        
+        Args:
+            host: 対象ホスト
+        
+        Returns:
+            正常な場合True
+        """
+        try:
+            response = await get_async_llm_client(host.url).tags()
+        except Exception as e:
+            if host.healthy:
+                self.logger.log_error(e, context=f"llm_pool_probe_{host.url}")
+            host.healthy = False
+            self.metrics.record_backend_health(host.url, healthy=False)
+            return False
+        
+        host.discovered_models = {m.get('name') or m.get('model') for m in response.get('models', [])}
+        if not host.healthy:
+            self.logger.log_system_event("llm_host_recovered", {"host": host.url})
+        host.healthy = True
+        self.metrics.record_backend_health(host.url, healthy=True)
+        return True
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        プールの状態を取得
+        
+        Returns:
+            {'running': bool, 'hosts': [{'url', 'healthy', 'circuit_open', 'outstanding', 'models'}]}
+        """
+        now = self._clock()
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'hosts': [
+                {
+                    'url': host.url,
+                    'healthy': host.healthy,
+                    'circuit_open': host.open_until > now,
+                    'outstanding': host.outstanding,
+                    'models': sorted(host.models or host.discovered_models or ())
+                }
+                for host in self.hosts
+            ]
+        }
+
+
+# グローバルインスタンス（シングルトン、ollama_hosts未設定時はNone）
+_llm_pool: Optional[LLMBackendPool] = None
+_llm_pool_loaded = False
+
+
+def get_llm_pool() -> Optional[LLMBackendPool]:
+    """
+    グローバルLLMBackendPoolインスタンスを取得
+    
+    Returns:
+        LLMBackendPoolインスタンス（ollama_hosts未設定時はNoneで、ollama_hostのみを使う）
+    """
+    global _llm_pool, _llm_pool_loaded
+    if not _llm_pool_loaded:
+        from config import config
+        
+        model_config = config.model
+        if model_config.ollama_hosts:
+            _llm_pool = LLMBackendPool(
+                hosts=model_config.ollama_hosts,
+                failure_threshold=model_config.llm_pool_failure_threshold,
+                open_seconds=model_config.llm_pool_open_seconds,
+                probe_interval=model_config.llm_pool_probe_interval,
+                hedge_enabled=model_config.llm_hedge_enabled,
+                hedge_min_delay_ms=model_config.llm_hedge_min_delay_ms,
+                hedge_min_samples=model_config.llm_hedge_min_samples,
+                timeout=model_config.llm_timeout
+            )
+        _llm_pool_loaded = True
+    return _llm_pool
+
+
+def reset_llm_pool():
+    """グローバルLLMBackendPoolをリセット"""
+    global _llm_pool, _llm_pool_loaded
+    _llm_pool = None
+    _llm_pool_loaded = False
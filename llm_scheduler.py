@@ -0,0 +1,343 @@
+"""
+llm_scheduler.py
+LLMリクエストスケジューラ
+
+LLMNodeとOllamaの間に入り、モデルごとの同時実行数を制限する。
+待機中のリクエストは優先度クラス順、同一優先度内は到着順（FIFO）で実行枠を割り当て、
+期限までに枠を得られなかったリクエストはLLMTimeoutErrorで打ち切る。
+同期（スレッド）・非同期（イベントループ）どちらの呼び出し元からも同じ枠を共有する。
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from exceptions import LLMTimeoutError
+
+
+# 優先度クラス（値が小さいほど優先）
+PRIORITY_PRO = 0         # 有料プラン（APIConfig.pro_roles）
+PRIORITY_FREE = 1        # 無料プラン・CLI
+PRIORITY_BACKGROUND = 2  # ウォームアップ・要約等のバックグラウンド処理
+
+# 待機状態
+_WAITING = 0
+_GRANTED = 1
+_ABANDONED = 2
+
+
+def priority_for_roles(roles: Optional[Iterable[str]]) -> int:
+    """
+    ユーザーロールから優先度クラスを決定
+    
+    Args:
+        roles: ユーザーロールのリスト
+    
+    Returns:
+        APIConfig.pro_rolesに該当すればPRIORITY_PRO、それ以外はPRIORITY_FREE
+    """
+    from config import config
+    
+    if roles and any(role in config.api.pro_roles for role in roles):
+        return PRIORITY_PRO
+    return PRIORITY_FREE
+
+
+class SchedulerTicket:
+    """実行枠の待機・保持状態"""
+    
+    __slots__ = ('model', 'priority', 'seq', 'enqueued_at', 'granted_at',
+                 'state', 'event', 'loop', 'future')
+    
+    def __init__(self, model: str, priority: int, seq: int):
+        self.model = model
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.state = _WAITING
+        # 同期待機用
+        self.event: Optional[threading.Event] = None
+        # 非同期待機用
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+    
+    @property
+    def wait_ms(self) -> float:
+        """枠を得るまでの待機時間（ミリ秒）"""
+        return ((self.granted_at or time.monotonic()) - self.enqueued_at) * 1000
+    
+    def __lt__(self, other: "SchedulerTicket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ModelQueue:
+    """モデル単位の実行枠と待機キュー"""
+    
+    __slots__ = ('slots', 'active', 'waiting', 'heap')
+    
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.active = 0
+        self.waiting = 0
+        self.heap: List[SchedulerTicket] = []
+
+
+class LLMScheduler:
+    """モデル別LLMリクエストスケジューラ"""
+    
+    def __init__(self, slots: Optional[Dict[str, int]] = None, default_slots: int = 1,
+                 queue_timeout: Optional[float] = None, metrics=None):
+        """
+        初期化
+        
+        Args:
+            slots: モデル名ごとの同時実行数（Ollama側の並列数に合わせる）
+            default_slots: slotsに無いモデルの同時実行数
+            queue_timeout: 実行枠の待機期限（秒、Noneで無期限）
+            metrics: MetricsCollector（省略時はグローバルインスタンス）
+        """
+        self.default_slots = max(1, default_slots)
+        self.queue_timeout = queue_timeout
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queues: Dict[str, _ModelQueue] = {
+            model: _ModelQueue(max(1, n)) for model, n in (slots or {}).items()
+        }
+    
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            from metrics import get_metrics_collector
+            return get_metrics_collector()
+        return self._metrics
+    
+    # ========================================
+    # 同期API
+    # ========================================
+    
+    def acquire(self, model: str, priority: int = PRIORITY_FREE,
+                timeout: Optional[float] = None) -> SchedulerTicket:
+        """
+        実行枠を取得（空きが出るまでスレッドをブロック）
+        
+        Args:
+            model: モデル名
+            priority: 優先度クラス
+            timeout: 待機期限（秒、省略時はqueue_timeout）
+        
+        Returns:
+            取得した枠（release()で返却すること）
+        
+        Raises:
+            LLMTimeoutError: 期限までに枠を取得できなかった場合
+        """
+        ticket = self._enqueue(model, priority, sync=True)
+        if ticket.state == _GRANTED:
+            return ticket
+        
+        granted = ticket.event.wait(self._timeout(timeout))
+        if not granted and not self._abandon(ticket):
+            self._raise_timeout(ticket)
+        return ticket
+    
+    @contextmanager
+    def slot(self, model: str, priority: int = PRIORITY_FREE, timeout: Optional[float] = None):
+        """実行枠を保持するコンテキスト（同期）"""
+        ticket = self.acquire(model, priority, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+    
+    # ========================================
+    # 非同期API
+    # ========================================
+    
+    async def aacquire(self, model: str, priority: int = PRIORITY_FREE,
+                       timeout: Optional[float] = None) -> SchedulerTicket:
+        """
+        実行枠を取得（非同期、待機中もイベントループはブロックしない）
+        
+        引数・戻り値・例外はacquire()と同じ。
+        """
+        ticket = self._enqueue(model, priority, sync=False)
+        if ticket.state == _GRANTED:
+            return ticket
+        
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self._timeout(timeout))
+        except asyncio.TimeoutError:
+            if not self._abandon(ticket):
+                self._raise_timeout(ticket)
+        except asyncio.CancelledError:
+            if self._abandon(ticket):
+                # 割り当てと同時にキャンセルされた場合は枠を次へ回す
+                self.release(ticket)
+            raise
+        return ticket
+    
+    @asynccontextmanager
+    async def aslot(self, model: str, priority: int = PRIORITY_FREE,
+                    timeout: Optional[float] = None):
+        """実行枠を保持するコンテキスト（非同期）"""
+        ticket = await self.aacquire(model, priority, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+    
+    # ========================================
+    # 共通処理
+    # ========================================
+    
+    def release(self, ticket: SchedulerTicket):
+        """
+        実行枠を返却し、待機中の次のリクエストに割り当て
+        
+        Args:
+            ticket: acquire()/aacquire()で取得した枠
+        """
+        service_ms = (time.monotonic() - ticket.granted_at) * 1000
+        
+        with self._lock:
+            queue = self._queues[ticket.model]
+            queue.active -= 1
+            self._grant_next(queue)
+        
+        self.metrics.record_llm_schedule(
+            model=ticket.model,
+            priority=ticket.priority,
+            wait_ms=ticket.wait_ms,
+            service_ms=service_ms
+        )
+    
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        現在の実行枠・待機数を取得
+        
+        Returns:
+            {モデル名: {'slots', 'active', 'queued'}}
+        """
+        with self._lock:
+            return {
+                model: {'slots': q.slots, 'active': q.active, 'queued': q.waiting}
+                for model, q in self._queues.items()
+            }
+    
+    def _enqueue(self, model: str, priority: int, sync: bool) -> SchedulerTicket:
+        """待機キューに登録（空き枠があり待機者もいなければ即時割り当て）"""
+        with self._lock:
+            queue = self._queues.get(model)
+            if queue is None:
+                queue = self._queues[model] = _ModelQueue(self.default_slots)
+            
+            ticket = SchedulerTicket(model, priority, next(self._seq))
+            if queue.active < queue.slots and queue.waiting == 0:
+                queue.active += 1
+                ticket.state = _GRANTED
+                ticket.granted_at = ticket.enqueued_at
+                return ticket
+            
+            if sync:
+                ticket.event = threading.Event()
+            else:
+                ticket.loop = asyncio.get_running_loop()
+                ticket.future = ticket.loop.create_future()
+            heapq.heappush(queue.heap, ticket)
+            queue.waiting += 1
+            depth = queue.waiting
+        
+        self.metrics.record_llm_queue_depth(model, depth)
+        return ticket
+    
+    def _grant_next(self, queue: _ModelQueue):
+        """空き枠を優先度順に割り当て（ロック保持中に呼ぶこと）"""
+        while queue.active < queue.slots and queue.heap:
+            ticket = heapq.heappop(queue.heap)
+            if ticket.state != _WAITING:
+                # 期限切れ・キャンセル済み（遅延削除）
+                continue
+            queue.waiting -= 1
+            queue.active += 1
+            ticket.state = _GRANTED
+            ticket.granted_at = time.monotonic()
+            if ticket.event is not None:
+                ticket.event.set()
+            else:
+                ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+    
+    def _abandon(self, ticket: SchedulerTicket) -> bool:
+        """
+        待機を取り下げ
+        
+        Returns:
+            取り下げ前に枠が割り当て済みだった場合True（呼び出し元が枠を保持）
+        """
+        with self._lock:
+            if ticket.state == _GRANTED:
+                return True
+            ticket.state = _ABANDONED
+            self._queues[ticket.model].waiting -= 1
+            return False
+    
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        return self.queue_timeout if timeout is None else timeout
+    
+    def _raise_timeout(self, ticket: SchedulerTicket):
+        self.metrics.record_llm_queue_timeout(ticket.model, ticket.priority)
+        raise LLMTimeoutError(
+            f"モデル {ticket.model} の実行待ちが期限切れになりました "
+            f"({ticket.wait_ms:.0f}ms)"
+        )
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# グローバルインスタンス（シングルトン）
+_llm_scheduler = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    グローバルLLMSchedulerインスタンスを取得
+    
+    モデル別の同時実行数は設定のモデルキー（fast/medium/search）から
+    モデル名に解決して初期化する。
+    ollama_hostsを設定している場合は、そのモデルを処理できるホスト数を掛ける。
+    
+    Returns:
+        LLMSchedulerインスタンス
+    """
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        from config import config
+        
+        slots: Dict[str, int] = {}
+        for key, model in config.model.models.items():
+            # 同一モデルを複数キーで共有する場合は先に定義された設定を使う
+            # Ollamaホストのプール使用時は、モデルを処理できるホスト数分の枠にする
+            hosts = sum(
+                1 for host in config.model.ollama_hosts if not host['models'] or model in host['models']
+            )
+            slots.setdefault(model, config.model.llm_slots.get(key, config.model.llm_default_slots) * max(1, hosts))
+        _llm_scheduler = LLMScheduler(
+            slots=slots,
+            default_slots=config.model.llm_default_slots,
+            queue_timeout=config.model.llm_queue_timeout
+        )
+    return _llm_scheduler
+
+
+def reset_llm_scheduler():
+    """グローバルLLMSchedulerをリセット"""
+    global _llm_scheduler
+    _llm_scheduler = None
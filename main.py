@@ -7,28 +7,94 @@ LangGraphを使用して各キャラクターノードを接続し、会話フ
 """
 
 from langgraph.graph import StateGraph, END
-from typing import Dict, Any, TypedDict, Annotated
+from langgraph.utils.runnable import RunnableCallable
+from typing import Dict, Any, TypedDict, Annotated, Iterator, AsyncIterator, List, Optional, Callable
+from contextlib import aclosing, asynccontextmanager, closing, contextmanager
 from datetime import datetime
+import asyncio
 import operator
+import threading
 
 from config import Config
-from conversation_state import ConversationState
+from conversation_state import ConversationState, SessionStateStore
+from conversation_summarizer import ConversationSummarizer
 from llm_nodes import LuminaNode, ClarisNode, NoxNode, RouterNode
+from llm_scheduler import PRIORITY_FREE
 from memory_manager import MemorySystemManager
 from exceptions import LLMNodeError
 from metrics import get_metrics_collector
 
 
+def _track_partial(partial: Dict[str, List[str]], event: Dict[str, Any]):
+    """ストリームイベントから発話者別の送出済みトークンを記録（改訂時はその発話者の分を破棄）"""
+    speaker = event.get("speaker", "")
+    if event.get("type") == "token":
+        partial.setdefault(speaker, []).append(event["delta"])
+    elif event.get("type") == "revision":
+        partial[speaker] = []
+
+
 class GraphState(TypedDict):
-    """LangGraphの状態型定義"""
+    """LangGraphの状態型定義
+    
+    各ノードは変更したキーのみを差分として返す。
+    historyは未要約ターンの直近ウィンドウのみを受け取り、ノードが返した新規ターンがreducerで追記される。
+    それより前のターンはsummary（ローリング要約）として渡す。
+    
+    targetsに複数キャラが指定された場合は各キャラのノードを並列実行し、応答は一旦repliesに
+    書き込んで合流ノード（merge）がtargetsの順に並べてhistoryへ追記する。
+    candidatesは投機的ルーティングの候補（判定が曖昧な場合のみ、speculateノードで処理する）。
+    """
     user_input: str
     history: Annotated[list, operator.add]
+    summary: str
     current_turn: int
     max_turns: int
     last_speaker: str
     next_character: str
+    targets: list
+    replies: Annotated[list, operator.add]
+    candidates: list
     session_id: str
     start_time: str
+    stream: bool
+    priority: int
+
+
+def _dual_node(func: Callable, afunc: Optional[Callable] = None, name: str = None) -> RunnableCallable:
+    """
+    同期・非同期の両実行パスを持つグラフノードを作成
+    
+    invoke/streamではfunc、ainvoke/astreamではafuncが呼ばれる。
+    afunc省略時は軽量な同期処理とみなし、スレッドプールを経由せずイベントループ上で直接実行する。
+    """
+    if afunc is None:
+        async def afunc(state: Dict[str, Any]) -> Any:
+            return func(state)
+    return RunnableCallable(func, afunc, name=name, trace=False)
+
+
+@asynccontextmanager
+async def _hold_lock(lock: threading.Lock):
+    """
+    threading.Lockを非同期コンテキストで取得
+    
+    競合時のみワーカースレッドで待機する。待機中にキャンセルされた場合も
+    後から取得されたロックは確実に解放する。
+    """
+    if not lock.acquire(blocking=False):
+        acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            acquiring.add_done_callback(
+                lambda f: lock.release() if not f.cancelled() and f.exception() is None else None
+            )
+            raise
+    try:
+        yield
+    finally:
+        lock.release()
 
 
 class MultiLLMChat:
@@ -37,12 +103,27 @@ class MultiLLMChat:
     def __init__(self):
         """初期化"""
         self.config = Config()
+        # Phase 1互換: session_id未指定時の会話状態
         self.conv_state = ConversationState()
+        self._default_lock = threading.Lock()
         
         # 記憶システムの初期化
         self.memory = MemorySystemManager()
         self.memory.initialize_characters()
         
+        # 古いターンのローリング要約（リクエスト外で実行）
+        self.summarizer = (
+            ConversationSummarizer(self.config, memory=self.memory)
+            if self.config.system.summary_enabled else None
+        )
+        
+        # セッション別会話状態（上限超過時はLRUで中期記憶へ退避）
+        self.sessions = SessionStateStore(
+            max_sessions=self.config.system.max_active_sessions,
+            on_evict=self._on_session_evicted,
+            loader=self._restore_session
+        )
+        
         # メトリクス収集の初期化
         self.metrics = get_metrics_collector()
         self.metrics.record_session_start()
@@ -63,36 +144,41 @@ class MultiLLMChat:
         # グラフの定義
         workflow = StateGraph(GraphState)
         
-        # ノードの追加
-        workflow.add_node("router", self._router_node)
-        workflow.add_node("lumina", self._lumina_node)
-        workflow.add_node("claris", self._claris_node)
-        workflow.add_node("nox", self._nox_node)
-        workflow.add_node("check_continue", self._check_continue)
+        # ノードの追加（キャラクターノードはainvoke時にネイティブ非同期で実行）
+        workflow.add_node("router", _dual_node(self._router_node, self._arouter_node, name="router"))
+        workflow.add_node("lumina", _dual_node(self._lumina_node, self._alumina_node, name="lumina"))
+        workflow.add_node("claris", _dual_node(self._claris_node, self._aclaris_node, name="claris"))
+        workflow.add_node("nox", _dual_node(self._nox_node, self._anox_node, name="nox"))
+        workflow.add_node("speculate", _dual_node(self._speculate_node, self._aspeculate_node, name="speculate"))
+        workflow.add_node("merge", _dual_node(self._merge_replies, name="merge"))
+        workflow.add_node("check_continue", _dual_node(self._check_continue, name="check_continue"))
         
         # エントリーポイント
         workflow.set_entry_point("router")
         
-        # ルーターから各キャラへの条件付きエッジ
+        # ルーターから各キャラへの条件付きエッジ（複数キャラの場合は並列実行）
         workflow.add_conditional_edges(
             "router",
-            self._route_decision,
+            _dual_node(self._route_decision),
             {
                 "lumina": "lumina",
                 "claris": "claris",
-                "nox": "nox"
+                "nox": "nox",
+                "speculate": "speculate"
             }
         )
         
-        # 各キャラから継続チェックへ
-        workflow.add_edge("lumina", "check_continue")
-        workflow.add_edge("claris", "check_continue")
-        workflow.add_edge("nox", "check_continue")
+        # 各キャラから合流ノードを経て継続チェックへ
+        workflow.add_edge("lumina", "merge")
+        workflow.add_edge("claris", "merge")
+        workflow.add_edge("nox", "merge")
+        workflow.add_edge("merge", "check_continue")
+        workflow.add_edge("speculate", "check_continue")
         
         # 継続チェックからの分岐
         workflow.add_conditional_edges(
             "check_continue",
-            self._should_continue,
+            _dual_node(self._should_continue),
             {
                 "continue": END,
                 "end": END
@@ -102,63 +188,136 @@ class MultiLLMChat:
         return workflow
     
     def _router_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """ルーターノード処理"""
-        return self.router_node.decide_next(state)
+        """ルーターノード処理（ノクス選択時は検索を先行開始）"""
+        update = self.router_node.decide_next(state)
+        if 'nox' in update['targets']:
+            self.nox_node.prefetch_search(state)
+        return update
+    
+    async def _arouter_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """ルーターノード処理（非同期、検索はイベントループ上のタスクとして先行開始）"""
+        update = self.router_node.decide_next(state)
+        if 'nox' in update['targets'] or 'nox' in update['candidates']:
+            self.nox_node.aprefetch_search(state)
+        return update
     
     def _lumina_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """ルミナノード処理（エラーハンドリング付き）"""
         try:
-            return self.lumina_node.generate(state)
+            return self._fan_out(state, 'lumina', self.lumina_node.generate(state))
         except LLMNodeError as e:
             self.memory.logger.log_error(e, context="lumina_node")
             # エラー時もフローを継続（フォールバック応答）
-            return {
-                **state,
-                "history": state.get("history", []) + [{
-                    "speaker": "system",
-                    "msg": "申し訳ございません。ルミナの応答生成中にエラーが発生しました。",
-                    "timestamp": datetime.now().isoformat()
-                }]
-            }
+            return self._fan_out(state, 'lumina', self._node_error_update("ルミナ"))
+    
+    async def _alumina_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """ルミナノード処理（非同期）"""
+        try:
+            return self._fan_out(state, 'lumina', await self.lumina_node.agenerate(state))
+        except LLMNodeError as e:
+            self.memory.logger.log_error(e, context="lumina_node")
+            return self._fan_out(state, 'lumina', self._node_error_update("ルミナ"))
     
     def _claris_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """クラリスノード処理（エラーハンドリング付き）"""
         try:
-            return self.claris_node.generate(state)
+            return self._fan_out(state, 'claris', self.claris_node.generate(state))
         except LLMNodeError as e:
             self.memory.logger.log_error(e, context="claris_node")
-            return {
-                **state,
-                "history": state.get("history", []) + [{
-                    "speaker": "system",
-                    "msg": "申し訳ございません。クラリスの応答生成中にエラーが発生しました。",
-                    "timestamp": datetime.now().isoformat()
-                }]
-            }
+            return self._fan_out(state, 'claris', self._node_error_update("クラリス"))
+    
+    async def _aclaris_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """クラリスノード処理（非同期）"""
+        try:
+            return self._fan_out(state, 'claris', await self.claris_node.agenerate(state))
+        except LLMNodeError as e:
+            self.memory.logger.log_error(e, context="claris_node")
+            return self._fan_out(state, 'claris', self._node_error_update("クラリス"))
     
     def _nox_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """ノクスノード処理（エラーハンドリング付き）"""
         try:
-            return self.nox_node.generate(state)
+            return self._fan_out(state, 'nox', self.nox_node.generate(state))
         except LLMNodeError as e:
             self.memory.logger.log_error(e, context="nox_node")
-            return {
-                **state,
-                "history": state.get("history", []) + [{
-                    "speaker": "system",
-                    "msg": "申し訳ございません。ノクスの応答生成中にエラーが発生しました。",
-                    "timestamp": datetime.now().isoformat()
-                }]
-            }
+            return self._fan_out(state, 'nox', self._node_error_update("ノクス"))
+    
+    async def _anox_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """ノクスノード処理（非同期）"""
+        try:
+            return self._fan_out(state, 'nox', await self.nox_node.agenerate(state))
+        except LLMNodeError as e:
+            self.memory.logger.log_error(e, context="nox_node")
+            return self._fan_out(state, 'nox', self._node_error_update("ノクス"))
     
-    def _route_decision(self, state: Dict[str, Any]) -> str:
-        """ルーティング決定"""
+    def _speculate_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """投機的ルーティングノード処理（同期実行時は先行生成せず第1候補で応答）"""
+        return {
+            'lumina': self._lumina_node,
+            'claris': self._claris_node,
+            'nox': self._nox_node
+        }[state['next_character']](state)
+    
+    async def _aspeculate_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """投機的ルーティングノード処理（非同期、候補2キャラを先行生成）"""
+        nodes = {'lumina': self.lumina_node, 'claris': self.claris_node, 'nox': self.nox_node}
+        try:
+            return await self.router_node.aspeculate(state, nodes)
+        except LLMNodeError as e:
+            self.memory.logger.log_error(e, context="speculate_node")
+            return self._node_error_update(nodes[state['next_character']].character_name)
+    
+    def _node_error_update(self, character_name: str) -> Dict[str, Any]:
+        """ノードエラー時の状態差分（systemメッセージを追記）"""
+        return {
+            "history": [{
+                "speaker": "system",
+                "msg": f"申し訳ございません。{character_name}の応答生成中にエラーが発生しました。",
+                "timestamp": datetime.now().isoformat()
+            }]
+        }
+    
+    def _fan_out(self, state: Dict[str, Any], character_key: str,
+                 update: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        並列実行時はノードの差分をrepliesへの書き込みに変換
+        
+        同一ステップで複数ノードがhistory・last_speakerを書き換えないよう、
+        応答はキャラクターキー付きでrepliesに集め、合流ノードで履歴へ追記する。
+        """
+        if len(state.get('targets') or []) <= 1:
+            return update
+        return {'replies': [{'character': character_key, 'turns': update.get('history', [])}]}
+    
+    def _merge_replies(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """合流ノード処理（並列応答をルーターの決定順に履歴へ追記）"""
+        replies = state.get('replies') or []
+        if not replies:
+            return {}
+        order = {key: index for index, key in enumerate(state.get('targets') or [])}
+        turns = [
+            turn
+            for reply in sorted(replies, key=lambda reply: order.get(reply['character'], len(order)))
+            for turn in reply['turns']
+        ]
+        update: Dict[str, Any] = {'history': turns}
+        speakers = [turn['speaker'] for turn in turns if turn['speaker'] != 'system']
+        if speakers:
+            update['last_speaker'] = speakers[-1]
+        return update
+    
+    def _route_decision(self, state: Dict[str, Any]) -> Any:
+        """ルーティング決定（複数キャラの場合はノード名のリスト）"""
+        targets = state.get('targets') or []
+        if len(targets) > 1:
+            return targets
+        if state.get('candidates'):
+            return "speculate"
         return state.get('next_character', 'lumina')
     
     def _check_continue(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """継続チェック"""
-        state['current_turn'] = state.get('current_turn', 0) + 1
-        return state
+        return {'current_turn': state.get('current_turn', 0) + 1}
     
     def _should_continue(self, state: Dict[str, Any]) -> str:
         """会話を継続すべきか判定"""
@@ -169,7 +328,8 @@ class MultiLLMChat:
             return "end"
         return "continue"
     
-    def chat(self, user_input: str, session_id: str = None, user_id: str = None, character: str = None) -> Dict[str, Any]:
+    def chat(self, user_input: str, session_id: str = None, user_id: str = None, character: str = None,
+             priority: int = PRIORITY_FREE) -> Dict[str, Any]:
         """
         ユーザー入力を処理して応答を生成
         
@@ -177,79 +337,336 @@ class MultiLLMChat:
             user_input: ユーザーの入力テキスト
             session_id: セッションID（省略時: 内部セッションIDを使用）
             user_id: ユーザーID（Phase 3統合用、省略可能）
-            
+            character: 指定キャラクター（省略可能）
+            priority: LLMスケジューラの優先度クラス
+        
         Returns:
             応答を含む状態辞書
         """
+        with self._session(session_id) as (conv_state, lock):
+            
+            # 同一セッションのターンは直列化、別セッションは並列実行
+            with lock:
+                initial_state, error_response = self._begin_turn(conv_state, user_input, character, priority)
+                if error_response:
+                    return error_response
+                
+                # グラフ実行
+                result = self.compiled_graph.invoke(initial_state)
+                
+                return self._complete_turn(conv_state, initial_state, result, lock)
+    
+    def stream_chat(self, user_input: str, session_id: str = None, user_id: str = None,
+                    character: str = None, priority: int = PRIORITY_FREE) -> Iterator[Dict[str, Any]]:
+        """
+        ユーザー入力を処理し、生成中のトークンを逐次返す
+        
+        LLMNodeのストリーミングモード（Ollama stream=True）を有効にしてグラフを実行し、
+        トークン差分をLangGraphのカスタムストリーム経由で中継する。
+        生成完了後の履歴・記憶への保存はchat()と同一。
+        
+        Args:
+            user_input: ユーザーの入力テキスト
+            session_id: セッションID（省略時: 内部セッションIDを使用）
+            user_id: ユーザーID（Phase 3統合用、省略可能）
+            character: 指定キャラクター（省略可能）
+            priority: LLMスケジューラの優先度クラス
+        
+        Yields:
+            {"type": "token", "speaker": 発話者, "delta": トークン差分}
+            {"type": "revision", "speaker": 発話者}（カスケードの改訂開始、その発話者の送出済みトークンを破棄）
+            最後に {"type": "done", **chat()と同形式の応答}
+        """
+        with self._session(session_id) as (conv_state, lock):
+            
+            with lock:
+                initial_state, error_response = self._begin_turn(conv_state, user_input, character, priority)
+                if error_response:
+                    yield {"type": "done", **error_response}
+                    return
+                
+                initial_state['stream'] = True
+                result: Optional[Dict[str, Any]] = None
+                
+                partial: Dict[str, List[str]] = {}
+                
+                # グラフ実行（custom: トークン, values: 最終状態）
+                try:
+                    with closing(self.compiled_graph.stream(
+                        initial_state, stream_mode=["custom", "values"]
+                    )) as stream:
+                        for mode, payload in stream:
+                            if mode == "custom":
+                                _track_partial(partial, payload)
+                                yield payload
+                            else:
+                                result = payload
+                except GeneratorExit:
+                    # 呼び出し元が受信をやめた場合は途中までの応答を記録
+                    self._cancel_turn(conv_state, initial_state, partial)
+                    raise
+                
+                yield {"type": "done", **self._complete_turn(conv_state, initial_state, result, lock)}
+    
+    async def achat(self, user_input: str, session_id: str = None, user_id: str = None,
+                    character: str = None, priority: int = PRIORITY_FREE) -> Dict[str, Any]:
+        """
+        chat()の非同期版
+        
+        グラフをainvokeで実行し、LLM呼び出しは共有の非同期クライアントで行う。
+        スレッドプールを占有しないため、同時リクエスト数がワーカースレッド数に制限されない。
+        
+        Args:
+            user_input: ユーザーの入力テキスト
+            session_id: セッションID（省略時: 内部セッションIDを使用）
+            user_id: ユーザーID（Phase 3統合用、省略可能）
+            character: 指定キャラクター（省略可能）
+            priority: LLMスケジューラの優先度クラス
+        
+        Returns:
+            chat()と同形式の応答辞書
+        """
+        with self._session(session_id) as (conv_state, lock):
+            
+            async with _hold_lock(lock):
+                initial_state, error_response = self._begin_turn(conv_state, user_input, character, priority)
+                if error_response:
+                    return error_response
+                
+                try:
+                    result = await self.compiled_graph.ainvoke(initial_state)
+                except asyncio.CancelledError:
+                    self._cancel_turn(conv_state, initial_state, {})
+                    raise
+                
+                return self._complete_turn(conv_state, initial_state, result, lock)
+    
+    async def astream_chat(self, user_input: str, session_id: str = None, user_id: str = None,
+                           character: str = None,
+                           priority: int = PRIORITY_FREE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        stream_chat()の非同期版
+        
+        呼び出し元がキャンセルされた場合・受信をやめた（aclose）場合はグラフ実行を中断し、
+        ノードのOllamaストリーミング要求も打ち切る。途中まで送出した応答は
+        cancelled付きで会話履歴・記憶に残す。
+        
+        Yields:
+            stream_chat()と同形式のイベント
+        """
+        with self._session(session_id) as (conv_state, lock):
+            
+            async with _hold_lock(lock):
+                initial_state, error_response = self._begin_turn(conv_state, user_input, character, priority)
+                if error_response:
+                    yield {"type": "done", **error_response}
+                    return
+                
+                initial_state['stream'] = True
+                result: Optional[Dict[str, Any]] = None
+                partial: Dict[str, List[str]] = {}
+                
+                try:
+                    async with aclosing(self.compiled_graph.astream(
+                        initial_state, stream_mode=["custom", "values"]
+                    )) as stream:
+                        async for mode, payload in stream:
+                            if mode == "custom":
+                                _track_partial(partial, payload)
+                                yield payload
+                            else:
+                                result = payload
+                except (asyncio.CancelledError, GeneratorExit):
+                    self._cancel_turn(conv_state, initial_state, partial)
+                    raise
+                
+                yield {"type": "done", **self._complete_turn(conv_state, initial_state, result, lock)}
+    
+    @contextmanager
+    def _session(self, session_id: Optional[str]) -> Iterator[tuple]:
+        """
+        ターンの間、セッションの会話状態とロックを確保（退避させない）
+        
+        Args:
+            session_id: セッションID（Noneの場合はPhase 1互換の内部セッション）
+        
+        Yields:
+            (会話状態, セッションロック)
+        """
+        if session_id is None:
+            yield self.conv_state, self._default_lock
+            return
+        
+        entry = self.sessions.acquire(session_id)
+        try:
+            yield entry
+        finally:
+            self.sessions.release(session_id)
+    
+    def _on_session_evicted(self, conv_state: ConversationState):
+        """セッション退避時に会話状態を中期記憶へ保存"""
+        session_id = conv_state.session_id
+        self.memory.save_session(
+            session_id,
+            conv_state.history,
+            metadata={'conversation_state': conv_state.to_dict()}
+        )
+        self.memory.release_session(session_id)
+    
+    def _restore_session(self, session_id: str) -> Optional[ConversationState]:
+        """退避済みセッションを中期記憶から復元"""
+        # セッションと要約はまとめて読み込む（要約は退避と独立して保存される）
+        try:
+            session, saved_summary = self.memory.load_session_with_summary(session_id)
+        except Exception:
+            return None
+        saved_state = (session or {}).get('metadata', {}).get('conversation_state')
+        if not saved_state:
+            return None
+        conv_state = ConversationState.from_dict(saved_state)
+        
+        # 退避後に完了した要約があれば反映
+        if saved_summary:
+            summarized_turns = saved_summary['summarized_turns']
+            if conv_state.summarized_turns < summarized_turns <= len(conv_state.history):
+                conv_state.apply_summary(saved_summary['summary'], summarized_turns)
+        return conv_state
+    
+    def _begin_turn(self, conv_state: ConversationState, user_input: str,
+                    character: Optional[str], priority: int = PRIORITY_FREE) -> tuple:
+        """
+        ターン開始処理（入力検証・セッション開始・グラフ初期状態構築）
+        
+        Returns:
+            (初期状態, None) または 入力エラー時 (None, エラー応答)
+        """
         # 入力検証
         from validators import InputValidator
         try:
             user_input = InputValidator.validate_user_input(user_input)
         except Exception as e:
             self.memory.logger.log_error(e, context="chat_input_validation")
-            return {
+            return None, {
                 "response": f"入力検証エラー: {str(e)}",
                 "speaker": "system",
-                "turn": self.conv_state.current_turn,
-                "session_id": self.conv_state.session_id
+                "turn": conv_state.current_turn,
+                "session_id": conv_state.session_id
             }
         
-        # セッションIDの処理（外部指定 or 内部管理）
-        if session_id:
-            # Phase 3統合: 外部指定のセッションIDを使用
-            if self.conv_state.session_id != session_id:
-                # 新規セッションまたはセッション切替
-                self.conv_state.session_id = session_id
-                if not self.conv_state.history:
-                    self.conv_state.start_new_session()
-        else:
-            # Phase 1互換: 内部セッションIDを使用
-            if not self.conv_state.history:
-                self.conv_state.start_new_session()
+        # 新規セッション開始（外部指定のセッションIDはストア作成時に設定済み）
+        if not conv_state.history:
+            conv_state.start_new_session(conv_state.thread_id)
         
         # ユーザー入力を履歴に追加
-        self.conv_state.add_turn("User", user_input)
+        conv_state.add_turn("User", user_input)
         
-        # グラフ状態の構築
+        # グラフ状態の構築（履歴は未要約分の直近ウィンドウのみ渡し、ターンあたりの処理量を一定に保つ）
+        window = self.config.system.graph_history_window
         initial_state: GraphState = {
             "user_input": user_input,
-            "history": self.conv_state.history.copy(),
-            "current_turn": self.conv_state.current_turn,
+            "history": conv_state.unsummarized_turns()[-window:],
+            "summary": conv_state.summary,
+            "current_turn": conv_state.current_turn,
             "max_turns": getattr(self.config, 'max_turns', 12),
-            "last_speaker": self.conv_state.last_speaker or "",
+            "last_speaker": conv_state.last_speaker or "",
             "next_character": character or "",
-            "session_id": self.conv_state.session_id,
-            "start_time": self.conv_state.start_time.isoformat()
+            "targets": [],
+            "replies": [],
+            "candidates": [],
+            "session_id": conv_state.session_id,
+            "start_time": conv_state.start_time.isoformat(),
+            "stream": False,
+            "priority": priority
         }
+        return initial_state, None
+    
+    def _complete_turn(self, conv_state: ConversationState, initial_state: Dict[str, Any],
+                       result: Dict[str, Any],
+                       lock: Optional[threading.Lock] = None) -> Dict[str, Any]:
+        """
+        ターン完了処理（会話状態の更新・記憶システムへの保存・要約の登録）
         
-        # グラフ実行
-        result = self.compiled_graph.invoke(initial_state)
+        Args:
+            conv_state: セッションの会話状態
+            initial_state: グラフ実行時の初期状態
+            result: グラフ実行後の最終状態
+            lock: セッションロック（要約の反映に使用）
         
-        # 会話状態の更新
-        self.conv_state.history = result['history']
-        self.conv_state.current_turn = result['current_turn']
-        self.conv_state.last_speaker = result['last_speaker']
+        Returns:
+            応答辞書
+        """
+        user_input = initial_state['user_input']
         
-        # 記憶システムに会話ターンを保存
-        last_response = result['history'][-1] if result['history'] else None
-        if last_response:
+        # 会話状態の更新（このターンで追加された分のみ履歴末尾に追記）
+        new_turns = result['history'][len(initial_state['history']):]
+        conv_state.history.extend(new_turns)
+        conv_state.current_turn = result['current_turn']
+        conv_state.last_speaker = result['last_speaker']
+        
+        # 記憶システムに会話ターンを保存（並列応答の場合は全キャラ分）
+        for turn in new_turns:
             self.memory.add_conversation_turn(
-                speaker=last_response['speaker'],
-                message=last_response['msg'],
+                speaker=turn['speaker'],
+                message=turn['msg'],
                 session_id=result['session_id'],
                 metadata={
                     'turn': result['current_turn'],
                     'user_input': user_input
                 }
             )
+        last_response = new_turns[-1] if new_turns else None
+        
+        # 未要約のターンが閾値を超えた場合は古いターンの要約を登録（応答は待たせない）
+        if self.summarizer is not None and lock is not None:
+            self.summarizer.maybe_schedule(conv_state, lock)
         
         return {
             "response": last_response['msg'] if last_response else "",
             "speaker": last_response['speaker'] if last_response else "",
             "turn": result['current_turn'],
-            "session_id": result['session_id']
+            "session_id": result['session_id'],
+            "responses": [{"speaker": turn['speaker'], "response": turn['msg']} for turn in new_turns]
         }
     
+    def _cancel_turn(self, conv_state: ConversationState, initial_state: Dict[str, Any],
+                     partial: Dict[str, List[str]]):
+        """
+        中断したターンの記録（クライアント切断時）
+        
+        途中まで生成した応答を発話者ごとにcancelled付きで会話状態・記憶システムへ保存する
+        （ターン数・最終発話者は進めない）。
+        
+        Args:
+            conv_state: セッションの会話状態
+            initial_state: グラフ実行時の初期状態
+            partial: 発話者 → 送出済みのトークン差分
+        """
+        turns = [
+            {'speaker': speaker, 'msg': ''.join(deltas), 'timestamp': datetime.now().isoformat(),
+             'cancelled': True}
+            for speaker, deltas in partial.items() if deltas
+        ]
+        conv_state.history.extend(turns)
+        for turn in turns:
+            self.memory.add_conversation_turn(
+                speaker=turn['speaker'],
+                message=turn['msg'],
+                session_id=initial_state['session_id'],
+                metadata={
+                    'turn': initial_state['current_turn'],
+                    'user_input': initial_state['user_input'],
+                    'cancelled': True
+                }
+            )
+        
+        partial_chars = sum(len(turn['msg']) for turn in turns)
+        get_metrics_collector().record_turn_cancelled(partial_chars)
+        self.memory.logger.log_system_event("turn_cancelled", {
+            "session_id": initial_state['session_id'],
+            "speakers": [turn['speaker'] for turn in turns],
+            "partial_chars": partial_chars
+        })
+    
     def reset_conversation(self):
         """会話状態をリセット"""
         # 現在のセッションを保存
@@ -357,7 +774,7 @@ def main():
             # 通常の会話処理
             response = chat_system.chat(user_input)
             print(f"\n{response['speaker']}: {response['response']}\n")
-            
+        
         except KeyboardInterrupt:
             print("\n\n会話を中断しました。")
             break
@@ -7,8 +7,14 @@ Phase 2以降での拡張を考慮した設計。
 """
 
 from abc import ABC, abstractmethod
+from types import MappingProxyType
 from typing import Any, Dict, Optional
 from datetime import datetime
+import time
+
+
+# メタデータなしのアイテムが共有する空のメタデータ（読み取り専用）
+_NO_METADATA = MappingProxyType({})
 
 
 class MemoryBackend(ABC):
@@ -95,9 +101,17 @@ class MemoryBackend(ABC):
 
 
 class MemoryItem:
-    """記憶アイテムの基本構造"""
+    """記憶アイテムの基本構造
+    
+    大量に保持するため__slots__で属性を固定し、日時はエポック秒（float）で持つ。
+    ISO形式の文字列はto_dictでの直列化時にのみ生成する。
+    """
     
-    def __init__(self, key: str, value: Any, metadata: Dict = None):
+    __slots__ = ('key', 'value', 'metadata', 'created_ts', 'accessed_ts', 'access_count')
+    
+    def __init__(self, key: str, value: Any, metadata: Dict = None,
+                 created_ts: Optional[float] = None, accessed_ts: Optional[float] = None,
+                 access_count: int = 0):
         """
         初期化
         
@@ -105,17 +119,39 @@ class MemoryItem:
             key: アイテムキー
             value: アイテム値
             metadata: メタデータ
+            created_ts: 作成日時（エポック秒、省略時は現在時刻）
+            accessed_ts: アクセス日時（エポック秒、省略時は作成日時）
+            access_count: アクセス回数
         """
         self.key = key
         self.value = value
-        self.metadata = metadata or {}
-        self.created_at = datetime.now()
-        self.accessed_at = datetime.now()
-        self.access_count = 0
+        # メタデータなしのアイテムは共有の空マッピングを参照する（アイテムごとの空辞書を作らない）
+        self.metadata = metadata or _NO_METADATA
+        self.created_ts = time.time() if created_ts is None else created_ts
+        self.accessed_ts = self.created_ts if accessed_ts is None else accessed_ts
+        self.access_count = access_count
+    
+    @property
+    def created_at(self) -> datetime:
+        """作成日時"""
+        return datetime.fromtimestamp(self.created_ts)
+    
+    @created_at.setter
+    def created_at(self, value: datetime):
+        self.created_ts = value.timestamp()
+    
+    @property
+    def accessed_at(self) -> datetime:
+        """アクセス日時"""
+        return datetime.fromtimestamp(self.accessed_ts)
+    
+    @accessed_at.setter
+    def accessed_at(self, value: datetime):
+        self.accessed_ts = value.timestamp()
     
     def update_access(self):
         """アクセス情報を更新"""
-        self.accessed_at = datetime.now()
+        self.accessed_ts = time.time()
         self.access_count += 1
     
     def to_dict(self) -> Dict[str, Any]:
@@ -123,7 +159,7 @@ class MemoryItem:
         return {
             'key': self.key,
             'value': self.value,
-            'metadata': self.metadata,
+            'metadata': dict(self.metadata),
             'created_at': self.created_at.isoformat(),
             'accessed_at': self.accessed_at.isoformat(),
             'access_count': self.access_count
@@ -132,15 +168,14 @@ class MemoryItem:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'MemoryItem':
         """辞書から復元"""
-        item = cls(
+        return cls(
             key=data['key'],
             value=data['value'],
-            metadata=data.get('metadata', {})
+            metadata=data.get('metadata'),
+            created_ts=datetime.fromisoformat(data['created_at']).timestamp(),
+            accessed_ts=datetime.fromisoformat(data['accessed_at']).timestamp(),
+            access_count=data.get('access_count', 0)
         )
-        item.created_at = datetime.fromisoformat(data['created_at'])
-        item.accessed_at = datetime.fromisoformat(data['accessed_at'])
-        item.access_count = data.get('access_count', 0)
-        return item
 
 
 class MemoryConfig:
@@ -155,7 +190,7 @@ class MemoryConfig:
         # 中期記憶設定
         self.mid_term_max_items = 1000
         self.mid_term_ttl_seconds = 86400 * 30  # 30日
-        self.mid_term_backend = "duckdb"  # "redis" or "duckdb"
+        self.mid_term_backend = "sqlite"  # "redis" or "sqlite"
         
         # 長期記憶設定
         self.long_term_backend = "vectordb"  # "vectordb" or "sql"
@@ -165,10 +200,16 @@ class MemoryConfig:
         self.kb_update_interval = 86400 * 7  # 週次
         self.kb_namespaces = ["movie", "history", "gossip", "tech", "news"]
         
+        # ファイル永続化設定（長期記憶・知識ベース: スナップショット＋追記ログ）
+        self.persistence_fsync = "interval"  # "always" / "interval" / "off"
+        self.persistence_fsync_interval = 1.0  # 秒（interval方式）
+        self.persistence_compact_records = 1000  # ログの記録数がこれ以上になったら圧縮
+        
         # 共通設定
         self.enable_compression = True
         self.enable_encryption = False  # Phase 2で実装
         self.max_memory_mb = 1024
+        self.sweep_interval_seconds = 60  # 期限切れアイテムの定期削除間隔（0の場合は無効）
     
     def to_dict(self) -> Dict[str, Any]:
         """辞書形式に変換"""
@@ -190,9 +231,15 @@ class MemoryConfig:
                 'update_interval': self.kb_update_interval,
                 'namespaces': self.kb_namespaces
             },
+            'persistence': {
+                'fsync': self.persistence_fsync,
+                'fsync_interval': self.persistence_fsync_interval,
+                'compact_records': self.persistence_compact_records
+            },
             'common': {
                 'enable_compression': self.enable_compression,
                 'enable_encryption': self.enable_encryption,
-                'max_memory_mb': self.max_memory_mb
+                'max_memory_mb': self.max_memory_mb,
+                'sweep_interval_seconds': self.sweep_interval_seconds
             }
         }
\ No newline at end of file
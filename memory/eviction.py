@@ -0,0 +1,210 @@
+"""
+memory/eviction.py
+記憶の退避・期限切れ管理
+
+- ExpiringLRU: LRU順序（OrderedDictのmove_to_end）と保存時刻の最小ヒープを持つ辞書。
+  容量超過時の退避はO(1)、期限切れの削除は期限切れ件数に比例するコストで行う
+- ExpirySweeper: 登録した記憶層のcleanup_expiredを一定間隔で呼ぶバックグラウンドスレッド
+
+保存時刻はtime.monotonicで記録する。TTLは層で共通のため、保存時刻の順が期限の順になる
+（TTLを実行中に変更しても、判定には常に現在の値を使う）。
+"""
+
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+import heapq
+import threading
+import time
+import weakref
+
+
+class ExpiringLRU:
+    """容量上限（LRU退避）とTTLを持つ辞書"""
+    
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        """
+        初期化
+        
+        Args:
+            clock: 保存時刻・現在時刻の取得関数（単調増加）
+        """
+        self._clock = clock
+        # キー → (保存時刻, 値)。先頭が最も長く使われていないアイテム
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # (保存時刻, キー)。上書き・削除済みのエントリは取り出し時に読み飛ばす
+        self._heap: List[Tuple[float, str]] = []
+        
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+    
+    def keys(self) -> Iterator[str]:
+        """キー（最も長く使われていない順）"""
+        return iter(self._items.keys())
+    
+    def values(self) -> Iterator[Any]:
+        """値（最も長く使われていない順）"""
+        return (value for _, value in self._items.values())
+    
+    def get(self, key: str, ttl_seconds: float, default: Any = None) -> Any:
+        """
+        値を取得し、最近使われたアイテムとして末尾へ移動
+        
+        Args:
+            key: キー
+            ttl_seconds: TTL（秒、保存からこれを超えたアイテムは削除してdefaultを返す）
+            default: 存在しない・期限切れの場合の戻り値
+        
+        Returns:
+            値
+        """
+        entry = self._items.get(key)
+        if entry is None:
+            return default
+        
+        if self._clock() - entry[0] > ttl_seconds:
+            del self._items[key]
+            self.expirations += 1
+            return default
+        
+        self._items.move_to_end(key)
+        return entry[1]
+    
+    def put(self, key: str, value: Any, max_items: int, ttl_seconds: float):
+        """
+        値を保存（期限切れのアイテムを削除し、上限を超える場合は最も長く使われていないアイテムを退避）
+        
+        Args:
+            key: キー
+            value: 値
+            max_items: 最大アイテム数
+            ttl_seconds: TTL（秒）
+        """
+        self._items.pop(key, None)
+        self.expire(ttl_seconds)
+        while self._items and len(self._items) >= max_items:
+            self._items.popitem(last=False)
+            self.evictions += 1
+        
+        stored_at = self._clock()
+        self._items[key] = (stored_at, value)
+        heapq.heappush(self._heap, (stored_at, key))
+        self._compact_heap()
+    
+    def pop(self, key: str, default: Any = None) -> Any:
+        """
+        値を削除
+        
+        Args:
+            key: キー
+            default: 存在しない場合の戻り値
+        
+        Returns:
+            削除した値
+        """
+        entry = self._items.pop(key, None)
+        if entry is None:
+            return default
+        self._compact_heap()
+        return entry[1]
+    
+    def clear(self):
+        """全て削除"""
+        self._items.clear()
+        self._heap.clear()
+    
+    def expire(self, ttl_seconds: float) -> int:
+        """
+        期限切れのアイテムを削除（保存時刻の古い順にヒープから取り出し、期限内のアイテムで止める）
+        
+        Args:
+            ttl_seconds: TTL（秒）
+        
+        Returns:
+            削除件数
+        """
+        expire_before = self._clock() - ttl_seconds
+        expired = 0
+        while self._heap and self._heap[0][0] < expire_before:
+            stored_at, key = heapq.heappop(self._heap)
+            entry = self._items.get(key)
+            if entry is not None and entry[0] == stored_at:
+                del self._items[key]
+                expired += 1
+        self.expirations += expired
+        return expired
+    
+    def _compact_heap(self):
+        """読み飛ばすエントリがアイテム数を大きく超えた場合はヒープを作り直す（償却O(1)）"""
+        if len(self._heap) > 2 * len(self._items) + 64:
+            self._heap = [(stored_at, key) for key, (stored_at, _) in self._items.items()]
+            heapq.heapify(self._heap)
+
+
+class ExpirySweeper:
+    """期限切れアイテムを定期的に削除するバックグラウンドスレッド"""
+    
+    def __init__(self, interval_seconds: float = 60.0):
+        """
+        初期化
+        
+        Args:
+            interval_seconds: 削除の間隔（秒）
+        """
+        self.interval_seconds = interval_seconds
+        # 記憶層の寿命を延ばさないよう弱参照で保持する
+        self._cleanups: List[weakref.WeakMethod] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.total_swept = 0
+    
+    def register(self, cleanup: Callable[[], int]):
+        """
+        削除処理を登録
+        
+        Args:
+            cleanup: 記憶層のcleanup_expired（削除件数を返すメソッド）
+        """
+        self._cleanups.append(weakref.WeakMethod(cleanup))
+    
+    def start(self):
+        """バックグラウンドスレッドを開始"""
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="memory-expiry-sweeper", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """バックグラウンドスレッドを停止"""
+        self._stop.set()
+    
+    def sweep(self) -> int:
+        """
+        登録済みの削除処理を1回ずつ実行
+        
+        Returns:
+            削除件数の合計
+        """
+        swept = 0
+        for ref in list(self._cleanups):
+            cleanup = ref()
+            if cleanup is None:
+                self._cleanups.remove(ref)
+                continue
+            try:
+                swept += cleanup()
+            except Exception as e:
+                print(f"Memory expiry sweep error: {e}")
+        self.total_swept += swept
+        return swept
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.sweep()
+            if not self._cleanups:
+                return
@@ -4,13 +4,14 @@ memory/knowledge_base.py
 
 RAG検索用の知識ベース管理。
 Phase 1では簡易実装、Phase 2以降でVectorDB統合。
+名前空間ごとにスナップショット＋追記ログ（memory/persistence.py）で永続化する。
 """
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pathlib import Path
-import json
 from .base import MemoryBackend, MemoryConfig
+from .persistence import JournaledStore
 
 
 class KnowledgeBase(MemoryBackend):
@@ -32,9 +33,11 @@ class KnowledgeBase(MemoryBackend):
         # データディレクトリ作成
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
-        # 名前空間別データストレージ
+        # 名前空間別データストレージ（<namespace>.json＋追記ログ）
+        self.journals: Dict[str, JournaledStore] = {}
         self.namespaces: Dict[str, Dict[str, Any]] = {}
-        self._load_namespaces()
+        for ns in self.config.kb_namespaces:
+            self._open_namespace(ns)
         
         # 統計情報
         self.stats = {
@@ -43,29 +46,17 @@ class KnowledgeBase(MemoryBackend):
             'total_searches': 0
         }
     
-    def _load_namespaces(self):
-        """名前空間データを読み込み"""
-        for ns in self.config.kb_namespaces:
-            ns_file = self.data_dir / f"{ns}.json"
-            if ns_file.exists():
-                try:
-                    with open(ns_file, 'r', encoding='utf-8') as f:
-                        self.namespaces[ns] = json.load(f)
-                except Exception as e:
-                    print(f"Knowledge base load error ({ns}): {e}")
-                    self.namespaces[ns] = {}
-            else:
-                self.namespaces[ns] = {}
-    
-    def _save_namespace(self, namespace: str):
-        """名前空間データを保存"""
-        try:
-            ns_file = self.data_dir / f"{namespace}.json"
-            with open(ns_file, 'w', encoding='utf-8') as f:
-                json.dump(self.namespaces.get(namespace, {}), f, 
-                         ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Knowledge base save error ({namespace}): {e}")
+    def _open_namespace(self, namespace: str) -> JournaledStore:
+        """名前空間のデータを読み込み（未作成の場合は空で作成）"""
+        journal = JournaledStore(
+            self.data_dir / f"{namespace}.json",
+            fsync=self.config.persistence_fsync,
+            fsync_interval=self.config.persistence_fsync_interval,
+            compact_records=self.config.persistence_compact_records
+        )
+        self.journals[namespace] = journal
+        self.namespaces[namespace] = journal.data
+        return journal
     
     def store(self, key: str, value: Any, metadata: Dict = None) -> bool:
         """
@@ -88,19 +79,17 @@ class KnowledgeBase(MemoryBackend):
                 item_id = key
             
             # 名前空間が存在しない場合は作成
-            if namespace not in self.namespaces:
-                self.namespaces[namespace] = {}
+            journal = self.journals.get(namespace) or self._open_namespace(namespace)
             
             # データ保存
-            self.namespaces[namespace][item_id] = {
+            journal.put(item_id, {
                 'value': value,
                 'metadata': metadata or {},
                 'created_at': datetime.now().isoformat(),
                 'updated_at': datetime.now().isoformat()
-            }
+            })
             
             self.stats['total_stores'] += 1
-            self._save_namespace(namespace)
             
             return True
             
@@ -155,11 +144,8 @@ class KnowledgeBase(MemoryBackend):
                 namespace = 'default'
                 item_id = key
             
-            if namespace in self.namespaces:
-                if item_id in self.namespaces[namespace]:
-                    del self.namespaces[namespace][item_id]
-                    self._save_namespace(namespace)
-                    return True
+            if namespace in self.journals:
+                return self.journals[namespace].delete(item_id)
             
             return False
             
@@ -199,11 +185,15 @@ class KnowledgeBase(MemoryBackend):
         Returns:
             成功した場合True
         """
-        for namespace in self.namespaces.keys():
-            self.namespaces[namespace] = {}
-            self._save_namespace(namespace)
+        for journal in self.journals.values():
+            journal.clear()
         return True
     
+    def close(self):
+        """全ての名前空間の未fsyncの追記を書き出してログをクローズ"""
+        for journal in self.journals.values():
+            journal.close()
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         統計情報を取得
@@ -220,7 +210,8 @@ class KnowledgeBase(MemoryBackend):
             'items_per_namespace': {
                 ns: len(items) for ns, items in self.namespaces.items()
             },
-            **self.stats
+            **self.stats,
+            'journal_records': sum(journal.records for journal in self.journals.values())
         }
     
     def search(self, query: str, namespace: str = None, limit: int = 5) -> List[Dict[str, Any]]:
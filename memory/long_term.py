@@ -4,13 +4,14 @@ memory/long_term.py
 
 永続的なプロファイル・成長データの保存。
 Phase 1では簡易実装、Phase 2以降でVectorDB統合。
+プロファイルはMemoryItemのまま保持し、スナップショット＋追記ログ（memory/persistence.py）で永続化する。
 """
 
 from typing import Dict, Any, Optional
 from datetime import datetime
 from pathlib import Path
-import json
 from .base import MemoryBackend, MemoryItem, MemoryConfig
+from .persistence import JournaledStore
 
 
 class LongTermMemory(MemoryBackend):
@@ -32,10 +33,17 @@ class LongTermMemory(MemoryBackend):
         # データディレクトリ作成
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
-        # プロファイルデータ
+        # プロファイルデータ（profiles.json＋追記ログ）
         self.profiles_path = self.data_dir / "profiles.json"
-        self.profiles: Dict[str, Dict[str, Any]] = {}
-        self._load_profiles()
+        self.journal = JournaledStore(
+            self.profiles_path,
+            fsync=self.config.persistence_fsync,
+            fsync_interval=self.config.persistence_fsync_interval,
+            compact_records=self.config.persistence_compact_records,
+            encode=MemoryItem.to_dict,
+            decode=MemoryItem.from_dict
+        )
+        self.profiles: Dict[str, MemoryItem] = self.journal.data
         
         # 統計情報
         self.stats = {
@@ -44,23 +52,6 @@ class LongTermMemory(MemoryBackend):
             'total_profiles': 0
         }
     
-    def _load_profiles(self):
-        """プロファイルデータを読み込み"""
-        if self.profiles_path.exists():
-            try:
-                with open(self.profiles_path, 'r', encoding='utf-8') as f:
-                    self.profiles = json.load(f)
-            except Exception as e:
-                print(f"Long-term memory load error: {e}")
-    
-    def _save_profiles(self):
-        """プロファイルデータを保存"""
-        try:
-            with open(self.profiles_path, 'w', encoding='utf-8') as f:
-                json.dump(self.profiles, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Long-term memory save error: {e}")
-    
     def store(self, key: str, value: Any, metadata: Dict = None) -> bool:
         """
         データを保存
@@ -75,9 +66,8 @@ class LongTermMemory(MemoryBackend):
         """
         try:
             item = MemoryItem(key, value, metadata)
-            self.profiles[key] = item.to_dict()
+            self.journal.put(key, item)
             self.stats['total_stores'] += 1
-            self._save_profiles()
             return True
         except Exception as e:
             print(f"Long-term memory store error: {e}")
@@ -95,14 +85,13 @@ class LongTermMemory(MemoryBackend):
         """
         self.stats['total_retrievals'] += 1
         
-        if key in self.profiles:
-            item_data = self.profiles[key]
-            item = MemoryItem.from_dict(item_data)
-            item.update_access()
-            self.profiles[key] = item.to_dict()
-            return item.value
+        item = self.profiles.get(key)
+        if item is None:
+            return None
         
-        return None
+        # アクセス情報は次回のスナップショットで永続化する
+        item.update_access()
+        return item.value
     
     def delete(self, key: str) -> bool:
         """
@@ -114,11 +103,7 @@ class LongTermMemory(MemoryBackend):
         Returns:
             成功した場合True
         """
-        if key in self.profiles:
-            del self.profiles[key]
-            self._save_profiles()
-            return True
-        return False
+        return self.journal.delete(key)
     
     def exists(self, key: str) -> bool:
         """
@@ -139,10 +124,13 @@ class LongTermMemory(MemoryBackend):
         Returns:
             成功した場合True
         """
-        self.profiles.clear()
-        self._save_profiles()
+        self.journal.clear()
         return True
     
+    def close(self):
+        """未fsyncの追記を書き出してログをクローズ"""
+        self.journal.close()
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         統計情報を取得
@@ -153,7 +141,8 @@ class LongTermMemory(MemoryBackend):
         return {
             'backend_type': self.backend_type,
             'total_profiles': len(self.profiles),
-            **self.stats
+            **self.stats,
+            'journal': self.journal.get_stats()
         }
     
     def store_user_profile(self, user_id: str, profile: Dict[str, Any]) -> bool:
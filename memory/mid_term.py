@@ -3,20 +3,88 @@ memory/mid_term.py
 中期記憶の実装
 
 24時間〜30日のセッション復帰用記憶。
-DuckDBを使用してローカルに永続化。
+SQLite（WAL）を使用してローカルに永続化。
 Redis キャッシュ層を追加（Phase 2）。
+
+キー・種別・セッションID・アクセス日時にインデックスを張り、期限切れ削除・LRU退避・件数管理を
+SQLで行うため、保存・削除のコストは保存件数に依存しない（件数はトリガーで集計）。
+旧形式（全件をJSONで書き直すファイル）のdb_pathは初回起動時に取り込む。
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from .base import MemoryBackend, MemoryItem, MemoryConfig
 from .redis_cache import get_redis_cache, RedisCache
 
 
+# SQLiteデータベースファイルの先頭
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mid_term_items (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    item_type TEXT,
+    session_id TEXT,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    access_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_mid_term_type ON mid_term_items(item_type);
+CREATE INDEX IF NOT EXISTS idx_mid_term_session ON mid_term_items(session_id);
+CREATE INDEX IF NOT EXISTS idx_mid_term_accessed ON mid_term_items(accessed_at);
+CREATE INDEX IF NOT EXISTS idx_mid_term_created ON mid_term_items(created_at);
+
+CREATE TABLE IF NOT EXISTS mid_term_counter (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    items INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO mid_term_counter (id, items) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS mid_term_items_insert AFTER INSERT ON mid_term_items
+BEGIN
+    UPDATE mid_term_counter SET items = items + 1 WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS mid_term_items_delete AFTER DELETE ON mid_term_items
+BEGIN
+    UPDATE mid_term_counter SET items = items - 1 WHERE id = 0;
+END;
+"""
+
+_COLUMNS = "key, value, metadata, item_type, session_id, created_at, accessed_at, access_count"
+
+_UPSERT = f"""
+INSERT INTO mid_term_items ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    value = excluded.value,
+    metadata = excluded.metadata,
+    item_type = excluded.item_type,
+    session_id = excluded.session_id,
+    created_at = excluded.created_at,
+    accessed_at = excluded.accessed_at,
+    access_count = excluded.access_count
+"""
+
+# 値・メタデータのJSON化（呼び出しごとのエンコーダー生成を省く）
+_encode_json = json.JSONEncoder(ensure_ascii=False).encode
+
+# 上限超過分をアクセス日時の古い順に削除
+_EVICT_LRU = """
+DELETE FROM mid_term_items WHERE key IN (
+    SELECT key FROM mid_term_items ORDER BY accessed_at
+    LIMIT MAX(0, (SELECT items FROM mid_term_counter WHERE id = 0) - ?)
+) RETURNING key
+"""
+
+
 class MidTermMemory(MemoryBackend):
-    """中期記憶の実装（DuckDBバックエンド）"""
+    """中期記憶の実装（SQLiteバックエンド）"""
     
     def __init__(
         self,
@@ -31,7 +99,7 @@ class MidTermMemory(MemoryBackend):
         
         Args:
             config: メモリ設定
-            db_path: データベースパス
+            db_path: データベースパス（旧形式のJSONファイルの場合は取り込んで置き換える）
             redis_enabled: Redisキャッシュを有効化
             redis_host: Redisホスト
             redis_port: Redisポート
@@ -49,10 +117,6 @@ class MidTermMemory(MemoryBackend):
         if redis_enabled:
             self.redis_cache = get_redis_cache(host=redis_host, port=redis_port)
         
-        # DuckDB接続（Phase 1では簡易実装）
-        self.storage: Dict[str, MemoryItem] = {}
-        self._load_from_file()
-        
         # 統計情報
         self.stats = {
             'total_stores': 0,
@@ -63,28 +127,102 @@ class MidTermMemory(MemoryBackend):
             'redis_misses': 0,
         }
     
-    def _load_from_file(self):
-        """ファイルからデータを読み込み"""
-        if self.db_path.exists():
-            try:
-                with open(self.db_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for key, item_data in data.items():
-                        self.storage[key] = MemoryItem.from_dict(item_data)
-            except Exception as e:
-                print(f"Mid-term memory load error: {e}")
-    
-    def _save_to_file(self):
-        """ファイルにデータを保存"""
+        # SQLite接続（スレッド間で共有し、ロックで直列化）
+        legacy_items = self._take_legacy_json()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        
+        if legacy_items:
+            self._import_items(legacy_items)
+    
+    def _take_legacy_json(self) -> List[MemoryItem]:
+        """
+        旧形式（JSON）のdb_pathを読み込み、<db_path>.jsonへ退避
+        
+        Returns:
+            取り込むアイテムのリスト（旧形式でない場合は空）
+        """
+        if not self.db_path.exists() or self.db_path.stat().st_size == 0:
+            return []
+        with open(self.db_path, 'rb') as f:
+            if f.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER:
+                return []
+        
+        items = []
         try:
-            data = {}
-            for key, item in self.storage.items():
-                data[key] = item.to_dict()
-            
-            with open(self.db_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(self.db_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            items = [MemoryItem.from_dict(item_data) for item_data in data.values()]
         except Exception as e:
-            print(f"Mid-term memory save error: {e}")
+            print(f"Mid-term memory load error: {e}")
+        
+        backup_path = self.db_path.with_name(self.db_path.name + ".json")
+        self.db_path.replace(backup_path)
+        print(f"Mid-term memory: migrating {len(items)} items from {backup_path}")
+        return items
+    
+    def _import_items(self, items: List[MemoryItem]):
+        """旧形式のアイテムを作成日時・アクセス情報を保ったまま一括登録"""
+        with self._transaction() as conn:
+            conn.executemany(_UPSERT, [self._to_row(item) for item in items])
+        self._evict()
+    
+    @contextmanager
+    def _transaction(self):
+        """書き込みトランザクション（スレッド間はロックで直列化）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    @staticmethod
+    def _to_row(item: MemoryItem) -> Tuple:
+        """MemoryItemをテーブルの行に変換"""
+        return (
+            item.key,
+            _encode_json(item.value),
+            _encode_json(item.metadata) if item.metadata else "{}",
+            item.metadata.get('type'),
+            item.metadata.get('session_id'),
+            item.created_ts,
+            item.accessed_ts,
+            item.access_count
+        )
+            
+    @staticmethod
+    def _from_row(row: Tuple) -> MemoryItem:
+        """テーブルの行をMemoryItemに変換"""
+        key, value, metadata, _, _, created_ts, accessed_ts, access_count = row
+        return MemoryItem(key, json.loads(value), json.loads(metadata), created_ts, accessed_ts, access_count)
+    
+    def _evict(self) -> List[str]:
+        """上限超過分をLRUで削除（Redisからも削除）"""
+        with self._transaction() as conn:
+            evicted = [row[0] for row in conn.execute(_EVICT_LRU, (self.config.mid_term_max_items,))]
+        self._delete_cached(evicted)
+        return evicted
+    
+    def _delete_cached(self, keys: Iterable[str]):
+        """Redisキャッシュから削除（1往復）"""
+        keys = list(keys)
+        if keys and self.redis_cache and self.redis_cache.is_available():
+            self.redis_cache.mdelete([f"mid_term:{key}" for key in keys])
+    
+    def _cache(self, items: List[MemoryItem]):
+        """Redisキャッシュに保存（TTL: 24時間、1往復）"""
+        if items and self.redis_cache and self.redis_cache.is_available():
+            self.redis_cache.mset(
+                {f"mid_term:{item.key}": item.to_dict() for item in items}, expire_seconds=86400
+            )
     
     def store(self, key: str, value: Any, metadata: Dict = None) -> bool:
         """
@@ -98,43 +236,37 @@ class MidTermMemory(MemoryBackend):
         Returns:
             成功した場合True
         """
+        return self.store_many([(key, value, metadata)]) == 1
+    
+    def store_many(self, entries: Iterable[Tuple[str, Any, Optional[Dict]]]) -> int:
+        """
+        複数のデータを1トランザクションで保存
+        
+        Args:
+            entries: (保存キー, 保存する値, メタデータ) のイテラブル
+        
+        Returns:
+            保存件数（失敗した場合0）
+        """
         try:
-            # 新しいアイテムを作成
-            item = MemoryItem(key, value, metadata)
+            items = [MemoryItem(key, value, metadata) for key, value, metadata in entries]
             
-            # 容量制限チェック
-            if len(self.storage) >= self.config.mid_term_max_items:
-                # 最古のアイテムを削除（LRU）
-                oldest_key = min(
-                    self.storage.keys(),
-                    key=lambda k: self.storage[k].accessed_at
-                )
-                del self.storage[oldest_key]
-                # Redisからも削除
-                if self.redis_cache and self.redis_cache.is_available():
-                    self.redis_cache.delete(f"mid_term:{oldest_key}")
+            # 保存と容量制限（最古のアイテムを削除、LRU）を同一トランザクションで実行
+            with self._transaction() as conn:
+                conn.executemany(_UPSERT, [self._to_row(item) for item in items])
+                evicted = [row[0] for row in conn.execute(_EVICT_LRU, (self.config.mid_term_max_items,))]
+            self.stats['total_stores'] += len(items)
             
-            # 保存
-            self.storage[key] = item
-            self.stats['total_stores'] += 1
+            # 同じ呼び出しで保存して即座に退避したアイテムはキャッシュしない
+            self._delete_cached(evicted)
+            evicted_keys = set(evicted)
+            self._cache([item for item in items if item.key not in evicted_keys])
             
-            # Redisキャッシュに保存（TTL: 24時間）
-            if self.redis_cache and self.redis_cache.is_available():
-                cache_key = f"mid_term:{key}"
-                self.redis_cache.set(
-                    cache_key,
-                    item.to_dict(),
-                    expire_seconds=86400  # 24時間
-                )
-            
-            # ファイルに永続化
-            self._save_to_file()
-            
-            return True
+            return len(items)
             
         except Exception as e:
             print(f"Mid-term memory store error: {e}")
-            return False
+            return 0
     
     def retrieve(self, key: str) -> Optional[Any]:
         """
@@ -146,46 +278,65 @@ class MidTermMemory(MemoryBackend):
         Returns:
             保存されたデータ、存在しない場合None
         """
-        self.stats['total_retrievals'] += 1
+        return self.retrieve_many([key]).get(key)
+    
+    def retrieve_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        複数のデータを取得（Redisから1往復で取得し、不足分をSQLiteから取得して再登録）
+        
+        Args:
+            keys: 取得キー
+        
+        Returns:
+            キー → 保存されたデータ（存在しない・期限切れのキーは含まない）
+        """
+        keys = list(dict.fromkeys(keys))
+        self.stats['total_retrievals'] += len(keys)
+        results: Dict[str, Any] = {}
         
         # 1. Redisキャッシュから取得試行
         if self.redis_cache and self.redis_cache.is_available():
-            cache_key = f"mid_term:{key}"
-            cached_data = self.redis_cache.get(cache_key, as_json=True)
+            cached = self.redis_cache.mget([f"mid_term:{key}" for key in keys], as_json=True)
+            for key in keys:
+                cached_data = cached.get(f"mid_term:{key}")
+                if isinstance(cached_data, dict) and 'value' in cached_data:
+                    # 値のみ使うため、MemoryItemへの復元（日時の解析）は行わない
+                    results[key] = cached_data['value']
+            self.stats['redis_hits'] += len(results)
+            self.stats['redis_misses'] += len(keys) - len(results)
             
-            if cached_data:
-                self.stats['redis_hits'] += 1
-                # MemoryItemオブジェクトに復元
-                item = MemoryItem.from_dict(cached_data)
-                item.update_access()
-                return item.value
-            else:
-                self.stats['redis_misses'] += 1
-        
-        # 2. JSONファイルから取得
-        if key in self.storage:
-            item = self.storage[key]
-            item.update_access()
-            
-            # TTLチェック
-            elapsed = (datetime.now() - item.created_at).total_seconds()
-            if elapsed > self.config.mid_term_ttl_seconds:
-                # 期限切れ
-                del self.storage[key]
-                self._save_to_file()
-                # Redisからも削除
-                if self.redis_cache and self.redis_cache.is_available():
-                    self.redis_cache.delete(f"mid_term:{key}")
-                return None
+        missing = [key for key in keys if key not in results]
+        if not missing:
+            return results
+        
+        # 2. SQLiteから取得（アクセス情報の更新・TTLチェック）
+        now = time.time()
+        expire_before = now - self.config.mid_term_ttl_seconds
+        placeholders = ", ".join("?" * len(missing))
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM mid_term_items WHERE key IN ({placeholders})", missing
+            ).fetchall()
             
-            # Redisキャッシュに再登録
-            if self.redis_cache and self.redis_cache.is_available():
-                cache_key = f"mid_term:{key}"
-                self.redis_cache.set(cache_key, item.to_dict(), expire_seconds=86400)
+            items = [self._from_row(row) for row in rows]
+            expired = [item.key for item in items if item.created_ts < expire_before]
+            found = [item for item in items if item.created_ts >= expire_before]
+            if expired:
+                conn.executemany("DELETE FROM mid_term_items WHERE key = ?", [(key,) for key in expired])
+            for item in found:
+                item.accessed_ts = now
+                item.access_count += 1
+            if found:
+                conn.executemany(
+                    "UPDATE mid_term_items SET accessed_at = ?, access_count = ? WHERE key = ?",
+                    [(now, item.access_count, item.key) for item in found]
+                )
             
-            return item.value
-        
-        return None
+        # 期限切れはRedisからも削除し、取得できたものはRedisキャッシュに再登録
+        self._delete_cached(expired)
+        self._cache(found)
+        results.update((item.key, item.value) for item in found)
+        return results
     
     def delete(self, key: str) -> bool:
         """
@@ -198,14 +349,12 @@ class MidTermMemory(MemoryBackend):
             成功した場合True
         """
         # Redisから削除
-        if self.redis_cache and self.redis_cache.is_available():
-            self.redis_cache.delete(f"mid_term:{key}")
+        self._delete_cached([key])
         
-        # JSONファイルから削除
-        if key in self.storage:
-            del self.storage[key]
+        with self._transaction() as conn:
+            deleted = conn.execute("DELETE FROM mid_term_items WHERE key = ?", (key,)).rowcount
+        if deleted:
             self.stats['total_deletions'] += 1
-            self._save_to_file()
             return True
         return False
     
@@ -219,7 +368,9 @@ class MidTermMemory(MemoryBackend):
         Returns:
             存在する場合True
         """
-        return key in self.storage
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM mid_term_items WHERE key = ?", (key,)).fetchone()
+        return row is not None
     
     def clear(self) -> bool:
         """
@@ -228,10 +379,25 @@ class MidTermMemory(MemoryBackend):
         Returns:
             成功した場合True
         """
-        self.storage.clear()
-        self._save_to_file()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM mid_term_items")
         return True
     
+    def count(self) -> int:
+        """
+        保存件数を取得
+        
+        Returns:
+            保存件数
+        """
+        with self._lock:
+            return self._conn.execute("SELECT items FROM mid_term_counter WHERE id = 0").fetchone()[0]
+    
+    def close(self):
+        """データベース接続をクローズ"""
+        with self._lock:
+            self._conn.close()
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         統計情報を取得
@@ -239,15 +405,16 @@ class MidTermMemory(MemoryBackend):
         Returns:
             統計情報の辞書
         """
-        db_size = self.db_path.stat().st_size if self.db_path.exists() else 0
+        wal_path = self.db_path.with_name(self.db_path.name + "-wal")
+        db_size = sum(path.stat().st_size for path in (self.db_path, wal_path) if path.exists())
         
         return {
+            **self.stats,
             'backend_type': self.backend_type,
-            'current_items': len(self.storage),
+            'current_items': self.count(),
             'max_items': self.config.mid_term_max_items,
             'ttl_seconds': self.config.mid_term_ttl_seconds,
-            'db_size_bytes': db_size,
-            **self.stats
+            'db_size_bytes': db_size
         }
     
     def cleanup_expired(self) -> int:
@@ -257,19 +424,14 @@ class MidTermMemory(MemoryBackend):
         Returns:
             削除件数
         """
-        now = datetime.now()
-        expired_keys = []
-        
-        for key, item in self.storage.items():
-            elapsed = (now - item.created_at).total_seconds()
-            if elapsed > self.config.mid_term_ttl_seconds:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self.storage[key]
-        
-        if expired_keys:
-            self._save_to_file()
+        expire_before = time.time() - self.config.mid_term_ttl_seconds
+        with self._transaction() as conn:
+            expired_keys = [
+                row[0] for row in conn.execute(
+                    "DELETE FROM mid_term_items WHERE created_at < ? RETURNING key", (expire_before,)
+                )
+            ]
+        self._delete_cached(expired_keys)
         
         return len(expired_keys)
     
@@ -281,21 +443,24 @@ class MidTermMemory(MemoryBackend):
             limit: 取得件数
             
         Returns:
-            セッション情報のリスト
-        """
-        sessions = []
-        for key, item in self.storage.items():
-            if key.startswith('session:'):
-                sessions.append({
-                    'session_id': key.replace('session:', ''),
-                    'created_at': item.created_at.isoformat(),
-                    'accessed_at': item.accessed_at.isoformat(),
-                    'access_count': item.access_count
-                })
+            セッション情報のリスト（アクセス日時の新しい順）
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, created_at, accessed_at, access_count FROM mid_term_items "
+                "WHERE item_type = 'session_summary' ORDER BY accessed_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
         
-        # アクセス日時でソート
-        sessions.sort(key=lambda x: x['accessed_at'], reverse=True)
-        return sessions[:limit]
+        return [
+            {
+                'session_id': key.replace('session:', '', 1),
+                'created_at': datetime.fromtimestamp(created_at).isoformat(),
+                'accessed_at': datetime.fromtimestamp(accessed_at).isoformat(),
+                'access_count': access_count
+            }
+            for key, created_at, accessed_at, access_count in rows
+        ]
     
     def store_session_summary(self, session_id: str, summary: Dict[str, Any]) -> bool:
         """
@@ -377,6 +542,73 @@ class SessionManager:
         """
         return self.memory.retrieve_session_summary(session_id)
     
+    def load_sessions(self, session_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        複数のセッションをまとめて読み込み（Redisへは1往復）
+        
+        Args:
+            session_ids: セッションID
+        
+        Returns:
+            セッションID → セッション情報（存在しないセッションは含まない）
+        """
+        session_ids = list(session_ids)
+        found = self.memory.retrieve_many(f"session:{session_id}" for session_id in session_ids)
+        return {
+            session_id: found[f"session:{session_id}"]
+            for session_id in session_ids if f"session:{session_id}" in found
+        }
+    
+    def load_session_with_summary(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        セッションとローリング要約をまとめて読み込み（Redisへは1往復）
+        
+        Args:
+            session_id: セッションID
+        
+        Returns:
+            (セッション情報, 要約情報)、存在しない場合はそれぞれNone
+        """
+        session_key, summary_key = f"session:{session_id}", f"summary:{session_id}"
+        found = self.memory.retrieve_many([session_key, summary_key])
+        return found.get(session_key), found.get(summary_key)
+    
+    def save_summary(self, session_id: str, summary: str, summarized_turns: int) -> bool:
+        """
+        セッションのローリング要約を保存
+        
+        Args:
+            session_id: セッションID
+            summary: 要約テキスト
+            summarized_turns: 要約済みのターン数
+        
+        Returns:
+            成功した場合True
+        """
+        value = {
+            'session_id': session_id,
+            'summary': summary,
+            'summarized_turns': summarized_turns,
+            'updated_at': datetime.now().isoformat()
+        }
+        metadata = {
+            'type': 'rolling_summary',
+            'session_id': session_id
+        }
+        return self.memory.store(f"summary:{session_id}", value, metadata)
+    
+    def load_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        セッションのローリング要約を読み込み
+        
+        Args:
+            session_id: セッションID
+        
+        Returns:
+            {'summary', 'summarized_turns', 'updated_at'}、存在しない場合None
+        """
+        return self.memory.retrieve(f"summary:{session_id}")
+    
     def list_recent_sessions(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         最近のセッション一覧を取得
@@ -389,6 +621,23 @@ class SessionManager:
         """
         return self.memory.get_sessions(limit)
     
+    def list_recent_sessions_with_summaries(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        最近のセッション一覧をサマリー付きで取得（サマリーはまとめて読み込む）
+        
+        Args:
+            limit: 取得件数
+        
+        Returns:
+            セッション情報のリスト（'summary'にセッションサマリー）
+        """
+        sessions = self.memory.get_sessions(limit)
+        summaries = self.load_sessions(session['session_id'] for session in sessions)
+        return [
+            {**session, 'summary': summaries.get(session['session_id'])}
+            for session in sessions
+        ]
+    
     def _count_speakers(self, history: List[Dict]) -> Dict[str, int]:
         """
         発話者ごとの発言数をカウント
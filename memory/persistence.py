@@ -0,0 +1,350 @@
+"""
+memory/persistence.py
+ファイル永続化（スナップショット＋追記ログ）
+
+長期記憶・知識ベースのキー・値データを、スナップショット（JSON）と変更ごとの追記ログ（JSONL）で
+永続化する。変更は1行の追記で完了し、文書全体の書き直しは行わない。
+
+- fsync方針: "always"（追記ごと）/ "interval"（バックグラウンドで一定間隔）/ "off"（OS任せ）
+- ログの記録数が閾値を超えると、バックグラウンドでスナップショットを書き出してログを切り詰める
+- 起動時はスナップショットにログを再生する（書き込み途中で終わった末尾の行は無視）
+
+スナップショットは一時ファイルに書き出してfsyncしてから置き換えるため、書き込み途中で
+停止しても既存のファイルは壊れない。圧縮中はログを `<name>.log.1` に退避して新しいログへ追記し、
+スナップショットの置き換え後に退避したログを削除する（途中で停止した場合は起動時に両方を再生する）。
+"""
+
+from typing import Any, Callable, Dict, Optional
+from pathlib import Path
+import json
+import os
+import shutil
+import threading
+import time
+import weakref
+
+
+FSYNC_POLICIES = ("always", "interval", "off")
+
+# バックグラウンド処理（interval方式のfsync・ログの圧縮）の確認間隔（秒）
+_MAINTENANCE_TICK = 0.1
+
+
+def _fsync_dir(path: Path):
+    """ディレクトリエントリ（ファイルの置き換え・削除）を永続化"""
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournaledStore:
+    """スナップショット＋追記ログで永続化するキー・値ストア"""
+    
+    def __init__(self, snapshot_path: str, fsync: str = "interval",
+                 fsync_interval: float = 1.0, compact_records: Optional[int] = 1000,
+                 encode: Optional[Callable[[Any], Any]] = None,
+                 decode: Optional[Callable[[Any], Any]] = None):
+        """
+        初期化（スナップショットとログを読み込み、未圧縮のログがあればスナップショットに反映）
+        
+        Args:
+            snapshot_path: スナップショット（JSON）のパス（ログは `<snapshot_path>.log`）
+            fsync: fsync方針（"always" / "interval" / "off"）
+            fsync_interval: interval方式のfsync間隔（秒）
+            compact_records: ログの記録数がこれ以上になったらバックグラウンドで圧縮（Noneの場合は自動圧縮しない）
+            encode: JSON化できない値（保持しているオブジェクト）をJSON化可能な値に変換する関数
+            decode: 読み込んだ値を保持するオブジェクトに変換する関数
+        
+        Raises:
+            ValueError: fsync方針が不正な場合
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync} (expected one of {FSYNC_POLICIES})")
+        
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = self.snapshot_path.with_name(self.snapshot_path.name + ".log")
+        self._compacting_path = self.snapshot_path.with_name(self.snapshot_path.name + ".log.1")
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_records = compact_records
+        self._encode = encode
+        self._decode = decode
+        # ログ記録のJSON化（呼び出しごとのエンコーダー生成を省く）
+        self._encode_json = json.JSONEncoder(ensure_ascii=False, default=encode).encode
+        
+        self.stats = {
+            'appends': 0,
+            'fsyncs': 0,
+            'compactions': 0,
+            'replayed_records': 0
+        }
+        
+        self._lock = threading.Lock()
+        self._closed = False
+        self._compacting = False
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        
+        # スナップショット以降のログ記録数
+        self.records = 0
+        self.data: Dict[str, Any] = self._load()
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        
+        _maintenance.register(self)
+    
+    def _load(self) -> Dict[str, Any]:
+        """スナップショットを読み込んでログを再生（再生した場合はスナップショットを書き直してログを削除）"""
+        data: Dict[str, Any] = {}
+        if self.snapshot_path.exists():
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if self._decode:
+                    data = {key: self._decode(value) for key, value in data.items()}
+            except Exception as e:
+                print(f"Journal snapshot load error ({self.snapshot_path}): {e}")
+        
+        replayed = 0
+        for path in (self._compacting_path, self.log_path):
+            replayed += self._replay(path, data)
+        self.stats['replayed_records'] = replayed
+        
+        if replayed:
+            self._write_snapshot(data)
+        for path in (self._compacting_path, self.log_path):
+            if path.exists():
+                path.unlink()
+        return data
+    
+    def _replay(self, path: Path, data: Dict[str, Any]) -> int:
+        """ログをdataに適用し、適用した記録数を返す"""
+        if not path.exists():
+            return 0
+        
+        replayed = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                # 追記途中で停止した末尾の行は無視する
+                if not line.endswith("\n"):
+                    print(f"Journal replay: ignoring torn record at end of {path}")
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Journal replay: ignoring corrupted records in {path}: {e}")
+                    break
+                
+                op = record.get("op")
+                if op == "set":
+                    value = record["value"]
+                    data[record["key"]] = self._decode(value) if self._decode else value
+                elif op == "del":
+                    data.pop(record["key"], None)
+                elif op == "clear":
+                    data.clear()
+                replayed += 1
+        return replayed
+    
+    def _write_snapshot(self, data: Dict[str, Any]):
+        """スナップショットを一時ファイルに書き出し、fsyncしてから置き換える"""
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=self._encode)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(self.snapshot_path.parent)
+    
+    def _append(self, record: Dict[str, Any]):
+        """ログへ1件追記（ロック取得済みで呼ぶ）"""
+        if self._closed:
+            raise RuntimeError(f"Journal is closed: {self.snapshot_path}")
+        
+        self._log.write(self._encode_json(record) + "\n")
+        self._log.flush()
+        self.records += 1
+        self.stats['appends'] += 1
+        
+        if self.fsync == "always":
+            os.fsync(self._log.fileno())
+            self.stats['fsyncs'] += 1
+        else:
+            self._dirty = True
+    
+    def put(self, key: str, value: Any):
+        """
+        値を保存
+        
+        Args:
+            key: キー
+            value: JSON化可能な値（encode指定時はencodeで変換できる値）
+        
+        Raises:
+            TypeError: 値がJSON化できない場合（dataは変更しない）
+        """
+        with self._lock:
+            self._append({"op": "set", "key": key, "value": value})
+            self.data[key] = value
+    
+    def delete(self, key: str) -> bool:
+        """
+        値を削除
+        
+        Args:
+            key: キー
+        
+        Returns:
+            削除した場合True
+        """
+        with self._lock:
+            if key not in self.data:
+                return False
+            self._append({"op": "del", "key": key})
+            del self.data[key]
+            return True
+    
+    def clear(self):
+        """全ての値を削除"""
+        with self._lock:
+            self._append({"op": "clear"})
+            self.data.clear()
+    
+    def flush(self):
+        """未fsyncの追記をディスクへ書き出す"""
+        with self._lock:
+            if self._closed or not self._dirty:
+                return
+            # fsyncの間も追記を止めないよう、複製したディスクリプタでロック外で行う
+            fd = os.dup(self._log.fileno())
+            self._dirty = False
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._last_sync = time.monotonic()
+        self.stats['fsyncs'] += 1
+    
+    def compact(self) -> bool:
+        """
+        スナップショットを書き出してログを切り詰める
+        
+        ロック内ではdataの浅いコピーとログの退避のみ行い、スナップショットの書き出しは
+        ロック外で行う（その間の変更は新しいログに追記される）。
+        
+        Returns:
+            圧縮した場合True（圧縮中・クローズ済み・失敗した場合False）
+        """
+        with self._lock:
+            if self._closed or self._compacting:
+                return False
+            self._compacting = True
+            snapshot = dict(self.data)
+            rotated_records = self.records
+            self._log.close()
+            os.replace(self.log_path, self._compacting_path)
+            self._log = open(self.log_path, "a", encoding="utf-8")
+            self.records = 0
+        
+        try:
+            # 値を呼び出し元が直接変更していた場合はRuntimeErrorになり得る（次回に再試行）
+            self._write_snapshot(snapshot)
+            self._compacting_path.unlink()
+            _fsync_dir(self.snapshot_path.parent)
+            self.stats['compactions'] += 1
+            return True
+        
+        except Exception as e:
+            print(f"Journal compaction error ({self.snapshot_path}): {e}")
+            self._restore_log(rotated_records)
+            return False
+        
+        finally:
+            self._compacting = False
+    
+    def _restore_log(self, rotated_records: int):
+        """圧縮の失敗時に、退避したログと新しいログを1つに戻す"""
+        with self._lock:
+            if not self._closed:
+                self._log.close()
+            with open(self._compacting_path, "a", encoding="utf-8") as dst, \
+                    open(self.log_path, "r", encoding="utf-8") as src:
+                shutil.copyfileobj(src, dst)
+            os.replace(self._compacting_path, self.log_path)
+            if not self._closed:
+                self._log = open(self.log_path, "a", encoding="utf-8")
+            self.records += rotated_records
+    
+    def maintain(self):
+        """バックグラウンド処理（interval方式のfsync・閾値を超えたログの圧縮）"""
+        if (self.fsync == "interval" and self._dirty
+                and time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.flush()
+        if self.compact_records is not None and self.records >= self.compact_records:
+            self.compact()
+    
+    def close(self):
+        """未fsyncの追記を書き出してログをクローズ"""
+        _maintenance.unregister(self)
+        with self._lock:
+            if self._closed:
+                return
+            self._log.flush()
+            if self.fsync != "off" and self._dirty:
+                os.fsync(self._log.fileno())
+                self.stats['fsyncs'] += 1
+            self._log.close()
+            self._closed = True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        統計情報を取得
+        
+        Returns:
+            統計情報の辞書
+        """
+        return {
+            'fsync': self.fsync,
+            'items': len(self.data),
+            'log_records': self.records,
+            'log_bytes': self.log_path.stat().st_size if self.log_path.exists() else 0,
+            **self.stats
+        }
+
+
+class _Maintenance:
+    """全てのJournaledStoreで共有するバックグラウンドスレッド"""
+    
+    def __init__(self):
+        self._stores: "weakref.WeakSet[JournaledStore]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # time.sleepを差し替えるテストの影響を受けないようEvent.waitで待つ
+        self._tick = threading.Event()
+    
+    def register(self, store: JournaledStore):
+        with self._lock:
+            self._stores.add(store)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="journal-maintenance", daemon=True)
+                self._thread.start()
+    
+    def unregister(self, store: JournaledStore):
+        with self._lock:
+            self._stores.discard(store)
+    
+    def _run(self):
+        while not self._tick.wait(_MAINTENANCE_TICK):
+            with self._lock:
+                stores = list(self._stores)
+            for store in stores:
+                try:
+                    store.maintain()
+                except Exception as e:
+                    print(f"Journal maintenance error ({store.snapshot_path}): {e}")
+
+
+_maintenance = _Maintenance()
@@ -1,14 +1,23 @@
 """
 Redis キャッシュモジュール
 中期記憶のキャッシュ層として使用
+
+接続状態は操作時の接続エラーから受動的に判定する（操作ごとのPINGは行わない）。
+接続エラー後はバックグラウンドで定期的にPINGし、復旧したら再び利用可能にする。
+複数キーの操作はmget/mset/mdeleteで1往復にまとめる。
 """
 
 import redis
 import json
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, Iterable, List
 from utils import Logger
 
 
+# 接続状態を「利用不可」にするエラー（それ以外のエラーは操作単位の失敗として扱う）
+_CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+
 class RedisCache:
     """Redisキャッシュマネージャー"""
     
@@ -21,7 +30,8 @@ class RedisCache:
         decode_responses: bool = True,
         max_connections: int = 10,
         socket_timeout: int = 5,
-        socket_connect_timeout: int = 5
+        socket_connect_timeout: int = 5,
+        probe_interval: float = 5.0
     ):
         """
         初期化
@@ -35,10 +45,25 @@ class RedisCache:
             max_connections: 最大接続数
             socket_timeout: ソケットタイムアウト（秒）
             socket_connect_timeout: 接続タイムアウト（秒）
+            probe_interval: 接続エラー後の再接続確認（PING）の間隔（秒）
         """
         self.logger = Logger()
         self.enabled = False
         self.redis_client: Optional[redis.Redis] = None
+        self.probe_interval = probe_interval
+        
+        # 受動的な接続状態（接続エラーでFalse、再接続確認の成功でTrue）
+        self.healthy = False
+        self._probe_thread: Optional[threading.Thread] = None
+        self._probe_lock = threading.Lock()
+        self._closed = threading.Event()
+        
+        # 統計情報（round_trips: Redisへの往復回数）
+        self.stats = {
+            'round_trips': 0,
+            'connection_errors': 0,
+            'probes': 0
+        }
         
         try:
             # Redis接続プールの作成
@@ -58,6 +83,7 @@ class RedisCache:
             # 接続テスト
             self.redis_client.ping()
             self.enabled = True
+            self.healthy = True
             
             self.logger.log_info("Redis接続成功", context="RedisCache")
             
@@ -73,19 +99,58 @@ class RedisCache:
     
     def is_available(self) -> bool:
         """
-        Redis接続が利用可能か確認
+        Redis接続が利用可能か確認（通信は行わず、直近の操作結果から判定）
         
         Returns:
             利用可能な場合True
         """
-        if not self.enabled or not self.redis_client:
-            return False
+        return self.enabled and self.redis_client is not None and self.healthy
         
+    def _handle_error(self, e: Exception, context: str):
+        """操作エラーを記録（接続エラーの場合は利用不可にして再接続確認を開始）"""
+        self.logger.log_error(e, context=context)
+        if isinstance(e, _CONNECTION_ERRORS):
+            self.stats['connection_errors'] += 1
+            self.healthy = False
+            self._start_probe()
+    
+    def _start_probe(self):
+        """再接続確認スレッドを開始（実行中の場合は何もしない）"""
+        with self._probe_lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive():
+                return
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, name="redis-probe", daemon=True
+            )
+            self._probe_thread.start()
+    
+    def _probe_loop(self):
+        """接続が復旧するまで一定間隔でPINGする"""
+        while not self.healthy and not self._closed.wait(self.probe_interval):
+            self.stats['probes'] += 1
+            try:
+                self.redis_client.ping()
+            except Exception:
+                continue
+            self.healthy = True
+            self.logger.log_info("Redis接続が復旧しました", context="RedisCache")
+    
+    @staticmethod
+    def _encode(value: Any) -> Any:
+        """辞書・リストの場合はJSON変換"""
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+    
+    @staticmethod
+    def _decode(value: Any, as_json: bool) -> Any:
+        """as_jsonの場合はJSON文字列をパース（パースできない場合はそのまま）"""
+        if value is None or not as_json:
+            return value
         try:
-            self.redis_client.ping()
-            return True
-        except Exception:
-            return False
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
     
     def set(
         self,
@@ -108,10 +173,9 @@ class RedisCache:
             return False
         
         try:
-            # 辞書・リストの場合はJSON変換
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, ensure_ascii=False)
+            value = self._encode(value)
             
+            self.stats['round_trips'] += 1
             if expire_seconds:
                 self.redis_client.setex(key, expire_seconds, value)
             else:
@@ -120,7 +184,7 @@ class RedisCache:
             return True
             
         except Exception as e:
-            self.logger.log_error(e, context=f"RedisCache.set({key})")
+            self._handle_error(e, context=f"RedisCache.set({key})")
             return False
     
     def get(self, key: str, as_json: bool = False) -> Optional[Any]:
@@ -138,22 +202,11 @@ class RedisCache:
             return None
         
         try:
-            value = self.redis_client.get(key)
-            
-            if value is None:
-                return None
-            
-            # JSON文字列の場合はパース
-            if as_json:
-                try:
-                    return json.loads(value)
-                except json.JSONDecodeError:
-                    return value
-            
-            return value
+            self.stats['round_trips'] += 1
+            return self._decode(self.redis_client.get(key), as_json)
             
         except Exception as e:
-            self.logger.log_error(e, context=f"RedisCache.get({key})")
+            self._handle_error(e, context=f"RedisCache.get({key})")
             return None
     
     def delete(self, key: str) -> bool:
@@ -170,10 +223,11 @@ class RedisCache:
             return False
         
         try:
+            self.stats['round_trips'] += 1
             self.redis_client.delete(key)
             return True
         except Exception as e:
-            self.logger.log_error(e, context=f"RedisCache.delete({key})")
+            self._handle_error(e, context=f"RedisCache.delete({key})")
             return False
     
     def exists(self, key: str) -> bool:
@@ -190,11 +244,84 @@ class RedisCache:
             return False
         
         try:
+            self.stats['round_trips'] += 1
             return bool(self.redis_client.exists(key))
         except Exception as e:
-            self.logger.log_error(e, context=f"RedisCache.exists({key})")
+            self._handle_error(e, context=f"RedisCache.exists({key})")
+            return False
+    
+    def mget(self, keys: Iterable[str], as_json: bool = False) -> Dict[str, Any]:
+        """
+        複数のキーの値を1往復で取得（MGET）
+        
+        Args:
+            keys: キー
+            as_json: JSON文字列として取得してパース
+        
+        Returns:
+            キー → 値（存在しないキーは含まない）
+        """
+        keys = list(keys)
+        if not keys or not self.is_available():
+            return {}
+        
+        try:
+            self.stats['round_trips'] += 1
+            values = self.redis_client.mget(keys)
+            return {
+                key: self._decode(value, as_json)
+                for key, value in zip(keys, values) if value is not None
+            }
+        except Exception as e:
+            self._handle_error(e, context=f"RedisCache.mget({len(keys)} keys)")
+            return {}
+    
+    def mset(self, mapping: Dict[str, Any], expire_seconds: Optional[int] = None) -> bool:
+        """
+        複数のキーバリューを1往復で設定（パイプライン）
+        
+        Args:
+            mapping: キー → 値（辞書・リストの場合JSON変換）
+            expire_seconds: 有効期限（秒）
+        
+        Returns:
+            成功した場合True
+        """
+        if not mapping or not self.is_available():
+            return False
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(key, self._encode(value), ex=expire_seconds or None)
+            self.stats['round_trips'] += 1
+            pipe.execute()
+            return True
+        except Exception as e:
+            self._handle_error(e, context=f"RedisCache.mset({len(mapping)} keys)")
             return False
     
+    def mdelete(self, keys: Iterable[str]) -> int:
+        """
+        複数のキーを1往復で削除（DEL）
+        
+        Args:
+            keys: キー
+        
+        Returns:
+            削除件数
+        """
+        keys = list(keys)
+        if not keys or not self.is_available():
+            return 0
+        
+        try:
+            self.stats['round_trips'] += 1
+            return int(self.redis_client.delete(*keys))
+        except Exception as e:
+            self._handle_error(e, context=f"RedisCache.mdelete({len(keys)} keys)")
+            return 0
+    
     def keys(self, pattern: str = "*") -> List[str]:
         """
         パターンに一致するキー一覧を取得
@@ -209,10 +336,11 @@ class RedisCache:
             return []
         
         try:
+            self.stats['round_trips'] += 1
             return [k.decode('utf-8') if isinstance(k, bytes) else k 
                     for k in self.redis_client.keys(pattern)]
         except Exception as e:
-            self.logger.log_error(e, context=f"RedisCache.keys({pattern})")
+            self._handle_error(e, context=f"RedisCache.keys({pattern})")
             return []
     
     def ttl(self, key: str) -> int:
@@ -229,9 +357,10 @@ class RedisCache:
             return -2
         
         try:
+            self.stats['round_trips'] += 1
             return self.redis_client.ttl(key)
         except Exception as e:
-            self.logger.log_error(e, context=f"RedisCache.ttl({key})")
+            self._handle_error(e, context=f"RedisCache.ttl({key})")
             return -2
     
     def expire(self, key: str, seconds: int) -> bool:
@@ -249,9 +378,10 @@ class RedisCache:
             return False
         
         try:
+            self.stats['round_trips'] += 1
             return bool(self.redis_client.expire(key, seconds))
         except Exception as e:
-            self.logger.log_error(e, context=f"RedisCache.expire({key})")
+            self._handle_error(e, context=f"RedisCache.expire({key})")
             return False
     
     def flushdb(self) -> bool:
@@ -265,11 +395,12 @@ class RedisCache:
             return False
         
         try:
+            self.stats['round_trips'] += 1
             self.redis_client.flushdb()
             self.logger.log_info("Redisデータベースをクリアしました", context="RedisCache")
             return True
         except Exception as e:
-            self.logger.log_error(e, context="RedisCache.flushdb")
+            self._handle_error(e, context="RedisCache.flushdb")
             return False
     
     def get_info(self) -> Dict[str, Any]:
@@ -283,6 +414,7 @@ class RedisCache:
             return {"enabled": False}
         
         try:
+            self.stats['round_trips'] += 2
             info = self.redis_client.info()
             return {
                 "enabled": True,
@@ -291,13 +423,28 @@ class RedisCache:
                 "total_commands_processed": info.get('total_commands_processed', 0),
                 "keyspace": self.redis_client.dbsize(),
                 "uptime_seconds": info.get('uptime_in_seconds', 0),
+                **self.stats,
             }
         except Exception as e:
-            self.logger.log_error(e, context="RedisCache.get_info")
+            self._handle_error(e, context="RedisCache.get_info")
             return {"enabled": False, "error": str(e)}
     
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        統計情報を取得（通信は行わない）
+        
+        Returns:
+            統計情報の辞書
+        """
+        return {
+            'enabled': self.enabled,
+            'healthy': self.healthy,
+            **self.stats
+        }
+    
     def close(self):
         """接続をクローズ"""
+        self._closed.set()
         if self.redis_client:
             try:
                 self.redis_client.close()
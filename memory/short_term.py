@@ -4,12 +4,14 @@ memory/short_term.py
 
 LangGraph Stateとして管理される即時応答用の記憶。
 6-12ターン程度を保持し、会話の文脈を維持。
+容量超過時は最も長く使われていないアイテムを退避（LRU）し、期限切れは保存時刻のヒープで削除する。
 """
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from collections import OrderedDict
+import threading
 from .base import MemoryBackend, MemoryItem, MemoryConfig
+from .eviction import ExpiringLRU
 
 
 class ShortTermMemory(MemoryBackend):
@@ -26,8 +28,9 @@ class ShortTermMemory(MemoryBackend):
         self.backend_type = "short_term"
         self.config = config or MemoryConfig()
         
-        # OrderedDictで順序を保持
-        self.storage: OrderedDict[str, MemoryItem] = OrderedDict()
+        # LRU順序・保存時刻のヒープを持つストレージ（期限切れ削除スレッドからも操作する）
+        self.storage = ExpiringLRU()
+        self._lock = threading.Lock()
         
         # 統計情報
         self.stats = {
@@ -51,20 +54,12 @@ class ShortTermMemory(MemoryBackend):
             成功した場合True
         """
         try:
-            # 既存アイテムがあれば削除
-            if key in self.storage:
-                del self.storage[key]
-            
-            # 新しいアイテムを作成
             item = MemoryItem(key, value, metadata)
             
-            # 容量制限チェック
-            if len(self.storage) >= self.config.short_term_max_items:
-                # 最古のアイテムを削除（FIFO）
-                self.storage.popitem(last=False)
-            
-            # 保存
-            self.storage[key] = item
+            # 期限切れを削除し、容量超過時は最も長く使われていないアイテムを退避（LRU）
+            with self._lock:
+                self.storage.put(key, item, self.config.short_term_max_items,
+                                 self.config.short_term_ttl_seconds)
             self.stats['total_stores'] += 1
             
             return True
@@ -85,23 +80,17 @@ class ShortTermMemory(MemoryBackend):
         """
         self.stats['total_retrievals'] += 1
         
-        if key in self.storage:
-            item = self.storage[key]
-            item.update_access()
-            self.stats['cache_hits'] += 1
+        # 期限切れの場合は削除してNone
+        with self._lock:
+            item = self.storage.get(key, self.config.short_term_ttl_seconds)
             
-            # TTLチェック
-            elapsed = (datetime.now() - item.created_at).total_seconds()
-            if elapsed > self.config.short_term_ttl_seconds:
-                # 期限切れ
-                del self.storage[key]
-                self.stats['cache_misses'] += 1
-                return None
-            
-            return item.value
-        else:
+        if item is None:
             self.stats['cache_misses'] += 1
             return None
+        
+        item.update_access()
+        self.stats['cache_hits'] += 1
+        return item.value
     
     def delete(self, key: str) -> bool:
         """
@@ -113,8 +102,9 @@ class ShortTermMemory(MemoryBackend):
         Returns:
             成功した場合True
         """
-        if key in self.storage:
-            del self.storage[key]
+        with self._lock:
+            item = self.storage.pop(key)
+        if item is not None:
             self.stats['total_deletions'] += 1
             return True
         return False
@@ -138,7 +128,8 @@ class ShortTermMemory(MemoryBackend):
         Returns:
             成功した場合True
         """
-        self.storage.clear()
+        with self._lock:
+            self.storage.clear()
         return True
     
     def get_stats(self) -> Dict[str, Any]:
@@ -158,20 +149,23 @@ class ShortTermMemory(MemoryBackend):
             'max_items': self.config.short_term_max_items,
             'ttl_seconds': self.config.short_term_ttl_seconds,
             'cache_hit_rate': cache_hit_rate,
+            'evictions': self.storage.evictions,
+            'expirations': self.storage.expirations,
             **self.stats
         }
     
     def get_recent_items(self, n: int = 10) -> List[Dict[str, Any]]:
         """
-        最新のN件のアイテムを取得
+        最近使われたN件のアイテムを取得
         
         Args:
             n: 取得件数
             
         Returns:
-            アイテムのリスト
+            アイテムのリスト（使われた順）
         """
-        items = list(self.storage.values())[-n:]
+        with self._lock:
+            items = list(self.storage.values())[-n:]
         return [item.to_dict() for item in items]
     
     def cleanup_expired(self) -> int:
@@ -181,18 +175,8 @@ class ShortTermMemory(MemoryBackend):
         Returns:
             削除件数
         """
-        now = datetime.now()
-        expired_keys = []
-        
-        for key, item in self.storage.items():
-            elapsed = (now - item.created_at).total_seconds()
-            if elapsed > self.config.short_term_ttl_seconds:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self.storage[key]
-        
-        return len(expired_keys)
+        with self._lock:
+            return self.storage.expire(self.config.short_term_ttl_seconds)
     
     def get_all_keys(self) -> List[str]:
         """
@@ -201,7 +185,8 @@ class ShortTermMemory(MemoryBackend):
         Returns:
             キーのリスト
         """
-        return list(self.storage.keys())
+        with self._lock:
+            return list(self.storage.keys())
     
     def get_size_bytes(self) -> int:
         """
@@ -212,7 +197,9 @@ class ShortTermMemory(MemoryBackend):
         """
         import sys
         total_size = 0
-        for item in self.storage.values():
+        with self._lock:
+            items = list(self.storage.values())
+        for item in items:
             total_size += sys.getsizeof(item.value)
             total_size += sys.getsizeof(item.metadata)
         return total_size
@@ -14,6 +14,7 @@ from exceptions import ShortTermMemoryError, MidTermMemoryError, LongTermMemoryE
 from utils import Logger
 from validators import InputValidator
 from memory.base import MemoryConfig
+from memory.eviction import ExpirySweeper
 from memory.short_term import ConversationBuffer
 from memory.mid_term import SessionManager
 from memory.long_term import CharacterKPIManager
@@ -41,10 +42,18 @@ class MemorySystemManager:
         
         # 補助マネージャーの初期化
         self.conversation_buffer = ConversationBuffer(max_turns=12)
+        # セッション別会話バッファ（session_id未指定時はconversation_bufferを使用）
+        self.conversation_buffers: Dict[str, ConversationBuffer] = {}
         self.session_manager = SessionManager(self.mid_term)
         self.kpi_manager = CharacterKPIManager(self.long_term)
         self.kb_manager = KnowledgeBaseManager(self.knowledge_base)
         
+        # 期限切れアイテムの定期削除（短期・中期）
+        self.sweeper = ExpirySweeper(self.config.sweep_interval_seconds)
+        self.sweeper.register(self.short_term.cleanup_expired)
+        self.sweeper.register(self.mid_term.cleanup_expired)
+        self.sweeper.start()
+        
         # 統計情報
         self.stats = {
             'total_conversations': 0,
@@ -52,6 +61,34 @@ class MemorySystemManager:
             'total_sessions': 0
         }
     
+    def get_conversation_buffer(self, session_id: Optional[str] = None) -> ConversationBuffer:
+        """
+        セッションの会話バッファを取得（存在しない場合は作成）
+        
+        Args:
+            session_id: セッションID（Noneの場合は共有バッファ）
+        
+        Returns:
+            会話バッファ
+        """
+        if session_id is None:
+            return self.conversation_buffer
+        buffer = self.conversation_buffers.get(session_id)
+        if buffer is None:
+            buffer = self.conversation_buffers.setdefault(
+                session_id, ConversationBuffer(max_turns=self.conversation_buffer.max_turns)
+            )
+        return buffer
+    
+    def release_session(self, session_id: str):
+        """
+        セッションの会話バッファを解放（セッション退避時に使用）
+        
+        Args:
+            session_id: セッションID
+        """
+        self.conversation_buffers.pop(session_id, None)
+    
     def add_conversation_turn(self, speaker: str, message: str,
                             session_id: Optional[str] = None,
                             metadata: Dict = None) -> bool:
@@ -78,7 +115,7 @@ class MemorySystemManager:
                 raise ShortTermMemoryError(f"無効な話者名: {speaker}")
             
             # 短期記憶（会話バッファ）に追加
-            self.conversation_buffer.add_turn(speaker, message, metadata)
+            self.get_conversation_buffer(session_id).add_turn(speaker, message, metadata)
             
             # 短期記憶（キャッシュ）にも保存
             turn_key = f"turn:{datetime.now().isoformat()}"
@@ -102,7 +139,7 @@ class MemorySystemManager:
         会話コンテキストを取得
         
         Args:
-            session_id: セッションID（Phase 3統合用、現在は未使用）
+            session_id: セッションID（Noneの場合は共有バッファ）
             max_turns: 最大ターン数
             
         Returns:
@@ -110,15 +147,17 @@ class MemorySystemManager:
         """
         from datetime import datetime
         
+        buffer = self.get_conversation_buffer(session_id)
+        
         # 会話履歴取得
-        history_str = self.conversation_buffer.get_context_string(max_turns)
+        history_str = buffer.get_context_string(max_turns)
         
         # 辞書形式で返却
         return {
-            "history": self.conversation_buffer.turns[-max_turns:] if hasattr(self.conversation_buffer, 'turns') else [],
+            "history": buffer.get_recent_turns(max_turns),
             "context_string": history_str,
             "last_activity": datetime.now().isoformat(),
-            "total_turns": len(self.conversation_buffer.turns) if hasattr(self.conversation_buffer, 'turns') else 0
+            "total_turns": len(buffer.buffer)
         }
     
     def save_session(self, session_id: str, history: List[Dict],
@@ -179,6 +218,68 @@ class MemorySystemManager:
             self.logger.log_error(e, context="load_session")
             raise MidTermMemoryError(f"セッション読み込み失敗: {e}") from e
     
+    def load_session_with_summary(self, session_id: str) -> tuple:
+        """
+        セッションとローリング要約を中期記憶からまとめて読み込み
+        
+        Args:
+            session_id: セッションID
+        
+        Returns:
+            (セッション情報, 要約情報)、存在しない場合はそれぞれNone
+        """
+        try:
+            session, summary = self.session_manager.load_session_with_summary(session_id)
+            if session:
+                self.logger.log_system_event(
+                    "session_load_success",
+                    {"session_id": session_id}
+                )
+            return session, summary
+        except Exception as e:
+            self.logger.log_error(e, context="load_session_with_summary")
+            raise MidTermMemoryError(f"セッション読み込み失敗: {e}") from e
+    
+    def save_rolling_summary(self, session_id: str, summary: str,
+                             summarized_turns: int) -> bool:
+        """
+        セッションのローリング要約を中期記憶に保存
+        
+        Args:
+            session_id: セッションID
+            summary: 要約テキスト
+            summarized_turns: 要約済みのターン数
+        
+        Returns:
+            成功した場合True
+        """
+        try:
+            success = self.session_manager.save_summary(session_id, summary, summarized_turns)
+            self.logger.log_system_event(
+                "rolling_summary_saved",
+                {"session_id": session_id, "summarized_turns": summarized_turns}
+            )
+            return success
+        except Exception as e:
+            self.logger.log_error(e, context="save_rolling_summary")
+            raise MidTermMemoryError(f"要約保存失敗: {e}") from e
+    
+    def load_rolling_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        セッションのローリング要約を中期記憶から読み込み
+        
+        Args:
+            session_id: セッションID
+        
+        Returns:
+            要約情報、存在しない場合None
+        """
+        try:
+            return self.session_manager.load_summary(session_id)
+        except Exception as e:
+            self.logger.log_error(e, context="load_rolling_summary")
+            raise MidTermMemoryError(f"要約読み込み失敗: {e}") from e
+    
     def update_character_kpi(self, character: str, kpi_type: str, 
                            value: int = 1) -> bool:
         """
@@ -408,7 +509,8 @@ class MemorySystemManager:
         """
         try:
             # 会話バッファをクリア
-            self.conversation_buffer.clear()
+            self.get_conversation_buffer(session_id).clear()
+            self.release_session(session_id)
             
             # セッション管理データがあれば削除
             if hasattr(self, 'session_manager'):
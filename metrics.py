@@ -6,16 +6,25 @@ LLM呼び出し、記憶操作、エラーなどのメトリクスを収集・
 セッション終了時にレポートをエクスポート。
 """
 
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any
+from typing import Deque, Dict, Any, List, Optional, Tuple
 import json
+import math
 from pathlib import Path
 import statistics
+import threading
+import time
 
 
 class MetricsCollector:
     """メトリクス収集クラス"""
     
+    # モデル別に保持する直近の応答時間の最大件数
+    LATENCY_WINDOW_SIZE = 1024
+    # モデル別に保持する直近のスケジューラ待機・実行時間の最大件数
+    QUEUE_SAMPLE_SIZE = 1024
+    
     def __init__(self):
         """初期化"""
         self.metrics = {
@@ -25,6 +34,58 @@ class MetricsCollector:
             'llm_errors': 0,
             'llm_retries': 0,
             'llm_fallbacks': 0,
+            'llm_coalesced': 0,  # 進行中の同一リクエストに合流した数
+            
+            # LLMスケジューラメトリクス（モデル別）
+            # {model: {'wait_times': deque, 'service_times': deque, 'by_priority': {priority: count},
+            #          'max_queue_depth': int, 'timeouts': int}}
+            'llm_queue': {},
+            
+            # レイテンシSLOによるモデル降格（モデルキー別）
+            # {model_key: {'downgrades': int, 'restores': int, 'downgraded_requests': int,
+            #              'active': bool, 'fallback': str, 'last_p95_ms': float}}
+            'model_downgrade': {},
+            
+            # Ollamaバックエンドプール（ホスト別）
+            # {host: {'requests': int, 'failures': int, 'circuit_opens': int, 'healthy': bool}}
+            'llm_backends': {},
+            # ヘッジング（遅いホストと並行して別ホストへ送信した数と、別ホストが先に応答した数）
+            'llm_hedging': {'hedged': 0, 'hedge_wins': 0},
+            
+            # モデル常駐メトリクス（モデル別）
+            # {model: {'warmups': int, 'warmup_failures': int, 'load_times': [],
+            #          'cold_starts': {source: count}, 'resident': bool}}
+            'model_residency': {},
+            
+            # LLM応答キャッシュメトリクス
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'cache_hits_by_layer': {'local': 0, 'redis': 0},
+            
+            # ルーティングメトリクス {判定元: {キャラクターキー: 回数}}
+            'routing': {},
+            
+            # 投機的ルーティングメトリクス（曖昧な入力で候補2キャラを先行生成）
+            'speculation': {
+                'runs': 0,
+                'hits': 0,  # 最終判定が通常のルーティング結果と一致した数
+                'judge_failures': 0,  # 判定失敗・期限超過で通常のルーティング結果を採用した数
+                'cancelled': 0,  # 生成途中でキャンセルした候補の数
+                'wasted_tokens': 0  # 採用されなかった候補が生成したトークン数（推定値）
+            },
+            
+            # 下書き→改訂カスケードメトリクス {キャラクター名: {結果(draft/refined/direct): 回数}}
+            'cascade': {},
+            
+            # Web検索メトリクス
+            'search': {
+                'requests': 0,
+                'errors': 0,
+                'timeouts': 0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'times': []  # ミリ秒
+            },
             
             # 記憶システムメトリクス
             'memory_operations': 0,
@@ -37,6 +98,14 @@ class MetricsCollector:
             'total_sessions': 0,
             'user_inputs': 0,
             'system_responses': 0,
+            'summaries': 0,
+            'summary_errors': 0,
+            'summary_times': [],  # ミリ秒
+            'summarized_turns': 0,
+            'cancelled_turns': 0,  # クライアント切断で生成を中断したターン
+            'cancelled_chars': 0,  # 中断までに生成済みだった応答の文字数
+            'coalesced_inputs': 0,  # 開始前のターンに合流した連続入力
+            'superseded_turns': 0,  # 後続の入力で打ち切った生成中のターン
             
             # エラーメトリクス
             'total_errors': 0,
@@ -56,6 +125,10 @@ class MetricsCollector:
         
         # 詳細ログ（デバッグ用）
         self.detailed_logs = []
+        
+        # モデル別の直近の応答時間（単調時刻, 待機+実行ミリ秒）。SLO判定用の時間窓
+        self._latency_windows: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._latency_lock = threading.Lock()
     
     def record_llm_call(self, duration_ms: float, character: str = "", 
                        success: bool = True, retry_count: int = 0):
@@ -106,6 +179,318 @@ class MetricsCollector:
             'character': character
         })
     
+    def record_llm_coalesced(self):
+        """進行中の同一LLMリクエストへの合流（single-flight）を記録"""
+        self.metrics['llm_coalesced'] += 1
+    
+    def record_llm_schedule(self, model: str, priority: int, wait_ms: float, service_ms: float):
+        """
+        スケジューラ経由のLLM実行を記録
+        
+        Args:
+            model: モデル名
+            priority: 優先度クラス
+            wait_ms: 実行枠の待機時間（ミリ秒）
+            service_ms: 実行枠の保持時間（ミリ秒）
+        """
+        queue = self._get_llm_queue_metrics(model)
+        queue['wait_times'].append(wait_ms)
+        queue['service_times'].append(service_ms)
+        queue['by_priority'][priority] = queue['by_priority'].get(priority, 0) + 1
+        
+        with self._latency_lock:
+            window = self._latency_windows.setdefault(model, deque(maxlen=self.LATENCY_WINDOW_SIZE))
+            window.append((time.monotonic(), wait_ms + service_ms))
+    
+    def rolling_latency_p95(self, model: str, window_seconds: float, min_samples: int = 1,
+                            now: Optional[float] = None) -> Optional[float]:
+        """
+        直近の時間窓内の応答時間（待機+実行）のp95
+        
+        Args:
+            model: モデル名
+            window_seconds: 時間窓（秒）
+            min_samples: これ未満の計測数の場合はNone
+            now: 現在の単調時刻（省略時はtime.monotonic()）
+        
+        Returns:
+            p95（ミリ秒）、計測数不足の場合None
+        """
+        cutoff = (time.monotonic() if now is None else now) - window_seconds
+        with self._latency_lock:
+            window = self._latency_windows.get(model)
+            if not window:
+                return None
+            while window and window[0][0] < cutoff:
+                window.popleft()
+            latencies = [latency for _, latency in window]
+        if len(latencies) < max(1, min_samples):
+            return None
+        return _percentile(latencies, 95)
+    
+    def record_model_downgrade(self, model_key: str, fallback: str, p95_ms: float):
+        """
+        SLO超過によるモデル降格を記録
+        
+        Args:
+            model_key: 降格したモデルキー
+            fallback: 降格先のモデルキー
+            p95_ms: 降格時のp95（ミリ秒）
+        """
+        downgrade = self._get_downgrade_metrics(model_key)
+        downgrade['downgrades'] += 1
+        downgrade['active'] = True
+        downgrade['fallback'] = fallback
+        downgrade['last_p95_ms'] = p95_ms
+        
+        self.detailed_logs.append({
+            'type': 'model_downgrade',
+            'timestamp': datetime.now().isoformat(),
+            'model_key': model_key,
+            'fallback': fallback,
+            'p95_ms': p95_ms
+        })
+    
+    def record_model_restore(self, model_key: str):
+        """降格の解除を記録"""
+        downgrade = self._get_downgrade_metrics(model_key)
+        downgrade['restores'] += 1
+        downgrade['active'] = False
+    
+    def record_downgraded_request(self, model_key: str):
+        """降格先に振り替えたリクエストを記録"""
+        self._get_downgrade_metrics(model_key)['downgraded_requests'] += 1
+    
+    def _get_downgrade_metrics(self, model_key: str) -> Dict[str, Any]:
+        """モデルキー別の降格メトリクスを取得（無ければ作成）"""
+        if model_key not in self.metrics['model_downgrade']:
+            self.metrics['model_downgrade'][model_key] = {
+                'downgrades': 0,
+                'restores': 0,
+                'downgraded_requests': 0,
+                'active': False,
+                'fallback': '',
+                'last_p95_ms': 0.0
+            }
+        return self.metrics['model_downgrade'][model_key]
+    
+    def record_backend_request(self, host: str, success: bool):
+        """
+        Ollamaホスト別のリクエスト結果を記録
+        
+        Args:
+            host: ホストURL
+            success: 成功したか
+        """
+        backend = self._get_backend_metrics(host)
+        backend['requests'] += 1
+        if not success:
+            backend['failures'] += 1
+    
+    def record_backend_circuit_open(self, host: str):
+        """Ollamaホストのサーキットブレーカーが開いた（一定時間除外）ことを記録"""
+        self._get_backend_metrics(host)['circuit_opens'] += 1
+        
+        self.detailed_logs.append({
+            'type': 'backend_circuit_open',
+            'timestamp': datetime.now().isoformat(),
+            'host': host
+        })
+    
+    def record_backend_health(self, host: str, healthy: bool):
+        """Ollamaホストのヘルスチェック結果を記録"""
+        self._get_backend_metrics(host)['healthy'] = healthy
+    
+    def record_llm_hedge(self, won: bool):
+        """
+        ヘッジングしたリクエストを記録
+        
+        Args:
+            won: 後から送った別ホストが先に応答したか
+        """
+        self.metrics['llm_hedging']['hedged'] += 1
+        if won:
+            self.metrics['llm_hedging']['hedge_wins'] += 1
+    
+    def _get_backend_metrics(self, host: str) -> Dict[str, Any]:
+        """ホスト別バックエンドメトリクスを取得（無ければ作成）"""
+        if host not in self.metrics['llm_backends']:
+            self.metrics['llm_backends'][host] = {
+                'requests': 0,
+                'failures': 0,
+                'circuit_opens': 0,
+                'healthy': True
+            }
+        return self.metrics['llm_backends'][host]
+    
+    def record_llm_queue_depth(self, model: str, depth: int):
+        """
+        LLM待機キューの深さを記録
+        
+        Args:
+            model: モデル名
+            depth: 登録直後の待機数
+        """
+        queue = self._get_llm_queue_metrics(model)
+        queue['max_queue_depth'] = max(queue['max_queue_depth'], depth)
+    
+    def record_llm_queue_timeout(self, model: str, priority: int):
+        """
+        LLM待機の期限切れを記録
+        
+        Args:
+            model: モデル名
+            priority: 優先度クラス
+        """
+        self._get_llm_queue_metrics(model)['timeouts'] += 1
+        
+        self.detailed_logs.append({
+            'type': 'llm_queue_timeout',
+            'timestamp': datetime.now().isoformat(),
+            'model': model,
+            'priority': priority
+        })
+    
+    def _get_llm_queue_metrics(self, model: str) -> Dict[str, Any]:
+        """モデル別スケジューラメトリクスを取得（無ければ作成）"""
+        if model not in self.metrics['llm_queue']:
+            self.metrics['llm_queue'][model] = {
+                'wait_times': deque(maxlen=self.QUEUE_SAMPLE_SIZE),
+                'service_times': deque(maxlen=self.QUEUE_SAMPLE_SIZE),
+                'by_priority': {},
+                'max_queue_depth': 0,
+                'timeouts': 0
+            }
+        return self.metrics['llm_queue'][model]
+    
+    def record_model_warmup(self, model: str, success: bool, resident: bool):
+        """
+        モデルのウォームアップ・キープアライブを記録
+        
+        Args:
+            model: モデル名
+            success: 呼び出しに成功したか
+            resident: 呼び出し後にモデルが常駐しているか
+        """
+        residency = self._get_model_residency_metrics(model)
+        residency['warmups'] += 1
+        if not success:
+            residency['warmup_failures'] += 1
+        residency['resident'] = resident
+    
+    def record_model_cold_start(self, model: str, load_ms: float, source: str = "request"):
+        """
+        モデルのコールドスタート（Ollamaによるモデル読み込み）を記録
+        
+        Args:
+            model: モデル名
+            load_ms: モデル読み込み時間（ミリ秒）
+            source: 発生元（warmup/keepalive/request）
+        """
+        residency = self._get_model_residency_metrics(model)
+        residency['load_times'].append(load_ms)
+        residency['cold_starts'][source] = residency['cold_starts'].get(source, 0) + 1
+        
+        self.detailed_logs.append({
+            'type': 'model_cold_start',
+            'timestamp': datetime.now().isoformat(),
+            'model': model,
+            'load_ms': load_ms,
+            'source': source
+        })
+    
+    def _get_model_residency_metrics(self, model: str) -> Dict[str, Any]:
+        """モデル別常駐メトリクスを取得（無ければ作成）"""
+        if model not in self.metrics['model_residency']:
+            self.metrics['model_residency'][model] = {
+                'warmups': 0,
+                'warmup_failures': 0,
+                'load_times': [],
+                'cold_starts': {},
+                'resident': False
+            }
+        return self.metrics['model_residency'][model]
+    
+    def record_cache_lookup(self, hit: bool, layer: str = "local", cache: str = "llm"):
+        """
+        LLM応答キャッシュ・検索結果キャッシュの参照を記録
+        
+        Args:
+            hit: ヒットしたかどうか
+            layer: ヒットした層（local/redis）
+            cache: キャッシュ種別（llm/search）
+        """
+        if cache == "search":
+            self.metrics['search']['cache_hits' if hit else 'cache_misses'] += 1
+            return
+        if hit:
+            self.metrics['cache_hits'] += 1
+            by_layer = self.metrics['cache_hits_by_layer']
+            by_layer[layer] = by_layer.get(layer, 0) + 1
+        else:
+            self.metrics['cache_misses'] += 1
+    
+    def record_route(self, target: str, source: str):
+        """
+        ルーティング判定を記録
+        
+        Args:
+            target: 応答キャラクターキー
+            source: 判定元（mention/classifier/keyword/default）
+        """
+        by_target = self.metrics['routing'].setdefault(source, {})
+        by_target[target] = by_target.get(target, 0) + 1
+    
+    def record_speculation(self, hit: bool, wasted_tokens: int, cancelled: bool,
+                           judge_failed: bool = False):
+        """
+        投機的ルーティング1回分を記録
+        
+        Args:
+            hit: 最終判定が通常のルーティング結果（第1候補）と一致したか
+            wasted_tokens: 採用されなかった候補が生成したトークン数（推定値、改訂で破棄した下書きを含む）
+            cancelled: 採用されなかった候補を生成途中でキャンセルしたか
+            judge_failed: 判定に失敗し第1候補を採用したか
+        """
+        speculation = self.metrics['speculation']
+        speculation['runs'] += 1
+        speculation['wasted_tokens'] += wasted_tokens
+        if hit:
+            speculation['hits'] += 1
+        if cancelled:
+            speculation['cancelled'] += 1
+        if judge_failed:
+            speculation['judge_failures'] += 1
+    
+    def record_cascade(self, character: str, outcome: str):
+        """
+        カスケード1回分の結果を記録
+        
+        Args:
+            character: キャラクター名
+            outcome: draft（下書きを採用）/ refined（改訂）/ direct（下書きなしで通常のモデル）
+        """
+        by_outcome = self.metrics['cascade'].setdefault(character, {})
+        by_outcome[outcome] = by_outcome.get(outcome, 0) + 1
+    
+    def record_search(self, duration_ms: float, success: bool = True):
+        """
+        Web検索APIの呼び出しを記録
+        
+        Args:
+            duration_ms: 応答時間（ミリ秒）
+            success: 成功したかどうか
+        """
+        search = self.metrics['search']
+        search['requests'] += 1
+        search['times'].append(duration_ms)
+        if not success:
+            search['errors'] += 1
+    
+    def record_search_timeout(self):
+        """検索が待ち時間の上限を超え、検索結果なしで応答したことを記録"""
+        self.metrics['search']['timeouts'] += 1
+    
     def record_memory_operation(self, operation_type: str, duration_ms: float = 0,
                                 success: bool = True):
         """
@@ -150,6 +535,30 @@ class MetricsCollector:
         else:
             self.metrics['system_responses'] += 1
     
+    def record_turn_cancelled(self, partial_chars: int):
+        """
+        クライアント切断で中断したターンを記録
+        
+        Args:
+            partial_chars: 中断までに生成済みだった応答の文字数
+        """
+        self.metrics['cancelled_turns'] += 1
+        self.metrics['cancelled_chars'] += partial_chars
+        
+        self.detailed_logs.append({
+            'type': 'turn_cancelled',
+            'timestamp': datetime.now().isoformat(),
+            'partial_chars': partial_chars
+        })
+    
+    def record_input_coalesced(self):
+        """連続入力の合流（開始前のターンへの入力の追加）を記録"""
+        self.metrics['coalesced_inputs'] += 1
+    
+    def record_turn_superseded(self):
+        """後続の入力による生成中のターンの打ち切りを記録"""
+        self.metrics['superseded_turns'] += 1
+    
     def record_error(self, error_type: str, context: str = ""):
         """
         エラーを記録
@@ -177,6 +586,22 @@ class MetricsCollector:
         self.metrics['total_sessions'] += 1
         self.metrics['session_start'] = datetime.now().isoformat()
     
+    def record_summary(self, duration_ms: float, success: bool = True, turns: int = 0):
+        """
+        ローリング要約を記録
+        
+        Args:
+            duration_ms: 要約生成時間（ミリ秒）
+            success: 成功したか
+            turns: 要約に取り込んだターン数
+        """
+        if not success:
+            self.metrics['summary_errors'] += 1
+            return
+        self.metrics['summaries'] += 1
+        self.metrics['summary_times'].append(duration_ms)
+        self.metrics['summarized_turns'] += turns
+    
     def record_session_end(self):
         """セッション終了を記録"""
         self.metrics['session_end'] = datetime.now().isoformat()
@@ -194,6 +619,7 @@ class MetricsCollector:
             'total_errors': self.metrics['llm_errors'],
             'total_retries': self.metrics['llm_retries'],
             'total_fallbacks': self.metrics['llm_fallbacks'],
+            'total_coalesced': self.metrics['llm_coalesced'],
             'avg_call_time_ms': 0.0,
             'median_call_time_ms': 0.0,
             'min_call_time_ms': 0.0,
@@ -207,6 +633,68 @@ class MetricsCollector:
             llm_stats['min_call_time_ms'] = min(call_times)
             llm_stats['max_call_time_ms'] = max(call_times)
         
+        # LLMスケジューラ統計（モデル別）
+        scheduler_stats = {}
+        for model, queue in self.metrics['llm_queue'].items():
+            wait_times = queue['wait_times']
+            service_times = queue['service_times']
+            scheduler_stats[model] = {
+                'requests': sum(queue['by_priority'].values()),
+                'avg_wait_ms': statistics.mean(wait_times) if wait_times else 0.0,
+                'p95_wait_ms': _percentile(wait_times, 95),
+                'max_wait_ms': max(wait_times) if wait_times else 0.0,
+                'avg_service_ms': statistics.mean(service_times) if service_times else 0.0,
+                'p95_service_ms': _percentile(service_times, 95),
+                'max_queue_depth': queue['max_queue_depth'],
+                'timeouts': queue['timeouts'],
+                'requests_by_priority': dict(queue['by_priority'])
+            }
+        
+        # モデル常駐統計（モデル別）
+        residency_stats = {}
+        for model, residency in self.metrics['model_residency'].items():
+            load_times = residency['load_times']
+            residency_stats[model] = {
+                'resident': residency['resident'],
+                'warmups': residency['warmups'],
+                'warmup_failures': residency['warmup_failures'],
+                'cold_starts': sum(residency['cold_starts'].values()),
+                'cold_starts_by_source': dict(residency['cold_starts']),
+                'avg_load_ms': statistics.mean(load_times) if load_times else 0.0,
+                'max_load_ms': max(load_times) if load_times else 0.0
+            }
+        
+        # Ollamaバックエンドプール統計
+        hedging = self.metrics['llm_hedging']
+        backend_stats = {
+            'hosts': {host: dict(backend) for host, backend in self.metrics['llm_backends'].items()},
+            'hedged': hedging['hedged'],
+            'hedge_wins': hedging['hedge_wins'],
+            'hedge_win_rate': hedging['hedge_wins'] / hedging['hedged'] if hedging['hedged'] else 0.0
+        }
+        
+        # LLM応答キャッシュ統計
+        lookups = self.metrics['cache_hits'] + self.metrics['cache_misses']
+        cache_stats = {
+            'hits': self.metrics['cache_hits'],
+            'misses': self.metrics['cache_misses'],
+            'hit_rate': self.metrics['cache_hits'] / lookups if lookups else 0.0,
+            'hits_by_layer': dict(self.metrics['cache_hits_by_layer'])
+        }
+        
+        # Web検索統計
+        search = self.metrics['search']
+        search_lookups = search['cache_hits'] + search['cache_misses']
+        search_stats = {
+            'requests': search['requests'],
+            'errors': search['errors'],
+            'timeouts': search['timeouts'],
+            'cache_hits': search['cache_hits'],
+            'cache_hit_rate': search['cache_hits'] / search_lookups if search_lookups else 0.0,
+            'avg_time_ms': statistics.mean(search['times']) if search['times'] else 0.0,
+            'p95_time_ms': _percentile(search['times'], 95)
+        }
+        
         # 記憶システム統計
         memory_stats = {
             'total_operations': self.metrics['memory_operations'],
@@ -220,7 +708,28 @@ class MetricsCollector:
             'total_turns': self.metrics['total_turns'],
             'user_inputs': self.metrics['user_inputs'],
             'system_responses': self.metrics['system_responses'],
-            'total_sessions': self.metrics['total_sessions']
+            'total_sessions': self.metrics['total_sessions'],
+            'summaries': self.metrics['summaries'],
+            'summary_errors': self.metrics['summary_errors'],
+            'summarized_turns': self.metrics['summarized_turns'],
+            'cancelled_turns': self.metrics['cancelled_turns'],
+            'cancelled_chars': self.metrics['cancelled_chars'],
+            'coalesced_inputs': self.metrics['coalesced_inputs'],
+            'superseded_turns': self.metrics['superseded_turns'],
+            'avg_summary_time_ms': (
+                sum(self.metrics['summary_times']) / len(self.metrics['summary_times'])
+                if self.metrics['summary_times'] else 0
+            )
+        }
+        
+        # 投機的ルーティング統計
+        speculation = self.metrics['speculation']
+        speculation_stats = {
+            **speculation,
+            'hit_rate': speculation['hits'] / speculation['runs'] if speculation['runs'] else 0.0,
+            'avg_wasted_tokens': (
+                speculation['wasted_tokens'] / speculation['runs'] if speculation['runs'] else 0.0
+            )
         }
         
         # エラー統計
@@ -246,6 +755,15 @@ class MetricsCollector:
                 'duration_seconds': session_duration
             },
             'llm_stats': llm_stats,
+            'scheduler_stats': scheduler_stats,
+            'backend_stats': backend_stats,
+            'cache_stats': cache_stats,
+            'residency_stats': residency_stats,
+            'search_stats': search_stats,
+            'routing_stats': {source: dict(by_target) for source, by_target in self.metrics['routing'].items()},
+            'speculation_stats': speculation_stats,
+            'downgrade_stats': {key: dict(downgrade) for key, downgrade in self.metrics['model_downgrade'].items()},
+            'cascade_stats': {character: dict(by_outcome) for character, by_outcome in self.metrics['cascade'].items()},
             'memory_stats': memory_stats,
             'conversation_stats': conversation_stats,
             'character_stats': character_stats,
@@ -258,7 +776,7 @@ class MetricsCollector:
         
         Args:
             filepath: 出力ファイルパス（Noneの場合は自動生成）
-            
+        
         Returns:
             エクスポートしたファイルのパス
         """
@@ -277,7 +795,8 @@ class MetricsCollector:
         }
         
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2)
+            # スケジューラの直近計測値（deque）はリストとして出力
+            json.dump(export_data, f, ensure_ascii=False, indent=2, default=list)
         
         return filepath
     
@@ -317,6 +836,87 @@ class MetricsCollector:
         report.append(f"エラー数: {llm['total_errors']}回")
         report.append(f"リトライ数: {llm['total_retries']}回")
         report.append(f"フォールバック数: {llm['total_fallbacks']}回")
+        report.append(f"合流数: {llm['total_coalesced']}回")
+        
+        # LLMスケジューラ統計
+        if summary['scheduler_stats']:
+            report.append("\n【LLMスケジューラ】")
+            for model, sched in summary['scheduler_stats'].items():
+                report.append(f"{model}:")
+                report.append(f"  実行数: {sched['requests']}回 / 最大待機数: {sched['max_queue_depth']}")
+                report.append(f"  待機時間 平均/p95: {sched['avg_wait_ms']:.2f}ms / {sched['p95_wait_ms']:.2f}ms")
+                report.append(f"  実行時間 平均/p95: {sched['avg_service_ms']:.2f}ms / {sched['p95_service_ms']:.2f}ms")
+                report.append(f"  期限切れ: {sched['timeouts']}回")
+        
+        # Ollamaバックエンドプール統計
+        backends = summary['backend_stats']
+        if backends['hosts']:
+            report.append("\n【Ollamaバックエンドプール】")
+            for host, backend in backends['hosts'].items():
+                state = "正常" if backend['healthy'] else "応答なし"
+                report.append(f"{host}: {state}")
+                report.append(f"  リクエスト/失敗: {backend['requests']}回 / {backend['failures']}回 "
+                              f"(サーキットブレーカー作動 {backend['circuit_opens']}回)")
+            report.append(f"ヘッジング: {backends['hedged']}回 "
+                          f"(別ホストが先に応答 {backends['hedge_wins']}回、{backends['hedge_win_rate']:.1%})")
+        
+        # LLM応答キャッシュ統計
+        cache = summary['cache_stats']
+        report.append("\n【LLM応答キャッシュ】")
+        report.append(f"ヒット/ミス: {cache['hits']}回 / {cache['misses']}回 (ヒット率 {cache['hit_rate']:.1%})")
+        report.append(f"層別ヒット: ローカル {cache['hits_by_layer'].get('local', 0)}回 / Redis {cache['hits_by_layer'].get('redis', 0)}回")
+        
+        # モデル降格統計
+        if summary['downgrade_stats']:
+            report.append("\n【レイテンシSLOによるモデル降格】")
+            for model_key, downgrade in summary['downgrade_stats'].items():
+                state = f"降格中（→ {downgrade['fallback']}）" if downgrade['active'] else "通常"
+                report.append(f"{model_key}: {state}")
+                report.append(f"  降格/復帰: {downgrade['downgrades']}回 / {downgrade['restores']}回 "
+                              f"(直近の降格時p95 {downgrade['last_p95_ms']:.0f}ms)")
+                report.append(f"  振り替えたリクエスト: {downgrade['downgraded_requests']}回")
+        
+        # モデル常駐統計
+        if summary['residency_stats']:
+            report.append("\n【モデル常駐】")
+            for model, residency in summary['residency_stats'].items():
+                state = "常駐" if residency['resident'] else "未常駐"
+                report.append(f"{model}: {state}")
+                report.append(f"  ウォームアップ: {residency['warmups']}回 (失敗 {residency['warmup_failures']}回)")
+                report.append(f"  コールドスタート: {residency['cold_starts']}回 (要求時 {residency['cold_starts_by_source'].get('request', 0)}回)")
+                report.append(f"  読み込み時間 平均/最大: {residency['avg_load_ms']:.2f}ms / {residency['max_load_ms']:.2f}ms")
+        
+        # ルーティング統計
+        if summary['routing_stats']:
+            report.append("\n【ルーティング】")
+            for source, by_target in summary['routing_stats'].items():
+                counts = ", ".join(f"{target} {count}回" for target, count in by_target.items())
+                report.append(f"{source}: {counts}")
+        
+        # 投機的ルーティング統計
+        speculation = summary['speculation_stats']
+        if speculation['runs']:
+            report.append("\n【投機的ルーティング】")
+            report.append(f"実行: {speculation['runs']}回 (第1候補的中率 {speculation['hit_rate']:.1%}、"
+                          f"判定失敗 {speculation['judge_failures']}回)")
+            report.append(f"破棄トークン: {speculation['wasted_tokens']} (平均 {speculation['avg_wasted_tokens']:.1f}/回、"
+                          f"生成途中のキャンセル {speculation['cancelled']}回)")
+        
+        # カスケード統計
+        if summary['cascade_stats']:
+            report.append("\n【下書き→改訂カスケード】")
+            for character, by_outcome in summary['cascade_stats'].items():
+                report.append(f"{character}: 下書き採用 {by_outcome.get('draft', 0)}回 / "
+                              f"改訂 {by_outcome.get('refined', 0)}回 / 直接生成 {by_outcome.get('direct', 0)}回")
+        
+        # Web検索統計
+        search = summary['search_stats']
+        if search['requests'] or search['cache_hits']:
+            report.append("\n【Web検索】")
+            report.append(f"API呼び出し: {search['requests']}回 (エラー {search['errors']}回)")
+            report.append(f"キャッシュヒット: {search['cache_hits']}回 (ヒット率 {search['cache_hit_rate']:.1%})")
+            report.append(f"応答時間 平均/P95: {search['avg_time_ms']:.2f}ms / {search['p95_time_ms']:.2f}ms")
+            report.append(f"期限超過（検索なしで応答）: {search['timeouts']}回")
         
         # 記憶システム統計
         memory = summary['memory_stats']
@@ -333,6 +933,10 @@ class MetricsCollector:
         report.append(f"ユーザー入力: {conv['user_inputs']}回")
         report.append(f"システム応答: {conv['system_responses']}回")
         report.append(f"総セッション数: {conv['total_sessions']}回")
+        report.append(f"ローリング要約: {conv['summaries']}回（{conv['summarized_turns']}ターン、"
+                      f"平均{conv['avg_summary_time_ms']:.0f}ms、失敗{conv['summary_errors']}回）")
+        report.append(f"切断による中断: {conv['cancelled_turns']}回（生成済み{conv['cancelled_chars']}文字）")
+        report.append(f"連続入力の合流: {conv['coalesced_inputs']}件 / 生成中ターンの置き換え: {conv['superseded_turns']}回")
         
         # キャラクター統計
         char = summary['character_stats']
@@ -354,6 +958,15 @@ class MetricsCollector:
         return "\n".join(report)
 
 
+def _percentile(values: List[float], pct: float) -> float:
+    """パーセンタイル値（最近傍法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(len(ordered) * pct / 100) - 1)
+    return ordered[index]
+
+
 # グローバルインスタンス（シングルトン）
 _metrics_collector = None
 
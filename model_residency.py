@@ -0,0 +1,246 @@
+"""
+model_residency.py
+モデル常駐管理（ウォームアップ・キープアライブ）
+
+ModelConfig.modelsの各モデルを起動時にウォームアップ（空メッセージのchatでOllamaにロード）し、
+keep_alive付きの定期キープアライブでアンロードを防ぐ。
+ホストのプール（ModelConfig.ollama_hosts）使用時は、各モデルを処理する全ホストに対して行う。
+常駐状況はOllamaの/api/psで確認し、応答のload_durationが閾値以上の場合は
+コールドスタートとしてメトリクスに記録する。
+"""
+
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from llm_client import get_async_llm_client
+from utils import Logger
+
+
+class ModelResidencyManager:
+    """モデル常駐マネージャー"""
+    
+    def __init__(self, models: Iterable[str], keep_alive: Union[float, str] = "30m",
+                 interval: float = 600.0, cold_start_threshold_ms: float = 500.0,
+                 host: Optional[str] = None,
+                 options: Optional[Dict[str, Dict[str, Any]]] = None, metrics=None,
+                 pool=None):
+        """
+        初期化
+        
+        Args:
+            models: 常駐させるモデル名（重複は1つにまとめる）
+            keep_alive: Ollamaにモデルを常駐させる時間
+            interval: キープアライブ送信間隔（秒）
+            cold_start_threshold_ms: コールドスタートとみなす読み込み時間（ミリ秒）
+            host: OllamaホストURL
+            options: モデル名ごとのモデルオプション（num_ctx等、通常リクエストと同じ値にする）
+            metrics: MetricsCollector（省略時はグローバルインスタンス）
+            pool: LLMBackendPool（指定時はhostに代えて、各モデルを処理するプール内の全ホストを対象にする）
+        """
+        self.models = list(dict.fromkeys(models))
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.cold_start_threshold_ms = cold_start_threshold_ms
+        self.host = host
+        self.options = options or {}
+        self.pool = pool
+        self._metrics = metrics
+        self._resident: Dict[str, bool] = {model: False for model in self.models}
+        self._task: Optional[asyncio.Task] = None
+        self.logger = Logger()
+    
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            from metrics import get_metrics_collector
+            return get_metrics_collector()
+        return self._metrics
+    
+    async def start(self):
+        """
+        バックグラウンドでウォームアップを開始し、以降は定期的にキープアライブを送信
+        
+        API起動を待たせないよう、ウォームアップの完了は待たない。
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """キープアライブを停止"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _run(self):
+        await self.warm_up_all()
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+    
+    async def warm_up_all(self, source: str = "warmup"):
+        """全モデルを並行してウォームアップ"""
+        await asyncio.gather(*(self.warm_up(model, source) for model in self.models))
+    
+    def hosts_for(self, model: str) -> List[Optional[str]]:
+        """
+        モデルを常駐させるホスト
+        
+        Args:
+            model: モデル名
+        
+        Returns:
+            プール使用時はモデルを処理する正常なホストのURL、それ以外は[host]
+        """
+        if self.pool is None:
+            return [self.host]
+        return [host.url for host in self.pool.hosts if host.healthy and host.serves(model)]
+    
+    async def warm_up(self, model: str, source: str = "warmup") -> bool:
+        """
+        モデルを各ホストにロード（ロード済みの場合は常駐期限のみ延長）
+        
+        空メッセージのchatはトークンを生成しないため、LLMスケジューラの実行枠は使用しない。
+        num_ctxが通常リクエストと異なるとOllamaが再ロードするため、同じオプションでロードする。
+        
+        Args:
+            model: モデル名
+            source: コールドスタート記録時の発生元（warmup/keepalive）
+        
+        Returns:
+            全ホストで成功した場合True
+        """
+        hosts = self.hosts_for(model)
+        results = await asyncio.gather(*(self._warm_up_host(model, host, source) for host in hosts))
+        success = bool(results) and all(results)
+        self._resident[model] = success
+        self.metrics.record_model_warmup(model, success=success, resident=success)
+        return success
+    
+    async def _warm_up_host(self, model: str, host: Optional[str], source: str) -> bool:
+        client = get_async_llm_client(host)
+        try:
+            response = await client.chat(
+                model=model,
+                messages=[],
+                options=self.options.get(model),
+                keep_alive=self.keep_alive
+            )
+        except Exception as e:
+            self.logger.log_error(e, context=f"model_warm_up_{model}")
+            return False
+        
+        self.observe(model, response.get('load_duration'), source)
+        return True
+    
+    async def refresh(self):
+        """常駐状況を確認してキープアライブを送信（アンロード済みのモデルは再ロード）"""
+        hosts = list(dict.fromkeys(host for model in self.models for host in self.hosts_for(model)))
+        loaded = dict(zip(hosts, await asyncio.gather(*(self.loaded_models(host) for host in hosts))))
+        for model in self.models:
+            states = [loaded[host] for host in self.hosts_for(model) if loaded.get(host) is not None]
+            if not states:
+                continue
+            resident = all(model in state for state in states)
+            if self._resident[model] and not resident:
+                self.logger.log_system_event("model_unloaded", {"model": model})
+            self._resident[model] = resident
+        
+        await self.warm_up_all(source="keepalive")
+    
+    async def loaded_models(self, host: Optional[str] = None) -> Optional[Set[str]]:
+        """
+        Ollamaにロード済みのモデル名を取得
+        
+        Args:
+            host: OllamaホストURL（省略時はhost）
+        
+        Returns:
+            モデル名の集合（取得失敗時None）
+        """
+        try:
+            response = await get_async_llm_client(host or self.host).ps()
+        except Exception as e:
+            self.logger.log_error(e, context="model_residency_ps")
+            return None
+        return {m.get('name') or m.get('model') for m in response.get('models', [])}
+    
+    def observe(self, model: str, load_duration: Optional[int], source: str = "request"):
+        """
+        Ollama応答のモデル読み込み時間を記録
+        
+        Args:
+            model: モデル名
+            load_duration: 応答のload_duration（ナノ秒、無い場合None）
+            source: 発生元（warmup/keepalive/request）
+        """
+        if load_duration is None:
+            return
+        
+        self._resident[model] = True
+        load_ms = load_duration / 1_000_000
+        if load_ms >= self.cold_start_threshold_ms:
+            self.metrics.record_model_cold_start(model, load_ms, source)
+            self.logger.log_system_event(
+                "model_cold_start",
+                {"model": model, "load_ms": round(load_ms, 1), "source": source}
+            )
+    
+    def is_resident(self, model: str) -> bool:
+        """モデルが常駐しているか（最後に確認した状態）"""
+        return self._resident.get(model, False)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        常駐状況を取得
+        
+        Returns:
+            {'running': bool, 'keep_alive': 常駐時間, 'models': {モデル名: 常駐中か}}
+        """
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'keep_alive': self.keep_alive,
+            'models': dict(self._resident)
+        }
+
+
+# グローバルインスタンス（シングルトン）
+_model_residency: Optional[ModelResidencyManager] = None
+
+
+def get_model_residency() -> ModelResidencyManager:
+    """
+    グローバルModelResidencyManagerインスタンスを取得
+    
+    Returns:
+        ModelResidencyManagerインスタンス
+    """
+    global _model_residency
+    if _model_residency is None:
+        from config import config
+        from llm_pool import get_llm_pool
+        from prompt_builder import get_prompt_builder
+        
+        builder = get_prompt_builder()
+        _model_residency = ModelResidencyManager(
+            models=config.model.models.values(),
+            keep_alive=config.model.keep_alive,
+            interval=config.model.model_keepalive_interval,
+            cold_start_threshold_ms=config.model.model_cold_start_threshold_ms,
+            host=config.model.ollama_host,
+            options={
+                model: {'num_ctx': builder.model_num_ctx(model)}
+                for model in config.model.models.values()
+            },
+            pool=get_llm_pool()
+        )
+    return _model_residency
+
+
+def reset_model_residency():
+    """グローバルModelResidencyManagerをリセット"""
+    global _model_residency
+    _model_residency = None
@@ -0,0 +1,150 @@
+"""
+model_slo.py
+レイテンシSLOによるモデル降格
+
+モデルキーごとに直近の応答時間（スケジューラの待機+実行、MetricsCollectorの時間窓）のp95を監視し、
+SLOを超えたモデルキーへの新規リクエストを一時的に安価なモデルキー（例: medium → fast）へ振り替える。
+Ollamaが飽和している間はタイムアウト・フォールバック応答より、品質を落としてでも速く応答する。
+
+降格中は元のモデルに新規リクエストが流れず古い計測値が時間窓から外れていくため、
+最低保持時間の経過後、p95が回復閾値（SLO×recover_ratio）以下か計測値不足になった時点で戻す
+（戻した後に再び遅ければ、計測値が揃った時点で再度降格する）。
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from utils import Logger
+
+
+class ModelDowngradePolicy:
+    """モデルキー単位のSLO監視と降格判定"""
+    
+    def __init__(self, models: Dict[str, str], slo_ms: Dict[str, float],
+                 fallbacks: Dict[str, str], window_seconds: float = 120.0,
+                 min_samples: int = 10, recover_ratio: float = 0.7,
+                 hold_seconds: float = 60.0, metrics=None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初期化
+        
+        Args:
+            models: モデルキー → モデル名
+            slo_ms: モデルキーごとのp95の上限（ミリ秒、0以下は監視しない）
+            fallbacks: モデルキーごとの降格先モデルキー
+            window_seconds: p95を計算する時間窓（秒）
+            min_samples: 判定に必要な最小計測数
+            recover_ratio: 降格を解除するp95のSLOに対する比率（ヒステリシス）
+            hold_seconds: 降格を維持する最低時間（秒）
+            metrics: MetricsCollector（省略時はグローバルインスタンス）
+            clock: 単調増加時計（テスト用）
+        """
+        self.models = models
+        self.slo_ms = {key: slo for key, slo in slo_ms.items() if slo > 0 and key in fallbacks}
+        self.fallbacks = fallbacks
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.recover_ratio = recover_ratio
+        self.hold_seconds = hold_seconds
+        self._metrics = metrics
+        self._clock = clock
+        # 降格中のモデルキー → 降格時刻
+        self._downgraded: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.logger = Logger()
+    
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            from metrics import get_metrics_collector
+            return get_metrics_collector()
+        return self._metrics
+    
+    def resolve(self, model_key: str) -> str:
+        """
+        リクエストに使うモデルキーを決定
+        
+        Args:
+            model_key: キャラクター本来のモデルキー
+        
+        Returns:
+            SLO超過で降格中の場合は降格先、それ以外はmodel_key
+        """
+        slo = self.slo_ms.get(model_key)
+        if slo is None:
+            return model_key
+        
+        now = self._clock()
+        p95 = self.metrics.rolling_latency_p95(
+            self.models.get(model_key, model_key), self.window_seconds, self.min_samples, now=now
+        )
+        with self._lock:
+            since = self._downgraded.get(model_key)
+            if since is None:
+                if p95 is not None and p95 > slo:
+                    self._downgraded[model_key] = now
+                    self._on_downgrade(model_key, p95, slo)
+                    since = now
+            elif now - since >= self.hold_seconds and (p95 is None or p95 <= slo * self.recover_ratio):
+                del self._downgraded[model_key]
+                self._on_restore(model_key, p95)
+                since = None
+        
+        if since is None:
+            return model_key
+        self.metrics.record_downgraded_request(model_key)
+        return self.fallbacks[model_key]
+    
+    def is_downgraded(self, model_key: str) -> bool:
+        """降格中か"""
+        return model_key in self._downgraded
+    
+    def _on_downgrade(self, model_key: str, p95: float, slo: float):
+        fallback = self.fallbacks[model_key]
+        self.metrics.record_model_downgrade(model_key, fallback, p95)
+        self.logger.log_warning(
+            f"モデル降格: {model_key} → {fallback} (p95 {p95:.0f}ms > SLO {slo:.0f}ms)",
+            context="model_slo"
+        )
+    
+    def _on_restore(self, model_key: str, p95: Optional[float]):
+        self.metrics.record_model_restore(model_key)
+        self.logger.log_system_event("model_restored", {
+            "model_key": model_key,
+            "p95_ms": p95
+        })
+
+
+# グローバルインスタンス（シングルトン）
+_policy: Optional[ModelDowngradePolicy] = None
+
+
+def get_model_downgrade_policy() -> ModelDowngradePolicy:
+    """
+    グローバルModelDowngradePolicyインスタンスを取得
+    
+    Returns:
+        ModelDowngradePolicyインスタンス（無効時はSLOなしで常に元のモデルキーを返す）
+    """
+    global _policy
+    if _policy is None:
+        from config import config
+        
+        model_config = config.model
+        _policy = ModelDowngradePolicy(
+            models=model_config.models,
+            slo_ms=model_config.model_slo_ms if model_config.model_downgrade_enabled else {},
+            fallbacks=model_config.model_downgrade,
+            window_seconds=model_config.model_slo_window_seconds,
+            min_samples=model_config.model_slo_min_samples,
+            recover_ratio=model_config.model_slo_recover_ratio,
+            hold_seconds=model_config.model_slo_hold_seconds
+        )
+    return _policy
+
+
+def reset_model_downgrade_policy():
+    """グローバルModelDowngradePolicyをリセット"""
+    global _policy
+    _policy = None
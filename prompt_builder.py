@@ -0,0 +1,410 @@
+"""
+prompt_builder.py
+トークン予算付きプロンプト構築
+
+キャラクター別テンプレートを事前に組み立て、以下を行う。
+- ペルソナ部分をプロンプト先頭の固定文字列（毎回バイト単位で同一）とし、
+  Ollamaのプレフィックス（KV）キャッシュを再利用させる
+- 会話履歴を新しい順にトークン予算内まで残す（ターン数ではなく長さで制限）
+- 予算からnum_ctx/num_predictを決定する
+
+トークン数はモデルのトークナイザを使わず、文字種ごとの近似で見積もる。
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+
+# 日本語（かな・漢字・全角記号）は1文字≒1トークンとして数える
+_CJK_RANGES = r"\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef"
+_CJK = re.compile(f"[{_CJK_RANGES}]")
+# 英数字の連続は4文字≒1トークン
+_ALNUM = re.compile(r"[A-Za-z0-9]+")
+# 上記以外の記号（空白以外）は1文字≒1トークン
+_SYMBOL = re.compile(rf"[^\sA-Za-z0-9{_CJK_RANGES}]")
+
+# 切り詰めた文字列の末尾
+_ELLIPSIS = "…"
+
+# num_ctxの丸め単位（値が変わるとOllamaがモデルを再ロードするため粗く丸める）
+CTX_STEP = 512
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数を近似的に見積もる
+    
+    履歴の同じ発言は毎ターン見積もられるため結果をキャッシュする。
+    
+    Args:
+        text: 対象文字列
+    
+    Returns:
+        推定トークン数
+    """
+    return _count_tokens(text)
+
+
+def _count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    alnum = sum(math.ceil(len(word) / 4) for word in _ALNUM.findall(text))
+    symbols = len(_SYMBOL.findall(text))
+    return cjk + alnum + symbols
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    推定トークン数が上限に収まるよう先頭側を残して切り詰める
+    
+    Args:
+        text: 対象文字列
+        max_tokens: 推定トークン数の上限
+    
+    Returns:
+        切り詰め後の文字列（切り詰めた場合は末尾に"…"）
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 上限に収まる最長の先頭部分を二分探索（途中の文字列はキャッシュしない）
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if _count_tokens(text[:mid]) + 1 <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + _ELLIPSIS
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    """キャラクター別のトークン予算"""
+    
+    # 会話履歴の上限
+    history_tokens: int = 1024
+    # ユーザー入力の上限（超過分は切り詰め）
+    input_tokens: int = 512
+    # 追加情報（検索結果等）の上限
+    extra_tokens: int = 0
+    # ローリング要約の上限
+    summary_tokens: int = 0
+    # 応答の最大生成トークン数
+    num_predict: int = 512
+
+
+class PromptTemplate:
+    """キャラクター別プロンプトテンプレート"""
+    
+    _BODY = "{summary}これまでの会話:\n{history}\n\nユーザーの入力: {user_input}\n\n{extra}{instruction}"
+    
+    def __init__(self, persona: str, instruction: str, extra_label: str = ""):
+        """
+        初期化
+        
+        Args:
+            persona: ペルソナ（プロンプト先頭に置く固定部分）
+            instruction: 末尾の指示文
+            extra_label: 追加情報の見出し（"検索結果"等）
+        """
+        # 固定部分は構築時に一度だけ組み立てる
+        self.prefix = persona.strip() + "\n\n"
+        self.instruction = instruction.strip()
+        self.extra_label = extra_label
+        self.fixed_tokens = estimate_tokens(self.prefix) + estimate_tokens(
+            self._BODY.format(summary="", history="", user_input="", extra="", instruction=self.instruction)
+        )
+    
+    def render(self, history_text: str, user_input: str, extra: str = "",
+               summary: str = "") -> str:
+        """
+        プロンプトを組み立て
+        
+        Args:
+            history_text: フォーマット済み会話履歴
+            user_input: ユーザー入力
+            extra: 追加情報（空の場合は省略）
+            summary: 履歴より前の会話の要約（空の場合は省略）
+        
+        Returns:
+            固定プレフィックスで始まるプロンプト
+        """
+        extra_text = f"{self.extra_label}:\n{extra}\n\n" if extra else ""
+        summary_text = f"これまでの要約:\n{summary}\n\n" if summary else ""
+        return self.prefix + self._BODY.format(
+            summary=summary_text,
+            history=history_text,
+            user_input=user_input,
+            extra=extra_text,
+            instruction=self.instruction
+        )
+
+
+# キャラクター別テンプレート（ペルソナ部分は変更するとプレフィックスキャッシュが無効になる）
+CHARACTER_TEMPLATES: Dict[str, PromptTemplate] = {
+    "lumina": PromptTemplate(
+        persona="""あなたは親しみやすく洞察力のあるAI「ルミナ」です。
+あなたの役割は司会進行と雑談です。
+
+性格・口調:
+- フレンドリーで明るい
+- ユーザーの感情に寄り添う
+- 話題を広げるのが得意
+- 自然な会話の流れを作る""",
+        instruction="""上記を踏まえて、自然で温かみのある返答をしてください。
+返答のみを出力してください。"""
+    ),
+    "claris": PromptTemplate(
+        persona="""あなたは理論的で穏やかなAI「クラリス」です。
+あなたの役割は解説と理論的な整理です。
+
+性格・口調:
+- 穏やかで丁寧
+- 論理的・構造的に説明
+- 背景や理由を重視
+- 分かりやすく整理するのが得意""",
+        instruction="""上記の内容を丁寧に整理し、背景や構造を含めて解説してください。
+返答のみを出力してください。"""
+    ),
+    "nox": PromptTemplate(
+        persona="""あなたはクールで情報整理に優れたAI「ノクス」です。
+あなたの役割は検証と要約です。
+
+性格・口調:
+- クールで簡潔
+- 疑問を持ちながら検証
+- 情報の正確性を重視
+- 要点を的確にまとめる""",
+        instruction="""上記を踏まえて、正確で簡潔な返答をしてください。
+返答のみを出力してください。""",
+        extra_label="検索結果"
+    ),
+}
+
+
+# 下書き→改訂カスケードの改訂指示（元のプロンプトの後ろに付けるため、プレフィックスは共有される）
+REFINE_SUFFIX = """
+
+以下は先に作成した下書きです。
+下書き:
+{draft}
+
+下書きの誤りを正し、不足している背景や理由を補って、より深く正確な返答に書き直してください。
+返答のみを出力してください。"""
+
+
+class PromptBuilder:
+    """トークン予算付きプロンプトビルダー"""
+    
+    def __init__(self, budgets: Dict[str, PromptBudget], character_models: Dict[str, str],
+                 templates: Optional[Dict[str, PromptTemplate]] = None,
+                 draft_models: Optional[Dict[str, str]] = None,
+                 fallback_models: Optional[Dict[str, str]] = None):
+        """
+        初期化
+        
+        Args:
+            budgets: キャラクターキーごとのトークン予算
+            character_models: キャラクターキーごとのモデル名（num_ctxの共有判定用）
+            templates: キャラクターキーごとのテンプレート（省略時はCHARACTER_TEMPLATES）
+            draft_models: カスケード有効なキャラクターキーごとの下書きモデル名
+            fallback_models: SLO超過で降格し得るキャラクターキーごとの降格先モデル名
+        """
+        self.templates = templates or CHARACTER_TEMPLATES
+        self.budgets = budgets
+        self.character_models = character_models
+        self.draft_models = draft_models or {}
+        self.fallback_models = fallback_models or {}
+    
+    def build(self, character_key: str, history: List[Dict[str, Any]],
+              user_input: str, extra: str = "", summary: str = "") -> str:
+        """
+        プロンプトを構築
+        
+        Args:
+            character_key: キャラクターキー（lumina/claris/nox）
+            history: 会話履歴（要約済みのターンを除く）
+            user_input: ユーザー入力
+            extra: 追加情報（検索結果等）
+            summary: 要約済みターンのローリング要約
+        
+        Returns:
+            プロンプト
+        """
+        template = self.templates[character_key]
+        budget = self.budget(character_key)
+        history_text = self.format_history(history, budget.history_tokens)
+        if extra and budget.extra_tokens:
+            extra = truncate_to_tokens(extra, budget.extra_tokens)
+        if summary and budget.summary_tokens:
+            summary = truncate_to_tokens(summary, budget.summary_tokens)
+        return template.render(
+            history_text,
+            truncate_to_tokens(user_input, budget.input_tokens),
+            extra,
+            summary
+        )
+    
+    def refine(self, character_key: str, prompt: str, draft: str) -> str:
+        """
+        カスケードの改訂プロンプトを構築
+        
+        Args:
+            character_key: キャラクターキー
+            prompt: 下書き生成に使ったプロンプト
+            draft: 下書き（num_predictを超える分は切り詰め）
+        
+        Returns:
+            改訂プロンプト
+        """
+        draft = truncate_to_tokens(draft, self.budget(character_key).num_predict)
+        return prompt + REFINE_SUFFIX.format(draft=draft)
+    
+    def budget(self, character_key: str) -> PromptBudget:
+        """キャラクターのトークン予算を取得"""
+        return self.budgets.get(character_key) or PromptBudget()
+    
+    def format_history(self, history: List[Dict[str, Any]], max_tokens: int) -> str:
+        """
+        会話履歴を新しい順に予算内まで残してフォーマット
+        
+        最新のターンだけで予算を超える場合は、そのターンを切り詰めて残す。
+        
+        Args:
+            history: 会話履歴
+            max_tokens: 推定トークン数の上限
+        
+        Returns:
+            "話者: 発言"を改行で連結した文字列
+        """
+        lines: List[str] = []
+        remaining = max_tokens
+        for turn in reversed(history):
+            line = f"{turn.get('speaker', 'User')}: {turn.get('msg', '')}"
+            # 改行1トークン分を含める
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                if not lines and remaining > 1:
+                    lines.append(truncate_to_tokens(line, remaining - 1))
+                break
+            lines.append(line)
+            remaining -= cost
+        return "\n".join(reversed(lines))
+    
+    def options(self, character_key: str, model: Optional[str] = None) -> Dict[str, int]:
+        """
+        Ollamaに渡すモデルオプションを取得
+        
+        Args:
+            character_key: キャラクターキー
+            model: 使用するモデル名（省略時はキャラクターのモデル、カスケードの下書き時に指定）
+        
+        Returns:
+            {'num_ctx', 'num_predict'}
+        """
+        return {
+            'num_ctx': self.model_num_ctx(model or self.character_models.get(character_key)),
+            'num_predict': self.budget(character_key).num_predict
+        }
+    
+    def model_num_ctx(self, model: Optional[str]) -> int:
+        """
+        モデルのnum_ctxを取得
+        
+        num_ctxが変わるとOllamaはモデルを再ロードするため、同じモデルを使う
+        キャラクター間では最大値で揃える。降格でこのモデルを使い得るキャラクターも含める
+        （含めないと降格時にプロンプトが収まらず、先頭の固定プレフィックスが切り捨てられる）。
+        
+        Args:
+            model: モデル名
+        
+        Returns:
+            CTX_STEP単位に切り上げたコンテキスト長
+        """
+        required = [
+            self._required_ctx(key)
+            for models in (self.character_models, self.draft_models, self.fallback_models)
+            for key, name in models.items()
+            if name == model and key in self.templates
+        ]
+        return max(required) if required else self._round_ctx(PromptBudget().history_tokens)
+    
+    def _required_ctx(self, character_key: str) -> int:
+        budget = self.budget(character_key)
+        total = (
+            self.templates[character_key].fixed_tokens
+            + budget.history_tokens
+            + budget.input_tokens
+            + budget.extra_tokens
+            + budget.summary_tokens
+            + budget.num_predict
+        )
+        if character_key in self.draft_models:
+            # 改訂プロンプトは下書き（最大num_predict）を含む
+            total += budget.num_predict + estimate_tokens(REFINE_SUFFIX)
+        return self._round_ctx(total)
+    
+    @staticmethod
+    def _round_ctx(tokens: int) -> int:
+        return math.ceil(tokens / CTX_STEP) * CTX_STEP
+
+
+# キャラクターキーと使用モデルキーの対応（LLMNode.model_keyと同じ）
+CHARACTER_MODEL_KEYS = {"lumina": "fast", "claris": "medium", "nox": "search"}
+
+# グローバルインスタンス（シングルトン）
+_prompt_builder: Optional[PromptBuilder] = None
+
+
+def get_prompt_builder() -> PromptBuilder:
+    """
+    グローバルPromptBuilderインスタンスを取得
+    
+    Returns:
+        PromptBuilderインスタンス
+    """
+    global _prompt_builder
+    if _prompt_builder is None:
+        from config import config
+        
+        budgets = {
+            key: PromptBudget(
+                history_tokens=config.model.prompt_history_tokens[key],
+                input_tokens=config.model.prompt_input_tokens,
+                extra_tokens=config.model.prompt_search_tokens if key == "nox" else 0,
+                summary_tokens=config.system.summary_max_tokens if config.system.summary_enabled else 0,
+                num_predict=config.model.num_predict[key]
+            )
+            for key in CHARACTER_TEMPLATES
+        }
+        _prompt_builder = PromptBuilder(
+            budgets=budgets,
+            character_models={
+                key: config.model.models[model_key]
+                for key, model_key in CHARACTER_MODEL_KEYS.items()
+            },
+            draft_models={
+                key: config.model.models[config.model.cascade_draft_model]
+                for key, policy in config.model.cascade_policy.items()
+                if policy != "off"
+            },
+            fallback_models={
+                key: config.model.models[config.model.model_downgrade[model_key]]
+                for key, model_key in CHARACTER_MODEL_KEYS.items()
+                if config.model.model_downgrade_enabled
+                and config.model.model_slo_ms.get(model_key, 0) > 0
+                and config.model.model_downgrade.get(model_key) in config.model.models
+            }
+        )
+    return _prompt_builder
+
+
+def reset_prompt_builder():
+    """グローバルPromptBuilderをリセット"""
+    global _prompt_builder
+    _prompt_builder = None
@@ -0,0 +1,209 @@
+"""
+response_cache.py
+LLM応答キャッシュ
+
+モデル・キャラクター・構築済みプロンプトのハッシュをキーとした完全一致キャッシュ。
+プロセス内のLRU+TTLキャッシュを一次層、Redis（memory.redis_cache.RedisCache）を二次層とし、
+同一プロンプトに対するOllama呼び出しを省略する。
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from memory.redis_cache import RedisCache, get_redis_cache
+
+
+# Redisキーの名前空間
+KEY_PREFIX = "llm:response"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    キャッシュキー用にプロンプトを正規化
+    
+    Unicode正規化（NFKC）と連続空白の畳み込みのみを行い、内容は変更しない。
+    
+    Args:
+        prompt: 構築済みプロンプト
+    
+    Returns:
+        正規化済みプロンプト
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", prompt)).strip()
+
+
+def make_cache_key(model: str, character: str, prompt: str) -> str:
+    """
+    キャッシュキーを生成
+    
+    Args:
+        model: モデル名
+        character: キャラクター名
+        prompt: 構築済みプロンプト
+    
+    Returns:
+        "llm:response:{model}:{character}:{sha256}"
+    """
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{model}:{character}:{digest}"
+
+
+class ResponseCache:
+    """LLM応答キャッシュ（プロセス内LRU+TTL → Redis）"""
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600,
+                 redis_cache: Optional[RedisCache] = None, metrics=None, name: str = "llm"):
+        """
+        初期化
+        
+        Args:
+            max_entries: プロセス内キャッシュの最大件数（超過時はLRUで削除）
+            ttl_seconds: 有効期限（秒）
+            redis_cache: 二次層のRedisCache（Noneの場合はプロセス内のみ）
+            metrics: MetricsCollector（省略時はグローバルインスタンス）
+            name: メトリクス上のキャッシュ種別（llm/search）
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_cache = redis_cache
+        self._metrics = metrics
+        self.name = name
+        self._lock = threading.Lock()
+        # {key: (応答, 有効期限のmonotonic時刻)}
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+    
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            from metrics import get_metrics_collector
+            return get_metrics_collector()
+        return self._metrics
+    
+    @property
+    def remote_enabled(self) -> bool:
+        """Redis層が有効か（接続エラー後、再接続を確認するまでは無効）"""
+        return self.redis_cache is not None and self.redis_cache.is_available()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        キャッシュから応答を取得
+        
+        Args:
+            key: make_cache_key()で生成したキー
+        
+        Returns:
+            キャッシュ済み応答（無い場合None）
+        """
+        value, layer = self._get_local(key), "local"
+        if value is None and self.remote_enabled:
+            value, layer = self._get_remote(key), "redis"
+        self.metrics.record_cache_lookup(hit=value is not None, layer=layer, cache=self.name)
+        return value
+    
+    async def aget(self, key: str) -> Optional[str]:
+        """キャッシュから応答を取得（非同期、Redis参照はワーカースレッドで実行）"""
+        value, layer = self._get_local(key), "local"
+        if value is None and self.remote_enabled:
+            value, layer = await asyncio.to_thread(self._get_remote, key), "redis"
+        self.metrics.record_cache_lookup(hit=value is not None, layer=layer, cache=self.name)
+        return value
+    
+    def set(self, key: str, value: str):
+        """
+        応答をキャッシュに保存
+        
+        Args:
+            key: make_cache_key()で生成したキー
+            value: 応答全文
+        """
+        self._set_local(key, value)
+        if self.remote_enabled:
+            self.redis_cache.set(key, value, expire_seconds=self.ttl_seconds)
+    
+    async def aset(self, key: str, value: str):
+        """応答をキャッシュに保存（非同期、Redis書き込みはワーカースレッドで実行）"""
+        self._set_local(key, value)
+        if self.remote_enabled:
+            await asyncio.to_thread(
+                self.redis_cache.set, key, value, expire_seconds=self.ttl_seconds
+            )
+    
+    def clear(self):
+        """プロセス内キャッシュをクリア"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def _set_local(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        expires_at = time.monotonic() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _get_remote(self, key: str) -> Optional[str]:
+        """Redisから取得し、ヒット時はプロセス内キャッシュにも残存期限付きで保持"""
+        value = self.redis_cache.get(key)
+        if value is None:
+            return None
+        remaining = self.redis_cache.ttl(key)
+        self._set_local(key, value, remaining if remaining and remaining > 0 else None)
+        return value
+
+
+# グローバルインスタンス（シングルトン）
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    グローバルResponseCacheインスタンスを取得
+    
+    Returns:
+        ResponseCacheインスタンス
+    """
+    global _response_cache
+    if _response_cache is None:
+        from config import config
+        
+        redis_cache = get_redis_cache(
+            host=config.database.redis_host,
+            port=config.database.redis_port,
+            db=config.database.redis_db,
+            password=config.database.redis_password or None
+        )
+        _response_cache = ResponseCache(
+            max_entries=config.model.response_cache_max_entries,
+            ttl_seconds=config.model.response_cache_ttl,
+            redis_cache=redis_cache
+        )
+    return _response_cache
+
+
+def reset_response_cache():
+    """グローバルResponseCacheをリセット"""
+    global _response_cache
+    _response_cache = None
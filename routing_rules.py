@@ -0,0 +1,218 @@
+"""
+routing_rules.py
+キーワードルールによるルーティング・意図判定
+
+設定のキーワードルールを一度だけAho-Corasickオートマトンにコンパイルし、
+入力1件につき正規化（NFKC・小文字化・カタカナ→ひらがな）と走査を1回だけ行って
+全ての一致を優先度付きで返す。ルール数が増えても1入力あたりの照合コストは入力長にのみ比例する。
+
+ルールのtargetはキャラクターキー（lumina/claris/nox）または意図（search等）で、
+RouterNodeとNoxNodeは同じコンパイル済みルールと走査結果を共有する。
+"""
+
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# カタカナ（ァ〜ヶ）→ひらがな
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+
+def normalize_text(text: str) -> str:
+    """
+    照合用にテキストを正規化
+    
+    NFKC正規化（半角カナ・全角英数字の統一）、小文字化、カタカナのひらがな化を行う。
+    
+    Args:
+        text: 対象テキスト
+    
+    Returns:
+        正規化済みテキスト
+    """
+    return unicodedata.normalize("NFKC", text).lower().translate(_KATAKANA_TO_HIRAGANA)
+
+
+@dataclass(frozen=True)
+class RoutingRule:
+    """キーワードルール"""
+    
+    # 照合するキーワード（正規化前の表記で指定）
+    keyword: str
+    # 一致時の対象（キャラクターキーまたは意図）
+    target: str
+    # 優先度（大きいほど優先、同値の場合は先に定義したルールを優先）
+    priority: int = 0
+
+
+@dataclass(frozen=True)
+class RuleMatch:
+    """ルールの一致結果"""
+    
+    rule: RoutingRule
+    # 定義順のインデックス
+    order: int
+    # 正規化済みテキスト上の一致位置
+    start: int
+    end: int
+
+
+class RuleMatcher:
+    """複数キーワードの一括照合（Aho-Corasick）"""
+    
+    def __init__(self, rules: Iterable[RoutingRule], cache_size: int = 1024):
+        """
+        初期化（ルールをオートマトンにコンパイル）
+        
+        Args:
+            rules: キーワードルール（空のキーワードは無視）
+            cache_size: 走査結果をキャッシュする入力の件数
+        """
+        self.rules: List[RoutingRule] = list(rules)
+        # 状態ごとの遷移・失敗遷移・出力（ルールインデックス）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._lengths: List[int] = []
+        self._compile()
+        # ルーターとノードで同じ入力を照合するため走査結果をキャッシュ
+        self._cached_scan = lru_cache(maxsize=cache_size)(self.scan)
+    
+    def _compile(self):
+        for index, rule in enumerate(self.rules):
+            keyword = normalize_text(rule.keyword)
+            self._lengths.append(len(keyword))
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+        
+        # 幅優先で失敗遷移を設定し、失敗先の出力を併合
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail_target if fail_target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def scan(self, text: str) -> Tuple[RuleMatch, ...]:
+        """
+        テキストを1回走査して全ての一致を取得（キャッシュなし）
+        
+        Args:
+            text: 入力テキスト（内部で正規化する）
+        
+        Returns:
+            出現位置順の一致結果
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        state = 0
+        for position, char in enumerate(normalize_text(text), 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                matches.append(RuleMatch(
+                    self.rules[index], index, position - self._lengths[index], position
+                ))
+        return tuple(matches)
+    
+    def find_all(self, text: str) -> Tuple[RuleMatch, ...]:
+        """
+        全ての一致を取得（同じ入力の走査結果はキャッシュを使用）
+        
+        Args:
+            text: 入力テキスト
+        
+        Returns:
+            出現位置順の一致結果
+        """
+        return self._cached_scan(text)
+    
+    def best(self, text: str, targets: Optional[Iterable[str]] = None) -> Optional[RoutingRule]:
+        """
+        最も優先度の高い一致ルールを取得
+        
+        Args:
+            text: 入力テキスト
+            targets: 対象を限定する場合のtarget一覧
+        
+        Returns:
+            一致ルール（一致しない場合None）
+        """
+        allowed = set(targets) if targets is not None else None
+        candidates = [
+            match for match in self.find_all(text)
+            if allowed is None or match.rule.target in allowed
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda match: (-match.rule.priority, match.order)).rule
+    
+    def matches_target(self, text: str, target: str) -> bool:
+        """
+        指定targetのルールに一致するか
+        
+        Args:
+            text: 入力テキスト
+            target: target名
+        
+        Returns:
+            一致した場合True
+        """
+        return any(match.rule.target == target for match in self.find_all(text))
+    
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+def parse_rules(rules: Iterable[Dict[str, Any]]) -> Tuple[RoutingRule, ...]:
+    """
+    設定のルール定義（辞書のリスト）を変換
+    
+    Args:
+        rules: {'keyword', 'target', 'priority'(省略可)} のリスト
+    
+    Returns:
+        RoutingRuleのタプル
+    """
+    return tuple(
+        RoutingRule(str(rule['keyword']), str(rule['target']), int(rule.get('priority', 0)))
+        for rule in rules
+    )
+
+
+@lru_cache(maxsize=8)
+def _compile_rules(rules: Tuple[RoutingRule, ...]) -> RuleMatcher:
+    return RuleMatcher(rules)
+
+
+def compile_rules(rules: Iterable[Dict[str, Any]]) -> RuleMatcher:
+    """
+    設定のルール定義をコンパイル
+    
+    同じルール定義からは同じRuleMatcherを返す（コンパイルと走査結果のキャッシュを共有）。
+    
+    Args:
+        rules: {'keyword', 'target', 'priority'(省略可)} のリスト
+    
+    Returns:
+        RuleMatcher インスタンス
+    """
+    return _compile_rules(parse_rules(rules))
@@ -1,14 +1,21 @@
 """ChatService - Phase 1-3統合チャットサービス.
 
-FastAPI（非同期）とLangGraph（同期）を橋渡しする統合レイヤー。
+FastAPI（非同期）からLangGraphをネイティブ非同期（ainvoke/astream）で実行する統合レイヤー。
 """
 
 import asyncio
 import logging
+import weakref
+from contextlib import aclosing
 from datetime import datetime
-from typing import Any, AsyncGenerator, Dict, Optional
+from functools import partial
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Optional
 
+from config import config
+from llm_scheduler import PRIORITY_FREE
 from main import MultiLLMChat
+from services.input_coalescer import InputCoalescer
+from validators import InputValidator
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +25,8 @@ class ChatService:
 
     機能:
     - 非同期会話実行（Phase 3 FastAPI → Phase 1 LangGraph）
-    - ユーザー別セッション管理
+    - ユーザー別セッション管理（セッション単位で直列化、セッション間は並列）
+    - 同一セッションの連続入力の合流（開始前のターンにまとめて1回の生成にする）
     - ストリーミング応答対応
     - マルチユーザー対応（セッションID変換）
     """
@@ -31,6 +39,21 @@ class ChatService:
 
         # ユーザーセッションマップ: {user_id: {session_id: Phase1SessionID}}
         self.user_sessions: Dict[str, Dict[str, str]] = {}
+
+        # セッション別ロック: {phase1_session_id: asyncio.Lock}
+        # 待機中・実行中のターンが参照している間だけ保持される
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+
+        # 連続入力の合流（ターンの直列実行もセッション別ロックで行う）
+        self.coalescer = InputCoalescer(
+            self._get_session_lock,
+            enabled=config.api.input_coalesce_enabled,
+            window_ms=config.api.input_coalesce_window_ms,
+            supersede=config.api.input_supersede_enabled,
+            max_chars=InputValidator.MAX_MESSAGE_LENGTH,
+        )
         logger.info("ChatService initialized")
 
     async def chat(
@@ -39,14 +62,18 @@ class ChatService:
         session_id: str,
         user_input: str,
         character: Optional[str] = None,
+        priority: int = PRIORITY_FREE,
     ) -> Dict[str, Any]:
         """非同期会話実行.
 
+        同一セッションの開始前のターンがある場合は入力を合流させ、合流したターンの応答を返す。
+
         Args:
             user_id: ユーザーID（JWT認証から取得）
             session_id: セッションID（クライアント指定）
             user_input: ユーザー入力テキスト
             character: 指定キャラクター（optional）
+            priority: LLMスケジューラの優先度クラス（priority_for_rolesで決定）
 
         Returns:
             Dict[str, Any]: 会話レスポンス
@@ -58,7 +85,8 @@ class ChatService:
                 'metadata': {
                     'model': モデル名,
                     'tokens': トークン数,
-                    'processing_time_ms': 処理時間（ミリ秒）
+                    'processing_time_ms': 処理時間（ミリ秒）,
+                    'coalesced_inputs': 合流した入力数
                 }
             }
 
@@ -74,32 +102,23 @@ class ChatService:
                 f"Chat request: user={user_id}, session={session_id}, phase1_session={phase1_session_id}"
             )
 
-            # Phase 1同期処理を非同期実行（asyncio.to_thread）
-            result = await asyncio.to_thread(
-                self.multi_llm_chat.chat,
-                user_input=user_input,
-                session_id=phase1_session_id,
-                character=character,
-            )
-
-            # 処理時間計算
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            # LangGraphを非同期実行（スレッドプールを経由しない）
+            # 同一セッションのターンは到着順に1件ずつ実行（開始前のターンには入力を合流）
+            result: Dict[str, Any] = {}
+            async with aclosing(self.coalescer.submit(
+                phase1_session_id, user_input, character, priority,
+                partial(self._achat_events, phase1_session_id),
+            )) as events:
+                async for event in events:
+                    if event.get("type") == "done":
+                        result = event
 
             # レスポンス整形（Phase 3形式）
-            response = {
-                "session_id": session_id,  # クライアント指定のセッションIDを返却
-                "response": result["response"],
-                "character": result.get("speaker", character or "lumina"),  # speakerまたは指定キャラクター
-                "timestamp": datetime.now().isoformat(),
-                "metadata": {
-                    "model": result.get("metadata", {}).get("model", "unknown"),
-                    "tokens": result.get("metadata", {}).get("tokens", 0),
-                    "processing_time_ms": int(processing_time),
-                },
-            }
+            response = self._build_response(result, session_id, character, start_time)
 
             logger.info(
-                f"Chat success: user={user_id}, character={response['character']}, time={processing_time:.2f}ms"
+                f"Chat success: user={user_id}, character={response['character']}, "
+                f"time={response['metadata']['processing_time_ms']}ms"
             )
             return response
 
@@ -113,6 +132,7 @@ class ChatService:
         session_id: str,
         user_input: str,
         character: Optional[str] = None,
+        priority: int = PRIORITY_FREE,
     ) -> AsyncGenerator[str, None]:
         """非同期ストリーミング会話.
 
@@ -121,31 +141,93 @@ class ChatService:
             session_id: セッションID
             user_input: ユーザー入力テキスト
             character: 指定キャラクター（optional）
+            priority: LLMスケジューラの優先度クラス（priority_for_rolesで決定）
 
         Yields:
-            str: 応答テキストの文字列（1文字ずつ）
+            str: LLMが生成したトークン差分（生成され次第）。
+            下書きの改訂はテキストのみでは表現できないため、改訂を扱うクライアントは
+            stream_chat_events()を使用すること。
+        """
+        streamed = False
+        async for event in self.stream_chat_events(
+            user_id, session_id, user_input, character, priority
+        ):
+            if event["type"] == "token":
+                streamed = True
+                yield event["delta"]
+            elif event["type"] == "done" and not streamed:
+                # トークンが流れなかった場合（入力検証エラー等）は応答全文を返す
+                yield event["response"]
+
+    async def stream_chat_events(
+        self,
+        user_id: str,
+        session_id: str,
+        user_input: str,
+        character: Optional[str] = None,
+        priority: int = PRIORITY_FREE,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """非同期ストリーミング会話（イベント形式）.
 
-        Notes:
-            現在は疑似ストリーミング（通常会話結果を分割）
-            TODO: LangGraphストリーミングサポート実装後に真のストリーミング対応
+        MultiLLMChat.astream_chatのトークンイベントを逐次中継する。
+        同一セッションの開始前のターンがある場合は入力を合流させ、合流したターンのイベントを中継する。
+        呼び出し元がキャンセル・acloseした場合（クライアント切断）は、合流した他の呼び出し元が
+        いなければグラフ実行とLLM生成も中断し、途中までの応答はcancelled付きで記録される。
+
+        Args:
+            user_id: ユーザーID
+            session_id: セッションID
+            user_input: ユーザー入力テキスト
+            character: 指定キャラクター（optional）
+            priority: LLMスケジューラの優先度クラス（priority_for_rolesで決定）
+
+        Yields:
+            Dict[str, Any]: ストリームイベント
+            - {'type': 'token', 'character': 発話キャラクター, 'delta': トークン差分}
+            - {'type': 'revision', 'character': 発話キャラクター}（下書きの改訂開始、以降のトークンで置き換える）
+            - {'type': 'done', **chat()と同形式のレスポンス}（最後に1回）
         """
         try:
-            logger.info(f"Stream chat request: user={user_id}, session={session_id}")
+            start_time = datetime.now()
+            phase1_session_id = self._get_phase1_session_id(user_id, session_id)
+            logger.info(
+                f"Stream chat request: user={user_id}, session={session_id}, phase1_session={phase1_session_id}"
+            )
 
-            # 通常会話実行
-            result = await self.chat(user_id, session_id, user_input, character)
-            response_text = result["response"]
+            chars = 0
+
+            async with aclosing(self.coalescer.submit(
+                phase1_session_id, user_input, character, priority,
+                partial(self._astream_events, phase1_session_id),
+            )) as events:
+                async for event in events:
+                    if event.get("type") == "token":
+                        chars += len(event["delta"])
+                        yield {
+                            "type": "token",
+                            "character": event.get("speaker", ""),
+                            "delta": event["delta"],
+                        }
+                    elif event.get("type") == "revision":
+                        yield {
+                            "type": "revision",
+                            "character": event.get("speaker", ""),
+                        }
+                    elif event.get("type") == "done":
+                        yield {
+                            "type": "done",
+                            **self._build_response(event, session_id, character, start_time),
+                        }
 
-            # 文字ごとにストリーミング（疑似ストリーミング）
-            for i, char in enumerate(response_text):
-                yield char
-                # ストリーミング効果（10ms間隔）
-                if i % 5 == 0:  # 5文字ごとにsleep（パフォーマンス最適化）
-                    await asyncio.sleep(0.01)
+            logger.info(
+                f"Stream chat completed: user={user_id}, chars={chars}"
+            )
 
+        except (asyncio.CancelledError, GeneratorExit):
             logger.info(
-                f"Stream chat completed: user={user_id}, chars={len(response_text)}"
+                f"Stream chat cancelled: user={user_id}, session={session_id}, chars={chars}"
             )
+            raise
 
         except Exception as e:
             logger.error(f"Stream chat error for user {user_id}: {e}", exc_info=True)
@@ -255,10 +337,12 @@ class ChatService:
             phase1_session_id = self._get_phase1_session_id(user_id, session_id)
 
             # Phase 1記憶マネージャーでセッションクリア
-            await asyncio.to_thread(
-                self.multi_llm_chat.memory.clear_session,
-                session_id=phase1_session_id,
-            )
+            async with self._get_session_lock(phase1_session_id):
+                await asyncio.to_thread(
+                    self.multi_llm_chat.memory.clear_session,
+                    session_id=phase1_session_id,
+                )
+                self.multi_llm_chat.sessions.remove(phase1_session_id)
 
             # ユーザーセッションマップから削除
             if (
@@ -274,6 +358,82 @@ class ChatService:
             logger.error(f"Clear session error for user {user_id}: {e}", exc_info=True)
             raise
 
+    async def _achat_events(
+        self, phase1_session_id: str, user_input: str, character: Optional[str], priority: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """MultiLLMChat.achatをイベント形式で実行（合流ターンの実行関数）.
+
+        Yields:
+            Dict[str, Any]: {'type': 'done', **achat()の戻り値}
+        """
+        result = await self.multi_llm_chat.achat(
+            user_input=user_input,
+            session_id=phase1_session_id,
+            character=character,
+            priority=priority,
+        )
+        yield {"type": "done", **result}
+
+    def _astream_events(
+        self, phase1_session_id: str, user_input: str, character: Optional[str], priority: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """MultiLLMChat.astream_chatを実行（合流ターンの実行関数）."""
+        return self.multi_llm_chat.astream_chat(
+            user_input=user_input,
+            session_id=phase1_session_id,
+            character=character,
+            priority=priority,
+        )
+
+    def _build_response(
+        self,
+        result: Dict[str, Any],
+        session_id: str,
+        character: Optional[str],
+        start_time: datetime,
+    ) -> Dict[str, Any]:
+        """Phase 1の応答をPhase 3形式に整形.
+
+        Args:
+            result: MultiLLMChat.chat()の戻り値
+            session_id: クライアント指定のセッションID
+            character: 指定キャラクター
+            start_time: 処理開始時刻
+
+        Returns:
+            Dict[str, Any]: Phase 3形式のレスポンス
+        """
+        # 処理時間計算
+        processing_time = (datetime.now() - start_time).total_seconds() * 1000
+
+        return {
+            "session_id": session_id,  # クライアント指定のセッションIDを返却
+            "response": result["response"],
+            "character": result.get("speaker", character or "lumina"),  # speakerまたは指定キャラクター
+            "timestamp": datetime.now().isoformat(),
+            "metadata": {
+                "model": result.get("metadata", {}).get("model", "unknown"),
+                "tokens": result.get("metadata", {}).get("tokens", 0),
+                "processing_time_ms": int(processing_time),
+                "coalesced_inputs": result.get("coalesced_inputs", 1),
+            },
+        }
+
+    def _get_session_lock(self, phase1_session_id: str) -> asyncio.Lock:
+        """セッション別ロック取得（存在しない場合は作成）.
+
+        Args:
+            phase1_session_id: Phase 1用セッションID
+
+        Returns:
+            asyncio.Lock: セッションロック
+        """
+        lock = self._session_locks.get(phase1_session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[phase1_session_id] = lock
+        return lock
+
     def _get_phase1_session_id(self, user_id: str, session_id: str) -> str:
         """ユーザー専用Phase 1セッションID取得.
 
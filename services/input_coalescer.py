@@ -0,0 +1,221 @@
+"""InputCoalescer - 同一セッションの連続入力の合流.
+
+短い入力が立て続けに届いた場合、開始前のターン（合流窓の待機中・先行ターンの完了待ち）に
+後続の入力をまとめ、1回のユーザーターン（1回のグラフ実行・LLM生成）として実行する。
+合流したリクエストは全て同じ応答イベントを受け取る。
+
+ターンはセッションごとのロックを取得してから開始し、開始後の入力は次のターンとして待機する。
+supersede有効時は、生成中のターンに後続の入力が届いた場合に生成を打ち切り（途中までの応答は
+cancelled付きで記録される）、後続の入力で新しいターンを開始する。打ち切られたターンの呼び出し元は
+revisionイベントの後、新しいターンの応答を受け取る。
+
+ターンは呼び出し元と独立したタスクで実行し、全ての呼び出し元が離脱（切断）した時点でキャンセルする。
+"""
+
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 合流した入力の区切り
+INPUT_SEPARATOR = "\n"
+
+# イベントストリームの終端
+_END = object()
+
+# ターンの実行関数: (ユーザー入力, 指定キャラクター, 優先度) → MultiLLMChat形式のイベント
+TurnRunner = Callable[[str, Optional[str], int], AsyncIterator[Dict[str, Any]]]
+
+
+class _Subscriber:
+    """ターンの応答イベントを受け取る呼び出し元"""
+    
+    def __init__(self, turn: "_Turn"):
+        self.turn = turn
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+
+class _Turn:
+    """合流待ち・実行中の1ターン"""
+    
+    def __init__(self, session_id: str, character: Optional[str], priority: int, runner: TurnRunner):
+        self.session_id = session_id
+        self.character = character
+        self.priority = priority
+        self.runner = runner
+        self.inputs: List[str] = []
+        self.subscribers: List[_Subscriber] = []
+        self.started = False
+        self.task: Optional[asyncio.Task] = None
+        # 送出済みトークンの最後の発話者（打ち切り時のrevisionイベント用）
+        self.streamed_speaker: Optional[str] = None
+    
+    def publish(self, item: Any):
+        """全ての呼び出し元へイベント（または例外・終端）を送る"""
+        if isinstance(item, dict):
+            if item.get("type") == "token":
+                self.streamed_speaker = item.get("speaker", "")
+            elif item.get("type") == "done":
+                item = {**item, "coalesced_inputs": len(self.inputs)}
+        for subscriber in self.subscribers:
+            subscriber.queue.put_nowait(item)
+
+
+class InputCoalescer:
+    """セッション単位の入力合流"""
+    
+    def __init__(self, get_lock: Callable[[str], asyncio.Lock], enabled: bool = True,
+                 window_ms: float = 0, supersede: bool = False,
+                 max_chars: Optional[int] = None, metrics=None):
+        """
+        初期化
+        
+        Args:
+            get_lock: セッションID → セッションロック（ターンの直列実行に使用）
+            enabled: Falseの場合は合流せず、呼び出し元でそのまま実行する
+            window_ms: ターン開始前に後続の入力を待つ時間（ミリ秒、0の場合は先行ターンの完了待ちの間のみ合流）
+            supersede: 生成中のターンを後続の入力で打ち切る
+            max_chars: 合流後の入力の最大文字数（超える場合は合流せず次のターンにする）
+            metrics: MetricsCollector（省略時はグローバルインスタンス）
+        """
+        self.get_lock = get_lock
+        self.enabled = enabled
+        self.window_ms = window_ms
+        self.supersede = supersede
+        self.max_chars = max_chars
+        self._metrics = metrics
+        # セッションID → 最新の（合流先候補の）ターン
+        self._turns: Dict[str, _Turn] = {}
+    
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            from metrics import get_metrics_collector
+            return get_metrics_collector()
+        return self._metrics
+    
+    async def submit(self, session_id: str, user_input: str, character: Optional[str],
+                     priority: int, runner: TurnRunner) -> AsyncIterator[Dict[str, Any]]:
+        """
+        入力を送信し、その入力を含むターンのイベントを受け取る
+        
+        Args:
+            session_id: セッションID
+            user_input: ユーザー入力
+            character: 指定キャラクター（指定が異なる入力は合流しない）
+            priority: LLMスケジューラの優先度クラス（合流時は高い方を使う）
+            runner: ターンの実行関数（合流先のターンが既にある場合は使われない）
+        
+        Yields:
+            runnerのイベント（doneイベントには合流した入力数coalesced_inputsを付加）
+        """
+        if not self.enabled:
+            async with self.get_lock(session_id), aclosing(runner(user_input, character, priority)) as events:
+                async for event in events:
+                    yield event
+            return
+        
+        subscriber = self._subscribe(session_id, user_input, character, priority, runner)
+        try:
+            while True:
+                item = await subscriber.queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            await self._unsubscribe(subscriber)
+    
+    def _subscribe(self, session_id: str, user_input: str, character: Optional[str],
+                   priority: int, runner: TurnRunner) -> _Subscriber:
+        """入力を合流先のターンに追加（合流できない場合は新しいターンを登録）"""
+        turn = self._turns.get(session_id)
+        if turn is not None and turn.character == character and self._fits(turn, user_input):
+            if not turn.started:
+                turn.inputs.append(user_input)
+                turn.priority = min(turn.priority, priority)
+                self.metrics.record_input_coalesced()
+                logger.info(f"Input coalesced: session={session_id}, inputs={len(turn.inputs)}")
+                return self._add_subscriber(turn)
+            if self.supersede:
+                successor = self._start(session_id, user_input, character, priority, runner)
+                self._supersede(turn, successor)
+                return self._add_subscriber(successor)
+        
+        return self._add_subscriber(self._start(session_id, user_input, character, priority, runner))
+    
+    def _fits(self, turn: _Turn, user_input: str) -> bool:
+        """合流後の入力が最大文字数以内か"""
+        if self.max_chars is None:
+            return True
+        merged = sum(len(text) for text in turn.inputs) + len(INPUT_SEPARATOR) * len(turn.inputs)
+        return merged + len(user_input) <= self.max_chars
+    
+    def _add_subscriber(self, turn: _Turn) -> _Subscriber:
+        subscriber = _Subscriber(turn)
+        turn.subscribers.append(subscriber)
+        return subscriber
+    
+    def _start(self, session_id: str, user_input: str, character: Optional[str],
+               priority: int, runner: TurnRunner) -> _Turn:
+        """新しいターンを登録して実行タスクを開始"""
+        turn = _Turn(session_id, character, priority, runner)
+        turn.inputs.append(user_input)
+        self._turns[session_id] = turn
+        turn.task = asyncio.ensure_future(self._run(turn))
+        return turn
+    
+    def _supersede(self, turn: _Turn, successor: _Turn):
+        """生成中のターンを打ち切り、呼び出し元を後続のターンへ移す"""
+        for subscriber in turn.subscribers:
+            if turn.streamed_speaker is not None:
+                subscriber.queue.put_nowait({"type": "revision", "speaker": turn.streamed_speaker})
+            subscriber.turn = successor
+            successor.subscribers.append(subscriber)
+        successor.priority = min(successor.priority, turn.priority)
+        turn.subscribers = []
+        turn.task.cancel()
+        self.metrics.record_turn_superseded()
+        logger.info(f"Turn superseded: session={turn.session_id}")
+    
+    async def _unsubscribe(self, subscriber: _Subscriber):
+        """呼び出し元の離脱（最後の呼び出し元の場合はターンをキャンセルし、終了を待つ）"""
+        turn = subscriber.turn
+        if subscriber in turn.subscribers:
+            turn.subscribers.remove(subscriber)
+        if turn.subscribers or turn.task.done():
+            return
+        
+        if self._turns.get(turn.session_id) is turn:
+            del self._turns[turn.session_id]
+        turn.task.cancel()
+        await asyncio.wait([turn.task])
+    
+    async def _run(self, turn: _Turn):
+        """ターンの実行（合流窓の待機 → セッションロック取得 → runner）"""
+        try:
+            if self.window_ms > 0:
+                await asyncio.sleep(self.window_ms / 1000)
+            
+            async with self.get_lock(turn.session_id):
+                # 以降の入力は合流しない
+                turn.started = True
+                user_input = INPUT_SEPARATOR.join(turn.inputs)
+                async with aclosing(turn.runner(user_input, turn.character, turn.priority)) as events:
+                    async for event in events:
+                        turn.publish(event)
+            turn.publish(_END)
+        
+        except asyncio.CancelledError:
+            # 呼び出し元は全て離脱済み、または後続のターンへ移動済み
+            raise
+        
+        except Exception as e:
+            turn.publish(e)
+        
+        finally:
+            if self._turns.get(turn.session_id) is turn:
+                del self._turns[turn.session_id]
@@ -0,0 +1,196 @@
+"""
+single_flight.py
+同一LLMリクエストの集約（single-flight）
+
+同じ(モデル, プロンプト)の生成が進行中の場合、後続のリクエストは新たに生成せず
+進行中の生成（フライト）の完了を待って結果を共有する。
+ストリーミング中のフライトに合流した場合は、それまでのトークンを再生した上で
+以降のトークンを同じ順序で受け取る。
+同期（スレッド）・非同期（イベントループ）どちらの呼び出し元も同じフライトに合流できる。
+"""
+
+import asyncio
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from response_cache import normalize_prompt
+
+
+class FlightAbandoned(Exception):
+    """先行リクエストがキャンセル等で結果を出さずに終了した"""
+
+
+def make_flight_key(model: str, prompt: str) -> str:
+    """
+    フライトキーを生成
+    
+    Args:
+        model: モデル名
+        prompt: 構築済みプロンプト
+    
+    Returns:
+        モデル名とプロンプトハッシュからなるキー
+    """
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class Flight:
+    """進行中の1回の生成"""
+    
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[str] = []
+        self.done = False
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self._cond = threading.Condition()
+        self._async_events: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+    
+    def emit(self, delta: str):
+        """トークン差分を追加して合流者へ通知（先行リクエストが呼ぶ）"""
+        with self._cond:
+            self.chunks.append(delta)
+            self._notify()
+    
+    def _finish(self, result: Optional[str], error: Optional[BaseException]):
+        with self._cond:
+            self.done = True
+            self.result = result
+            self.error = error
+            self._notify()
+    
+    def _notify(self):
+        """待機中の合流者を起こす（_cond保持中に呼ぶこと）"""
+        self._cond.notify_all()
+        for loop, event in self._async_events:
+            loop.call_soon_threadsafe(event.set)
+    
+    def _take(self, index: int) -> Tuple[List[str], bool]:
+        """index以降のトークンと完了状態を取得（_cond保持中に呼ぶこと）"""
+        return self.chunks[index:], self.done
+    
+    def _outcome(self) -> str:
+        if self.error is not None:
+            raise self.error
+        return self.result
+    
+    def wait(self, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        フライトの完了を待って結果を取得（同期）
+        
+        Args:
+            on_token: 指定時は受信済み・以降のトークン差分を順に通知
+        
+        Returns:
+            生成結果
+        
+        Raises:
+            FlightAbandoned: 先行リクエストが結果を出さずに終了した場合
+        """
+        index = 0
+        while True:
+            with self._cond:
+                while len(self.chunks) == index and not self.done:
+                    self._cond.wait()
+                new, done = self._take(index)
+            index += len(new)
+            if on_token is not None:
+                for delta in new:
+                    on_token(delta)
+            if done:
+                return self._outcome()
+    
+    async def await_result(self, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """フライトの完了を待って結果を取得（非同期）。引数・戻り値はwait()と同じ。"""
+        subscription = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            self._async_events.append(subscription)
+        try:
+            index = 0
+            while True:
+                with self._cond:
+                    new, done = self._take(index)
+                    if not new and not done:
+                        subscription[1].clear()
+                index += len(new)
+                if on_token is not None:
+                    for delta in new:
+                        on_token(delta)
+                if done:
+                    return self._outcome()
+                if not new:
+                    await subscription[1].wait()
+        finally:
+            with self._cond:
+                self._async_events.remove(subscription)
+
+
+class SingleFlight:
+    """フライトの登録簿"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Flight] = {}
+    
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        """
+        フライトに合流（進行中のものが無ければ新規に開始）
+        
+        Args:
+            key: make_flight_key()で生成したキー
+        
+        Returns:
+            (フライト, 先行リクエストかどうか)
+            先行リクエストは生成後に必ずcomplete()を呼ぶこと
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                return flight, False
+            flight = self._flights[key] = Flight(key)
+            return flight, True
+    
+    def complete(self, flight: Flight, result: Optional[str] = None,
+                 error: Optional[BaseException] = None):
+        """
+        フライトを完了して登録簿から外す
+        
+        Args:
+            flight: join()で先行リクエストとして得たフライト
+            result: 生成結果
+            error: 失敗時の例外（合流者にも送出される）
+        """
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight._finish(result, error)
+    
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+# グローバルインスタンス（シングルトン）
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    グローバルSingleFlightインスタンスを取得
+    
+    Returns:
+        SingleFlightインスタンス
+    """
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+def reset_single_flight():
+    """グローバルSingleFlightをリセット"""
+    global _single_flight
+    _single_flight = None
@@ -4,6 +4,9 @@ Redis導入前後の性能比較
 """
 import pytest
 import time
+import tracemalloc
+from memory.base import MemoryConfig, MemoryItem
+from memory.long_term import LongTermMemory
 from memory.mid_term import MidTermMemory
 from metrics import get_metrics_collector
 import statistics
@@ -183,6 +186,124 @@ class TestPhase2Performance:
         # クリーンアップ
         for i in range(1000):
             mid_term_redis.delete(f"memory:test_{i}")
+    
+    
+    def test_write_scaling(self, tmp_path):
+        """保存件数が100万件まで増えても1件の書き込み時間が一定であること"""
+        config = MemoryConfig()
+        config.mid_term_max_items = 2_000_000
+        memory = MidTermMemory(config=config, db_path=str(tmp_path / "mid_term.db"), redis_enabled=False)
+        
+        def measure(prefix):
+            times = []
+            for i in range(200):
+                start = time.perf_counter()
+                memory.store(f"{prefix}:{i}", {"turn": i, "data": "test"},
+                             {"type": "bench", "session_id": f"s{i % 10}"})
+                times.append(time.perf_counter() - start)
+            return statistics.median(times) * 1000  # ms
+        
+        def fill(start, stop):
+            # 計測対象外の件数はSQLで一括投入
+            with memory._transaction() as conn:
+                conn.execute("""
+                    WITH RECURSIVE seq(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < ?)
+                    INSERT INTO mid_term_items
+                    SELECT 'bulk:' || i, '{"index": ' || i || '}', '{}', 'bulk', 's' || (i % 1000),
+                           ?, ? + i * 1e-6, 0
+                    FROM seq
+                """, (start, stop, time.time(), time.time() - 3600))
+        
+        results = {}
+        loaded = 0
+        for size in (10_000, 100_000, 1_000_000):
+            fill(loaded, size)
+            loaded = size
+            results[size] = measure(f"perf:{size}")
+        
+        print("\n=== 件数別の書き込み時間（中央値）===")
+        for size, median in results.items():
+            print(f"{size:>9,}件: {median:.3f}ms")
+        
+        assert memory.count() == 1_000_000 + 600
+        # 件数が100倍でも書き込み時間はほぼ一定（全件書き直しの場合は件数に比例する）
+        assert results[1_000_000] < results[10_000] * 3 + 0.5
+        memory.close()
+
+
+class TestMemoryItemPerformance:
+    """記憶アイテム表現のメモリ・スループットテスト"""
+    
+    SIZE = 100_000
+    
+    @staticmethod
+    def _resident(build):
+        """buildで作成したオブジェクトの確保量（バイト）"""
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            obj = build()
+            return tracemalloc.get_traced_memory()[0] - before, obj
+        finally:
+            tracemalloc.stop()
+    
+    def test_long_term_resident_size(self, tmp_path):
+        """10万件の長期記憶がアイテムをMemoryItemのまま保持し、辞書形式の3分の1以下の大きさであること"""
+        config = MemoryConfig()
+        config.persistence_fsync = "off"
+        config.persistence_compact_records = None
+        memory = LongTermMemory(config, data_dir=str(tmp_path))
+        keys = [f"user:{i}" for i in range(self.SIZE)]
+        values = [{"turn": i} for i in range(self.SIZE)]
+        
+        start = time.perf_counter()
+        for key, value in zip(keys, values):
+            memory.store(key, value)
+        store_time = time.perf_counter() - start
+        
+        live_size, live = self._resident(
+            lambda: {key: MemoryItem(key, value) for key, value in zip(keys, values)})
+        dict_size, _ = self._resident(lambda: {key: item.to_dict() for key, item in live.items()})
+        
+        print(f"\n=== 長期記憶 {self.SIZE:,}件 ===")
+        print(f"保存: {self.SIZE / store_time:,.0f}件/秒")
+        print(f"MemoryItem: {live_size / self.SIZE:.0f}バイト/件")
+        print(f"辞書形式: {dict_size / self.SIZE:.0f}バイト/件")
+        
+        assert all(isinstance(item, MemoryItem) for item in memory.profiles.values())
+        assert len(memory.profiles) == self.SIZE
+        assert dict_size >= live_size * 3
+        memory.close()
+    
+    def test_retrieve_throughput(self, tmp_path):
+        """取得時に辞書形式との往復変換を行わないこと"""
+        config = MemoryConfig()
+        config.persistence_fsync = "off"
+        config.persistence_compact_records = None
+        memory = LongTermMemory(config, data_dir=str(tmp_path))
+        for i in range(self.SIZE):
+            memory.store(f"user:{i}", {"turn": i})
+        
+        start = time.perf_counter()
+        for i in range(self.SIZE):
+            memory.retrieve(f"user:{i}")
+        live_time = time.perf_counter() - start
+        
+        # 従来の取得（辞書から復元し、アクセス情報を更新して辞書に戻す）
+        dicts = {key: item.to_dict() for key, item in memory.profiles.items()}
+        start = time.perf_counter()
+        for i in range(self.SIZE):
+            item = MemoryItem.from_dict(dicts[f"user:{i}"])
+            item.update_access()
+            dicts[f"user:{i}"] = item.to_dict()
+        roundtrip_time = time.perf_counter() - start
+        
+        print(f"\n=== 長期記憶の取得 {self.SIZE:,}件 ===")
+        print(f"MemoryItem: {self.SIZE / live_time:,.0f}件/秒")
+        print(f"辞書形式との往復変換: {self.SIZE / roundtrip_time:,.0f}件/秒")
+        
+        assert live_time * 3 < roundtrip_time
+        memory.close()
 
 
 class TestMetricsPerformance:
@@ -0,0 +1,79 @@
+"""GraphState増加回帰ベンチマーク
+
+会話が長くなってもターンあたりのグラフ状態処理量が増えないことを検証します。
+Ollamaはモックを使用します。
+"""
+
+import statistics
+import time
+import pytest
+from unittest.mock import patch
+
+from main import MultiLLMChat
+
+
+TURNS = 200
+
+
+@pytest.fixture
+def chat_system():
+    """Ollama呼び出しを即時応答に差し替えたMultiLLMChat"""
+    with patch('llm_nodes.ollama.chat', return_value={'message': {'content': '了解です'}}):
+        yield MultiLLMChat()
+
+
+def _instrument(chat_system):
+    """compiled_graph.invokeの入出力履歴長と実行時間を記録"""
+    records = []
+    original_invoke = chat_system.compiled_graph.invoke
+    
+    def invoke(state, *args, **kwargs):
+        start = time.perf_counter()
+        result = original_invoke(state, *args, **kwargs)
+        records.append({
+            'history_in': len(state['history']),
+            'history_out': len(result['history']),
+            'seconds': time.perf_counter() - start
+        })
+        return result
+    
+    chat_system.compiled_graph.invoke = invoke
+    return records
+
+
+def test_graph_state_is_delta_only(chat_system):
+    """各ターンでグラフが追加する履歴が応答1件のみであること"""
+    records = _instrument(chat_system)
+    
+    for i in range(TURNS):
+        chat_system.chat(f"発言{i}", session_id="bench")
+    
+    conv_state, _ = chat_system.sessions.acquire("bench")
+    window = chat_system.config.system.graph_history_window
+    
+    assert all(r['history_out'] - r['history_in'] == 1 for r in records)
+    assert max(r['history_in'] for r in records) <= window
+    # ユーザー発言 + 応答 が重複なく記録されていること
+    assert len(conv_state.history) == TURNS * 2
+    assert [t['msg'] for t in conv_state.history[-2:]] == [f"発言{TURNS - 1}", '了解です']
+
+
+def test_turn_cost_flat_with_conversation_length(chat_system):
+    """ターンあたりの実行時間が会話長に比例して増えないこと"""
+    records = _instrument(chat_system)
+    
+    for i in range(TURNS):
+        chat_system.chat(f"発言{i}", session_id="bench")
+    
+    early = statistics.median(r['seconds'] for r in records[10:60])
+    late = statistics.median(r['seconds'] for r in records[-50:])
+    
+    print("\n=== ターンあたりのグラフ実行時間 ===")
+    print(f"序盤（11-60ターン）: {early * 1000:.3f}ms")
+    print(f"終盤（{TURNS - 49}-{TURNS}ターン）: {late * 1000:.3f}ms")
+    
+    assert late < early * 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
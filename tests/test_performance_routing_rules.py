@@ -0,0 +1,66 @@
+"""ルーティングルール照合ベンチマーク
+
+ルール数が数千件に増えても、1入力あたりの照合コストがほぼ一定であることを検証します。
+"""
+
+import random
+import time
+
+from routing_rules import RoutingRule, RuleMatcher
+
+
+INPUTS = 300
+RULE_COUNTS = [10, 1000, 5000]
+# 入力・キーワードに使う文字（ひらがな + 常用範囲の漢字）
+CHARS = [chr(code) for code in range(ord("ぁ"), ord("ん") + 1)] + [
+    chr(code) for code in range(0x4E00, 0x4E00 + 2000)
+]
+
+
+def _random_text(rng, length):
+    return "".join(rng.choice(CHARS) for _ in range(length))
+
+
+def _matcher(rng, count):
+    """キーワード（2〜6文字）をcount件持つルール"""
+    rules = [RoutingRule(_random_text(rng, rng.randint(2, 6)), "nox", rng.randint(0, 100))
+             for _ in range(count)]
+    return RuleMatcher(rules)
+
+
+def _seconds_per_input(matcher, texts):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for text in texts:
+            matcher.scan(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts)
+
+
+def test_routing_cost_flat_as_rules_grow():
+    """ルール数が10件→5000件でも照合時間が大きく増えないこと"""
+    rng = random.Random(0)
+    texts = [_random_text(rng, 80) for _ in range(INPUTS)]
+    
+    timings = {count: _seconds_per_input(_matcher(rng, count), texts) for count in RULE_COUNTS}
+    
+    for count, seconds in timings.items():
+        print(f"rules={count:5d}: {seconds * 1e6:.1f}us/input")
+    # 一致件数の増加分を見込んでも、ルール数に比例（500倍）せず数倍以内に収まる
+    assert timings[5000] < timings[10] * 5
+
+
+def test_naive_scan_grows_with_rules():
+    """比較: キーワードごとの部分文字列検索はルール数に比例して遅くなること"""
+    rng = random.Random(1)
+    text = _random_text(rng, 80)
+    keywords = {count: [_random_text(rng, 4) for _ in range(count)] for count in (10, 5000)}
+    
+    def naive(words):
+        start = time.perf_counter()
+        for _ in range(20):
+            [word for word in words if word in text]
+        return time.perf_counter() - start
+    
+    assert naive(keywords[5000]) > naive(keywords[10]) * 20
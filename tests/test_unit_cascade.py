@@ -0,0 +1,150 @@
+"""下書き→改訂カスケードユニットテスト
+
+キャラクター別ポリシーによる下書きモデル・通常モデルの使い分け、改訂イベント、
+下書きモデルのnum_ctx共有をテストします。Ollamaはモックを使用します。
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from config import Config
+from llm_nodes import ClarisNode
+from metrics import get_metrics_collector
+from prompt_builder import PromptBudget, PromptBuilder
+
+
+CONFIDENT = "量子もつれとは、二つの粒子の状態が互いに強く結びつき、一方を測定すると他方の状態も即座に決まる現象です。" * 2
+
+
+def _stream_chunks(*deltas):
+    for delta in deltas:
+        yield {'message': {'content': delta}, 'done': False}
+    yield {'message': {'content': ''}, 'done': True}
+
+
+def _fake_chat(draft, refined="改訂版の詳しい解説です。"):
+    """モデルに応じて下書き・改訂の応答を返すollama.chatのモック"""
+    config = Config()
+    fast, medium = config.model.models['fast'], config.model.models['medium']
+    
+    def chat(model, messages, stream=False, **kwargs):
+        text = {fast: draft, medium: refined}[model]
+        if stream:
+            return _stream_chunks(*text.split("。"))
+        return {'message': {'content': text}}
+    
+    return chat
+
+
+def _node(policy):
+    config = Config()
+    config.model.cascade_policy['claris'] = policy
+    config.model.response_cache_enabled = False
+    return ClarisNode(config)
+
+
+class TestCascadePolicy:
+    """ポリシー別の生成経路テスト"""
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_off_uses_medium_only(self, mock_chat):
+        """offの場合は従来通り通常のモデルのみで生成すること"""
+        mock_chat.side_effect = _fake_chat(CONFIDENT)
+        
+        result = _node("off").generate({'history': [], 'user_input': '量子もつれって？'})
+        
+        assert mock_chat.call_count == 1
+        assert mock_chat.call_args.kwargs['model'] == Config().model.models['medium']
+        assert 'cascade' not in result['history'][-1]
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_auto_accepts_confident_draft(self, mock_chat):
+        """autoで下書きが簡易判定を満たす場合は下書きを採用すること"""
+        mock_chat.side_effect = _fake_chat(CONFIDENT)
+        
+        result = _node("auto").generate({'history': [], 'user_input': '量子もつれって？'})
+        
+        assert mock_chat.call_count == 1
+        assert mock_chat.call_args.kwargs['model'] == Config().model.models['fast']
+        assert result['history'][-1]['msg'] == CONFIDENT
+        assert result['history'][-1]['cascade'] == 'draft'
+    
+    @pytest.mark.parametrize("draft", ["短い下書き", CONFIDENT + "ただし詳細は不明です。"])
+    @patch('llm_nodes.ollama.chat')
+    def test_auto_refines_weak_draft(self, mock_chat, draft):
+        """autoで下書きが短い・不確実な場合は下書きを含めて通常のモデルで改訂すること"""
+        mock_chat.side_effect = _fake_chat(draft)
+        
+        result = _node("auto").generate({'history': [], 'user_input': '量子もつれって？'})
+        
+        assert mock_chat.call_count == 2
+        refine_call = mock_chat.call_args_list[1].kwargs
+        assert refine_call['model'] == Config().model.models['medium']
+        assert draft in refine_call['messages'][0]['content']
+        assert result['history'][-1]['msg'] == "改訂版の詳しい解説です。"
+        assert result['history'][-1]['cascade'] == 'refined'
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_depth_question_without_stream_skips_draft(self, mock_chat):
+        """深い説明が必要な入力は、ストリーミングでなければ下書きなしで通常のモデルを使うこと"""
+        mock_chat.side_effect = _fake_chat(CONFIDENT)
+        
+        result = _node("auto").generate({'history': [], 'user_input': '量子もつれの仕組みを詳しく'})
+        
+        assert mock_chat.call_count == 1
+        assert mock_chat.call_args.kwargs['model'] == Config().model.models['medium']
+        assert result['history'][-1]['cascade'] == 'direct'
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_refine_streams_draft_then_revision(self, mock_chat):
+        """ストリーミング時は下書きを先に送出し、改訂イベントの後に改訂版を送出すること"""
+        mock_chat.side_effect = _fake_chat("下書き。です")
+        events = []
+        
+        def on_token(delta):
+            events.append(delta)
+        
+        on_token.revise = lambda: events.append("<revision>")
+        
+        response, extra = _node("refine")._respond({'user_input': '量子もつれって？'}, "プロンプト", on_token)
+        
+        assert events == ["下書き", "です", "<revision>", "改訂版の詳しい解説です"]
+        assert response == "改訂版の詳しい解説です"
+        assert extra == {'cascade': 'refined'}
+        
+        cascade = get_metrics_collector().get_summary()['cascade_stats']
+        assert cascade == {'クラリス': {'refined': 1}}
+    
+    @pytest.mark.asyncio
+    @patch('llm_client.AsyncLLMClient.chat', new_callable=AsyncMock)
+    async def test_async_auto_accepts_draft(self, mock_chat):
+        """非同期でも同じポリシーで下書きを採用すること"""
+        mock_chat.return_value = {'message': {'content': CONFIDENT}}
+        
+        result = await _node("auto").agenerate({'history': [], 'user_input': '量子もつれって？'})
+        
+        assert mock_chat.call_count == 1
+        assert mock_chat.call_args.kwargs['model'] == Config().model.models['fast']
+        assert result['history'][-1]['cascade'] == 'draft'
+
+
+class TestDraftContext:
+    """下書きモデルのnum_ctxテスト"""
+    
+    def test_draft_model_shares_num_ctx(self):
+        """下書きモデルのnum_ctxがカスケード対象キャラの改訂まで含めた値で揃うこと"""
+        budgets = {
+            "lumina": PromptBudget(history_tokens=512, num_predict=256),
+            "claris": PromptBudget(history_tokens=4096, num_predict=1024),
+        }
+        models = {"lumina": "fast-model", "claris": "medium-model"}
+        plain = PromptBuilder(budgets, models)
+        cascade = PromptBuilder(budgets, models, draft_models={"claris": "fast-model"})
+        
+        assert cascade.options("claris", "fast-model")['num_ctx'] == cascade.options("lumina")['num_ctx']
+        assert cascade.options("lumina")['num_ctx'] > plain.options("lumina")['num_ctx']
+        assert cascade.options("claris")['num_ctx'] >= plain.options("claris")['num_ctx']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -12,6 +12,14 @@ from datetime import datetime
 from services.chat_service import ChatService
 
 
+def _async_events(events):
+    """MultiLLMChat.astream_chatのモック（イベントを順に返す非同期ジェネレーター）"""
+    async def astream_chat(*args, **kwargs):
+        for event in events:
+            yield event
+    return astream_chat
+
+
 class TestChatServiceUnit:
     """ChatServiceユニットテスト"""
     
@@ -19,7 +27,7 @@ class TestChatServiceUnit:
     def mock_multi_llm_chat(self):
         """Phase 1コアのモック"""
         mock = Mock()
-        mock.chat = Mock(return_value={
+        mock.achat = AsyncMock(return_value={
             'response': 'モック応答',
             'character': 'lumina',
             'metadata': {'timestamp': datetime.now().isoformat()}
@@ -47,7 +55,7 @@ class TestChatServiceUnit:
         assert 'response' in result
         assert result['response'] == 'モック応答'
         assert result['character'] == 'lumina'
-        mock_multi_llm_chat.chat.assert_called_once()
+        mock_multi_llm_chat.achat.assert_awaited_once()
         print("✅ chat()メソッド正常系テスト成功")
     
     @pytest.mark.asyncio
@@ -71,7 +79,7 @@ class TestChatServiceUnit:
     @pytest.mark.asyncio
     async def test_chat_with_character(self, chat_service, mock_multi_llm_chat):
         """キャラクター指定テスト"""
-        mock_multi_llm_chat.chat.return_value = {
+        mock_multi_llm_chat.achat.return_value = {
             'response': 'ノクスの応答',
             'character': 'ノクス',
             'metadata': {}
@@ -90,11 +98,11 @@ class TestChatServiceUnit:
     @pytest.mark.asyncio
     async def test_stream_chat_method(self, chat_service, mock_multi_llm_chat):
         """stream_chat()メソッド単体テスト"""
-        mock_multi_llm_chat.chat.return_value = {
-            'response': 'ストリーミング応答テスト',
-            'character': 'lumina',
-            'metadata': {}
-        }
+        mock_multi_llm_chat.astream_chat = _async_events([
+            {'type': 'token', 'speaker': 'ルミナ', 'delta': 'ストリーミング'},
+            {'type': 'token', 'speaker': 'ルミナ', 'delta': '応答テスト'},
+            {'type': 'done', 'response': 'ストリーミング応答テスト', 'speaker': 'ルミナ'}
+        ])
         
         chunks = []
         async for chunk in chat_service.stream_chat(
@@ -104,11 +112,53 @@ class TestChatServiceUnit:
         ):
             chunks.append(chunk)
         
-        assert len(chunks) > 0
+        assert chunks == ['ストリーミング', '応答テスト']
         full_response = ''.join(chunks)
         assert 'ストリーミング応答テスト' in full_response
+        mock_multi_llm_chat.achat.assert_not_called()
         print(f"✅ stream_chat()メソッドテスト成功: {len(chunks)}チャンク")
     
+    @pytest.mark.asyncio
+    async def test_stream_chat_events_done(self, chat_service, mock_multi_llm_chat):
+        """stream_chat_events()の最終イベントがPhase 3形式であること"""
+        mock_multi_llm_chat.astream_chat = _async_events([
+            {'type': 'token', 'speaker': 'ノクス', 'delta': '了解'},
+            {'type': 'done', 'response': '了解', 'speaker': 'ノクス'}
+        ])
+        
+        events = []
+        async for event in chat_service.stream_chat_events(
+            user_id="test_user",
+            session_id="test_session",
+            user_input="テスト"
+        ):
+            events.append(event)
+        
+        assert events[0] == {'type': 'token', 'character': 'ノクス', 'delta': '了解'}
+        assert events[-1]['type'] == 'done'
+        assert events[-1]['session_id'] == 'test_session'
+        assert events[-1]['character'] == 'ノクス'
+        assert 'processing_time_ms' in events[-1]['metadata']
+        print("✅ stream_chat_events()テスト成功")
+    
+    @pytest.mark.asyncio
+    async def test_stream_chat_without_tokens(self, chat_service, mock_multi_llm_chat):
+        """トークンが流れない場合（入力検証エラー等）は応答全文を返すこと"""
+        mock_multi_llm_chat.astream_chat = _async_events([
+            {'type': 'done', 'response': '入力検証エラー: 空です', 'speaker': 'system'}
+        ])
+        
+        chunks = []
+        async for chunk in chat_service.stream_chat(
+            user_id="test_user",
+            session_id="test_session",
+            user_input=""
+        ):
+            chunks.append(chunk)
+        
+        assert chunks == ['入力検証エラー: 空です']
+        print("✅ トークンなしストリーミングテスト成功")
+    
     @pytest.mark.asyncio
     async def test_get_conversation_history(self, chat_service, mock_multi_llm_chat):
         """get_conversation_history()メソッド単体テスト"""
@@ -163,16 +213,9 @@ class TestChatServiceUnit:
         print("✅ clear_session()メソッドテスト成功")
     
     @pytest.mark.asyncio
-    async def test_async_to_sync_conversion(self, chat_service, mock_multi_llm_chat):
-        """非同期⇔同期変換テスト（asyncio.to_thread）"""
-        # asyncio.to_threadが正しく呼ばれることを確認
+    async def test_chat_runs_natively_async(self, chat_service, mock_multi_llm_chat):
+        """chat()がスレッドプールを経由せずachat()を直接awaitすること"""
         with patch('asyncio.to_thread', new_callable=AsyncMock) as mock_to_thread:
-            mock_to_thread.return_value = {
-                'response': '変換テスト',
-                'character': 'lumina',
-                'metadata': {}
-            }
-            
             result = await chat_service.chat(
                 user_id="test_user",
                 session_id="test_session",
@@ -180,13 +223,14 @@ class TestChatServiceUnit:
             )
             
             assert result is not None
-            mock_to_thread.assert_called()
-            print("✅ 非同期⇔同期変換テスト成功")
+            mock_multi_llm_chat.achat.assert_awaited_once()
+            mock_to_thread.assert_not_called()
+            print("✅ ネイティブ非同期実行テスト成功")
     
     @pytest.mark.asyncio
     async def test_error_handling(self, chat_service, mock_multi_llm_chat):
         """エラーハンドリング単体テスト"""
-        mock_multi_llm_chat.chat.side_effect = Exception("Phase 1エラー")
+        mock_multi_llm_chat.achat.side_effect = Exception("Phase 1エラー")
         
         with pytest.raises(Exception) as exc_info:
             await chat_service.chat(
@@ -0,0 +1,213 @@
+"""クライアント切断時の生成中断ユニットテスト
+
+切断（ストリームのaclose・タスクのキャンセル・WebSocket切断）が、LangGraph実行と
+Ollamaのストリーミング要求まで伝播し、途中までの応答がcancelled付きで記録されることをテストします。
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from fastapi import WebSocketDisconnect
+
+from api.websocket import ConnectionManager
+from main import MultiLLMChat
+from metrics import get_metrics_collector
+from services.chat_service import ChatService
+
+
+class SlowStream:
+    """トークンを一定間隔で返すOllamaストリーミング応答"""
+    
+    def __init__(self):
+        self.closed = False
+    
+    async def chunks(self):
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.01)
+                yield {'message': {'role': 'assistant', 'content': f"トークン{i}"}, 'done': False}
+            yield {'message': {'role': 'assistant', 'content': ''}, 'done': True}
+        finally:
+            self.closed = True
+
+
+@pytest.fixture
+def chat_system():
+    with patch('llm_nodes.ollama.chat', return_value={'message': {'content': '了解です'}}):
+        chat_system = MultiLLMChat()
+    chat_system.config.model.response_cache_enabled = False
+    return chat_system
+
+
+@pytest.fixture
+def slow_stream():
+    stream = SlowStream()
+    
+    def chat(**kwargs):
+        if kwargs.get('stream'):
+            return stream.chunks()
+        return {'message': {'content': '続きの応答'}}
+    
+    with patch('llm_client.AsyncLLMClient.chat', new_callable=AsyncMock, side_effect=chat):
+        yield stream
+
+
+def _history(chat_system, session_id):
+    conv_state, _ = chat_system.sessions.acquire(session_id)
+    return conv_state.history
+
+
+class TestGraphCancellation:
+    """MultiLLMChat.astream_chatの中断テスト"""
+    
+    @pytest.mark.asyncio
+    async def test_aclose_aborts_generation(self, chat_system, slow_stream):
+        """受信をやめた場合はOllamaのストリームを閉じ、途中までの応答をcancelled付きで記録すること"""
+        stream = chat_system.astream_chat("こんにちは", session_id="s1")
+        received = []
+        async for event in stream:
+            received.append(event)
+            if len(received) == 3:
+                break
+        await stream.aclose()
+        
+        assert slow_stream.closed
+        last = _history(chat_system, "s1")[-1]
+        assert last['cancelled'] is True
+        assert last['msg'] == "".join(event['delta'] for event in received)
+        assert last['speaker'] == received[0]['speaker']
+        
+        conversation = get_metrics_collector().get_summary()['conversation_stats']
+        assert conversation['cancelled_turns'] == 1
+        assert conversation['cancelled_chars'] == len(last['msg'])
+    
+    @pytest.mark.asyncio
+    async def test_task_cancel_aborts_generation(self, chat_system, slow_stream):
+        """呼び出し元のタスクがキャンセルされた場合も生成を中断し、セッションを解放すること"""
+        async def consume():
+            async for _ in chat_system.astream_chat("こんにちは", session_id="s2"):
+                pass
+        
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        
+        assert slow_stream.closed
+        assert _history(chat_system, "s2")[-1]['cancelled'] is True
+        
+        # 次のターンは通常通り実行できる
+        result = await asyncio.wait_for(chat_system.achat("続けて", session_id="s2"), timeout=5)
+        assert result['response'] == '続きの応答'
+        assert 'cancelled' not in _history(chat_system, "s2")[-1]
+
+
+class TestChatServiceCancellation:
+    """ChatServiceの中断テスト"""
+    
+    @pytest.mark.asyncio
+    async def test_aclose_closes_graph_stream(self):
+        """stream_chat_eventsを閉じるとMultiLLMChatのストリームも閉じること"""
+        closed = []
+        
+        async def astream_chat(**kwargs):
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield {'type': 'token', 'speaker': 'ルミナ', 'delta': 'あ'}
+            finally:
+                closed.append(True)
+        
+        multi_llm_chat = Mock()
+        multi_llm_chat.astream_chat = astream_chat
+        with patch('services.chat_service.MultiLLMChat', return_value=multi_llm_chat):
+            service = ChatService()
+        
+        events = service.stream_chat_events("user", "session", "こんにちは")
+        assert (await events.__anext__())['type'] == 'token'
+        await events.aclose()
+        
+        assert closed == [True]
+
+
+class FakeWebSocket:
+    """受信メッセージを順に返すWebSocket"""
+    
+    def __init__(self, *messages, delay=0.05):
+        self.messages = list(messages)
+        self.delay = delay
+    
+    async def receive(self):
+        await asyncio.sleep(self.delay)
+        if not self.messages:
+            await asyncio.Event().wait()
+        return self.messages.pop(0)
+
+
+def _manager(websocket):
+    manager = ConnectionManager()
+    manager.active_connections["c1"] = websocket
+    manager.connection_metadata["c1"] = {}
+    return manager
+
+
+async def _generation(state, duration=5.0):
+    try:
+        await asyncio.sleep(duration)
+    except asyncio.CancelledError:
+        state.append("cancelled")
+        raise
+    return {"type": "chat_response"}
+
+
+class TestWebSocketCancellation:
+    """ConnectionManager.run_until_disconnectテスト"""
+    
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_generation(self):
+        """生成中に切断された場合は生成をキャンセルすること"""
+        manager = _manager(FakeWebSocket({"type": "websocket.disconnect", "code": 1001}))
+        state = []
+        
+        with pytest.raises(WebSocketDisconnect):
+            await manager.run_until_disconnect("c1", _generation(state), [])
+        await asyncio.sleep(0)
+        
+        assert state == ["cancelled"]
+        assert not manager.is_connected("c1")
+        assert manager.generations == {}
+    
+    @pytest.mark.asyncio
+    async def test_messages_during_generation_are_kept(self):
+        """生成中に受信したメッセージは生成後に処理するためbacklogに積むこと"""
+        ping = {"type": "websocket.receive", "text": json.dumps({"type": "ping"})}
+        manager = _manager(FakeWebSocket(ping, delay=0.01))
+        backlog = []
+        
+        response = await manager.run_until_disconnect("c1", _generation([], duration=0.1), backlog)
+        
+        assert response == {"type": "chat_response"}
+        assert backlog == [{"type": "ping"}]
+    
+    @pytest.mark.asyncio
+    async def test_send_failure_cancels_generation(self):
+        """送信失敗でdisconnectされた場合も生成をキャンセルすること"""
+        manager = _manager(FakeWebSocket())
+        state = []
+        
+        async def generation():
+            await asyncio.sleep(0.05)
+            manager.disconnect("c1")
+            return await _generation(state)
+        
+        with pytest.raises(WebSocketDisconnect):
+            await manager.run_until_disconnect("c1", generation(), [])
+        
+        assert state == ["cancelled"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
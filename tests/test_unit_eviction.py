@@ -0,0 +1,168 @@
+"""記憶の退避・期限切れ管理ユニットテスト
+
+ExpiringLRUのLRU退避・保存時刻ヒープによる期限切れ削除、ExpirySweeperの定期削除と、
+短期記憶での使用をテストします。
+"""
+
+import time
+import pytest
+
+from memory.base import MemoryConfig
+from memory.eviction import ExpiringLRU, ExpirySweeper
+from memory.short_term import ShortTermMemory
+
+
+@pytest.fixture
+def lru(clock):
+    return ExpiringLRU(clock=clock)
+
+
+class TestExpiringLRU:
+    """ExpiringLRUテスト"""
+    
+    def test_lru_eviction(self, lru):
+        """上限に達した場合は最も長く使われていないアイテムを退避すること"""
+        for key in ("a", "b", "c"):
+            lru.put(key, key, max_items=3, ttl_seconds=60)
+        lru.get("a", ttl_seconds=60)
+        
+        lru.put("d", "d", max_items=3, ttl_seconds=60)
+        
+        assert list(lru.keys()) == ["c", "a", "d"]
+        assert lru.evictions == 1
+    
+    def test_overwrite_does_not_evict(self, lru):
+        """既存キーの上書きでは退避しないこと"""
+        lru.put("a", 1, max_items=2, ttl_seconds=60)
+        lru.put("b", 2, max_items=2, ttl_seconds=60)
+        lru.put("a", 3, max_items=2, ttl_seconds=60)
+        
+        assert list(lru.keys()) == ["b", "a"]
+        assert lru.get("a", ttl_seconds=60) == 3
+        assert lru.evictions == 0
+    
+    def test_expire(self, lru, clock):
+        """保存からTTLを超えたアイテムのみ削除すること"""
+        lru.put("old", 1, max_items=10, ttl_seconds=60)
+        clock.now += 30
+        lru.put("new", 2, max_items=10, ttl_seconds=60)
+        clock.now += 31
+        
+        assert lru.expire(ttl_seconds=60) == 1
+        assert list(lru.keys()) == ["new"]
+        assert lru.get("new", ttl_seconds=60) == 2
+        
+        clock.now += 30
+        assert lru.get("new", ttl_seconds=60) is None
+        assert lru.expirations == 2
+    
+    def test_expire_skips_overwritten_entries(self, lru, clock):
+        """上書き前の保存時刻では上書き後のアイテムを削除しないこと"""
+        lru.put("a", 1, max_items=10, ttl_seconds=60)
+        clock.now += 50
+        lru.put("a", 2, max_items=10, ttl_seconds=60)
+        clock.now += 20
+        
+        assert lru.expire(ttl_seconds=60) == 0
+        assert lru.get("a", ttl_seconds=60) == 2
+    
+    def test_ttl_change(self, lru):
+        """TTLの変更は保存済みのアイテムにも適用すること"""
+        lru.put("a", 1, max_items=10, ttl_seconds=3600)
+        
+        assert lru.get("a", ttl_seconds=-1) is None
+    
+    def test_put_expires_before_evicting(self, lru, clock):
+        """上限に達していても期限切れのアイテムがあればそれを先に削除すること"""
+        lru.put("a", 1, max_items=2, ttl_seconds=60)
+        clock.now += 30
+        lru.put("b", 2, max_items=2, ttl_seconds=60)
+        clock.now += 31
+        
+        lru.put("c", 3, max_items=2, ttl_seconds=60)
+        
+        assert list(lru.keys()) == ["b", "c"]
+        assert lru.evictions == 0
+    
+    def test_heap_stays_bounded(self, lru):
+        """上書き・削除を繰り返してもヒープがアイテム数に比例した大きさに収まること"""
+        for i in range(10_000):
+            lru.put(f"k{i % 10}", i, max_items=100, ttl_seconds=60)
+            lru.pop(f"k{(i + 5) % 10}")
+        
+        assert len(lru._heap) <= 2 * len(lru) + 65
+
+
+class TestExpirySweeper:
+    """ExpirySweeperテスト"""
+    
+    def test_sweep(self):
+        """登録した削除処理を実行し、破棄された記憶層は登録から外すこと"""
+        config = MemoryConfig()
+        config.short_term_ttl_seconds = -1
+        kept = ShortTermMemory(config)
+        dropped = ShortTermMemory(config)
+        kept.store("a", 1)
+        kept.store("b", 2)
+        sweeper = ExpirySweeper()
+        sweeper.register(kept.cleanup_expired)
+        sweeper.register(dropped.cleanup_expired)
+        del dropped
+        
+        assert sweeper.sweep() >= 1
+        assert len(kept.storage) == 0
+        assert len(sweeper._cleanups) == 1
+    
+    def test_background_thread(self):
+        """バックグラウンドスレッドが一定間隔で削除すること"""
+        config = MemoryConfig()
+        memory = ShortTermMemory(config)
+        memory.store("a", 1)
+        config.short_term_ttl_seconds = 0
+        sweeper = ExpirySweeper(interval_seconds=0.02)
+        sweeper.register(memory.cleanup_expired)
+        
+        sweeper.start()
+        deadline = time.monotonic() + 2
+        while sweeper.total_swept == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        sweeper.stop()
+        
+        assert len(memory.storage) == 0
+        assert sweeper.total_swept == 1
+
+
+class TestShortTermMemory:
+    """短期記憶での使用テスト"""
+    
+    def test_retrieve_protects_from_eviction(self):
+        """取得したアイテムは容量超過時に退避しないこと（LRU）"""
+        config = MemoryConfig()
+        config.short_term_max_items = 3
+        memory = ShortTermMemory(config)
+        for key in ("a", "b", "c"):
+            memory.store(key, key)
+        memory.retrieve("a")
+        
+        memory.store("d", "d")
+        
+        assert memory.get_all_keys() == ["c", "a", "d"]
+        assert memory.retrieve("b") is None
+        assert memory.get_stats()['evictions'] == 1
+        assert memory.get_stats()['current_items'] == 3
+    
+    def test_expired_is_miss(self):
+        """期限切れのアイテムは取得時に削除してミスとして数えること"""
+        config = MemoryConfig()
+        memory = ShortTermMemory(config)
+        memory.store("a", 1)
+        config.short_term_ttl_seconds = -1
+        
+        assert memory.retrieve("a") is None
+        assert not memory.exists("a")
+        stats = memory.get_stats()
+        assert (stats['cache_hits'], stats['cache_misses'], stats['expirations']) == (0, 1, 1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,134 @@
+"""複数キャラクター並列応答ユニットテスト
+
+RouterNode.route_targetsの複数指名判定と、グラフでの並列実行・合流順序をテストします。
+Ollamaは使用せず、各キャラクターノードの生成を一定時間待つスタブに差し替えます。
+"""
+
+import asyncio
+import time
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from config import Config
+from llm_nodes import RouterNode
+from main import MultiLLMChat
+
+
+DELAY = 0.2
+
+
+def _turn_update(speaker, msg):
+    return {
+        'history': [{'speaker': speaker, 'msg': msg, 'timestamp': datetime.now().isoformat()}],
+        'last_speaker': speaker
+    }
+
+
+def _fanout_config():
+    config = Config()
+    config.system.fanout_enabled = True
+    return config
+
+
+@pytest.fixture
+def chat_system():
+    """各キャラクターの生成をDELAY秒待つスタブに差し替え、並列応答を有効にしたMultiLLMChat"""
+    with patch('llm_nodes.ollama.chat', return_value={'message': {'content': '了解です'}}):
+        chat_system = MultiLLMChat()
+    chat_system.config.system.fanout_enabled = True
+    
+    for node in (chat_system.lumina_node, chat_system.claris_node, chat_system.nox_node):
+        def generate(state, name=node.character_name):
+            time.sleep(DELAY)
+            return _turn_update(name, f"{name}の応答")
+        
+        async def agenerate(state, name=node.character_name):
+            await asyncio.sleep(DELAY)
+            return _turn_update(name, f"{name}の応答")
+        
+        node.generate = generate
+        node.agenerate = agenerate
+    return chat_system
+
+
+class TestRouteTargets:
+    """RouterNode.route_targetsテスト"""
+    
+    @pytest.fixture
+    def router(self):
+        return RouterNode(_fanout_config())
+    
+    def test_multiple_mentions(self, router):
+        """入力中の複数の指名を出現順に返すこと"""
+        assert router.route_targets({'user_input': 'ノクスとクラリス、意見を聞かせて'}) == ['nox', 'claris']
+        assert router.route_targets({'user_input': 'ルミナ、ルミナ聞いて'}) == ['lumina']
+    
+    def test_explicit_character_list(self, router):
+        """区切り指定を正規化し、重複と不明なキャラクターを除くこと"""
+        state = {'user_input': 'こんにちは', 'next_character': 'Clarisse、nox, claris unknown'}
+        assert router.route_targets(state) == ['claris', 'nox']
+    
+    def test_single_target_uses_route(self, router):
+        """指名が1件以下の場合は従来のroute()と同じ判定になること"""
+        for user_input in ['最新ニュースを調べて', '理由を詳しく教えて', 'こんにちは']:
+            state = {'user_input': user_input}
+            assert router.route_targets(state) == [router.route(state)]
+    
+    def test_limits(self):
+        """最大キャラクター数の設定に従うこと"""
+        config = _fanout_config()
+        config.system.fanout_max_characters = 2
+        state = {'user_input': 'こんにちは', 'next_character': 'nox,claris,lumina'}
+        assert RouterNode(config).route_targets(state) == ['nox', 'claris']
+    
+    def test_disabled_by_default(self):
+        """既定では無効で、複数の指名があっても従来のroute()の1キャラのみ返すこと"""
+        router = RouterNode(Config())
+        state = {'user_input': 'ノクスとクラリスに質問'}
+        
+        assert not Config().system.fanout_enabled
+        assert router.route_targets(state) == [router.route(state)]
+
+
+class TestParallelGraph:
+    """グラフでの並列実行テスト"""
+    
+    def test_parallel_wall_time_and_order(self, chat_system):
+        """2キャラの応答を並列に生成し、ルーターの決定順で履歴に追記すること"""
+        start = time.perf_counter()
+        result = chat_system.chat('クラリスとノクス、どう思う？', session_id='fanout')
+        elapsed = time.perf_counter() - start
+        
+        assert elapsed < DELAY * 1.75
+        assert [r['speaker'] for r in result['responses']] == ['クラリス', 'ノクス']
+        assert result['speaker'] == 'ノクス'
+        
+        conv_state, _ = chat_system.sessions.acquire('fanout')
+        assert [t['speaker'] for t in conv_state.history] == ['User', 'クラリス', 'ノクス']
+        assert conv_state.last_speaker == 'ノクス'
+    
+    def test_async_parallel(self, chat_system):
+        """非同期実行でも並列に生成し、同じ順序で合流すること"""
+        async def run():
+            start = time.perf_counter()
+            result = await chat_system.achat('こんにちは', session_id='afanout', character='nox,lumina')
+            return result, time.perf_counter() - start
+        
+        result, elapsed = asyncio.run(run())
+        
+        assert elapsed < DELAY * 1.75
+        assert [r['speaker'] for r in result['responses']] == ['ノクス', 'ルミナ']
+    
+    def test_single_target_unchanged(self, chat_system):
+        """1キャラの場合は従来通り応答1件のみ追記すること"""
+        result = chat_system.chat('こんにちは', session_id='single')
+        
+        assert result['speaker'] == 'ルミナ'
+        assert len(result['responses']) == 1
+        conv_state, _ = chat_system.sessions.acquire('single')
+        assert [t['speaker'] for t in conv_state.history] == ['User', 'ルミナ']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
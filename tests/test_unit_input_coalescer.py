@@ -0,0 +1,201 @@
+"""連続入力の合流ユニットテスト
+
+InputCoalescerによる開始前のターンへの入力の合流・生成中のターンの置き換え・
+呼び出し元の離脱時のキャンセルと、ChatServiceでの使用をテストします。
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from metrics import MetricsCollector
+from services.chat_service import ChatService
+from services.input_coalescer import InputCoalescer
+
+
+class FakeRunner:
+    """MultiLLMChat.astream_chatを模した実行関数（入力ごとにトークンを返す）"""
+    
+    def __init__(self, delay=0.05, tokens=3, error=None):
+        self.delay = delay
+        self.tokens = tokens
+        self.error = error
+        self.calls = []
+        self.cancelled = []
+    
+    async def __call__(self, user_input, character, priority):
+        self.calls.append((user_input, character, priority))
+        try:
+            for i in range(self.tokens):
+                await asyncio.sleep(self.delay)
+                if self.error:
+                    raise self.error
+                yield {'type': 'token', 'speaker': 'ルミナ', 'delta': f"{i}"}
+            yield {'type': 'done', 'response': f"応答: {user_input}", 'speaker': 'ルミナ'}
+        except asyncio.CancelledError:
+            self.cancelled.append(user_input)
+            raise
+
+
+@pytest.fixture
+def metrics():
+    return MetricsCollector()
+
+
+def _coalescer(metrics, **kwargs):
+    locks = {}
+    return InputCoalescer(lambda session_id: locks.setdefault(session_id, asyncio.Lock()),
+                          metrics=metrics, **kwargs)
+
+
+async def _collect(coalescer, runner, user_input, character=None, priority=1, session_id="s1"):
+    return [event async for event in coalescer.submit(session_id, user_input, character, priority, runner)]
+
+
+class TestInputCoalescer:
+    """InputCoalescerテスト"""
+    
+    @pytest.mark.asyncio
+    async def test_coalesce_while_queued(self, metrics):
+        """先行ターンの生成中に届いた入力は1つのターンにまとめること"""
+        coalescer = _coalescer(metrics)
+        runner = FakeRunner()
+        
+        first = asyncio.ensure_future(_collect(coalescer, runner, "こんにちは"))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(_collect(coalescer, runner, "ねえ", priority=1))
+        third = asyncio.ensure_future(_collect(coalescer, runner, "聞いてる？", priority=0))
+        results = await asyncio.gather(first, second, third)
+        
+        assert runner.calls == [("こんにちは", None, 1), ("ねえ\n聞いてる？", None, 0)]
+        assert results[1] == results[2]
+        assert results[1][-1]['response'] == "応答: ねえ\n聞いてる？"
+        assert results[1][-1]['coalesced_inputs'] == 2
+        assert results[0][-1]['coalesced_inputs'] == 1
+        assert metrics.get_summary()['conversation_stats']['coalesced_inputs'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_window(self, metrics):
+        """合流窓の間に届いた入力はアイドル状態のセッションでもまとめること"""
+        coalescer = _coalescer(metrics, window_ms=50)
+        runner = FakeRunner(delay=0)
+        
+        results = await asyncio.gather(*[
+            _collect(coalescer, runner, text) for text in ("あ", "い", "う")
+        ])
+        
+        assert runner.calls == [("あ\nい\nう", None, 1)]
+        assert all(result[-1]['coalesced_inputs'] == 3 for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_not_coalesced(self, metrics):
+        """指定キャラクターが異なる入力・最大文字数を超える入力は合流しないこと"""
+        coalescer = _coalescer(metrics, window_ms=50, max_chars=10)
+        runner = FakeRunner(delay=0)
+        
+        await asyncio.gather(
+            _collect(coalescer, runner, "あ"),
+            _collect(coalescer, runner, "い", character="nox"),
+            _collect(coalescer, runner, "う", character="nox"),
+            _collect(coalescer, runner, "長い入力" * 3, character="nox"),
+        )
+        
+        assert [call[0] for call in runner.calls] == ["あ", "い\nう", "長い入力" * 3]
+    
+    @pytest.mark.asyncio
+    async def test_supersede(self, metrics):
+        """supersede有効時は生成中のターンを打ち切り、後続の入力の応答を返すこと"""
+        coalescer = _coalescer(metrics, supersede=True)
+        runner = FakeRunner()
+        
+        first = asyncio.ensure_future(_collect(coalescer, runner, "こんにちは"))
+        await asyncio.sleep(0.07)
+        second = asyncio.ensure_future(_collect(coalescer, runner, "やっぱり違う話"))
+        first_events, second_events = await asyncio.gather(first, second)
+        
+        assert runner.cancelled == ["こんにちは"]
+        assert [call[0] for call in runner.calls] == ["こんにちは", "やっぱり違う話"]
+        assert first_events[0] == {'type': 'token', 'speaker': 'ルミナ', 'delta': '0'}
+        assert first_events[1] == {'type': 'revision', 'speaker': 'ルミナ'}
+        assert first_events[2:] == second_events
+        assert second_events[-1]['response'] == "応答: やっぱり違う話"
+        assert metrics.get_summary()['conversation_stats']['superseded_turns'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_cancel_when_all_callers_leave(self, metrics):
+        """合流した呼び出し元が全て離脱した場合のみ生成をキャンセルすること"""
+        coalescer = _coalescer(metrics, window_ms=20)
+        runner = FakeRunner(tokens=10)
+        
+        first = asyncio.ensure_future(_collect(coalescer, runner, "あ"))
+        second = asyncio.ensure_future(_collect(coalescer, runner, "い"))
+        await asyncio.sleep(0.1)
+        
+        first.cancel()
+        await asyncio.sleep(0.1)
+        assert runner.cancelled == []
+        
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        assert runner.cancelled == ["あ\nい"]
+        assert coalescer._turns == {}
+    
+    @pytest.mark.asyncio
+    async def test_error_propagates(self, metrics):
+        """ターンの例外は合流した全ての呼び出し元に送出すること"""
+        coalescer = _coalescer(metrics, window_ms=20)
+        runner = FakeRunner(error=ValueError("生成失敗"))
+        
+        results = await asyncio.gather(
+            _collect(coalescer, runner, "あ"),
+            _collect(coalescer, runner, "い"),
+            return_exceptions=True
+        )
+        
+        assert [str(result) for result in results] == ["生成失敗", "生成失敗"]
+    
+    @pytest.mark.asyncio
+    async def test_disabled(self, metrics):
+        """無効時は入力ごとに順に実行すること"""
+        coalescer = _coalescer(metrics, enabled=False)
+        runner = FakeRunner(delay=0.01)
+        
+        await asyncio.gather(*[_collect(coalescer, runner, text) for text in ("あ", "い", "う")])
+        
+        assert [call[0] for call in runner.calls] == ["あ", "い", "う"]
+
+
+class TestChatServiceCoalescing:
+    """ChatServiceでの合流テスト"""
+    
+    @pytest.mark.asyncio
+    async def test_chat_coalesces_queued_inputs(self):
+        """生成中に届いた同一セッションの入力は1回のachat呼び出しにまとめること"""
+        async def achat(user_input, **kwargs):
+            await asyncio.sleep(0.05)
+            return {'response': f"応答: {user_input}", 'speaker': 'ルミナ', 'metadata': {}}
+        
+        multi_llm_chat = Mock()
+        multi_llm_chat.achat = AsyncMock(side_effect=achat)
+        with patch('services.chat_service.MultiLLMChat', return_value=multi_llm_chat):
+            service = ChatService()
+        service.coalescer.window_ms = 0
+        
+        first = asyncio.ensure_future(service.chat("user", "session", "こんにちは"))
+        await asyncio.sleep(0.01)
+        responses = await asyncio.gather(
+            first,
+            service.chat("user", "session", "ねえ"),
+            service.chat("user", "session", "聞いてる？"),
+            service.chat("user", "other", "別のセッション"),
+        )
+        
+        assert multi_llm_chat.achat.await_count == 3
+        assert responses[1]['response'] == responses[2]['response'] == "応答: ねえ\n聞いてる？"
+        assert responses[1]['metadata']['coalesced_inputs'] == 2
+        assert responses[3]['response'] == "応答: 別のセッション"
+        assert responses[3]['metadata']['coalesced_inputs'] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
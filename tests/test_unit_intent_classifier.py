@@ -0,0 +1,148 @@
+"""意図分類器ユニットテスト
+
+IntentClassifierの学習・一括推論・保存と、RouterNodeでの確信度によるフォールバックをテストします。
+"""
+
+import json
+import time
+import numpy as np
+import pytest
+
+from config import Config
+from intent_classifier import (
+    HashingVectorizer, IntentClassifier, get_intent_classifier,
+    load_examples, reset_intent_classifiers
+)
+from llm_nodes import RouterNode
+
+
+EXAMPLES = {
+    "claris": ["量子もつれの仕組みを教えて", "なぜ空は青いのか知りたい", "相対性理論ってどういうこと",
+               "インフレの原因を整理して", "光合成の仕組みは", "税金の計算方法を教えて"],
+    "nox": ["今日の株価はどう", "明日の天気は", "昨日の試合結果", "今週の為替の動き",
+            "新作映画の評判", "選挙の速報"],
+    "lumina": ["こんにちは", "今日は疲れたよ", "おはよう元気？", "暇だから話そう",
+               "ありがとう嬉しい", "おやすみなさい"],
+}
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    texts = [text for texts in EXAMPLES.values() for text in texts]
+    labels = [label for label, texts in EXAMPLES.items() for _ in texts]
+    return IntentClassifier.train(texts, labels, n_features=2 ** 12)
+
+
+@pytest.fixture(autouse=True)
+def _reset_classifiers():
+    yield
+    reset_intent_classifiers()
+
+
+class TestIntentClassifier:
+    """IntentClassifierテスト"""
+    
+    def test_features_are_normalized(self):
+        """各行のn-gram特徴がL2正規化されていること"""
+        rows, cols, values = HashingVectorizer(n_features=256).transform(["ルミナ", "るみなるみな", "a"])
+        
+        norms = np.bincount(rows, weights=values ** 2)
+        assert np.allclose(norms, 1.0)
+        assert cols.max() < 256
+    
+    def test_learns_training_examples(self, classifier):
+        """学習データを分類でき、確率の合計が1であること"""
+        for label, texts in EXAMPLES.items():
+            for text in texts:
+                assert classifier.predict(text)[0] == label
+        assert np.allclose(classifier.predict_proba_batch(["こんにちは"]).sum(axis=1), 1.0)
+    
+    def test_batch_matches_single(self, classifier):
+        """一括推論の結果が1件ずつの推論と一致すること"""
+        texts = ["天気を教えて", "仕組みを知りたい", "おはよう", ""]
+        
+        batch = classifier.predict_batch(texts)
+        
+        for text, (label, confidence) in zip(texts, batch):
+            single_label, single_confidence = classifier.predict(text)
+            assert label == single_label
+            assert confidence == pytest.approx(single_confidence)
+    
+    def test_save_and_load(self, classifier, tmp_path):
+        """保存したモデルを読み込んで同じ確率を返すこと"""
+        path = tmp_path / "intent.npz"
+        classifier.save(str(path))
+        
+        loaded = IntentClassifier.load(str(path))
+        
+        assert loaded.labels == classifier.labels
+        assert np.allclose(
+            loaded.predict_proba_batch(["選挙の結果"]),
+            classifier.predict_proba_batch(["選挙の結果"]),
+            atol=1e-5
+        )
+    
+    def test_inference_under_one_millisecond(self, classifier):
+        """1ターン分の推論が1ms未満であること"""
+        text = "最近話題になっている新しい技術について、仕組みと背景を教えてください"
+        classifier.predict(text)
+        
+        start = time.perf_counter()
+        for _ in range(200):
+            classifier.predict(text)
+        assert (time.perf_counter() - start) / 200 < 0.001
+    
+    def test_load_examples_from_export(self, tmp_path):
+        """会話エクスポートからユーザー発言と次の応答キャラクターの組を抽出すること"""
+        export = tmp_path / "conversation.json"
+        export.write_text(json.dumps({"conversation": [
+            {"speaker": "User", "msg": "天気は？"},
+            {"speaker": "ノクス", "msg": "晴れです"},
+            {"speaker": "User", "msg": "ありがとう"},
+            {"speaker": "ルミナ", "msg": "どういたしまして"},
+        ]}, ensure_ascii=False), encoding="utf-8")
+        labeled = tmp_path / "labels.jsonl"
+        labeled.write_text('{"text": "理由は？", "label": "claris"}\n', encoding="utf-8")
+        
+        texts, labels = load_examples([str(export), str(labeled)])
+        
+        assert texts == ["天気は？", "ありがとう", "理由は？"]
+        assert labels == ["nox", "lumina", "claris"]
+
+
+class TestRouterWithClassifier:
+    """RouterNodeの分類器利用テスト"""
+    
+    @pytest.fixture
+    def router(self, classifier, tmp_path):
+        path = tmp_path / "intent.npz"
+        classifier.save(str(path))
+        config = Config()
+        config.system.intent_model_path = str(path)
+        config.system.intent_confidence_threshold = 0.5
+        return RouterNode(config)
+    
+    def test_classifier_routes_unmatched_input(self, router):
+        """キーワードに一致しない入力も分類器の判定で振り分けること"""
+        assert router.route({'user_input': '光合成の仕組みを整理して'}) == 'claris'
+        assert router.route({'user_input': '今日の株価の速報'}) == 'nox'
+    
+    def test_low_confidence_falls_back_to_rules(self, router):
+        """確信度が閾値未満の場合はキーワードルールで判定すること"""
+        router.config.system.intent_confidence_threshold = 1.01
+        
+        assert router.route({'user_input': '光合成の仕組みを整理して'}) == 'lumina'
+        assert router.route({'user_input': '理由を整理して'}) == 'claris'
+    
+    def test_mention_overrides_classifier(self, router):
+        """キャラクターの指名は分類器より優先すること"""
+        assert router.route({'user_input': 'ルミナ、今日の株価の速報は？'}) == 'lumina'
+    
+    def test_missing_model_disables_classifier(self, tmp_path):
+        """モデルが読み込めない場合は分類器なしで動作すること"""
+        assert get_intent_classifier(str(tmp_path / "missing.npz")) is None
+        assert get_intent_classifier("") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
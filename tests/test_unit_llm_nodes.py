@@ -0,0 +1,174 @@
+"""LLMノードユニットテスト
+
+LLMNodeの呼び出し経路を単体でテストします。
+Ollamaはモックを使用して分離します。
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from config import Config
+from llm_client import AsyncLLMClient, backoff_delay
+from llm_nodes import LuminaNode
+
+
+def _stream_chunks(*deltas):
+    """Ollama stream=True のチャンク列を生成"""
+    for delta in deltas:
+        yield {'message': {'role': 'assistant', 'content': delta}, 'done': False}
+    yield {'message': {'role': 'assistant', 'content': ''}, 'done': True}
+
+
+class TestLLMNodeStreaming:
+    """LLMNodeストリーミングテスト"""
+    
+    @pytest.fixture
+    def node(self):
+        """ルミナノード"""
+        return LuminaNode(Config())
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_call_ollama_stream_emits_deltas(self, mock_chat, node):
+        """stream=Trueでトークン差分が順に通知され、全文が返ること"""
+        mock_chat.return_value = _stream_chunks('こん', 'にち', 'は')
+        received = []
+        
+        response = node._call_ollama("テスト", on_token=received.append)
+        
+        assert received == ['こん', 'にち', 'は']
+        assert response == 'こんにちは'
+        assert mock_chat.call_args.kwargs['stream'] is True
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_call_ollama_without_callback_is_blocking(self, mock_chat, node):
+        """コールバック未指定時は従来通り非ストリーミング"""
+        mock_chat.return_value = {'message': {'content': '応答'}}
+        
+        assert node._call_ollama("テスト") == '応答'
+        assert 'stream' not in mock_chat.call_args.kwargs
+    
+    @patch('llm_nodes.time.sleep')
+    @patch('llm_nodes.ollama.chat')
+    def test_call_ollama_stream_partial_failure(self, mock_chat, mock_sleep, node):
+        """トークン送出後の失敗はリトライせず部分応答で確定すること"""
+        def broken_stream():
+            yield {'message': {'content': '途中'}, 'done': False}
+            raise ConnectionError("切断")
+        
+        mock_chat.return_value = broken_stream()
+        received = []
+        
+        response = node._call_ollama("テスト", on_token=received.append)
+        
+        assert response == '途中'
+        assert received == ['途中']
+        assert mock_chat.call_count == 1
+        mock_sleep.assert_not_called()
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_generate_outside_graph_ignores_stream_flag(self, mock_chat, node):
+        """グラフ外から直接generateした場合はストリーミングしないこと"""
+        mock_chat.return_value = {'message': {'content': '応答'}}
+        
+        result = node.generate({'history': [], 'user_input': 'やあ', 'stream': True})
+        
+        assert result['history'][-1]['msg'] == '応答'
+        assert 'stream' not in mock_chat.call_args.kwargs
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_generate_returns_delta_without_mutating_state(self, mock_chat, node):
+        """generateが新規ターンのみを返し、入力stateを変更しないこと"""
+        mock_chat.return_value = {'message': {'content': '応答'}}
+        history = [{'speaker': 'User', 'msg': 'やあ'}]
+        
+        result = node.generate({'history': history, 'user_input': 'やあ'})
+        
+        assert history == [{'speaker': 'User', 'msg': 'やあ'}]
+        assert len(result['history']) == 1
+        assert result['last_speaker'] == 'ルミナ'
+
+
+
+async def _astream_chunks(*deltas):
+    """AsyncClient.chat(stream=True) のチャンク列を生成"""
+    for delta in deltas:
+        yield {'message': {'role': 'assistant', 'content': delta}, 'done': False}
+    yield {'message': {'role': 'assistant', 'content': ''}, 'done': True}
+
+
+class TestLLMNodeAsync:
+    """LLMNode非同期呼び出しテスト"""
+    
+    @pytest.fixture
+    def node(self):
+        """ルミナノード"""
+        return LuminaNode(Config())
+    
+    @pytest.mark.asyncio
+    @patch('llm_client.AsyncLLMClient.chat', new_callable=AsyncMock)
+    async def test_agenerate_returns_same_delta(self, mock_chat, node):
+        """agenerateがgenerateと同形式の差分を返すこと"""
+        mock_chat.return_value = {'message': {'content': '非同期応答'}}
+        
+        result = await node.agenerate({'history': [], 'user_input': 'やあ'})
+        
+        assert result['history'][-1]['msg'] == '非同期応答'
+        assert result['last_speaker'] == 'ルミナ'
+    
+    @pytest.mark.asyncio
+    @patch('llm_client.AsyncLLMClient.chat', new_callable=AsyncMock)
+    async def test_acall_ollama_stream_emits_deltas(self, mock_chat, node):
+        """非同期ストリーミングでトークン差分が順に通知されること"""
+        mock_chat.return_value = _astream_chunks('こん', 'にち', 'は')
+        received = []
+        
+        response = await node._acall_ollama("テスト", on_token=received.append)
+        
+        assert received == ['こん', 'にち', 'は']
+        assert response == 'こんにちは'
+    
+    @pytest.mark.asyncio
+    @patch('llm_nodes.time.sleep')
+    @patch('llm_nodes.asyncio.sleep', new_callable=AsyncMock)
+    @patch('llm_client.AsyncLLMClient.chat', new_callable=AsyncMock)
+    async def test_acall_ollama_retry_does_not_block(self, mock_chat, mock_async_sleep,
+                                                     mock_sleep, node):
+        """リトライ待機がasyncio.sleepで行われ、スレッドをブロックしないこと"""
+        mock_chat.side_effect = [ConnectionError("切断"), {'message': {'content': '復旧'}}]
+        
+        response = await node._acall_ollama("テスト")
+        
+        assert response == '復旧'
+        mock_async_sleep.assert_awaited_once()
+        mock_sleep.assert_not_called()
+
+
+class TestAsyncLLMClient:
+    """非同期クライアントテスト"""
+    
+    @pytest.mark.asyncio
+    async def test_aclose_closes_own_transport(self):
+        """acloseは自前のトランスポート（接続プール）をクローズすること"""
+        client = AsyncLLMClient("http://127.0.0.1:11434", max_connections=3)
+        
+        with patch.object(client._transport, 'aclose', new_callable=AsyncMock) as mock_aclose:
+            await client.aclose()
+        
+        mock_aclose.assert_awaited_once()
+        assert client.limits.max_connections == 3
+
+
+class TestBackoffDelay:
+    """リトライ待機時間テスト"""
+    
+    def test_backoff_delay_is_jittered_within_bounds(self):
+        """待機時間が上限付き指数値の半分〜全量に収まること"""
+        for attempt in range(6):
+            ceiling = min(8.0, 1.0 * 2 ** attempt)
+            delays = [backoff_delay(attempt, base=1.0, cap=8.0) for _ in range(50)]
+            assert all(ceiling / 2 <= d <= ceiling for d in delays)
+            assert len(set(delays)) > 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,325 @@
+"""Ollamaバックエンドプールユニットテスト
+
+複数ホストへの振り分け・モデル一覧・ヘルスチェック・サーキットブレーカー・ヘッジングをテストします。
+Ollamaの/api/chat・/api/tagsを模したローカルHTTPサーバーを使用します。
+"""
+
+import asyncio
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+from config import Config
+from conversation_state import ConversationState
+from conversation_summarizer import ConversationSummarizer
+from exceptions import LLMInvocationError
+from llm_client import close_async_llm_clients
+from llm_nodes import ClarisNode
+from llm_pool import LLMBackendPool
+from metrics import MetricsCollector
+from model_residency import ModelResidencyManager
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """/api/chatと/api/tagsのみを模したハンドラ"""
+    
+    def do_GET(self):
+        if self.path != "/api/tags":
+            self.send_error(404)
+            return
+        models = [{"name": name, "model": name} for name in self.server.models]
+        self._send_json({"models": models})
+    
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(request)
+        time.sleep(self.server.delay)
+        if self.server.fail:
+            self._send_json({"error": "model failed"}, status=500)
+            return
+        
+        message = {"role": "assistant", "content": self.server.reply}
+        if not request.get("stream"):
+            self._send_json({"model": request["model"], "message": message, "done": True})
+            return
+        
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for delta in (self.server.reply[:2], self.server.reply[2:], ""):
+                chunk = {"model": request["model"], "message": {"role": "assistant", "content": delta},
+                         "done": delta == ""}
+                self.wfile.write((json.dumps(chunk) + "\n").encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # ヘッジングでキャンセルされた側
+            pass
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOllama(ThreadingHTTPServer):
+    """ローカルのOllama代替サーバー"""
+    
+    daemon_threads = True
+    
+    def __init__(self, reply, delay=0.0, fail=False, models=()):
+        super().__init__(("127.0.0.1", 0), FakeOllamaHandler)
+        self.reply = reply
+        self.delay = delay
+        self.fail = fail
+        self.models = list(models)
+        self.requests = []
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def servers():
+    started = []
+    
+    def start(*args, **kwargs):
+        server = FakeOllama(*args, **kwargs)
+        started.append(server)
+        return server
+    
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def metrics():
+    return MetricsCollector()
+
+
+def _pool(metrics, *servers, **kwargs):
+    hosts = [{"url": server.url, "models": kwargs.pop("models", [])} for server in servers]
+    return LLMBackendPool(hosts, metrics=metrics, **kwargs)
+
+
+async def _achat(pool, model="fast-model", stream=False):
+    """プール経由で非同期に生成し、応答テキストを返す"""
+    try:
+        response = await pool.achat(model=model, messages=[{"role": "user", "content": "こんにちは"}],
+                                    stream=stream)
+        if not stream:
+            return response['message']['content']
+        return "".join([chunk['message']['content'] async for chunk in response])
+    finally:
+        await close_async_llm_clients()
+
+
+class TestDispatch:
+    """振り分けテスト"""
+    
+    def test_least_outstanding(self, metrics):
+        """処理中リクエスト数が最少のホストを選ぶこと"""
+        pool = LLMBackendPool([{"url": "http://a"}, {"url": "http://b"}], metrics=metrics)
+        
+        first = pool.select("fast-model")
+        second = pool.select("fast-model")
+        assert {first.url, second.url} == {"http://a", "http://b"}
+        
+        pool._release(first, "success")
+        assert pool.select("fast-model") is first
+    
+    def test_model_inventory(self, servers, metrics):
+        """設定・ヘルスチェックで取得したモデル一覧に載っているホストのみ選ぶこと"""
+        a = servers("A", models=["fast-model:latest"])
+        b = servers("B", models=["medium-model:latest"])
+        pool = LLMBackendPool([{"url": a.url}, {"url": b.url, "models": ["search-model"]}], metrics=metrics)
+        
+        asyncio.run(pool.probe_all())
+        
+        assert pool.select("fast-model").url == a.url
+        assert pool.select("search-model").url == b.url
+        with pytest.raises(LLMInvocationError):
+            pool.select("medium-model")
+    
+    def test_unreachable_host_excluded(self, servers, metrics):
+        """ヘルスチェックに応答しないホストは除外すること"""
+        alive = servers("A")
+        pool = LLMBackendPool([{"url": "http://127.0.0.1:1"}, {"url": alive.url}], metrics=metrics)
+        
+        asyncio.run(pool.probe_all())
+        
+        assert [host.healthy for host in pool.hosts] == [False, True]
+        assert pool.select("fast-model").url == alive.url
+        assert pool.select("fast-model").url == alive.url
+        assert not metrics.get_summary()['backend_stats']['hosts']["http://127.0.0.1:1"]['healthy']
+
+
+class TestCircuitBreaker:
+    """サーキットブレーカーテスト"""
+    
+    def test_opens_and_retries_after_timeout(self, servers, metrics, clock):
+        """連続失敗したホストは一定時間除外し、経過後の失敗で再び除外すること"""
+        broken = servers("A", fail=True)
+        healthy = servers("B")
+        pool = _pool(metrics, broken, healthy, failure_threshold=2, open_seconds=30, clock=clock)
+        
+        def chat():
+            return pool.chat(model="fast-model", messages=[{"role": "user", "content": "やあ"}])
+        
+        for _ in range(2):
+            with pytest.raises(Exception):
+                chat()
+            assert chat()['message']['content'] == "B"
+        assert len(broken.requests) == 2
+        
+        # 除外中は正常なホストのみ
+        for _ in range(3):
+            assert chat()['message']['content'] == "B"
+        assert len(broken.requests) == 2
+        
+        # 経過後は再び送信し、失敗すれば再度除外
+        clock.now += 31
+        with pytest.raises(Exception):
+            chat()
+        assert chat()['message']['content'] == "B"
+        assert len(broken.requests) == 3
+        
+        stats = metrics.get_summary()['backend_stats']['hosts']
+        assert stats[broken.url] == {'requests': 3, 'failures': 3, 'circuit_opens': 2, 'healthy': True}
+        assert stats[healthy.url]['failures'] == 0
+    
+    def test_sync_stream(self, servers, metrics):
+        """同期ストリーミングでも処理中登録を解除すること"""
+        server = servers("ストリーム応答")
+        pool = _pool(metrics, server)
+        
+        chunks = pool.chat(model="fast-model", messages=[], stream=True)
+        
+        assert "".join(chunk['message']['content'] for chunk in chunks) == "ストリーム応答"
+        assert pool.hosts[0].outstanding == 0
+
+
+class TestHedging:
+    """ヘッジングテスト"""
+    
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_hedged_request_uses_first_reply(self, servers, metrics, stream):
+        """応答が遅い場合は別ホストにも送り、先に応答した方を採用すること"""
+        slow = servers("遅いホスト", delay=1.0)
+        fast = servers("速いホスト")
+        pool = _pool(metrics, slow, fast, hedge_enabled=True, hedge_min_delay_ms=100)
+        
+        start = time.monotonic()
+        text = asyncio.run(_achat(pool, stream=stream))
+        elapsed = time.monotonic() - start
+        
+        assert text == "速いホスト"
+        assert elapsed < 0.8
+        assert len(slow.requests) == len(fast.requests) == 1
+        assert [host.outstanding for host in pool.hosts] == [0, 0]
+        backend = metrics.get_summary()['backend_stats']
+        assert backend['hedged'] == 1
+        assert backend['hedge_wins'] == 1
+    
+    def test_no_hedge_when_fast(self, servers, metrics):
+        """待機時間内に応答した場合は別ホストに送らないこと"""
+        a = servers("A")
+        b = servers("B")
+        pool = _pool(metrics, a, b, hedge_enabled=True, hedge_min_delay_ms=500)
+        
+        assert asyncio.run(_achat(pool)) == "A"
+        assert len(b.requests) == 0
+        assert metrics.get_summary()['backend_stats']['hedged'] == 0
+    
+    def test_failover_on_error(self, servers, metrics):
+        """最初のホストが失敗した場合は別ホストへ1回だけ送り直すこと"""
+        broken = servers("A", fail=True)
+        healthy = servers("B")
+        pool = _pool(metrics, broken, healthy)
+        
+        assert asyncio.run(_achat(pool)) == "B"
+        assert metrics.get_summary()['backend_stats']['hosts'][broken.url]['failures'] == 1
+    
+    def test_delay_from_p95(self, metrics):
+        """計測数が揃うとp95を待機時間に使うこと"""
+        pool = LLMBackendPool([{"url": "http://a"}, {"url": "http://b"}], hedge_enabled=True,
+                              hedge_min_delay_ms=100, hedge_min_samples=20, metrics=metrics)
+        
+        assert pool.hedge_delay("fast-model", False) == pytest.approx(0.1)
+        for latency in [200] * 18 + [2000, 3000]:
+            pool._observe("fast-model", False, latency)
+        assert pool.hedge_delay("fast-model", False) == pytest.approx(2.0)
+        assert pool.hedge_delay("fast-model", True) == pytest.approx(0.1)
+        
+        pool.hedge_enabled = False
+        assert pool.hedge_delay("fast-model", False) is None
+
+
+class TestNodeIntegration:
+    """LLMNode・要約・常駐管理からのプール使用テスト"""
+    
+    def test_node_uses_pool(self, servers, metrics):
+        """プール設定時はLLMNodeの生成がプール経由になること"""
+        server = servers("プール経由の応答")
+        pool = _pool(metrics, server)
+        config = Config()
+        config.model.response_cache_enabled = False
+        
+        with patch('llm_nodes.get_llm_pool', return_value=pool):
+            result = ClarisNode(config).generate({'history': [], 'user_input': 'やあ'})
+        
+        assert result['history'][-1]['msg'] == "プール経由の応答"
+        assert server.requests[0]['model'] == config.model.models['medium']
+    
+    def test_summarizer_uses_pool(self, servers, metrics):
+        """プール設定時は要約の生成もプール経由になること"""
+        server = servers("要約")
+        pool = _pool(metrics, server)
+        state = ConversationState()
+        state.start_new_session()
+        for i in range(6):
+            state.add_turn("User", f"発言{i}")
+        summarizer = ConversationSummarizer(Config(), memory=MagicMock())
+        
+        with patch('conversation_summarizer.get_llm_pool', return_value=pool):
+            assert summarizer.summarize(state, threading.Lock())
+        
+        assert state.summary == "要約"
+        assert len(server.requests) == 1
+    
+    def test_residency_warms_every_host(self, servers, metrics):
+        """ウォームアップはモデルを処理するプール内の全ホストに送ること"""
+        first, second, other = servers("A"), servers("B"), servers("C")
+        pool = LLMBackendPool([
+            {"url": first.url, "models": ["fast-model"]},
+            {"url": second.url, "models": ["fast-model"]},
+            {"url": other.url, "models": ["medium-model"]}
+        ], metrics=metrics)
+        manager = ModelResidencyManager(models=["fast-model"], pool=pool, metrics=metrics)
+        
+        async def warm_up():
+            try:
+                return await manager.warm_up("fast-model")
+            finally:
+                await close_async_llm_clients()
+        
+        assert asyncio.run(warm_up())
+        assert [len(server.requests) for server in (first, second, other)] == [1, 1, 0]
+        assert manager.is_resident("fast-model")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,186 @@
+"""LLMスケジューラユニットテスト
+
+モデル別の実行枠・優先度・待機期限・メトリクス記録をテストします。
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+
+from exceptions import LLMTimeoutError
+from llm_scheduler import (
+    LLMScheduler, PRIORITY_PRO, PRIORITY_FREE, PRIORITY_BACKGROUND, priority_for_roles
+)
+from metrics import MetricsCollector
+
+
+@pytest.fixture
+def metrics():
+    """スケジューラ専用のMetricsCollector"""
+    return MetricsCollector()
+
+
+@pytest.fixture
+def scheduler(metrics):
+    """fastモデル1枠のスケジューラ"""
+    return LLMScheduler(slots={"fast": 1}, default_slots=2, queue_timeout=5, metrics=metrics)
+
+
+class TestLLMScheduler:
+    """LLMSchedulerテスト"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrency_limited_per_model(self, scheduler):
+        """モデルごとの同時実行数が枠数を超えないこと"""
+        running = 0
+        peak = 0
+        
+        async def call():
+            nonlocal running, peak
+            async with scheduler.aslot("fast"):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+        
+        await asyncio.gather(*(call() for _ in range(5)))
+        
+        assert peak == 1
+        assert scheduler.get_stats()["fast"] == {'slots': 1, 'active': 0, 'queued': 0}
+    
+    @pytest.mark.asyncio
+    async def test_models_do_not_share_slots(self, scheduler):
+        """別モデルの実行枠は独立していること"""
+        held = await scheduler.aacquire("fast")
+        
+        other = await asyncio.wait_for(scheduler.aacquire("medium"), timeout=1)
+        
+        scheduler.release(other)
+        scheduler.release(held)
+    
+    @pytest.mark.asyncio
+    async def test_priority_then_fifo_order(self, scheduler):
+        """優先度順、同一優先度内は到着順に割り当てられること"""
+        held = await scheduler.aacquire("fast")
+        order = []
+        
+        async def call(name, priority):
+            async with scheduler.aslot("fast", priority):
+                order.append(name)
+        
+        tasks = []
+        for name, priority in [("free1", PRIORITY_FREE), ("bg", PRIORITY_BACKGROUND),
+                               ("free2", PRIORITY_FREE), ("pro", PRIORITY_PRO)]:
+            tasks.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        
+        scheduler.release(held)
+        await asyncio.gather(*tasks)
+        
+        assert order == ["pro", "free1", "free2", "bg"]
+    
+    @pytest.mark.asyncio
+    async def test_deadline_raises_and_frees_queue(self, scheduler, metrics):
+        """期限切れはLLMTimeoutErrorとなり、待機キューに残らないこと"""
+        held = await scheduler.aacquire("fast")
+        
+        with pytest.raises(LLMTimeoutError):
+            await scheduler.aacquire("fast", timeout=0.05)
+        
+        assert scheduler.get_stats()["fast"]["queued"] == 0
+        scheduler.release(held)
+        # 期限切れの待機者が枠を消費していないこと
+        ticket = await asyncio.wait_for(scheduler.aacquire("fast"), timeout=1)
+        scheduler.release(ticket)
+        assert metrics.get_summary()['scheduler_stats']['fast']['timeouts'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_releases_slot(self, scheduler):
+        """待機中にキャンセルされたリクエストが枠を保持し続けないこと"""
+        held = await scheduler.aacquire("fast")
+        waiter = asyncio.create_task(scheduler.aacquire("fast"))
+        await asyncio.sleep(0)
+        
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        scheduler.release(held)
+        
+        assert scheduler.get_stats()["fast"] == {'slots': 1, 'active': 0, 'queued': 0}
+    
+    @pytest.mark.asyncio
+    async def test_sync_and_async_callers_share_slots(self, scheduler):
+        """スレッドからの同期呼び出しと非同期呼び出しが同じ枠を共有すること"""
+        held = await scheduler.aacquire("fast")
+        acquired = threading.Event()
+        
+        def sync_call():
+            with scheduler.slot("fast"):
+                acquired.set()
+        
+        thread = threading.Thread(target=sync_call)
+        thread.start()
+        await asyncio.sleep(0.05)
+        assert not acquired.is_set()
+        
+        scheduler.release(held)
+        await asyncio.to_thread(thread.join, 1)
+        assert acquired.is_set()
+    
+    def test_sync_deadline(self, scheduler):
+        """同期呼び出しでも待機期限が適用されること"""
+        held = scheduler.acquire("fast")
+        start = time.monotonic()
+        
+        with pytest.raises(LLMTimeoutError):
+            scheduler.acquire("fast", timeout=0.05)
+        
+        assert time.monotonic() - start < 1
+        scheduler.release(held)
+    
+    def test_wait_and_service_metrics(self, scheduler, metrics):
+        """待機時間・実行時間・待機数がメトリクスに記録されること"""
+        held = scheduler.acquire("fast")
+        thread = threading.Thread(target=lambda: scheduler.release(scheduler.acquire("fast", PRIORITY_PRO)))
+        thread.start()
+        time.sleep(0.05)
+        scheduler.release(held)
+        thread.join(1)
+        
+        stats = metrics.get_summary()['scheduler_stats']['fast']
+        assert stats['requests'] == 2
+        assert stats['max_queue_depth'] == 1
+        assert stats['max_wait_ms'] >= 40
+        assert stats['p95_service_ms'] >= 40
+        assert stats['requests_by_priority'] == {PRIORITY_FREE: 1, PRIORITY_PRO: 1}
+        assert "LLMスケジューラ" in metrics.get_performance_report()
+    
+    def test_queue_metrics_bounded(self, metrics, tmp_path):
+        """待機・実行時間は直近の一定件数のみ保持し、要求数は全件を数えること"""
+        metrics.QUEUE_SAMPLE_SIZE = 4
+        for i in range(10):
+            metrics.record_llm_schedule("fast", PRIORITY_FREE, wait_ms=i, service_ms=i)
+        
+        queue = metrics.metrics['llm_queue']['fast']
+        stats = metrics.get_summary()['scheduler_stats']['fast']
+        assert list(queue['wait_times']) == [6, 7, 8, 9]
+        assert len(queue['service_times']) == 4
+        assert stats['requests'] == 10
+        assert stats['max_wait_ms'] == 9
+        metrics.export_to_json(str(tmp_path / "metrics.json"))
+
+
+class TestPriorityForRoles:
+    """優先度クラス決定テスト"""
+    
+    def test_pro_roles(self):
+        """premium/adminはpro、それ以外はfree扱いになること"""
+        assert priority_for_roles(["user", "premium"]) == PRIORITY_PRO
+        assert priority_for_roles(["admin"]) == PRIORITY_PRO
+        assert priority_for_roles(["user"]) == PRIORITY_FREE
+        assert priority_for_roles(None) == PRIORITY_FREE
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,169 @@
+"""中期記憶（SQLiteバックエンド）ユニットテスト
+
+MidTermMemoryの保存・LRU退避・期限切れ削除・一括保存・旧形式JSONの取り込みをテストします。
+Redisキャッシュは使用しません。
+"""
+
+import json
+import sqlite3
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from memory.base import MemoryConfig, MemoryItem
+from memory.mid_term import MidTermMemory, SessionManager
+
+
+@pytest.fixture
+def config():
+    config = MemoryConfig()
+    config.mid_term_max_items = 100
+    return config
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "mid_term.db")
+
+
+@pytest.fixture
+def memory(config, db_path):
+    memory = MidTermMemory(config=config, db_path=db_path, redis_enabled=False)
+    yield memory
+    memory.close()
+
+
+class TestMidTermMemory:
+    """MidTermMemoryテスト"""
+    
+    def test_store_retrieve_delete(self, memory):
+        """保存・取得・削除と件数が一致すること"""
+        assert memory.store("k1", {"text": "こんにちは"}, {"type": "note"})
+        assert memory.store("k1", {"text": "上書き"})
+        
+        assert memory.retrieve("k1") == {"text": "上書き"}
+        assert memory.exists("k1")
+        assert memory.count() == 1
+        
+        assert memory.delete("k1")
+        assert not memory.delete("k1")
+        assert memory.retrieve("k1") is None
+        assert memory.count() == 0
+    
+    def test_persistence(self, memory, config, db_path):
+        """別インスタンスから保存済みのデータを読めること"""
+        memory.store("k1", [1, 2, 3])
+        
+        reopened = MidTermMemory(config=config, db_path=db_path, redis_enabled=False)
+        assert reopened.retrieve("k1") == [1, 2, 3]
+        assert reopened.get_stats()['current_items'] == 1
+        reopened.close()
+    
+    def test_lru_eviction(self, memory, config):
+        """上限を超えた場合はアクセス日時の最も古いアイテムを削除すること"""
+        config.mid_term_max_items = 3
+        for key in ("a", "b", "c"):
+            memory.store(key, key)
+        memory.retrieve("a")
+        
+        memory.store("d", "d")
+        
+        assert not memory.exists("b")
+        assert all(memory.exists(key) for key in ("a", "c", "d"))
+        assert memory.count() == 3
+    
+    def test_expiry(self, memory, config):
+        """TTLを過ぎたアイテムは取得時・一括削除時に削除すること"""
+        memory.store("old1", 1)
+        memory.store("old2", 2)
+        config.mid_term_ttl_seconds = 0
+        
+        assert memory.retrieve("old1") is None
+        assert memory.cleanup_expired() == 1
+        assert memory.count() == 0
+    
+    def test_store_many(self, memory, config):
+        """一括保存は上限を超えた分を保存後にLRUで削除すること"""
+        config.mid_term_max_items = 50
+        
+        stored = memory.store_many((f"k{i}", {"i": i}, {"type": "bulk"}) for i in range(80))
+        
+        assert stored == 80
+        assert memory.count() == 50
+        assert memory.get_stats()['total_stores'] == 80
+    
+    def test_sessions_use_type_index(self, memory):
+        """セッション一覧は種別インデックスで取得し、アクセス日時の新しい順に返すこと"""
+        session_manager = SessionManager(memory)
+        for session_id in ("s1", "s2", "s3"):
+            session_manager.save_session(session_id, [{"speaker": "User", "timestamp": "t"}])
+        session_manager.save_summary("s1", "要約", 4)
+        memory.retrieve_session_summary("s1")
+        
+        sessions = memory.get_sessions(limit=2)
+        
+        assert [session['session_id'] for session in sessions] == ["s1", "s3"]
+        plan = memory._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT key FROM mid_term_items WHERE item_type = 'session_summary'"
+        ).fetchall()
+        assert "idx_mid_term_type" in str(plan)
+    
+    def test_concurrent_store(self, memory):
+        """複数スレッドからの保存で件数がずれないこと"""
+        def store(index):
+            memory.store(f"c{index}", index)
+            return memory.retrieve(f"c{index}")
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(store, range(64)))
+        
+        assert results == list(range(64))
+        assert memory.count() == 64
+
+
+class TestLegacyMigration:
+    """旧形式（JSON）の取り込みテスト"""
+    
+    def test_import_json(self, config, tmp_path):
+        """旧形式のJSONを作成日時・アクセス回数を保ったまま取り込み、.jsonへ退避すること"""
+        db_path = tmp_path / "mid_term.db"
+        created = datetime.now() - timedelta(days=1)
+        items = {}
+        for key, metadata in (("session:s1", {"type": "session_summary", "session_id": "s1"}),
+                              ("note", {})):
+            item = MemoryItem(key, {"key": key}, metadata)
+            item.created_at = created
+            item.access_count = 3
+            items[key] = item.to_dict()
+        db_path.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+        
+        memory = MidTermMemory(config=config, db_path=str(db_path), redis_enabled=False)
+        
+        assert memory.count() == 2
+        assert memory.retrieve("note") == {"key": "note"}
+        assert memory.get_sessions()[0]['session_id'] == "s1"
+        assert memory.get_sessions()[0]['created_at'] == created.isoformat()
+        assert memory.get_sessions()[0]['access_count'] == 3
+        assert (tmp_path / "mid_term.db.json").exists()
+        memory.close()
+        
+        # 取り込み後はSQLiteとして開き、再度取り込まない
+        with open(db_path, "rb") as f:
+            assert f.read(6) == b"SQLite"
+        reopened = MidTermMemory(config=config, db_path=str(db_path), redis_enabled=False)
+        assert reopened.count() == 2
+        reopened.close()
+    
+    def test_schema(self, memory, db_path):
+        """キー・種別・セッションID・アクセス日時のインデックスを作成すること"""
+        with sqlite3.connect(db_path) as conn:
+            indexes = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'mid_term_items'"
+            )}
+        
+        assert {"idx_mid_term_type", "idx_mid_term_session", "idx_mid_term_accessed",
+                "idx_mid_term_created"} <= indexes
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,119 @@
+"""モデル常駐管理ユニットテスト
+
+ModelResidencyManagerのウォームアップ・キープアライブ・コールドスタート記録をテストします。
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from config import Config
+from llm_nodes import LuminaNode
+from metrics import MetricsCollector
+from model_residency import ModelResidencyManager
+
+
+@pytest.fixture
+def metrics():
+    """常駐管理専用のMetricsCollector"""
+    return MetricsCollector()
+
+
+@pytest.fixture
+def manager(metrics):
+    """2モデル（重複指定あり）の常駐マネージャー"""
+    return ModelResidencyManager(
+        models=["fast", "medium", "fast"], keep_alive="30m", interval=0.01,
+        cold_start_threshold_ms=500, metrics=metrics
+    )
+
+
+def _client(chat=None, ps=None):
+    """chat/psをモックした非同期クライアント"""
+    client = AsyncMock()
+    client.chat.side_effect = chat or (lambda **kwargs: {'load_duration': 2_000_000_000})
+    client.ps.side_effect = ps or (lambda: {'models': []})
+    return client
+
+
+class TestModelResidencyManager:
+    """ModelResidencyManagerテスト"""
+    
+    @pytest.mark.asyncio
+    async def test_warm_up_loads_each_model_once(self, manager, metrics):
+        """重複を除いた各モデルをkeep_alive付きでロードし、コールドスタートを記録すること"""
+        client = _client()
+        with patch('model_residency.get_async_llm_client', return_value=client):
+            await manager.warm_up_all()
+        
+        assert client.chat.call_count == 2
+        assert client.chat.call_args.kwargs['keep_alive'] == "30m"
+        assert client.chat.call_args.kwargs['messages'] == []
+        assert manager.get_status()['models'] == {"fast": True, "medium": True}
+        stats = metrics.get_summary()['residency_stats']['fast']
+        assert stats['cold_starts_by_source'] == {'warmup': 1}
+        assert stats['avg_load_ms'] == 2000
+    
+    @pytest.mark.asyncio
+    async def test_keepalive_on_resident_model_is_not_cold(self, manager, metrics):
+        """常駐中モデルへのキープアライブ（読み込み時間が短い）はコールドスタートにならないこと"""
+        client = _client(
+            chat=lambda **kwargs: {'load_duration': 5_000_000},
+            ps=lambda: {'models': [{'name': 'fast'}, {'name': 'medium'}]}
+        )
+        with patch('model_residency.get_async_llm_client', return_value=client):
+            await manager.refresh()
+        
+        assert manager.is_resident("fast")
+        assert metrics.get_summary()['residency_stats']['fast']['cold_starts'] == 0
+    
+    @pytest.mark.asyncio
+    async def test_failed_warm_up_marks_not_resident(self, manager, metrics):
+        """ウォームアップ失敗時は未常駐として記録し、例外を送出しないこと"""
+        def fail(**kwargs):
+            raise ConnectionError("接続失敗")
+        
+        with patch('model_residency.get_async_llm_client', return_value=_client(chat=fail)):
+            assert await manager.warm_up("fast") is False
+        
+        assert not manager.is_resident("fast")
+        stats = metrics.get_summary()['residency_stats']['fast']
+        assert stats['warmup_failures'] == 1
+        assert "モデル常駐" in metrics.get_performance_report()
+    
+    @pytest.mark.asyncio
+    async def test_start_and_stop(self, manager):
+        """起動後にウォームアップとキープアライブを繰り返し、停止できること"""
+        client = _client()
+        with patch('model_residency.get_async_llm_client', return_value=client):
+            await manager.start()
+            await asyncio.sleep(0.05)
+            assert manager.get_status()['running']
+            await manager.stop()
+        
+        assert client.chat.call_count > 2
+        assert client.ps.call_count >= 1
+        assert not manager.get_status()['running']
+
+
+class TestLLMNodeKeepAlive:
+    """LLMNodeのkeep_alive指定・コールドスタート検出テスト"""
+    
+    @patch('llm_nodes.get_model_residency')
+    @patch('llm_nodes.ollama.chat')
+    def test_request_passes_keep_alive_and_reports_load(self, mock_chat, mock_residency):
+        """通常リクエストも設定のkeep_aliveを指定し、読み込み時間を常駐管理へ通知すること"""
+        config = Config()
+        config.model.keep_alive = "1h"
+        mock_chat.return_value = {'message': {'content': '応答'}, 'load_duration': 3_000_000_000}
+        
+        LuminaNode(config)._call_ollama("挨拶")
+        
+        assert mock_chat.call_args.kwargs['keep_alive'] == "1h"
+        mock_residency.return_value.observe.assert_called_once_with(
+            config.model.models['fast'], 3_000_000_000, source="request"
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
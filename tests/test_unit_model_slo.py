@@ -0,0 +1,174 @@
+"""レイテンシSLOによるモデル降格ユニットテスト
+
+ModelDowngradePolicyのp95判定・ヒステリシスと、LLMNodeでの降格先モデルの使用をテストします。
+"""
+
+import time
+import pytest
+from unittest.mock import patch
+
+from config import Config
+from llm_nodes import ClarisNode
+from metrics import MetricsCollector
+from model_slo import ModelDowngradePolicy, get_model_downgrade_policy
+from prompt_builder import get_prompt_builder, reset_prompt_builder
+
+
+SLO_MS = 1000
+
+
+@pytest.fixture
+def metrics():
+    return MetricsCollector()
+
+
+@pytest.fixture
+def policy(metrics, clock):
+    return ModelDowngradePolicy(
+        models={"fast": "fast-model", "medium": "medium-model"},
+        slo_ms={"fast": 0, "medium": SLO_MS},
+        fallbacks={"medium": "fast"},
+        window_seconds=60, min_samples=5, recover_ratio=0.7, hold_seconds=30,
+        metrics=metrics, clock=clock
+    )
+
+
+@pytest.fixture
+def downgrade_enabled(monkeypatch):
+    """モデル降格を有効にした設定でPromptBuilderを作り直す（既定は無効）"""
+    monkeypatch.setattr('config.config.model.model_downgrade_enabled', True)
+    reset_prompt_builder()
+    yield
+    reset_prompt_builder()
+
+
+def _record(metrics, latency_ms, count=10, model="medium-model", clock=None):
+    with patch('metrics.time.monotonic', clock or time.monotonic):
+        for _ in range(count):
+            metrics.record_llm_schedule(model, 1, wait_ms=latency_ms / 2, service_ms=latency_ms / 2)
+
+
+class TestModelDowngradePolicy:
+    """ModelDowngradePolicyテスト"""
+    
+    def test_within_slo(self, policy, metrics):
+        """p95がSLO以内なら元のモデルキーを使うこと"""
+        _record(metrics, SLO_MS * 0.5)
+        
+        assert policy.resolve("medium") == "medium"
+        assert policy.resolve("fast") == "fast"
+    
+    def test_downgrade_when_p95_exceeds_slo(self, policy, metrics):
+        """p95がSLOを超えたら降格先を使い、降格をメトリクスに記録すること"""
+        _record(metrics, SLO_MS * 0.5, count=18)
+        _record(metrics, SLO_MS * 3, count=2)
+        
+        assert policy.resolve("medium") == "fast"
+        assert policy.resolve("medium") == "fast"
+        
+        stats = metrics.get_summary()['downgrade_stats']['medium']
+        assert stats['downgrades'] == 1
+        assert stats['downgraded_requests'] == 2
+        assert stats['active'] and stats['fallback'] == "fast"
+        assert stats['last_p95_ms'] == pytest.approx(SLO_MS * 3)
+    
+    def test_needs_min_samples(self, policy, metrics):
+        """計測数が最小数未満の場合は判定しないこと"""
+        _record(metrics, SLO_MS * 3, count=4)
+        
+        assert policy.resolve("medium") == "medium"
+    
+    def test_recover_ratio(self, policy, metrics, clock):
+        """SLO以下でも回復閾値（SLO×0.7）を上回る間は降格を維持し、計測値が窓から外れたら戻すこと"""
+        _record(metrics, SLO_MS * 3, clock=clock)
+        assert policy.resolve("medium") == "fast"
+        
+        clock.now += 65
+        _record(metrics, SLO_MS * 0.9, clock=clock)
+        assert policy.resolve("medium") == "fast"
+        
+        clock.now += 65
+        assert policy.resolve("medium") == "medium"
+        stats = metrics.get_summary()['downgrade_stats']['medium']
+        assert stats['restores'] == 1
+        assert not stats['active']
+    
+    def test_restore_below_recover_ratio(self, policy, metrics, clock):
+        """保持時間経過後、p95が回復閾値以下なら戻すこと"""
+        _record(metrics, SLO_MS * 3, clock=clock)
+        assert policy.resolve("medium") == "fast"
+        
+        clock.now += 65
+        _record(metrics, SLO_MS * 0.5, clock=clock)
+        
+        assert policy.resolve("medium") == "medium"
+    
+    def test_hold_seconds(self, policy, metrics, clock):
+        """最低保持時間内は計測値が回復していても降格を維持すること"""
+        policy.hold_seconds = 100
+        _record(metrics, SLO_MS * 3, clock=clock)
+        assert policy.resolve("medium") == "fast"
+        
+        clock.now += 65
+        assert policy.resolve("medium") == "fast"
+        
+        clock.now += 36
+        assert policy.resolve("medium") == "medium"
+    
+    def test_rolling_window(self, metrics):
+        """時間窓より古い計測値はp95から除外されること"""
+        _record(metrics, 5000, count=5)
+        now = time.monotonic()
+        
+        assert metrics.rolling_latency_p95("medium-model", 60, now=now) == pytest.approx(5000)
+        assert metrics.rolling_latency_p95("medium-model", 60, now=now + 120) is None
+        assert metrics.rolling_latency_p95("unknown", 60) is None
+    
+    def test_disabled_by_default(self):
+        """既定では無効で、SLOを監視せず元のモデルキーを返すこと"""
+        assert not Config().model.model_downgrade_enabled
+        assert get_model_downgrade_policy().slo_ms == {}
+        assert get_model_downgrade_policy().resolve("medium") == "medium"
+        assert get_prompt_builder().fallback_models == {}
+
+
+class TestNodeDowngrade:
+    """LLMNodeでの降格テスト"""
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_node_uses_fallback_model(self, mock_chat, policy, metrics):
+        """降格中はキャラクターのモデルキーに代えて降格先のモデルで生成すること"""
+        mock_chat.return_value = {'message': {'content': '応答'}}
+        config = Config()
+        config.model.response_cache_enabled = False
+        policy.models = config.model.models
+        _record(metrics, SLO_MS * 3, model=config.model.models['medium'])
+        
+        with patch('llm_nodes.get_model_downgrade_policy', return_value=policy):
+            ClarisNode(config).generate({'history': [], 'user_input': 'やあ'})
+        
+        assert mock_chat.call_args.kwargs['model'] == config.model.models['fast']
+    
+    @patch('llm_nodes.ollama.chat')
+    @pytest.mark.usefixtures('downgrade_enabled')
+    def test_fallback_model_fits_prompt(self, mock_chat, policy, metrics):
+        """降格先のモデルにも降格するキャラクターのプロンプトが収まるnum_ctxを送ること"""
+        mock_chat.return_value = {'message': {'content': '応答'}}
+        config = Config()
+        config.model.response_cache_enabled = False
+        policy.models = config.model.models
+        _record(metrics, SLO_MS * 3, model=config.model.models['medium'])
+        builder = get_prompt_builder()
+        
+        with patch('llm_nodes.get_model_downgrade_policy', return_value=policy):
+            ClarisNode(config).generate({'history': [], 'user_input': 'やあ'})
+        
+        num_ctx = mock_chat.call_args.kwargs['options']['num_ctx']
+        assert num_ctx >= builder._required_ctx('claris')
+        # ルミナ（通常時の利用キャラクター）・ウォームアップと同じ値で、再ロードを起こさないこと
+        assert num_ctx == builder.options('lumina')['num_ctx']
+        assert num_ctx == builder.model_num_ctx(config.model.models['fast'])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
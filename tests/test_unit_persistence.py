@@ -0,0 +1,236 @@
+"""ファイル永続化（スナップショット＋追記ログ）ユニットテスト
+
+JournaledStoreの追記・再生・書き込み途中の末尾の無視・圧縮・fsync方針と、
+長期記憶・知識ベースでの使用をテストします。
+"""
+
+import json
+import time
+import pytest
+from unittest.mock import patch
+
+import memory.persistence as persistence
+from memory.base import MemoryConfig, MemoryItem
+from memory.knowledge_base import KnowledgeBase
+from memory.long_term import LongTermMemory
+from memory.persistence import JournaledStore
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return tmp_path / "profiles.json"
+
+
+def _reopen(store, **kwargs):
+    store.close()
+    return JournaledStore(store.snapshot_path, **kwargs)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+class TestJournaledStore:
+    """JournaledStoreテスト"""
+    
+    def test_replay(self, snapshot_path):
+        """追記したログを起動時に再生し、スナップショットに反映してログを削除すること"""
+        store = JournaledStore(snapshot_path, compact_records=None)
+        store.put("a", {"n": 1})
+        store.put("b", [1, 2])
+        store.put("a", {"n": 2})
+        store.delete("b")
+        assert not store.delete("missing")
+        
+        assert not snapshot_path.exists()
+        assert len(store.log_path.read_text(encoding="utf-8").splitlines()) == 4
+        
+        reopened = _reopen(store)
+        assert reopened.data == {"a": {"n": 2}}
+        assert reopened.stats['replayed_records'] == 4
+        assert json.loads(snapshot_path.read_text(encoding="utf-8")) == {"a": {"n": 2}}
+        assert reopened.log_path.read_text(encoding="utf-8") == ""
+        reopened.close()
+    
+    def test_clear(self, snapshot_path):
+        """clearの記録以前の値は再生後に残らないこと"""
+        store = JournaledStore(snapshot_path)
+        store.put("a", 1)
+        store.clear()
+        store.put("b", 2)
+        
+        reopened = _reopen(store)
+        assert reopened.data == {"b": 2}
+        reopened.close()
+    
+    def test_torn_tail(self, snapshot_path):
+        """書き込み途中で終わった末尾の行は無視すること"""
+        store = JournaledStore(snapshot_path)
+        store.put("a", 1)
+        store.close()
+        with open(store.log_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "set", "key": "b", "val')
+        
+        reopened = JournaledStore(snapshot_path)
+        assert reopened.data == {"a": 1}
+        reopened.put("c", 3)
+        
+        assert _reopen(reopened).data == {"a": 1, "c": 3}
+    
+    def test_unserializable_value(self, snapshot_path):
+        """JSON化できない値は保存せず、ログも壊さないこと"""
+        store = JournaledStore(snapshot_path)
+        with pytest.raises(TypeError):
+            store.put("a", object())
+        store.put("b", 2)
+        
+        assert store.data == {"b": 2}
+        assert _reopen(store).data == {"b": 2}
+    
+    def test_compact(self, snapshot_path):
+        """圧縮はスナップショットを書き出してログを切り詰めること"""
+        store = JournaledStore(snapshot_path, compact_records=None)
+        for i in range(10):
+            store.put(f"k{i}", i)
+        
+        assert store.compact()
+        store.put("after", True)
+        
+        assert json.loads(snapshot_path.read_text(encoding="utf-8")) == {f"k{i}": i for i in range(10)}
+        assert store.records == 1
+        assert not store.log_path.with_name(store.log_path.name + ".1").exists()
+        assert _reopen(store).data == {**{f"k{i}": i for i in range(10)}, "after": True}
+    
+    def test_background_compaction(self, snapshot_path):
+        """記録数が閾値を超えた場合はバックグラウンドで圧縮すること"""
+        store = JournaledStore(snapshot_path, compact_records=20)
+        for i in range(25):
+            store.put(f"k{i}", i)
+        
+        _wait_for(lambda: store.stats['compactions'] == 1)
+        assert len(json.loads(snapshot_path.read_text(encoding="utf-8"))) >= 20
+        assert store.records < 20
+        assert _reopen(store).data == {f"k{i}": i for i in range(25)}
+    
+    def test_compaction_failure_keeps_log(self, snapshot_path):
+        """スナップショットの書き出しに失敗した場合はログを元に戻すこと"""
+        store = JournaledStore(snapshot_path, compact_records=None)
+        store.put("a", 1)
+        
+        with patch.object(store, "_write_snapshot", side_effect=OSError("disk full")):
+            assert not store.compact()
+        store.put("b", 2)
+        
+        assert store.records == 2
+        assert _reopen(store).data == {"a": 1, "b": 2}
+    
+    def test_interrupted_compaction(self, snapshot_path):
+        """圧縮途中で停止した場合は退避したログと新しいログを両方再生すること"""
+        snapshot_path.write_text(json.dumps({"a": 0}), encoding="utf-8")
+        rotated = snapshot_path.with_name(snapshot_path.name + ".log.1")
+        rotated.write_text('{"op": "set", "key": "a", "value": 1}\n', encoding="utf-8")
+        log = snapshot_path.with_name(snapshot_path.name + ".log")
+        log.write_text('{"op": "set", "key": "b", "value": 2}\n', encoding="utf-8")
+        
+        store = JournaledStore(snapshot_path)
+        
+        assert store.data == {"a": 1, "b": 2}
+        assert not rotated.exists()
+        store.close()
+    
+    @pytest.mark.parametrize("policy, expected", [("always", 3), ("off", 0)])
+    def test_fsync_per_write(self, snapshot_path, policy, expected):
+        """always方式は追記ごとにfsyncし、off方式はfsyncしないこと"""
+        store = JournaledStore(snapshot_path, fsync=policy, compact_records=None)
+        with patch.object(persistence.os, "fsync") as fsync:
+            for i in range(3):
+                store.put(f"k{i}", i)
+            store.close()
+        
+        assert fsync.call_count == expected
+    
+    def test_fsync_interval(self, snapshot_path):
+        """interval方式はバックグラウンドで一定間隔ごとにまとめてfsyncすること"""
+        store = JournaledStore(snapshot_path, fsync="interval", fsync_interval=0.05)
+        for i in range(50):
+            store.put(f"k{i}", i)
+        
+        _wait_for(lambda: store.stats['fsyncs'] >= 1)
+        assert store.stats['fsyncs'] < 50
+        store.close()
+    
+    def test_invalid_policy(self, snapshot_path):
+        """不明なfsync方針はValueErrorを送出すること"""
+        with pytest.raises(ValueError):
+            JournaledStore(snapshot_path, fsync="sometimes")
+
+
+class TestMemoryLayers:
+    """長期記憶・知識ベースでの使用テスト"""
+    
+    def test_long_term_appends(self, tmp_path):
+        """既存のprofiles.jsonを読み込み、保存は文書全体を書き直さずログへ追記すること"""
+        data_dir = tmp_path / "long_term"
+        legacy = LongTermMemory(data_dir=str(data_dir))
+        legacy.close()
+        profiles = {"user:u1": {"key": "user:u1", "value": {"name": "旧"}, "metadata": {},
+                                "created_at": "2024-01-01T00:00:00", "accessed_at": "2024-01-01T00:00:00",
+                                "access_count": 0}}
+        (data_dir / "profiles.json").write_text(json.dumps(profiles, ensure_ascii=False), encoding="utf-8")
+        
+        memory = LongTermMemory(data_dir=str(data_dir))
+        assert memory.retrieve_user_profile("u1") == {"name": "旧"}
+        memory.store_user_profile("u2", {"name": "新"})
+        
+        assert json.loads((data_dir / "profiles.json").read_text(encoding="utf-8")) == profiles
+        assert memory.get_stats()['journal']['log_records'] == 1
+        memory.close()
+        
+        reopened = LongTermMemory(data_dir=str(data_dir))
+        assert reopened.retrieve_user_profile("u2") == {"name": "新"}
+        reopened.close()
+    
+    def test_long_term_holds_items(self, tmp_path):
+        """長期記憶はMemoryItemのまま保持し、ファイルには従来のISO形式で書き出すこと"""
+        memory = LongTermMemory(data_dir=str(tmp_path))
+        memory.store("user:u1", {"name": "ユーザー"}, {"type": "user_profile"})
+        memory.retrieve("user:u1")
+        
+        item = memory.profiles["user:u1"]
+        assert isinstance(item, MemoryItem)
+        assert item.access_count == 1
+        assert not hasattr(item, "__dict__")
+        assert memory.journal.compact()
+        memory.close()
+        
+        saved = json.loads((tmp_path / "profiles.json").read_text(encoding="utf-8"))["user:u1"]
+        assert saved["metadata"] == {"type": "user_profile"}
+        assert saved["access_count"] == 1
+        assert MemoryItem.from_dict(saved).accessed_at.isoformat() == saved["accessed_at"]
+        
+        reopened = LongTermMemory(data_dir=str(tmp_path))
+        assert reopened.profiles["user:u1"].created_ts == pytest.approx(item.created_ts, abs=1e-6)
+        reopened.close()
+    
+    def test_knowledge_base_namespaces(self, tmp_path):
+        """知識ベースは名前空間ごとにログへ追記し、再起動後も読めること"""
+        config = MemoryConfig()
+        config.kb_namespaces = ["movie", "tech"]
+        kb = KnowledgeBase(config, data_dir=str(tmp_path))
+        kb.add_document("movie", "m1", "映画の話")
+        kb.add_document("tech", "t1", "技術の話")
+        kb.delete("tech:t1")
+        kb.close()
+        
+        reopened = KnowledgeBase(config, data_dir=str(tmp_path))
+        assert reopened.retrieve("movie:m1") == "映画の話"
+        assert not reopened.exists("tech:t1")
+        assert reopened.get_stats()['items_per_namespace'] == {"movie": 1, "tech": 0}
+        reopened.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
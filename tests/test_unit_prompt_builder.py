@@ -0,0 +1,128 @@
+"""プロンプトビルダーユニットテスト
+
+トークン見積もり・固定プレフィックス・履歴の予算内切り詰め・num_ctx算出をテストします。
+"""
+
+import pytest
+from unittest.mock import patch
+
+from config import Config
+from llm_nodes import NoxNode
+from prompt_builder import (
+    CHARACTER_TEMPLATES, CTX_STEP, PromptBudget, PromptBuilder,
+    estimate_tokens, truncate_to_tokens
+)
+
+
+@pytest.fixture
+def builder():
+    """ルミナ・ノクスが同じモデルを使うビルダー"""
+    return PromptBuilder(
+        budgets={
+            "lumina": PromptBudget(history_tokens=100, input_tokens=50, num_predict=128),
+            "claris": PromptBudget(history_tokens=2000, num_predict=1024),
+            "nox": PromptBudget(history_tokens=300, extra_tokens=200, num_predict=256)
+        },
+        character_models={"lumina": "shared", "claris": "medium", "nox": "shared"}
+    )
+
+
+def _history(n, msg="こんにちは"):
+    return [{'speaker': 'User' if i % 2 == 0 else 'ルミナ', 'msg': f"{msg}{i}"} for i in range(n)]
+
+
+class TestTokenEstimate:
+    """トークン見積もりテスト"""
+    
+    def test_estimate_by_script(self):
+        """日本語は1文字1トークン、英数字は4文字1トークンで見積もること"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("こんにちは") == 5
+        assert estimate_tokens("hello world") == 4
+        assert estimate_tokens("今日はsunny!") == 3 + 2 + 1
+    
+    def test_truncate_within_budget(self):
+        """上限を超える文字列は先頭側を残して切り詰めること"""
+        text = "あ" * 100
+        
+        truncated = truncate_to_tokens(text, 10)
+        
+        assert truncated.endswith("…")
+        assert estimate_tokens(truncated) <= 10
+        assert truncate_to_tokens("短い", 10) == "短い"
+
+
+class TestPromptBuilder:
+    """PromptBuilderテスト"""
+    
+    def test_prefix_is_byte_identical(self, builder):
+        """履歴・入力が変わってもペルソナ部分は同一の先頭文字列であること"""
+        first = builder.build("lumina", [], "はじめまして")
+        second = builder.build("lumina", _history(5), "別の質問です")
+        prefix = CHARACTER_TEMPLATES["lumina"].prefix
+        
+        assert first.startswith(prefix) and second.startswith(prefix)
+        assert "ルミナ" in prefix and "これまでの会話" not in prefix
+    
+    def test_history_trimmed_to_budget(self, builder):
+        """履歴は新しい順に予算内まで残ること（ターン数では制限しない）"""
+        history = _history(40)
+        
+        text = builder.format_history(history, 100)
+        
+        assert text.endswith("ルミナ: こんにちは39")
+        assert "こんにちは0\n" not in text
+        assert estimate_tokens(text) + text.count("\n") <= 100
+        # 短い発言なら従来の6ターンを超えて残る
+        assert text.count("\n") + 1 > 6
+    
+    def test_oversized_latest_turn_truncated(self, builder):
+        """最新ターンだけで予算を超える場合は切り詰めて残すこと"""
+        history = _history(3) + [{'speaker': 'User', 'msg': "長文" * 500}]
+        
+        text = builder.format_history(history, 100)
+        
+        assert text.startswith("User: 長文") and text.endswith("…")
+        assert estimate_tokens(text) <= 100
+    
+    def test_search_result_included_and_bounded(self, builder):
+        """検索結果は見出し付きで予算内に切り詰めて含めること"""
+        prompt = builder.build("nox", [], "最新ニュース", extra="記事" * 1000)
+        
+        assert "検索結果:\n記事" in prompt
+        assert estimate_tokens(prompt) < CHARACTER_TEMPLATES["nox"].fixed_tokens + 200 + 20
+        assert "検索結果" not in builder.build("nox", [], "こんにちは")
+    
+    def test_num_ctx_shared_per_model(self, builder):
+        """同じモデルを使うキャラクター間でnum_ctxを揃えること"""
+        lumina = builder.options("lumina")
+        nox = builder.options("nox")
+        
+        assert lumina['num_ctx'] == nox['num_ctx']
+        assert lumina['num_ctx'] % CTX_STEP == 0
+        assert (lumina['num_predict'], nox['num_predict']) == (128, 256)
+        assert builder.options("claris")['num_ctx'] >= 2000 + 512 + 1024
+
+
+class TestLLMNodePromptOptions:
+    """LLMNodeからのプロンプトビルダー利用テスト"""
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_nox_passes_search_result_and_options(self, mock_chat):
+        """ノクスは検索結果入りのプロンプトとnum_ctx/num_predictを送ること"""
+        config = Config()
+        config.model.response_cache_enabled = False
+        config.system.enable_search = True
+        mock_chat.return_value = {'message': {'content': '要約'}}
+        node = NoxNode(config)
+        
+        with patch.object(node, '_perform_search', return_value="1. 記事タイトル"):
+            node.generate({'history': [], 'user_input': '最新ニュースを調べて'})
+        
+        kwargs = mock_chat.call_args.kwargs
+        assert "検索結果:\n1. 記事タイトル" in kwargs['messages'][0]['content']
+        assert set(kwargs['options']) == {'num_ctx', 'num_predict'}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
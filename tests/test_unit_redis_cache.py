@@ -0,0 +1,223 @@
+"""Redisキャッシュのユニットテスト
+
+RedisCacheの受動的な接続状態の判定・再接続確認・一括操作（mget/mset/mdelete）と、
+中期記憶・セッション管理での一括読み込みをテストします。Redisサーバーは使用しません。
+"""
+
+import time
+import pytest
+from unittest.mock import patch
+
+import redis
+
+from memory.base import MemoryConfig
+from memory.mid_term import MidTermMemory, SessionManager
+from memory.redis_cache import RedisCache
+
+
+class FakeRedis:
+    """コマンドの往復回数を数えるインメモリのRedisクライアント"""
+    
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+        self.down = False
+    
+    def _call(self):
+        self.round_trips += 1
+        if self.down:
+            raise redis.ConnectionError("接続できません")
+    
+    def ping(self):
+        self._call()
+        return True
+    
+    def get(self, key):
+        self._call()
+        return self.data.get(key)
+    
+    def set(self, key, value, ex=None):
+        self._call()
+        self.data[key] = value
+        return True
+    
+    def setex(self, key, seconds, value):
+        return self.set(key, value)
+    
+    def delete(self, *keys):
+        self._call()
+        return sum(self.data.pop(key, None) is not None for key in keys)
+    
+    def exists(self, key):
+        self._call()
+        return int(key in self.data)
+    
+    def mget(self, keys):
+        self._call()
+        return [self.data.get(key) for key in keys]
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    
+    def close(self):
+        pass
+
+
+class FakePipeline:
+    """execute時に1往復でまとめて実行するパイプライン"""
+    
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+    
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+    
+    def execute(self):
+        self.client._call()
+        self.client.data.update(self.commands)
+        return [True] * len(self.commands)
+
+
+@pytest.fixture
+def client():
+    return FakeRedis()
+
+
+@pytest.fixture
+def cache(client):
+    with patch('memory.redis_cache.redis.Redis', return_value=client):
+        cache = RedisCache(probe_interval=0.02)
+    client.round_trips = 0
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def memory(cache, tmp_path):
+    memory = MidTermMemory(config=MemoryConfig(), db_path=str(tmp_path / "mid_term.db"), redis_enabled=False)
+    memory.redis_cache = cache
+    yield memory
+    memory.close()
+
+
+class TestRedisCache:
+    """RedisCacheテスト"""
+    
+    def test_no_ping_per_operation(self, cache, client):
+        """操作ごとにPINGせず、1操作1往復であること"""
+        assert cache.set("k", {"a": 1})
+        assert cache.get("k", as_json=True) == {"a": 1}
+        assert cache.exists("k")
+        assert cache.delete("k")
+        
+        assert client.round_trips == 4
+        assert cache.get_stats()['round_trips'] == 4
+    
+    def test_batch_operations(self, cache, client):
+        """mget/mset/mdeleteはそれぞれ1往復で実行すること"""
+        assert cache.mset({"a": {"n": 1}, "b": "文字列"}, expire_seconds=60)
+        assert cache.mget(["a", "b", "missing"], as_json=True) == {"a": {"n": 1}, "b": "文字列"}
+        assert cache.mdelete(["a", "b", "missing"]) == 2
+        assert cache.mget([]) == {}
+        
+        assert client.round_trips == 3
+    
+    def test_passive_health_and_probe(self, cache, client):
+        """接続エラーで利用不可にし、バックグラウンドの再接続確認で復旧すること"""
+        client.down = True
+        assert cache.get("k") is None
+        assert not cache.is_available()
+        
+        # 利用不可の間は通信しない
+        trips = client.round_trips
+        assert not cache.set("k", "v")
+        assert client.round_trips - trips <= cache.stats['probes']
+        
+        client.down = False
+        deadline = time.monotonic() + 2
+        while not cache.is_available() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        
+        assert cache.is_available()
+        assert cache.stats['connection_errors'] == 1
+        assert cache.set("k", "v")
+    
+    def test_command_error_keeps_available(self, cache, client):
+        """接続エラー以外の失敗では利用不可にしないこと"""
+        with patch.object(client, 'get', side_effect=redis.ResponseError("WRONGTYPE")):
+            assert cache.get("k") is None
+        
+        assert cache.is_available()
+
+
+class TestMidTermBatching:
+    """中期記憶・セッション管理の一括読み込みテスト"""
+    
+    def test_retrieve_round_trips(self, memory, client):
+        """取得はヒット時1往復、ミス時はSQLiteから取得して再登録の2往復であること"""
+        memory.store("k", {"v": 1})
+        client.data.clear()
+        client.round_trips = 0
+        
+        assert memory.retrieve("k") == {"v": 1}
+        assert client.round_trips == 2
+        assert memory.retrieve("k") == {"v": 1}
+        assert client.round_trips == 3
+        assert (memory.stats['redis_hits'], memory.stats['redis_misses']) == (1, 1)
+    
+    def test_store_many_round_trips(self, memory, client):
+        """一括保存のRedis登録と退避分の削除をそれぞれ1往復で行うこと"""
+        memory.config.mid_term_max_items = 5
+        memory.store_many((f"k{i}", i, None) for i in range(10))
+        
+        assert client.round_trips == 2
+        assert sorted(client.data) == [f"mid_term:k{i}" for i in range(5, 10)]
+    
+    def test_retrieve_many(self, memory, client):
+        """キャッシュ済み・未キャッシュ・期限切れ・存在しないキーを1回の呼び出しで扱うこと"""
+        memory.store("cached", 1)
+        memory.store("uncached", 2)
+        memory.store("expired", 3)
+        client.data.pop("mid_term:uncached")
+        with memory._transaction() as conn:
+            conn.execute("UPDATE mid_term_items SET created_at = 0 WHERE key = 'expired'")
+        client.data.pop("mid_term:expired")
+        client.round_trips = 0
+        
+        results = memory.retrieve_many(["cached", "uncached", "expired", "missing"])
+        
+        assert results == {"cached": 1, "uncached": 2}
+        assert not memory.exists("expired")
+        # mget + 期限切れの削除 + 再登録
+        assert client.round_trips == 3
+    
+    def test_session_with_summary(self, memory, client):
+        """セッションと要約は1往復でまとめて読み込むこと"""
+        session_manager = SessionManager(memory)
+        session_manager.save_session("s1", [{"speaker": "User", "timestamp": "t"}])
+        session_manager.save_summary("s1", "要約", 4)
+        client.round_trips = 0
+        
+        session, summary = session_manager.load_session_with_summary("s1")
+        
+        assert session['total_turns'] == 1
+        assert summary['summary'] == "要約"
+        assert client.round_trips == 1
+    
+    def test_list_sessions_with_summaries(self, memory, client):
+        """セッション一覧のサマリーは1往復でまとめて読み込むこと"""
+        session_manager = SessionManager(memory)
+        for session_id in ("s1", "s2", "s3"):
+            session_manager.save_session(session_id, [{"speaker": "User", "timestamp": "t"}])
+        client.round_trips = 0
+        
+        sessions = session_manager.list_recent_sessions_with_summaries(limit=3)
+        
+        assert {session['session_id'] for session in sessions} == {"s1", "s2", "s3"}
+        assert all(session['summary']['total_turns'] == 1 for session in sessions)
+        assert client.round_trips == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
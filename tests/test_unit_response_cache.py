@@ -0,0 +1,140 @@
+"""LLM応答キャッシュユニットテスト
+
+ResponseCacheのキー生成・LRU/TTL・Redis層と、LLMNodeからの利用をテストします。
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+import response_cache
+from config import Config
+from llm_nodes import LuminaNode
+from memory.redis_cache import RedisCache
+from metrics import MetricsCollector
+from response_cache import ResponseCache, make_cache_key
+
+
+@pytest.fixture
+def metrics():
+    """キャッシュ専用のMetricsCollector"""
+    return MetricsCollector()
+
+
+class TestResponseCache:
+    """ResponseCacheテスト"""
+    
+    def test_key_normalizes_whitespace_only(self):
+        """空白の違いは同一キー、モデル・キャラクター・内容の違いは別キーになること"""
+        key = make_cache_key("m", "ルミナ", "こんにちは\n  元気？")
+        
+        assert key == make_cache_key("m", "ルミナ", "  こんにちは 元気？\n")
+        assert key != make_cache_key("m2", "ルミナ", "こんにちは 元気？")
+        assert key != make_cache_key("m", "クラリス", "こんにちは 元気？")
+        assert key != make_cache_key("m", "ルミナ", "こんばんは 元気？")
+    
+    def test_lru_eviction(self, metrics):
+        """上限超過時に最も参照の古いエントリが削除されること"""
+        cache = ResponseCache(max_entries=2, metrics=metrics)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+        
+        assert cache.get("a") == "A"
+        assert cache.get("b") is None
+        assert cache.get("c") == "C"
+    
+    def test_ttl_expiry(self, metrics):
+        """有効期限切れのエントリが返らないこと"""
+        cache = ResponseCache(ttl_seconds=10, metrics=metrics)
+        with patch('response_cache.time.monotonic', return_value=100.0):
+            cache.set("a", "A")
+        with patch('response_cache.time.monotonic', return_value=109.0):
+            assert cache.get("a") == "A"
+        with patch('response_cache.time.monotonic', return_value=111.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+    
+    def test_redis_layer_backfills_local(self, metrics):
+        """ローカルミス時にRedisを参照し、ヒットをローカルへ保持すること"""
+        redis_cache = Mock(spec=RedisCache)
+        redis_cache.enabled = True
+        redis_cache.get.return_value = "Redis応答"
+        redis_cache.ttl.return_value = 50
+        cache = ResponseCache(redis_cache=redis_cache, metrics=metrics)
+        
+        assert cache.get("k") == "Redis応答"
+        assert cache.get("k") == "Redis応答"
+        
+        redis_cache.get.assert_called_once_with("k")
+        stats = metrics.get_summary()['cache_stats']
+        assert stats['hits_by_layer'] == {'local': 1, 'redis': 1}
+    
+    def test_set_writes_through_to_redis(self, metrics):
+        """保存時にTTL付きでRedisへも書き込むこと"""
+        redis_cache = Mock(spec=RedisCache)
+        redis_cache.enabled = True
+        cache = ResponseCache(ttl_seconds=60, redis_cache=redis_cache, metrics=metrics)
+        
+        cache.set("k", "応答")
+        
+        redis_cache.set.assert_called_once_with("k", "応答", expire_seconds=60)
+
+
+class TestLLMNodeResponseCache:
+    """LLMNodeの応答キャッシュ利用テスト"""
+    
+    @pytest.fixture
+    def node(self):
+        """ルミナノード"""
+        return LuminaNode(Config())
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_identical_prompt_skips_llm(self, mock_chat, node):
+        """同一プロンプトの2回目はOllamaを呼ばずキャッシュから返すこと"""
+        mock_chat.return_value = {'message': {'content': 'こんにちは！'}}
+        received = []
+        
+        assert node._call_ollama("挨拶") == 'こんにちは！'
+        assert node._call_ollama("挨拶", on_token=received.append) == 'こんにちは！'
+        
+        assert mock_chat.call_count == 1
+        assert received == ['こんにちは！']
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_excluded_character_not_cached(self, mock_chat, node):
+        """キャッシュ対象外のキャラクターは毎回Ollamaを呼ぶこと"""
+        node.config.model.response_cache_exclude = ['lumina']
+        mock_chat.return_value = {'message': {'content': '応答'}}
+        
+        node._call_ollama("挨拶")
+        node._call_ollama("挨拶")
+        
+        assert mock_chat.call_count == 2
+    
+    @patch('llm_nodes.time.sleep')
+    @patch('llm_nodes.ollama.chat')
+    def test_fallback_not_cached(self, mock_chat, mock_sleep, node):
+        """フォールバック応答はキャッシュされないこと"""
+        mock_chat.side_effect = ConnectionError("接続失敗")
+        fallback = node._call_ollama("挨拶")
+        
+        mock_chat.side_effect = None
+        mock_chat.return_value = {'message': {'content': '復旧'}}
+        
+        assert fallback == node._get_fallback_response()
+        assert node._call_ollama("挨拶") == '復旧'
+    
+    @pytest.mark.asyncio
+    async def test_async_path_shares_cache(self, node):
+        """同期経路で保存した応答を非同期経路でも利用すること"""
+        with patch('llm_nodes.ollama.chat', return_value={'message': {'content': '共有'}}):
+            node._call_ollama("挨拶")
+        
+        with patch('llm_client.AsyncLLMClient.chat') as mock_achat:
+            assert await node._acall_ollama("挨拶") == '共有'
+            mock_achat.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
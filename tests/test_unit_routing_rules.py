@@ -0,0 +1,91 @@
+"""ルーティングルールユニットテスト
+
+RuleMatcherの正規化・一括照合・優先度と、RouterNode/NoxNodeからの利用をテストします。
+"""
+
+import pytest
+
+from config import Config
+from llm_nodes import NoxNode, RouterNode
+from routing_rules import RoutingRule, RuleMatcher, compile_rules, normalize_text
+
+
+@pytest.fixture
+def router():
+    return RouterNode(Config())
+
+
+class TestRuleMatcher:
+    """RuleMatcherテスト"""
+    
+    def test_normalization(self):
+        """半角カナ・カタカナ・全角英字を同じ表記に正規化すること"""
+        assert normalize_text("ﾙﾐﾅ") == normalize_text("ルミナ") == "るみな"
+        assert normalize_text("ＮＥＷＳ") == "news"
+    
+    def test_all_overlapping_matches_in_one_pass(self):
+        """重なり・包含関係にあるキーワードも全て検出すること"""
+        matcher = RuleMatcher([
+            RoutingRule("he", "a"), RoutingRule("she", "b"),
+            RoutingRule("his", "c"), RoutingRule("hers", "d")
+        ])
+        
+        matches = matcher.scan("ushers")
+        
+        assert sorted((m.rule.keyword, m.start, m.end) for m in matches) == [
+            ("he", 2, 4), ("hers", 2, 6), ("she", 1, 4)
+        ]
+    
+    def test_best_by_priority_then_order(self):
+        """優先度の高いルール、同値なら先に定義したルールを採用すること"""
+        matcher = RuleMatcher([
+            RoutingRule("説明", "claris", 40),
+            RoutingRule("検索", "nox", 50),
+            RoutingRule("最新", "lumina", 50),
+        ])
+        
+        assert matcher.best("最新情報を検索して説明して").target == "nox"
+        assert matcher.best("説明して", targets=["nox"]) is None
+    
+    def test_compiled_once_per_rule_set(self):
+        """同じルール定義からは同じコンパイル済みインスタンスを返すこと"""
+        rules = Config().system.routing_rules
+        assert compile_rules(rules) is compile_rules(list(rules))
+
+
+class TestRouterRules:
+    """RouterNode/NoxNodeのルール利用テスト"""
+    
+    @pytest.mark.parametrize("user_input, expected", [
+        ("こんにちは", "lumina"),
+        ("最新ニュースを調べて", "nox"),
+        ("理由を詳しく教えて", "claris"),
+        ("ノクス、説明して", "nox"),
+        ("のくすとルミナに聞きたい", "lumina"),
+        ("ｸﾗﾘｽ、最新の話題は？", "claris"),
+    ])
+    def test_route(self, router, user_input, expected):
+        """指名 > 検索キーワード > 解説キーワード > 既定（ルミナ）の順に判定すること"""
+        assert router.route({'user_input': user_input}) == expected
+    
+    def test_explicit_character(self, router):
+        """キャラクター指定は別名・表記揺れを正規化して優先すること"""
+        assert router.route({'user_input': '最新ニュース', 'next_character': 'クラリス'}) == 'claris'
+        assert router.route({'user_input': 'こんにちは', 'next_character': 'Clarisse'}) == 'claris'
+        assert router.route({'user_input': '検索して', 'next_character': 'unknown'}) == 'nox'
+    
+    def test_rules_from_config(self):
+        """設定のルール追加で新しいキーワードをルーティングできること"""
+        config = Config()
+        config.system.routing_rules = config.system.routing_rules + [
+            {"keyword": "天気", "target": "nox", "priority": 60},
+            {"keyword": "天気", "target": "search"},
+        ]
+        
+        assert RouterNode(config).route({'user_input': '明日の天気を説明して'}) == 'nox'
+        assert NoxNode(config)._needs_search("明日の天気は？")
+        assert not NoxNode(Config())._needs_search("明日の天気は？")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,189 @@
+"""SessionStateStoreユニットテスト
+
+セッション別会話状態の分離・LRU退避・並列実行を検証します。
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from conversation_state import ConversationState, SessionStateStore
+from services.chat_service import ChatService
+
+
+def _use(store, session_id):
+    """ターン1回分の確保・解放を行い、会話状態を返す"""
+    state, _ = store.acquire(session_id)
+    store.release(session_id)
+    return state
+
+
+class TestSessionStateStore:
+    """SessionStateStoreテスト"""
+    
+    def test_sessions_are_isolated(self):
+        """セッションごとに別の会話状態が返ること"""
+        store = SessionStateStore(max_sessions=10)
+        state_a, lock_a = store.acquire("a")
+        state_b, lock_b = store.acquire("b")
+        
+        state_a.add_turn("User", "Aの発言")
+        
+        assert state_a is not state_b
+        assert lock_a is not lock_b
+        assert state_b.history == []
+        assert state_a.session_id == "a"
+        assert store.acquire("a")[0] is state_a
+    
+    def test_lru_eviction(self):
+        """上限超過時に最も古く使われたセッションが退避されること"""
+        evicted = []
+        store = SessionStateStore(max_sessions=2, on_evict=evicted.append)
+        
+        for session_id in ["a", "b"]:
+            _use(store, session_id).add_turn("User", session_id)
+        _use(store, "a")  # aを最近使用に
+        _use(store, "c")
+        
+        assert [s.session_id for s in evicted] == ["b"]
+        assert "b" not in store
+        assert len(store) == 2
+    
+    def test_locked_session_not_evicted(self):
+        """実行中（ロック保持中）のセッションは退避されないこと"""
+        evicted = []
+        store = SessionStateStore(max_sessions=1, on_evict=evicted.append)
+        state, lock = store.acquire("busy")
+        state.add_turn("User", "処理中")
+        store.release("busy")
+        
+        with lock:
+            _use(store, "other")
+            assert "busy" in store
+        
+        assert evicted == []
+    
+    def test_acquired_session_not_evicted(self):
+        """acquire後、ロック取得前のセッションも退避されず、release後に退避されること"""
+        evicted = []
+        store = SessionStateStore(max_sessions=1, on_evict=evicted.append)
+        state, lock = store.acquire("pinned")
+        state.add_turn("User", "ロック取得前")
+        
+        _use(store, "other")
+        assert "pinned" in store
+        assert store.acquire("pinned")[0] is state
+        
+        store.release("pinned")
+        store.release("pinned")
+        assert "other" not in store and len(store) == 1
+        assert evicted == []
+        _use(store, "third")
+        assert [s.session_id for s in evicted] == ["pinned"]
+    
+    def test_loader_restores_evicted_session(self):
+        """退避済みセッションがloaderで復元されること"""
+        saved = {}
+        store = SessionStateStore(
+            max_sessions=1,
+            on_evict=lambda s: saved.__setitem__(s.session_id, s.to_dict()),
+            loader=lambda sid: ConversationState.from_dict(saved[sid]) if sid in saved else None
+        )
+        _use(store, "a").add_turn("User", "覚えていて")
+        _use(store, "b")
+        
+        restored, _ = store.acquire("a")
+        
+        assert restored.history[0]["msg"] == "覚えていて"
+    
+    def test_acquire_during_eviction_reuses_state(self):
+        """退避コールバック実行中に再確保すると、loaderを呼ばず保存完了後に同じ会話状態が返ること"""
+        saving = threading.Event()
+        resume = threading.Event()
+        
+        def on_evict(state):
+            saving.set()
+            resume.wait(timeout=5)
+        
+        loader = Mock(return_value=None)
+        store = SessionStateStore(max_sessions=1, on_evict=on_evict, loader=loader)
+        state = _use(store, "a")
+        state.add_turn("User", "保存中")
+        
+        evictor = threading.Thread(target=_use, args=(store, "b"))
+        evictor.start()
+        assert saving.wait(timeout=5)
+        
+        acquired = []
+        reacquirer = threading.Thread(target=lambda: acquired.append(store.acquire("a")[0]))
+        reacquirer.start()
+        time.sleep(0.1)
+        assert acquired == []  # 保存完了まで待機
+        
+        resume.set()
+        evictor.join(timeout=5)
+        reacquirer.join(timeout=5)
+        
+        assert acquired[0] is state
+        assert [c.args[0] for c in loader.call_args_list] == ["a", "b"]
+
+
+class TestChatServiceSessionConcurrency:
+    """ChatServiceのセッション並列実行テスト"""
+    
+    @pytest.fixture
+    def slow_chat(self):
+        """実行区間を記録する低速なPhase 1コアのモック"""
+        spans = []
+        
+        async def achat(user_input, session_id, character=None, **kwargs):
+            start = time.perf_counter()
+            await asyncio.sleep(0.2)
+            spans.append((session_id, start, time.perf_counter()))
+            return {'response': user_input, 'speaker': 'ルミナ'}
+        
+        mock = Mock()
+        mock.achat = AsyncMock(side_effect=achat)
+        return mock, spans
+    
+    @pytest.fixture
+    def chat_service(self, slow_chat):
+        mock, _ = slow_chat
+        with patch('services.chat_service.MultiLLMChat', return_value=mock):
+            return ChatService()
+    
+    @pytest.mark.asyncio
+    async def test_different_sessions_run_in_parallel(self, chat_service, slow_chat):
+        """別セッションのターンが並列実行されること"""
+        _, spans = slow_chat
+        start = time.perf_counter()
+        
+        await asyncio.gather(
+            chat_service.chat("u1", "s1", "こんにちは"),
+            chat_service.chat("u2", "s2", "こんにちは"),
+        )
+        
+        assert time.perf_counter() - start < 0.35
+        assert len(spans) == 2
+    
+    @pytest.mark.asyncio
+    async def test_same_session_turns_are_ordered(self, chat_service, slow_chat):
+        """同一セッションのターンが到着順に直列実行されること"""
+        _, spans = slow_chat
+        # 同時に届いた入力は合流するため、合流なしの直列実行を確認する
+        chat_service.coalescer.enabled = False
+        
+        results = await asyncio.gather(
+            chat_service.chat("u1", "s1", "1"),
+            chat_service.chat("u1", "s1", "2"),
+        )
+        
+        assert [r['response'] for r in results] == ["1", "2"]
+        (_, _, first_end), (_, second_start, _) = sorted(spans, key=lambda s: s[1])
+        assert second_start >= first_end
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
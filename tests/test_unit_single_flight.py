@@ -0,0 +1,179 @@
+"""同一LLMリクエスト集約ユニットテスト
+
+SingleFlightのトークン共有・例外伝播と、LLMNodeからの利用をテストします。
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from config import Config
+from exceptions import LLMTimeoutError
+from llm_nodes import LuminaNode
+from single_flight import FlightAbandoned, SingleFlight, get_single_flight, make_flight_key
+
+
+class TestSingleFlight:
+    """SingleFlightテスト"""
+    
+    def test_key_ignores_whitespace(self):
+        """空白の違いは同一キー、モデルの違いは別キーになること"""
+        assert make_flight_key("m", "こんにちは\n 元気？") == make_flight_key("m", "こんにちは 元気？")
+        assert make_flight_key("m", "挨拶") != make_flight_key("m2", "挨拶")
+    
+    def test_follower_replays_and_streams_tokens(self):
+        """途中から合流しても全トークンを同じ順序で受け取ること"""
+        single_flight = SingleFlight()
+        flight, leader = single_flight.join("k")
+        flight.emit("こん")
+        
+        follower, is_leader = single_flight.join("k")
+        received = []
+        thread = threading.Thread(target=lambda: received.append(follower.wait(received.append)))
+        thread.start()
+        flight.emit("にちは")
+        single_flight.complete(flight, result="こんにちは")
+        thread.join(1)
+        
+        assert leader and not is_leader and follower is flight
+        assert received == ["こん", "にちは", "こんにちは"]
+        assert len(single_flight) == 0
+    
+    @pytest.mark.asyncio
+    async def test_async_follower(self):
+        """非同期の合流者もトークンと結果を受け取ること"""
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join("k")
+        follower, _ = single_flight.join("k")
+        received = []
+        waiter = asyncio.create_task(follower.await_result(received.append))
+        
+        await asyncio.sleep(0)
+        flight.emit("a")
+        await asyncio.sleep(0)
+        flight.emit("b")
+        single_flight.complete(flight, result="ab")
+        
+        assert await asyncio.wait_for(waiter, timeout=1) == "ab"
+        assert received == ["a", "b"]
+    
+    @pytest.mark.asyncio
+    async def test_error_propagates(self):
+        """先行リクエストの例外が合流者にも送出されること"""
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join("k")
+        single_flight.join("k")
+        single_flight.complete(flight, error=FlightAbandoned("k"))
+        
+        with pytest.raises(FlightAbandoned):
+            await flight.await_result()
+
+
+class TestLLMNodeSingleFlight:
+    """LLMNodeの同一リクエスト集約テスト"""
+    
+    @pytest.fixture
+    def node(self):
+        """応答キャッシュ無効のルミナノード（集約のみを検証する）"""
+        config = Config()
+        config.model.response_cache_enabled = False
+        return LuminaNode(config)
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_calls_share_stream(self, node):
+        """同時の同一リクエストはOllama呼び出し1回で同じトークン列を共有すること"""
+        calls = 0
+        
+        async def fake_chat(**kwargs):
+            nonlocal calls
+            calls += 1
+            
+            async def stream():
+                for delta in ["こん", "にち", "は"]:
+                    await asyncio.sleep(0.01)
+                    yield {'message': {'content': delta}}
+            return stream()
+        
+        streams = [[], [], []]
+        with patch('llm_client.AsyncLLMClient.chat', side_effect=fake_chat):
+            results = await asyncio.gather(*(
+                node._acall_ollama("挨拶", on_token=received.append) for received in streams
+            ))
+        
+        assert calls == 1
+        assert results == ["こんにちは"] * 3
+        assert streams == [["こん", "にち", "は"]] * 3
+    
+    @patch('llm_nodes.ollama.chat')
+    def test_sync_threads_coalesce(self, mock_chat, node):
+        """スレッドからの同時同一リクエストも1回の生成に集約されること"""
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow_chat(**kwargs):
+            started.set()
+            release.wait(1)
+            return {'message': {'content': '応答'}}
+        
+        mock_chat.side_effect = slow_chat
+        results = []
+        leader = threading.Thread(target=lambda: results.append(node._call_ollama("挨拶")))
+        leader.start()
+        started.wait(1)
+        follower = threading.Thread(target=lambda: results.append(node._call_ollama("挨拶")))
+        follower.start()
+        # 合流者がフライトに加わるまで待つ
+        while not any(f.followers for f in get_single_flight()._flights.values()):
+            time.sleep(0.001)
+        release.set()
+        leader.join(1)
+        follower.join(1)
+        
+        assert mock_chat.call_count == 1
+        assert results == ['応答', '応答']
+    
+    @pytest.mark.asyncio
+    async def test_leader_error_propagates(self, node):
+        """先行リクエストの失敗（実行枠の期限切れ等）は合流者にも送出されること"""
+        gate = asyncio.Event()
+        
+        async def failing_invoke(*args, **kwargs):
+            await gate.wait()
+            raise LLMTimeoutError("期限切れ")
+        
+        with patch.object(node, '_ainvoke_ollama', side_effect=failing_invoke) as mock_invoke:
+            tasks = [asyncio.create_task(node._acall_ollama("挨拶")) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            gate.set()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        assert mock_invoke.call_count == 1
+        assert all(isinstance(r, LLMTimeoutError) for r in results)
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_hands_over(self, node):
+        """先行リクエストがキャンセルされた場合、合流者が自分で再実行すること"""
+        gate = asyncio.Event()
+        
+        async def invoke(*args, **kwargs):
+            await gate.wait()
+            return "応答"
+        
+        with patch.object(node, '_ainvoke_ollama', side_effect=invoke) as mock_invoke:
+            leader = asyncio.create_task(node._acall_ollama("挨拶"))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(node._acall_ollama("挨拶"))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0.01)
+            gate.set()
+            
+            assert await asyncio.wait_for(follower, timeout=1) == "応答"
+        
+        assert mock_invoke.call_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
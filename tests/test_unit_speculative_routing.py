@@ -0,0 +1,205 @@
+"""投機的ルーティングユニットテスト
+
+曖昧な入力の候補判定、候補2キャラの先行生成と採用されなかった側のキャンセル、
+破棄トークンのメトリクスをテストします。Ollamaは使用せず、生成・最終判定をスタブに差し替えます。
+"""
+
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from config import Config
+from llm_nodes import RouterNode
+from main import MultiLLMChat
+from metrics import get_metrics_collector
+from prompt_builder import estimate_tokens
+
+
+AMBIGUOUS = "最新ニュースの理由を教えて"
+
+
+class StubNode:
+    """トークンを一定間隔で生成するノード"""
+    
+    def __init__(self, name, tokens=10, interval=0.02):
+        self.character_name = name
+        self.tokens = tokens
+        self.interval = interval
+        self.cancelled = False
+        self.streamed = []
+    
+    async def agenerate(self, state, on_token=None):
+        try:
+            for i in range(self.tokens):
+                await asyncio.sleep(self.interval)
+                on_token(f"{self.character_name}{i}")
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        msg = "".join(f"{self.character_name}{i}" for i in range(self.tokens))
+        return {
+            'history': [{'speaker': self.character_name, 'msg': msg, 'timestamp': datetime.now().isoformat()}],
+            'last_speaker': self.character_name
+        }
+    
+    def _get_token_callback(self, state):
+        return self.streamed.append
+
+
+def _router(**system):
+    config = Config()
+    config.system.speculative_routing_enabled = True
+    for key, value in system.items():
+        setattr(config.system, key, value)
+    return RouterNode(config)
+
+
+def _judge(answer, delay=0.05):
+    async def ajudge(state, candidates):
+        await asyncio.sleep(delay)
+        return answer
+    return ajudge
+
+
+class TestCandidates:
+    """speculation_candidatesテスト"""
+    
+    def test_ambiguous_keywords(self):
+        """複数キャラのキーワードに一致した入力は上位2キャラを候補にすること"""
+        router = _router()
+        update = router.decide_next({'user_input': AMBIGUOUS})
+        
+        assert update['next_character'] == 'nox'
+        assert update['candidates'] == ['nox', 'claris']
+    
+    @pytest.mark.parametrize("state", [
+        {'user_input': 'こんにちは'},
+        {'user_input': '理由を詳しく'},
+        {'user_input': 'ノクス、' + AMBIGUOUS},
+        {'user_input': AMBIGUOUS, 'next_character': 'claris'},
+    ])
+    def test_not_ambiguous(self, state):
+        """一致が1キャラ以下・指名・キャラクター指定の場合は投機しないこと"""
+        assert _router().decide_next(state)['candidates'] == []
+    
+    def test_disabled(self):
+        """無効時は候補を返さないこと"""
+        assert _router(speculative_routing_enabled=False).decide_next({'user_input': AMBIGUOUS})['candidates'] == []
+    
+    def test_parse_judgement(self):
+        """判定応答から候補のキー・別名を判別すること"""
+        router = _router()
+        
+        assert router._parse_judgement("claris", ['nox', 'claris']) == 'claris'
+        assert router._parse_judgement("ノクスが適任です（claris ではない）", ['nox', 'claris']) == 'nox'
+        assert router._parse_judgement("lumina", ['nox', 'claris']) is None
+
+
+class TestSpeculate:
+    """aspeculateテスト"""
+    
+    def test_misprediction_cancels_first_candidate(self):
+        """判定が第2候補の場合、第1候補の生成をキャンセルし破棄トークンを記録すること"""
+        router = _router()
+        nodes = {'nox': StubNode('ノクス'), 'claris': StubNode('クラリス')}
+        state = {'user_input': AMBIGUOUS, 'candidates': ['nox', 'claris']}
+        
+        with patch.object(router, 'ajudge', _judge('claris', delay=0.05)):
+            update = asyncio.run(router.aspeculate(state, nodes))
+        
+        assert update['next_character'] == 'claris'
+        assert update['last_speaker'] == 'クラリス'
+        assert nodes['nox'].cancelled
+        # 判定前にバッファしたトークンも含め、採用側のトークンが順序通り送出されること
+        assert nodes['claris'].streamed == [f"クラリス{i}" for i in range(10)]
+        assert nodes['nox'].streamed == []
+        
+        speculation = get_metrics_collector().get_summary()['speculation_stats']
+        assert speculation['runs'] == 1
+        assert speculation['hits'] == 0
+        assert speculation['cancelled'] == 1
+        # チャンク数ではなく推定トークン数で数えること
+        assert 4 <= speculation['wasted_tokens'] < estimate_tokens("".join(f"ノクス{i}" for i in range(10)))
+    
+    def test_wasted_tokens_include_revised_draft(self):
+        """採用されなかった候補がカスケードで改訂した場合、破棄した下書きも数えること"""
+        class RevisingNode(StubNode):
+            async def agenerate(self, state, on_token=None):
+                for delta in ("下書き", "の本文"):
+                    on_token(delta)
+                on_token.revise()
+                return await super().agenerate(state, on_token)
+        
+        router = _router()
+        nodes = {'nox': RevisingNode('ノクス', tokens=1, interval=0.01), 'claris': StubNode('クラリス')}
+        state = {'user_input': AMBIGUOUS, 'candidates': ['nox', 'claris']}
+        
+        with patch.object(router, 'ajudge', _judge('claris', delay=0.1)):
+            asyncio.run(router.aspeculate(state, nodes))
+        
+        speculation = get_metrics_collector().get_summary()['speculation_stats']
+        assert speculation['wasted_tokens'] == estimate_tokens("下書きの本文") + estimate_tokens("ノクス0")
+    
+    def test_judge_timeout_uses_first_candidate(self):
+        """判定が期限を超えた場合は第1候補を採用すること"""
+        router = _router(speculative_judge_timeout_ms=20)
+        nodes = {'nox': StubNode('ノクス'), 'claris': StubNode('クラリス')}
+        state = {'user_input': AMBIGUOUS, 'candidates': ['nox', 'claris']}
+        
+        with patch.object(router, 'ajudge', _judge('claris', delay=1.0)):
+            update = asyncio.run(router.aspeculate(state, nodes))
+        
+        assert update['next_character'] == 'nox'
+        assert nodes['claris'].cancelled
+        speculation = get_metrics_collector().get_summary()['speculation_stats']
+        assert speculation['judge_failures'] == 1
+        assert speculation['hits'] == 1
+    
+    def test_outer_cancellation_stops_candidates(self):
+        """呼び出し元がキャンセルされた場合は両候補の生成もキャンセルすること"""
+        router = _router()
+        nodes = {'nox': StubNode('ノクス'), 'claris': StubNode('クラリス')}
+        state = {'user_input': AMBIGUOUS, 'candidates': ['nox', 'claris']}
+        
+        async def run():
+            task = asyncio.ensure_future(router.aspeculate(state, nodes))
+            await asyncio.sleep(0.03)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0)
+        
+        with patch.object(router, 'ajudge', _judge('claris', delay=1.0)):
+            asyncio.run(run())
+        
+        assert nodes['nox'].cancelled and nodes['claris'].cancelled
+
+
+class TestGraph:
+    """グラフでの投機的ルーティングテスト"""
+    
+    @pytest.fixture
+    def chat_system(self):
+        with patch('llm_nodes.ollama.chat', return_value={'message': {'content': '了解です'}}):
+            chat_system = MultiLLMChat()
+        chat_system.config.system.speculative_routing_enabled = True
+        chat_system.stubs = {}
+        for node in (chat_system.claris_node, chat_system.nox_node):
+            stub = StubNode(node.character_name, tokens=3)
+            node.agenerate = stub.agenerate
+            chat_system.stubs[node.character_key] = stub
+        return chat_system
+    
+    def test_async_uses_judgement(self, chat_system):
+        """非同期実行では最終判定のキャラクターが応答すること"""
+        with patch.object(chat_system.router_node, 'ajudge', _judge('claris')):
+            result = asyncio.run(chat_system.achat(AMBIGUOUS, session_id='speculate'))
+        
+        assert result['speaker'] == 'クラリス'
+        assert len(result['responses']) == 1
+        assert chat_system.stubs['nox'].cancelled
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,160 @@
+"""Web検索ユニットテスト
+
+WebSearchClientのクエリ正規化・結果キャッシュと、
+NoxNodeの検索先行開始・待ち時間上限をテストします。
+"""
+
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import patch
+
+from config import Config
+from llm_nodes import NoxNode
+from metrics import MetricsCollector
+from response_cache import ResponseCache
+from web_search import WebSearchClient, make_search_key
+
+
+SERPER_RESPONSE = {"organic": [{"title": "記事タイトル", "snippet": "概要"}]}
+
+
+@pytest.fixture
+def metrics():
+    return MetricsCollector()
+
+
+@pytest.fixture
+def requests_seen():
+    return []
+
+
+@pytest.fixture
+def client(metrics, requests_seen):
+    """Serperをモックトランスポートに差し替えた検索クライアント"""
+    def handler(request):
+        requests_seen.append(request)
+        return httpx.Response(200, json=SERPER_RESPONSE)
+    
+    client = WebSearchClient(
+        api_key="test-key",
+        cache=ResponseCache(metrics=metrics, name="search"),
+        metrics=metrics
+    )
+    transport = httpx.MockTransport(handler)
+    client._client = httpx.Client(transport=transport)
+    client._get_async_client = lambda: httpx.AsyncClient(transport=transport)
+    return client
+
+
+@pytest.fixture
+def config():
+    config = Config()
+    config.model.response_cache_enabled = False
+    config.system.enable_search = True
+    config.system.search_deadline_ms = 100
+    return config
+
+
+class TestWebSearchClient:
+    """WebSearchClientテスト"""
+    
+    def test_query_normalization(self):
+        """全角・半角、大文字・小文字、空白の違いは同じキーになること"""
+        assert make_search_key("最新  ＡＩ ニュース", 3) == make_search_key("最新 ai ニュース", 3)
+        assert make_search_key("最新 AI ニュース", 3) != make_search_key("最新 AI ニュース", 5)
+    
+    def test_result_cached(self, client, metrics, requests_seen):
+        """同じクエリの2回目はSerperを呼び出さないこと"""
+        first = client.search("最新ニュース")
+        second = client.search(" 最新ニュース ")
+        
+        assert first == second == "1. 記事タイトル\n   概要"
+        assert len(requests_seen) == 1
+        assert requests_seen[0].headers["X-API-KEY"] == "test-key"
+        stats = metrics.get_summary()['search_stats']
+        assert (stats['requests'], stats['cache_hits']) == (1, 1)
+        assert metrics.get_summary()['cache_stats']['hits'] == 0
+    
+    def test_error_not_cached(self, client, requests_seen):
+        """エラー応答はキャッシュせず、次回は再度呼び出すこと"""
+        client._client = httpx.Client(transport=httpx.MockTransport(
+            lambda request: requests_seen.append(request) or httpx.Response(500)
+        ))
+        
+        assert client.search("調べて").startswith("[検索エラー")
+        client.search("調べて")
+        assert len(requests_seen) == 2
+    
+    @pytest.mark.asyncio
+    async def test_async_search_shares_cache(self, client, requests_seen):
+        """非同期検索も同じキャッシュを使うこと"""
+        assert await client.asearch("最新ニュース") == client.search("最新ニュース")
+        assert len(requests_seen) == 1
+
+
+class TestNoxSearchStage:
+    """NoxNodeの検索ステージテスト"""
+    
+    @patch('llm_nodes.ollama.chat', return_value={'message': {'content': '応答'}})
+    def test_prefetched_search_is_reused(self, mock_chat, config):
+        """ルーター時点で開始した検索結果をそのまま使うこと"""
+        node = NoxNode(config)
+        state = {'history': [], 'user_input': '最新ニュースを調べて', 'session_id': 's1'}
+        
+        with patch.object(node, '_perform_search', return_value="1. 記事") as mock_search:
+            assert node.prefetch_search(state)
+            assert not node.prefetch_search(state)
+            update = node.generate(state)
+        
+        mock_search.assert_called_once_with('最新ニュースを調べて')
+        assert update['history'][0]['search_used'] is True
+        assert "検索結果:\n1. 記事" in mock_chat.call_args.kwargs['messages'][0]['content']
+    
+    @patch('llm_nodes.ollama.chat', return_value={'message': {'content': '応答'}})
+    def test_answers_without_search_after_deadline(self, mock_chat, config):
+        """検索が期限を超えた場合は検索結果なしで応答すること"""
+        node = NoxNode(config)
+        state = {'history': [], 'user_input': '最新ニュースを調べて', 'session_id': 's1'}
+        
+        def slow_search(query):
+            time.sleep(0.5)
+            return "1. 遅い記事"
+        
+        with patch('metrics.get_metrics_collector') as mock_metrics, \
+                patch.object(node, '_perform_search', side_effect=slow_search):
+            mock_metrics.return_value.rolling_latency_p95.return_value = None
+            start = time.monotonic()
+            update = node.generate(state)
+            elapsed = time.monotonic() - start
+        
+        assert elapsed < 0.4
+        assert update['history'][0]['search_used'] is False
+        assert "検索結果" not in mock_chat.call_args.kwargs['messages'][0]['content']
+        mock_metrics.return_value.record_search_timeout.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_async_prefetch_and_deadline(self, config):
+        """非同期でも先行検索を再利用し、期限超過時は検索タスクを継続したまま応答すること"""
+        node = NoxNode(config)
+        state = {'history': [], 'user_input': '最新ニュースを調べて', 'session_id': 's1'}
+        finished = []
+        
+        async def slow_search(query):
+            await asyncio.sleep(0.3)
+            finished.append(query)
+            return "1. 遅い記事"
+        
+        with patch.object(node, '_aperform_search', side_effect=slow_search), \
+                patch.object(node, '_acall_ollama', return_value="応答"):
+            assert node.aprefetch_search(state)
+            update = await node.agenerate(state)
+            assert update['history'][0]['search_used'] is False
+            await asyncio.sleep(0.4)
+        
+        assert finished == ['最新ニュースを調べて']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
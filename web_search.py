@@ -0,0 +1,271 @@
+"""
+web_search.py
+Web検索クライアント（Serper API）
+
+同期・非同期の両方で接続プール付きHTTPクライアント（httpx）を共有し、
+検索結果は正規化したクエリをキーにResponseCache（プロセス内LRU+TTL → Redis）へ保存する。
+同じ質問の繰り返しや表記揺れ（全角・半角、大文字・小文字、空白）ではSerperを呼び出さない。
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+from memory.redis_cache import get_redis_cache
+from response_cache import ResponseCache, normalize_prompt
+
+
+SEARCH_URL = "https://google.serper.dev/search"
+
+# Redisキーの名前空間
+KEY_PREFIX = "search:serper"
+
+
+def normalize_query(query: str) -> str:
+    """
+    キャッシュキー用に検索クエリを正規化
+    
+    Args:
+        query: 検索クエリ
+    
+    Returns:
+        NFKC正規化・空白の畳み込み・小文字化したクエリ
+    """
+    return normalize_prompt(query).lower()
+
+
+def make_search_key(query: str, num_results: int) -> str:
+    """
+    検索結果キャッシュのキーを生成
+    
+    Args:
+        query: 検索クエリ
+        num_results: 取得件数
+    
+    Returns:
+        "search:serper:{件数}:{sha256}"
+    """
+    digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{num_results}:{digest}"
+
+
+def format_results(data: Dict[str, Any], num_results: int) -> str:
+    """
+    Serperの応答をプロンプト用の文字列に整形
+    
+    Args:
+        data: Serper APIの応答JSON
+        num_results: 使用する件数
+    
+    Returns:
+        "1. タイトル\\n   スニペット"形式の検索結果
+    """
+    results = data.get("organic", [])[:num_results]
+    if not results:
+        return "[検索結果が見つかりませんでした]"
+    
+    formatted = []
+    for i, result in enumerate(results, 1):
+        title = result.get("title", "")
+        snippet = result.get("snippet", "")
+        formatted.append(f"{i}. {title}\n   {snippet}")
+    return "\n\n".join(formatted)
+
+
+class WebSearchClient:
+    """Serper検索クライアント（接続プール・結果キャッシュ付き）"""
+    
+    def __init__(self, api_key: str, cache: Optional[ResponseCache] = None,
+                 num_results: int = 3, timeout: float = 10.0, max_connections: int = 10,
+                 metrics=None):
+        """
+        初期化
+        
+        Args:
+            api_key: Serper APIキー
+            cache: 検索結果キャッシュ（Noneの場合はキャッシュしない）
+            num_results: 取得件数
+            timeout: HTTPタイムアウト（秒）
+            max_connections: 同時接続数の上限
+            metrics: MetricsCollector（省略時はグローバルインスタンス）
+        """
+        self.api_key = api_key
+        self.cache = cache
+        self.num_results = num_results
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        self._metrics = metrics
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        # 非同期クライアントはイベントループごとに保持（接続プールがループに束縛されるため）
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+    
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            from metrics import get_metrics_collector
+            return get_metrics_collector()
+        return self._metrics
+    
+    @property
+    def enabled(self) -> bool:
+        """APIキーが設定されているか"""
+        return bool(self.api_key)
+    
+    def search(self, query: str) -> str:
+        """
+        検索を実行（同期）
+        
+        Args:
+            query: 検索クエリ
+        
+        Returns:
+            整形済みの検索結果（失敗時は"[検索エラー: ...]"）
+        """
+        if not self.enabled:
+            return "[検索APIキーが設定されていません]"
+        
+        key = make_search_key(query, self.num_results)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        start_time = time.time()
+        try:
+            response = self._get_client().post(SEARCH_URL, headers=self._headers(),
+                                               json=self._payload(query))
+            response.raise_for_status()
+            result = format_results(response.json(), self.num_results)
+        except Exception as e:
+            self.metrics.record_search((time.time() - start_time) * 1000, success=False)
+            return f"[検索エラー: {str(e)}]"
+        
+        self.metrics.record_search((time.time() - start_time) * 1000)
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
+    
+    async def asearch(self, query: str) -> str:
+        """
+        検索を実行（非同期）
+        
+        Args:
+            query: 検索クエリ
+        
+        Returns:
+            整形済みの検索結果（失敗時は"[検索エラー: ...]"）
+        """
+        if not self.enabled:
+            return "[検索APIキーが設定されていません]"
+        
+        key = make_search_key(query, self.num_results)
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+        
+        start_time = time.time()
+        try:
+            response = await self._get_async_client().post(
+                SEARCH_URL, headers=self._headers(), json=self._payload(query)
+            )
+            response.raise_for_status()
+            result = format_results(response.json(), self.num_results)
+        except Exception as e:
+            self.metrics.record_search((time.time() - start_time) * 1000, success=False)
+            return f"[検索エラー: {str(e)}]"
+        
+        self.metrics.record_search((time.time() - start_time) * 1000)
+        if self.cache is not None:
+            await self.cache.aset(key, result)
+        return result
+    
+    def close(self):
+        """同期クライアントの接続プールをクローズ"""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+    
+    async def aclose(self):
+        """現在のイベントループの非同期クライアントをクローズ"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    def _headers(self) -> Dict[str, str]:
+        return {"X-API-KEY": self.api_key, "Content-Type": "application/json"}
+    
+    def _payload(self, query: str) -> Dict[str, Any]:
+        return {"q": query, "num": self.num_results}
+    
+    def _get_client(self) -> httpx.Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout, limits=self.limits)
+            return self._client
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._async_clients[loop] = client
+        return client
+
+
+# グローバルインスタンス（シングルトン）
+_web_search_client: Optional[WebSearchClient] = None
+
+
+def get_web_search_client() -> WebSearchClient:
+    """
+    グローバルWebSearchClientインスタンスを取得
+    
+    Returns:
+        WebSearchClientインスタンス
+    """
+    global _web_search_client
+    if _web_search_client is None:
+        from config import config
+        
+        system = config.system
+        cache = None
+        if system.search_cache_enabled:
+            cache = ResponseCache(
+                max_entries=system.search_cache_max_entries,
+                ttl_seconds=system.search_cache_ttl,
+                redis_cache=get_redis_cache(
+                    host=config.database.redis_host,
+                    port=config.database.redis_port,
+                    db=config.database.redis_db,
+                    password=config.database.redis_password or None
+                ),
+                name="search"
+            )
+        _web_search_client = WebSearchClient(
+            api_key=system.serper_api_key,
+            cache=cache,
+            timeout=system.search_timeout,
+            max_connections=system.search_max_connections
+        )
+    return _web_search_client
+
+
+def reset_web_search_client():
+    """グローバルWebSearchClientをリセット"""
+    global _web_search_client
+    if _web_search_client is not None:
+        _web_search_client.close()
+    _web_search_client = None